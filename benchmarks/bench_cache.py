@@ -0,0 +1,127 @@
+"""Exercise the two-tier cache against the in-memory Redis stand-in.
+
+Two CacheManager instances share one tools.redis_stub server, as two bot
+processes would. The run times local hits, Redis hits and misses, checks
+that a write from one instance invalidates the other's local copy, and
+stops Redis halfway to check that both keep serving local-only and
+recover once it is back.
+
+The stampede part fires --concurrency get_or_compute calls per instance at
+one key, three times: while it is missing, after its soft TTL and after
+its hard TTL. Each round should compute it once for all instances, and
+the round after the soft TTL should answer without waiting.
+
+    python -m benchmarks.bench_cache --entries 2000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+import numpy as np
+from config.config import Config
+from src.utils.cache_manager import CacheManager
+from tools.redis_stub import RedisStub
+
+async def timed(count: int, func) -> float:
+    """Microseconds per awaited call"""
+    start = time.perf_counter()
+    for i in range(count):
+        await func(i)
+    return round((time.perf_counter() - start) / count * 1e6, 2)
+
+async def wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await predicate():
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+async def stampede(caches, concurrency: int) -> dict:
+    calls = {'computed': 0}
+
+    async def compute():
+        calls['computed'] += 1
+        await asyncio.sleep(0.2)  # Mis. mengambil daftar pair dari exchange
+        return {'computed': calls['computed']}
+
+    async def burst():
+        start = time.perf_counter()
+        values = await asyncio.gather(*(cache.get_or_compute('stampede', compute, soft_ttl=0.5, hard_ttl=1.5)
+                                        for cache in caches for _ in range(concurrency)))
+        return round((time.perf_counter() - start) * 1e3, 1), sorted({value['computed'] for value in values})
+
+    results = {}
+    for name, pause in (('cold', 0), ('after_soft_ttl', 0.6), ('after_hard_ttl', 1.7)):
+        await asyncio.sleep(pause)
+        before = calls['computed']
+        ms, seen = await burst()
+        await asyncio.sleep(0.3)  # Refresh di background selesai
+        results[name] = {'ms': ms, 'values_seen': seen, 'computations': calls['computed'] - before}
+    return results
+
+async def run(args) -> dict:
+    stub = RedisStub().start()
+    a, b = CacheManager.for_url(stub.url), CacheManager.for_url(stub.url)
+    tickers = {f"coin{i}_idr": {'last': str(1000 + i), 'high': str(1100 + i), 'low': str(900 + i),
+                                'vol_idr': str(10 ** 9 + i)} for i in range(200)}
+    closes = np.random.default_rng(1).random((500, 6))
+    results = {}
+
+    await a.set_data('warm', 1)  # Buka koneksi dan listener
+    await b.get_data('warm')
+    await asyncio.sleep(0.2)
+
+    results['set_tickers_us'] = await timed(args.entries, lambda i: a.set_data(f"tickers:{i}", tickers, 60))
+    results['local_hit_tickers_us'] = await timed(args.entries, lambda i: a.get_data(f"tickers:{i}"))
+    results['redis_hit_tickers_us'] = await timed(args.entries, lambda i: b.get_data(f"tickers:{i}"))
+    results['local_hit_after_redis_us'] = await timed(args.entries, lambda i: b.get_data(f"tickers:{i}"))
+    results['miss_us'] = await timed(args.entries, lambda i: b.get_data(f"absent:{i}"))
+    await a.set_data('ohlcv', closes, 60)
+    results['array_roundtrip_ok'] = bool(np.array_equal(await b.get_data('ohlcv'), closes))
+
+    # Tulisan dari a harus menghapus salinan lokal b
+    await a.set_data('shared', 'v1', 60)
+    await b.get_data('shared')
+    await a.set_data('shared', 'v2', 60)
+    results['invalidated'] = await wait_for(lambda: _equals(b, 'shared', 'v2'))
+
+    # Redis mati: kedua instance tetap melayani dari tier lokal
+    port = stub.port
+    stub.stop()
+    await a.set_data('during_outage', 'local', 60)
+    results['outage_local_hit'] = await a.get_data('during_outage') == 'local'
+    results['outage_get_us'] = await timed(200, lambda i: b.get_data(f"absent:{i}"))
+    stub = RedisStub(port=port).start()
+    await asyncio.sleep(Config.CACHE_REDIS_RETRY + 0.2)
+    await a.set_data('after', 'ok', 60)
+    results['recovered'] = await wait_for(lambda: _equals(b, 'after', 'ok'))
+
+    results['local_entries'] = len(b.local)
+    results['local_bytes'] = b.local.size
+
+    c = CacheManager.for_url(stub.url)
+    results['stampede'] = await stampede([a, b, c], args.concurrency)
+    for cache in (a, b, c):
+        await cache.close()
+    stub.stop()
+    return results
+
+async def _equals(cache: CacheManager, key: str, expected) -> bool:
+    return await cache.get_data(key) == expected
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50, help="Concurrent requests per instance")
+    parser.add_argument('--with-logging', action='store_true')
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logging.disable(logging.INFO)
+    Config.CACHE_REDIS_RETRY = 1.0  # Percepat pemulihan untuk uji ini
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Time the bot's hot paths offline against recorded exchange responses.
+
+Cases: Indodax trade aggregation and Bitget candle parsing in get_ohlcv,
+price and pairs message formatting, candlestick plot plus PNG savefig,
+OHLCV and order book inserts, and alert checking against 1k, 10k and 100k
+alerts. Each case reports seconds per operation (median and best of the
+repeats); pass --baseline to compare against an earlier run and exit with
+status 1 when any case got slower by more than --threshold.
+
+    python -m benchmarks.bench_hot_paths --output bench.json
+    python -m benchmarks.bench_hot_paths --baseline bench.json --threshold 0.2
+
+See benchmarks/fixtures.py for recording the exchange responses.
+"""
+import argparse
+import io
+import json
+import logging
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from benchmarks import fixtures
+
+def measure(func: Callable[[], object], repeat: int, min_time: float) -> Dict[str, float]:
+    """Seconds per call: calls are batched until a batch takes min_time, then batches are repeated"""
+    func()  # Pemanasan: import malas, cache, JIT regex
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return {'median': statistics.median(samples), 'best': min(samples), 'calls_per_sample': number}
+
+def ohlcv_cases() -> Dict[str, Callable]:
+    from src.api.bitget_client import BitgetClient
+    from src.api.indodax_client import IndodaxClient
+    indodax, bitget = IndodaxClient(), BitgetClient()
+    cases = {
+        'indodax_get_ohlcv_1h': lambda: indodax.get_ohlcv('BTC', '1h'),
+        'indodax_get_ohlcv_1d': lambda: indodax.get_ohlcv('BTC', '1d'),
+        'bitget_get_ohlcv': lambda: bitget.get_ohlcv('BTCUSDT', '1h')
+    }
+    # Klien mengembalikan None saat gagal; jangan sampai yang diukur hanya jalur error
+    for name, func in cases.items():
+        if not func():
+            raise SystemExit(f"{name} returned no candles from the fixtures, see logs/error.log")
+    return cases
+
+def format_cases() -> Dict[str, Callable]:
+    from src.api.price_service import PriceService
+    service = PriceService()
+    prices = {name: client.get_ticker('BTC') for name, client in service.exchanges.items()}
+    pairs = service.get_available_pairs()
+    return {
+        'format_price_message': lambda: service.format_price_message(prices, rate=15800.0),
+        'format_pairs_message': lambda: service.format_pairs_message(pairs)
+    }
+
+def chart_cases() -> Dict[str, Callable]:
+    from src.api.bitget_client import BitgetClient
+    from src.bot.telegram_bot import plot_candlestick
+    ohlcv = BitgetClient().get_ohlcv('BTCUSDT', '1h')
+    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    df.set_index('timestamp', inplace=True)
+
+    def render():
+        fig, ax = plt.subplots(figsize=(12, 8))
+        try:
+            plot_candlestick(ax, df)
+            fig.savefig(io.BytesIO(), format='png', dpi=100)
+        finally:
+            plt.close(fig)
+    return {'plot_candlestick_savefig': render}
+
+def database_cases(database_url: str) -> Dict[str, Callable]:
+    from src.database.models import Base
+    from src.database.operations import DatabaseOps
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    candle = fixtures.load('bitget_candles')[0][-1]
+    ohlcv = {'symbol': 'BTCUSDT', 'timestamp': int(candle[0]), 'open': float(candle[1]),
+             'high': float(candle[2]), 'low': float(candle[3]), 'close': float(candle[4]),
+             'volume': float(candle[5])}
+    rng = random.Random(fixtures.SEED)
+    book = {'symbol': 'BTCUSDT', 'timestamp': ohlcv['timestamp'],
+            'bids': [[42000 - i * 0.5, rng.uniform(0.01, 5)] for i in range(50)],
+            'asks': [[42000.5 + i * 0.5, rng.uniform(0.01, 5)] for i in range(50)]}
+    return {
+        'db_save_ohlcv': lambda: DatabaseOps.save_ohlcv(session, ohlcv),
+        'db_save_order_book': lambda: DatabaseOps.save_order_book(session, book)
+    }
+
+def alert_cases(sizes: List[int]) -> Dict[str, Callable]:
+    from src.services.alert_engine import AlertEngine, PriceAlert
+    tickers = fixtures.load('indodax_summaries')[0]['tickers']
+    last = {pair.split('_')[0].upper(): float(ticker['last']) for pair, ticker in tickers.items()}
+    symbols = sorted(last)
+    cases = {}
+    for size in sizes:
+        rng = random.Random(f"{fixtures.SEED}:{size}")
+        engine = AlertEngine()
+        alerts = []
+        for i in range(size):
+            symbol = symbols[i % len(symbols)]
+            # Ambang 2-50% dari harga, jadi jarang terpicu oleh pergerakan kecil di bawah
+            above = rng.random() < 0.5
+            factor = 1 + rng.uniform(0.02, 0.5) * (1 if above else -1)
+            alerts.append(PriceAlert.restore(i + 1, 1000 + i % 5000, symbol, 'indodax',
+                                             last[symbol] * factor, 'above' if above else 'below'))
+        engine.load(alerts)
+        moves = [{symbol: price * (1 + rng.uniform(-0.01, 0.01)) for symbol, price in last.items()}
+                 for _ in range(64)]
+        state = {'i': 0}
+
+        def check(engine=engine, moves=moves, state=state):
+            state['i'] = (state['i'] + 1) % len(moves)
+            fired = engine.on_tickers('indodax', moves[state['i']])
+            if fired:
+                engine.load([alert for alert, _ in fired])  # Kembalikan agar ukuran indeks tetap
+        cases[f"alerts_on_tickers_{size}"] = check
+    return cases
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(name)
+        if not previous:
+            continue
+        change = current['median'] / previous['median'] - 1
+        current['change'] = round(change, 4)
+        if change > threshold:
+            regressions.append(f"{name}: {previous['median'] * 1e3:.3f}ms -> {current['median'] * 1e3:.3f}ms "
+                               f"({change * 100:+.1f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='*', help="Run only cases whose name contains one of these")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help="Seconds per sample batch")
+    parser.add_argument('--alerts', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--output', help="Write results JSON here (default: stdout)")
+    parser.add_argument('--baseline', help="Earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown, 0.25 = 25%%")
+    parser.add_argument('--with-logging', action='store_true', help="Keep INFO logging on (included in timings)")
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logging.disable(logging.INFO)
+
+    results = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'fixtures': 'recorded' if fixtures.all_recorded() else 'synthetic',
+        'logging': args.with_logging,
+        'cases': {}
+    }
+    with fixtures.replay():
+        cases = {}
+        for build in (ohlcv_cases, format_cases, chart_cases,
+                      lambda: database_cases(args.database_url), lambda: alert_cases(args.alerts)):
+            cases.update(build())
+
+        for name, func in cases.items():
+            if args.only and not any(part in name for part in args.only):
+                continue
+            result = measure(func, args.repeat, args.min_time)
+            results['cases'][name] = {key: round(value, 9) if isinstance(value, float) else value
+                                      for key, value in result.items()}
+            print(f"{name}: {result['median'] * 1e3:.3f}ms", file=sys.stderr)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('fixtures') != results['fixtures']:
+            print(f"Warning: baseline used {baseline.get('fixtures')} fixtures, this run {results['fixtures']}",
+                  file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold)
+        results['regressions'] = regressions
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if regressions:
+        print(f"Regressions beyond {args.threshold * 100:.0f}%:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Measure stream ingest and alert matching against the exchange simulator.
+
+Starts tools.exchange_simulator at --speed times the real tick rate, opens
+the bot's public Bitget stream (BitgetClient.setup_public_websocket) for
+--pairs symbols and feeds every tick into an AlertEngine holding --alerts
+alerts spread around the current prices. Reports ticks received per second,
+ticks published by the simulator (the difference is what the client could
+not keep up with) and alerts fired.
+
+    python -m benchmarks.bench_ingest --speed 10 --pairs 50 --alerts 100000
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from config.config import Config
+from src.services.alert_engine import AlertEngine, PriceAlert
+from tools.exchange_simulator import ExchangeSimulator, MarketSimulator
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--speed', type=float, default=10.0)
+    parser.add_argument('--rate', type=float, default=1.0, help="Ticks per second per symbol at speed 1")
+    parser.add_argument('--pairs', type=int, default=50)
+    parser.add_argument('--alerts', type=int, default=100000)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--with-logging', action='store_true')
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logging.disable(logging.INFO)
+
+    market = MarketSimulator(max(args.pairs, 20), args.speed, args.rate)
+    simulator = ExchangeSimulator(market).start()
+    Config.BITGET_WS_URL = simulator.url.replace('http://', 'ws://') + '/spot/v1/stream'
+    from src.api.bitget_client import BitgetClient
+
+    symbols = list(market.states)[:args.pairs]
+    rng = random.Random(1)
+    engine = AlertEngine()
+    engine.load(
+        PriceAlert.restore(i + 1, i % 5000, symbol, 'bitget',
+                           market.states[symbol].price * (1 + rng.uniform(0.001, 0.05) * (1 if above else -1)),
+                           'above' if above else 'below')
+        for i, (symbol, above) in enumerate((rng.choice(symbols), rng.random() < 0.5) for _ in range(args.alerts))
+    )
+
+    lock = threading.Lock()
+    counts = {'ticks': 0, 'fired': 0}
+    busy = [0.0]
+
+    def on_ticker(symbol: str, price: float):
+        start = time.perf_counter()
+        fired = engine.on_price('bitget', symbol, price)
+        busy[0] += time.perf_counter() - start
+        with lock:
+            counts['ticks'] += 1
+            counts['fired'] += len(fired)
+
+    client = BitgetClient()
+    client.setup_public_websocket([f"{symbol}USDT" for symbol in symbols], on_ticker=on_ticker)
+    time.sleep(1.0)  # Tunggu koneksi dan subscribe
+    with lock:
+        counts['ticks'] = counts['fired'] = 0
+    busy[0] = 0.0
+    published = simulator.messages
+    start = time.perf_counter()
+    time.sleep(args.seconds)
+    elapsed = time.perf_counter() - start
+    with lock:
+        ticks, fired = counts['ticks'], counts['fired']
+    published = simulator.messages - published
+    client.ws.close()
+    simulator.stop()
+
+    print(json.dumps({
+        'speed': args.speed,
+        'pairs': args.pairs,
+        'alerts': args.alerts,
+        'published_per_second': round(published / elapsed, 1),
+        'received_per_second': round(ticks / elapsed, 1),
+        'alerts_fired': fired,
+        'alerts_remaining': len(engine),
+        'match_us_per_tick': round(busy[0] / ticks * 1e6, 2) if ticks else None
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
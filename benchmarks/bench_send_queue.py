@@ -0,0 +1,91 @@
+"""Measure OutboundMessageQueue throughput against the local fake Bot API.
+
+Simulates an alert storm: N messages spread over M chats, half of them
+alerts and half info messages. Reports delivered messages per second, how
+many Bot API calls were made (merging reduces this) and how many 429s the
+server returned, for the queue and for naive direct sends.
+
+    python -m benchmarks.bench_send_queue --messages 2000 --chats 500
+"""
+import argparse
+import asyncio
+import json
+import time
+from telegram import Bot
+from telegram.request import HTTPXRequest
+from src.utils.message_queue import OutboundMessageQueue, PRIORITY_ALERT, PRIORITY_INFO
+from tools.fake_telegram_api import FakeTelegramAPI
+
+TOKEN = '123456:FAKE'
+
+def make_bot(server: FakeTelegramAPI) -> Bot:
+    return Bot(TOKEN, base_url=f"{server.url}/bot", request=HTTPXRequest(connection_pool_size=64))
+
+async def run_queue(server: FakeTelegramAPI, messages: int, chats: int) -> dict:
+    bot = make_bot(server)
+    async with bot:
+        queue = OutboundMessageQueue(bot)
+        await queue.start()
+        start = time.perf_counter()
+        futures = []
+        for i in range(messages):
+            priority = PRIORITY_ALERT if i % 2 == 0 else PRIORITY_INFO
+            futures.append(queue.send_message(1000 + i % chats, f"message {i}", priority))
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        elapsed = time.perf_counter() - start
+        await queue.stop()
+
+    delivered = sum(1 for result in results if not isinstance(result, Exception))
+    return {
+        'mode': 'queue',
+        'messages': messages,
+        'delivered': delivered,
+        'api_calls': queue.sent,
+        'merged': queue.merged,
+        'flood_errors': server.flood_errors,
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(delivered / elapsed, 1)
+    }
+
+async def run_direct(server: FakeTelegramAPI, messages: int, chats: int) -> dict:
+    bot = make_bot(server)
+    async with bot:
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            bot.send_message(chat_id=1000 + i % chats, text=f"message {i}")
+            for i in range(messages)
+        ], return_exceptions=True)
+        elapsed = time.perf_counter() - start
+
+    delivered = sum(1 for result in results if not isinstance(result, Exception))
+    return {
+        'mode': 'direct',
+        'messages': messages,
+        'delivered': delivered,
+        'api_calls': messages,
+        'merged': 0,
+        'flood_errors': server.flood_errors,
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(delivered / elapsed, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--chats', type=int, default=500)
+    parser.add_argument('--global-limit', type=float, default=30)
+    parser.add_argument('--chat-limit', type=float, default=1)
+    args = parser.parse_args()
+
+    results = []
+    for runner in (run_direct, run_queue):
+        server = FakeTelegramAPI(global_limit=args.global_limit, chat_limit=args.chat_limit).start()
+        try:
+            results.append(asyncio.run(runner(server, args.messages, args.chats)))
+        finally:
+            server.stop()
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
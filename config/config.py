@@ -8,15 +8,103 @@ class Config:
     # Telegram Bot
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     TELEGRAM_ADMIN_ID = os.getenv('TELEGRAM_ADMIN_ID')
+    TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org/bot')  # Bot API lokal/uji beban
     
     # Database
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///trading_bot.db')
     
     # Redis Cache
-    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')  # Kosong = cache lokal saja
+    CACHE_LOCAL_MAX_ENTRIES = int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', 10000))
+    CACHE_LOCAL_MAX_BYTES = int(os.getenv('CACHE_LOCAL_MAX_BYTES', 64 * 1024 * 1024))
+    CACHE_LOCAL_TTL = float(os.getenv('CACHE_LOCAL_TTL', 30))  # Batas basi salinan lokal (detik)
+    CACHE_REDIS_TIMEOUT = float(os.getenv('CACHE_REDIS_TIMEOUT', 0.5))
+    CACHE_REDIS_RETRY = float(os.getenv('CACHE_REDIS_RETRY', 5))  # Jeda sebelum mencoba Redis lagi
+    CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'cache:invalidate')
+    CACHE_STALE_FACTOR = float(os.getenv('CACHE_STALE_FACTOR', 5))  # Hard TTL = soft TTL x faktor (default)
+    CACHE_LOCK_TTL = float(os.getenv('CACHE_LOCK_TTL', 10))  # Detik; lock refresh per key di Redis
+    CACHE_EARLY_BETA = float(os.getenv('CACHE_EARLY_BETA', 1.0))  # >1 refresh lebih awal, 0 = tanpa
+    CACHE_WAIT_POLL = float(os.getenv('CACHE_WAIT_POLL', 0.05))
+    PAIRS_CACHE_TTL = int(os.getenv('PAIRS_CACHE_TTL', 600))  # Soft TTL daftar pair (/pairs)
+    
+    # Telegram outbound rate limits (pesan/detik)
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 25))
+    TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+    TELEGRAM_CHAT_BURST = float(os.getenv('TELEGRAM_CHAT_BURST', 1))
+    TELEGRAM_MAX_IN_FLIGHT = int(os.getenv('TELEGRAM_MAX_IN_FLIGHT', 32))
+    
+    # Metrics (endpoint scrape lokal; port 0 = nonaktif)
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 9464))
+    METRICS_PORT_SPAN = int(os.getenv('METRICS_PORT_SPAN', 16))  # Port terpakai: coba port berikutnya (multi-proses)
+    
+    # Cluster (beberapa proses bot berbagi satu Redis; lihat src/utils/cluster.py)
+    CLUSTER_ENABLED = os.getenv('CLUSTER_ENABLED', 'false').lower() == 'true'
+    CLUSTER_NAME = os.getenv('CLUSTER_NAME', 'bot')  # Prefix key Redis; beda nama = cluster terpisah
+    INSTANCE_ID = os.getenv('INSTANCE_ID', '')  # Kosong = hostname:pid
+    LEADER_LEASE_TTL = float(os.getenv('LEADER_LEASE_TTL', 5))  # Detik; failover dalam ~TTL + interval
+    LEADER_RENEW_INTERVAL = float(os.getenv('LEADER_RENEW_INTERVAL', 1))
+    CLUSTER_PREFETCH = int(os.getenv('CLUSTER_PREFETCH', 32))  # Update dari Redis yang diproses bersamaan per proses
+    CLUSTER_SYNC_DELAY = float(os.getenv('CLUSTER_SYNC_DELAY', 1))  # Detik, penggabungan notifikasi perubahan
+    CLUSTER_SYNC_INTERVAL = int(os.getenv('CLUSTER_SYNC_INTERVAL', 60))  # Detik, sinkron penuh alert dan kondisi
+    
+    # Profiling
+    SLOW_HANDLER_THRESHOLD = float(os.getenv('SLOW_HANDLER_THRESHOLD', 2.0))  # Detik
+    SLOW_HANDLER_CAPTURE = os.getenv('SLOW_HANDLER_CAPTURE', 'stack')  # 'stack' atau 'cprofile'
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))  # Detik antar sampel
+    PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', 300))
+    
+    # Startup: pandas/matplotlib/ccxt dimuat di background N detik setelah polling (-1 = saat pertama dipakai)
+    IMPORT_WARM_UP_DELAY = float(os.getenv('IMPORT_WARM_UP_DELAY', 2))
+    
+    # Update scheduler (prioritas update masuk per role)
+    SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', 16))  # Update yang diproses bersamaan
+    SCHEDULER_EXPENSIVE_SLOTS = int(os.getenv('SCHEDULER_EXPENSIVE_SLOTS', 4))  # Dari jumlah di atas, untuk chart/scan
+    SCHEDULER_MAX_PENDING = int(os.getenv('SCHEDULER_MAX_PENDING', 2000))
+    SCHEDULER_ROLE_TTL = int(os.getenv('SCHEDULER_ROLE_TTL', 300))  # Detik, cache role pengguna
+    
+    # Chart cache (byte budget for rendered PNGs and Telegram file_ids)
+    CHART_CACHE_MAX_BYTES = int(os.getenv('CHART_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    
+    # Exchange endpoints (arahkan ke tools.exchange_simulator untuk replay dan uji beban lokal)
+    INDODAX_API_URL = os.getenv('INDODAX_API_URL', 'https://indodax.com/api')
+    BITGET_API_URL = os.getenv('BITGET_API_URL', 'https://api.bitget.com')
+    BITGET_WS_URL = os.getenv('BITGET_WS_URL', 'wss://ws.bitget.com/spot/v1/stream')
+    
+    # Market data
+    TICKER_SNAPSHOT_TTL = int(os.getenv('TICKER_SNAPSHOT_TTL', 10))  # Detik
+    FX_RATE_TTL = int(os.getenv('FX_RATE_TTL', 60))  # Detik, kurs USDT/IDR dari Indodax
+    PRICE_STREAM_ENABLED = os.getenv('PRICE_STREAM_ENABLED', 'false').lower() == 'true'
+    
+    # Live price messages
+    LIVE_PRICE_TTL = int(os.getenv('LIVE_PRICE_TTL', 600))  # Detik sebelum sesi live berakhir
+    LIVE_EDIT_INTERVAL = float(os.getenv('LIVE_EDIT_INTERVAL', 3))  # Jeda minimum antar edit per pesan
+    LIVE_FLUSH_INTERVAL = float(os.getenv('LIVE_FLUSH_INTERVAL', 1))
+    LIVE_MAX_EDITS_PER_FLUSH = int(os.getenv('LIVE_MAX_EDITS_PER_FLUSH', 20))
+    LIVE_MAX_PER_CHAT = int(os.getenv('LIVE_MAX_PER_CHAT', 3))
+    
+    # Price alerts
+    ALERT_CHECK_INTERVAL = int(os.getenv('ALERT_CHECK_INTERVAL', 10))  # Detik
+    ALERT_SNAPSHOT_PATH = os.getenv('ALERT_SNAPSHOT_PATH', 'data/alerts.snapshot')
+    ALERT_SNAPSHOT_INTERVAL = int(os.getenv('ALERT_SNAPSHOT_INTERVAL', 300))  # Detik
+    
+    # Market scanner & signals
+    SCAN_TIMEFRAMES = os.getenv('SCAN_TIMEFRAMES', '1h').split(',')
+    SIGNAL_TIMEFRAMES = os.getenv('SIGNAL_TIMEFRAMES', '1h,4h').split(',')
+    CONDITION_TIMEFRAMES = os.getenv('CONDITION_TIMEFRAMES', '15m,1h,4h,1d').split(',')
+    CORRELATION_EXCHANGE = os.getenv('CORRELATION_EXCHANGE', 'bitget')
+    CORRELATION_TIMEFRAME = os.getenv('CORRELATION_TIMEFRAME', '1h')
+    CORRELATION_WINDOW = int(os.getenv('CORRELATION_WINDOW', 72))  # Candle
+    CORRELATION_SHORT_WINDOW = int(os.getenv('CORRELATION_SHORT_WINDOW', 24))
+    SCAN_WORKERS = int(os.getenv('SCAN_WORKERS', 0))  # 0 = jumlah CPU
+    SCAN_FETCH_WORKERS = int(os.getenv('SCAN_FETCH_WORKERS', 16))
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json (JSON lines) atau text untuk file log
+    LOG_RATE = float(os.getenv('LOG_RATE', 20))  # Record/detik per baris kode; 0 = tanpa batas
+    LOG_BURST = float(os.getenv('LOG_BURST', 100))
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # Penuh = record dibuang dan dihitung
     
     # Trading Parameters
     TRADING_PAIRS = ['BTC/USDT', 'ETH/USDT']  # Default trading pairs
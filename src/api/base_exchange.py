@@ -15,4 +15,8 @@ class BaseExchange(ABC):
     @abstractmethod
     def get_available_pairs(self) -> List[str]:
         """Get list of available trading pairs"""
-        pass 
\ No newline at end of file
+        pass
+
+    def get_all_tickers(self) -> Dict[str, Dict]:
+        """Get tickers for every pair in one request, keyed by base symbol"""
+        return {}
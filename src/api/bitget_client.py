@@ -1,40 +1,58 @@
-import ccxt
 import time
 from typing import Dict, List, Optional
-import websocket
 import json
 import threading
 from config.config import Config
+from src.utils.lazy_imports import lazy
 from src.utils.logger import activity_logger, error_logger
+from src.utils.metrics import REGISTRY, instrument
+from src.utils.symbols import normalize_symbol
+from src.utils.timeframes import TIMEFRAME_SECONDS
 from src.database.operations import DatabaseOps
 from src.api.websocket_handler import WebSocketHandler
 import requests
 from .base_exchange import BaseExchange
 
+ccxt = lazy('ccxt')
+websocket = lazy('websocket')
+
+# Timeframe bot -> granularity endpoint candles mix v1
+GRANULARITY = {'1m': '1m', '5m': '5m', '15m': '15m', '1h': '1H', '4h': '4H', '1d': '1D'}
+
+@instrument('exchange_request', methods=('get_ticker', 'get_ohlcv', 'get_order_book', 'create_order',
+                                         'get_public_ticker', 'get_all_tickers', 'get_available_pairs'),
+            failure_on_empty=True, exchange='bitget')
 class BitgetClient(BaseExchange):
     def __init__(self, db_session=None, use_credentials=False):
         self.db_session = db_session
         self.ws_handler = WebSocketHandler(db_session) if db_session else None
-        
-        # Initialize exchange with or without credentials
-        if use_credentials:
-            self.exchange = ccxt.bitget({
-                'apiKey': Config.BITGET_API_KEY,
-                'secret': Config.BITGET_SECRET,
-                'password': Config.BITGET_PASSWORD,
-                'enableRateLimit': True,
-            })
-        else:
-            # Public API only
-            self.exchange = ccxt.bitget({
-                'enableRateLimit': True
-            })
+        self.use_credentials = use_credentials
+        self._exchange = None
         
         self.ws = None
         self.ws_connected = False
         self.callbacks = {}
         
-        self.base_url = "https://api.bitget.com/api/mix/v1/market"
+        self.base_url = f"{Config.BITGET_API_URL}/api/mix/v1/market"
+    
+    @property
+    def exchange(self):
+        """ccxt client, built on first use (only the order book and orders need it)"""
+        if self._exchange is None:
+            # Initialize exchange with or without credentials
+            if self.use_credentials:
+                self._exchange = ccxt.bitget({
+                    'apiKey': Config.BITGET_API_KEY,
+                    'secret': Config.BITGET_SECRET,
+                    'password': Config.BITGET_PASSWORD,
+                    'enableRateLimit': True,
+                })
+            else:
+                # Public API only
+                self._exchange = ccxt.bitget({
+                    'enableRateLimit': True
+                })
+        return self._exchange
     
     def retry_api_call(self, func, *args, max_retries=3, delay=1):
         """Retry mechanism for API calls"""
@@ -60,7 +78,7 @@ class BitgetClient(BaseExchange):
             headers = {'Accept': 'application/json', 'User-Agent': 'Mozilla/5.0'}
             params = {'symbol': formatted_symbol}
             
-            activity_logger.info(f"[Bitget] Requesting price for {formatted_symbol}")
+            activity_logger.debug("[Bitget] Requesting price for %s", formatted_symbol)
             response = requests.get(url, headers=headers, params=params, timeout=10)
             
             if response.status_code == 200:
@@ -88,27 +106,22 @@ class BitgetClient(BaseExchange):
             return None
     
     def get_ohlcv(self, symbol: str, timeframe: str = '1d', limit: int = 100) -> Optional[List]:
-        """Get OHLCV data from Bitget"""
+        """Get OHLCV data from Bitget (USDT-M perpetual candles, oldest first)"""
         try:
-            # Format symbol
-            formatted_symbol = f"{symbol[:3]}-{symbol[3:]}" if 'USDT' in symbol else f"{symbol}-USDT"
+            # Simbol kontrak mix: BTCUSDT_UMCBL
+            formatted_symbol = f"{normalize_symbol(symbol)}USDT_UMCBL"
             
-            # Map timeframe to Bitget format
-            timeframe_map = {
-                '1m': '1min',
-                '5m': '5min',
-                '15m': '15min',
-                '1h': '1hour',
-                '4h': '4hour',
-                '1d': '1day'
-            }
-            period = timeframe_map.get(timeframe, '1day')
+            # Endpoint mix v1 memakai granularity (1H, 4H, 1D) dan wajib startTime/endTime
+            granularity = GRANULARITY.get(timeframe, '1D')
+            end_time = int(time.time() * 1000)
+            start_time = end_time - limit * TIMEFRAME_SECONDS.get(timeframe, 86400) * 1000
             
-            # Get candle data
-            url = f"{self.base_url}/market/candles"
+            url = f"{self.base_url}/candles"
             params = {
                 'symbol': formatted_symbol,
-                'period': period,
+                'granularity': granularity,
+                'startTime': start_time,
+                'endTime': end_time,
                 'limit': limit
             }
             
@@ -116,7 +129,9 @@ class BitgetClient(BaseExchange):
             
             if response.status_code == 200:
                 data = response.json()
-                if 'data' in data:
+                # Respons candles mix v1 berupa array langsung, bukan {'data': [...]}
+                rows = data.get('data') if isinstance(data, dict) else data
+                if rows is not None:
                     # Convert to OHLCV format
                     return [
                         [
@@ -127,9 +142,10 @@ class BitgetClient(BaseExchange):
                             float(candle[4]),  # close
                             float(candle[5])   # volume
                         ]
-                        for candle in data['data']
+                        for candle in rows
                     ]
             
+            error_logger.error(f"[Bitget] Failed to get OHLCV for {formatted_symbol}. Status: {response.status_code}")
             return None
             
         except Exception as e:
@@ -155,9 +171,12 @@ class BitgetClient(BaseExchange):
     def setup_websocket(self, symbols: List[str], callbacks: Dict = None):
         """Setup WebSocket connection"""
         self.callbacks = callbacks or {}
-        ws_url = "wss://ws.bitget.com/spot/v1/stream"
+        ws_url = Config.BITGET_WS_URL
+        received = REGISTRY.counter('websocket_messages_total', 'WebSocket messages received',
+                                    exchange='bitget', stream='private')
         
         def on_message(ws, message):
+            received.value += 1
             data = json.loads(message)
             if 'data' in data:
                 channel = data.get('channel', '')
@@ -218,11 +237,14 @@ class BitgetClient(BaseExchange):
         except Exception as e:
             error_logger.error(f"Error saving market data: {str(e)}")
 
-    def setup_public_websocket(self, symbols: List[str]):
-        """Setup WebSocket for public data only"""
-        ws_url = "wss://ws.bitget.com/spot/v1/stream"
+    def setup_public_websocket(self, symbols: List[str], on_ticker=None):
+        """Setup WebSocket for public data only, optionally calling on_ticker(symbol, last_price)"""
+        ws_url = Config.BITGET_WS_URL
+        received = REGISTRY.counter('websocket_messages_total', 'WebSocket messages received',
+                                    exchange='bitget', stream='public')
         
         def on_message(ws, message):
+            received.value += 1
             try:
                 data = json.loads(message)
                 if 'data' in data:
@@ -230,7 +252,8 @@ class BitgetClient(BaseExchange):
                     if channel.startswith('ticker.'):
                         symbol = channel.split('.')[1]
                         ticker_data = data['data']
-                        activity_logger.info(f"Received ticker for {symbol}: {ticker_data['last']}")
+                        if on_ticker:
+                            on_ticker(symbol, float(ticker_data['last']))
                         if self.ws_handler:
                             self.ws_handler.handle_ohlcv({
                                 'symbol': symbol,
@@ -276,6 +299,13 @@ class BitgetClient(BaseExchange):
         ws_thread.daemon = True
         ws_thread.start()
     
+    def close_websocket(self):
+        """Close the WebSocket opened by setup_websocket/setup_public_websocket, if any"""
+        if self.ws is not None:
+            self.ws.close()
+            self.ws = None
+            self.ws_connected = False
+    
     def get_public_ticker(self, symbol: str) -> Dict:
         """Get current ticker information using public API"""
         try:
@@ -283,15 +313,14 @@ class BitgetClient(BaseExchange):
             formatted_symbol = f"{symbol[:3]}-{symbol[3:]}" if 'USDT' in symbol else f"{symbol}-USDT"
             
             # Use the correct Bitget API endpoint
-            url = "https://api.bitget.com/api/mix/v1/market/ticker"
+            url = f"{self.base_url}/ticker"
             
             headers = {
                 'Accept': 'application/json',
                 'User-Agent': 'Mozilla/5.0'
             }
             
-            # Log the request
-            activity_logger.info(f"Requesting price for {formatted_symbol}")
+            activity_logger.debug("Requesting price for %s", formatted_symbol)
             
             # Make the request
             response = requests.get(
@@ -301,10 +330,6 @@ class BitgetClient(BaseExchange):
                 timeout=10
             )
             
-            # Log the response
-            activity_logger.info(f"Response status: {response.status_code}")
-            activity_logger.info(f"Response body: {response.text}")
-            
             if response.status_code == 200:
                 data = response.json()
                 if 'data' in data:
@@ -319,13 +344,51 @@ class BitgetClient(BaseExchange):
                         'timestamp': int(ticker['timestamp'])
                     }
             
-            error_logger.error(f"Failed to get ticker. Status: {response.status_code}, Response: {response.text}")
+            error_logger.error("Failed to get ticker. Status: %s, Response: %.200s", response.status_code, response.text)
             return None
             
         except Exception as e:
             error_logger.error(f"Error fetching price for {symbol}: {str(e)}")
             return None
 
+    def get_all_tickers(self) -> Dict[str, Dict]:
+        """Get tickers for all USDT perpetual pairs from Bitget in a single request"""
+        try:
+            url = f"{self.base_url}/tickers"
+            headers = {'Accept': 'application/json', 'User-Agent': 'Mozilla/5.0'}
+            response = requests.get(url, headers=headers, params={'productType': 'umcbl'}, timeout=10)
+            
+            if response.status_code == 200:
+                data = response.json()
+                tickers = {}
+                for ticker in data.get('data') or []:
+                    # Simbol Bitget berbentuk BTCUSDT_UMCBL
+                    pair = ticker['symbol'].split('_')[0]
+                    if not pair.endswith('USDT'):
+                        continue
+                    
+                    symbol = pair[:-4]
+                    last_price = float(ticker['last'])
+                    tickers[symbol] = {
+                        'exchange': 'Bitget',
+                        'symbol': symbol,
+                        'last': last_price,
+                        'high': float(ticker['high24h']),
+                        'low': float(ticker['low24h']),
+                        'volume': float(ticker.get('baseVolume', 0)),
+                        'percentage': float(ticker.get('priceChangePercent', 0)),
+                        'timestamp': int(ticker['timestamp']),
+                        'formatted_price': f"${last_price:,.2f}"
+                    }
+                return tickers
+            
+            error_logger.error(f"[Bitget] Failed to get all tickers. Status: {response.status_code}")
+            return {}
+            
+        except Exception as e:
+            error_logger.error(f"[Bitget] Error getting all tickers: {str(e)}")
+            return {}
+
     def get_exchange_name(self) -> str:
         return "Bitget"
 
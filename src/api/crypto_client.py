@@ -1,11 +1,12 @@
 from typing import Dict
 import requests
+from config.config import Config
 from src.utils.logger import activity_logger, error_logger
 import time
 
 class CryptoClient:
     def __init__(self):
-        self.base_url = "https://indodax.com/api"
+        self.base_url = Config.INDODAX_API_URL
         
     def get_public_ticker(self, symbol: str) -> Dict:
         """Get current ticker information using Indodax API"""
@@ -16,7 +17,7 @@ class CryptoClient:
             # Get ticker data
             url = f"{self.base_url}/ticker/{formatted_symbol}"
             
-            activity_logger.info(f"Requesting price for {formatted_symbol}")
+            activity_logger.debug("Requesting price for %s", formatted_symbol)
             response = requests.get(url, timeout=10)
             
             if response.status_code == 200:
@@ -47,7 +48,7 @@ class CryptoClient:
                     'idr_price': f"Rp {last_price:,.0f}"  # Format IDR price
                 }
             
-            error_logger.error(f"Failed to get ticker. Status: {response.status_code}, Response: {response.text}")
+            error_logger.error("Failed to get ticker. Status: %s, Response: %.200s", response.status_code, response.text)
             return None
             
         except Exception as e:
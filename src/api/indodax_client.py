@@ -1,12 +1,19 @@
 from typing import Dict, Optional, List
 import requests
+from config.config import Config
+from src.utils.lazy_imports import lazy
 from src.utils.logger import activity_logger, error_logger
+from src.utils.metrics import instrument
+from src.utils.symbols import normalize_symbol
 from .base_exchange import BaseExchange
-import pandas as pd
 
+pd = lazy('pandas')
+
+@instrument('exchange_request', methods=('get_ticker', 'get_all_tickers', 'get_available_pairs', 'get_ohlcv'),
+            failure_on_empty=True, exchange='indodax')
 class IndodaxClient(BaseExchange):
     def __init__(self):
-        self.base_url = "https://indodax.com/api"
+        self.base_url = Config.INDODAX_API_URL
         
     def get_exchange_name(self) -> str:
         return "Indodax"
@@ -15,10 +22,11 @@ class IndodaxClient(BaseExchange):
         """Get current ticker information from Indodax"""
         try:
             # Format symbol untuk Indodax (btcidr format)
-            formatted_symbol = f"{symbol[:3].lower()}idr"
+            base = normalize_symbol(symbol).lower()
+            formatted_symbol = f"{base}idr"
             
             url = f"{self.base_url}/ticker/{formatted_symbol}"
-            activity_logger.info(f"[Indodax] Requesting price for {formatted_symbol}")
+            activity_logger.debug("[Indodax] Requesting price for %s", formatted_symbol)
             
             response = requests.get(url, timeout=10)
             
@@ -33,7 +41,7 @@ class IndodaxClient(BaseExchange):
                     'last': last_price,
                     'high': float(ticker['high']),
                     'low': float(ticker['low']),
-                    'volume': float(ticker['vol_' + symbol[:3].lower()]),
+                    'volume': float(ticker.get('vol_' + base, 0)),
                     'percentage': self._calculate_change(last_price, ticker.get('open', last_price)),
                     'timestamp': int(ticker['server_time']),
                     'formatted_price': f"Rp {last_price:,.0f}"
@@ -52,6 +60,44 @@ class IndodaxClient(BaseExchange):
             return ((float(current) - float(open_price)) / float(open_price)) * 100
         return 0.0
 
+    def get_all_tickers(self) -> Dict[str, Dict]:
+        """Get tickers for all IDR pairs from Indodax in a single request"""
+        try:
+            # summaries = ticker_all plus harga 24 jam lalu; ticker Indodax sendiri tidak punya harga open
+            url = f"{self.base_url}/summaries"
+            response = requests.get(url, timeout=10)
+            
+            if response.status_code == 200:
+                data = response.json()
+                prices_24h = data.get('prices_24h') or {}
+                tickers = {}
+                for pair, ticker in data.get('tickers', {}).items():
+                    base, _, quote = pair.partition('_')
+                    if quote != 'idr':
+                        continue
+                    
+                    last_price = float(ticker['last'])
+                    symbol = base.upper()
+                    tickers[symbol] = {
+                        'exchange': 'Indodax',
+                        'symbol': symbol,
+                        'last': last_price,
+                        'high': float(ticker['high']),
+                        'low': float(ticker['low']),
+                        'volume': float(ticker.get('vol_' + base, 0)),
+                        'percentage': self._calculate_change(last_price, prices_24h.get(f"{base}idr", last_price)),
+                        'timestamp': int(ticker['server_time']),
+                        'formatted_price': f"Rp {last_price:,.0f}"
+                    }
+                return tickers
+            
+            error_logger.error(f"[Indodax] Failed to get all tickers. Status: {response.status_code}")
+            return {}
+            
+        except Exception as e:
+            error_logger.error(f"[Indodax] Error getting all tickers: {str(e)}")
+            return {}
+
     def get_available_pairs(self) -> List[str]:
         """Get available trading pairs from Indodax"""
         try:
@@ -70,18 +116,18 @@ class IndodaxClient(BaseExchange):
     def get_ohlcv(self, symbol: str, timeframe: str = '1d') -> Optional[List]:
         """Get OHLCV data from Indodax"""
         try:
-            # Format symbol
-            formatted_symbol = f"{symbol[:3].lower()}idr"
+            # Format symbol: basis lengkap, bukan tiga huruf pertama (SOLO bukan SOL, DOGE bukan DOG)
+            formatted_symbol = f"{normalize_symbol(symbol).lower()}idr"
             
             # Get trades data
             url = f"{self.base_url}/trades/{formatted_symbol}"
-            activity_logger.info(f"Fetching trades from: {url}")
+            activity_logger.debug("Fetching trades from: %s", url)
             
             response = requests.get(url, timeout=10)
             
             if response.status_code == 200:
                 trades = response.json()
-                activity_logger.info(f"Received {len(trades)} trades")
+                activity_logger.debug("Received %d trades", len(trades))
                 
                 if not trades:
                     return None
@@ -116,7 +162,7 @@ class IndodaxClient(BaseExchange):
                 ohlcv['volume'] = df['amount'].resample(period).sum()
                 
                 # Fill missing data
-                ohlcv = ohlcv.fillna(method='ffill')
+                ohlcv = ohlcv.ffill()
                 
                 # Convert to list format
                 result = [
@@ -125,7 +171,7 @@ class IndodaxClient(BaseExchange):
                     if not pd.isna(row.open)  # Skip any remaining NaN values
                 ]
                 
-                activity_logger.info(f"Generated {len(result)} OHLCV candles")
+                activity_logger.debug("Generated %d OHLCV candles", len(result))
                 return result
                 
             return None
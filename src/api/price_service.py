@@ -1,7 +1,20 @@
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
+import time
+from config.config import Config
 from .indodax_client import IndodaxClient
 from .bitget_client import BitgetClient
 from src.utils.logger import activity_logger, error_logger
+from src.utils.metrics import REGISTRY
+from src.utils.symbols import EXCHANGE_CURRENCY, exchange_for_symbol, normalize_symbol
+
+def format_currency(price: float, currency: str) -> str:
+    """Format a price in IDR or USDT"""
+    if currency == 'IDR':
+        return f"Rp {price:,.0f}"
+    return f"${price:,.2f}" if price >= 1 else f"${price:,.6f}"
+
+SNAPSHOT_HITS = REGISTRY.counter('cache_requests_total', 'Cache lookups by result', cache='ticker_snapshot', result='hit')
+SNAPSHOT_MISSES = REGISTRY.counter('cache_requests_total', 'Cache lookups by result', cache='ticker_snapshot', result='miss')
 
 class PriceService:
     def __init__(self):
@@ -9,6 +22,8 @@ class PriceService:
             'indodax': IndodaxClient(),
             'bitget': BitgetClient()
         }
+        self._snapshots = {}  # {exchange: (fetched_at, {symbol: ticker})}
+        self._usdt_idr = None  # (fetched_at, IDR per USDT)
     
     def get_price(self, symbol: str, exchange: str = None) -> Dict:
         """Get price from specific exchange or all exchanges"""
@@ -28,23 +43,113 @@ class PriceService:
         
         return results
     
-    def format_price_message(self, prices: Dict) -> str:
-        """Format price data into readable message"""
+    def get_all_tickers(self, exchange: str) -> Dict[str, Dict]:
+        """Get the all-tickers snapshot of an exchange, refreshed at most every TICKER_SNAPSHOT_TTL seconds"""
+        if exchange not in self.exchanges:
+            return {}
+        
+        cached = self._snapshots.get(exchange)
+        if cached and time.monotonic() - cached[0] < Config.TICKER_SNAPSHOT_TTL:
+            SNAPSHOT_HITS.value += 1
+            return cached[1]
+        
+        SNAPSHOT_MISSES.value += 1
+        tickers = self.exchanges[exchange].get_all_tickers()
+        if tickers:
+            self._snapshots[exchange] = (time.monotonic(), tickers)
+        elif cached:
+            # Pakai snapshot lama daripada tidak ada data sama sekali
+            return cached[1]
+        return tickers
+    
+    def get_usdt_idr_rate(self) -> Optional[float]:
+        """IDR per USDT from the Indodax usdtidr market, cached for FX_RATE_TTL seconds"""
+        if self._usdt_idr and time.monotonic() - self._usdt_idr[0] < Config.FX_RATE_TTL:
+            return self._usdt_idr[1]
+        
+        ticker = self.get_all_tickers('indodax').get('USDT') or self.exchanges['indodax'].get_ticker('USDT')
+        if ticker and ticker['last'] > 0:
+            self._usdt_idr = (time.monotonic(), ticker['last'])
+        # Kurs lama tetap dipakai jika Indodax sedang tidak bisa diakses
+        return self._usdt_idr[1] if self._usdt_idr else None
+    
+    def convert(self, price: float, from_currency: str, to_currency: str, rate: float = None) -> Optional[float]:
+        """Convert a price between USDT and IDR"""
+        if from_currency == to_currency:
+            return price
+        rate = rate or self.get_usdt_idr_rate()
+        if not rate:
+            return None
+        return price * rate if from_currency == 'USDT' else price / rate
+    
+    def get_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Get last prices for many symbols with one all-tickers request per exchange.
+
+        Symbols quoted in IDR are priced on Indodax, everything else on Bitget.
+        Symbols missing from the snapshot fall back to a single ticker request.
+        """
+        by_exchange = {}
+        for symbol in symbols:
+            exchange = exchange_for_symbol(symbol)
+            by_exchange.setdefault(exchange, []).append(symbol)
+        
+        prices = {}
+        for exchange, exchange_symbols in by_exchange.items():
+            tickers = self.get_all_tickers(exchange)
+            for symbol in exchange_symbols:
+                ticker = tickers.get(normalize_symbol(symbol))
+                if ticker is None:
+                    ticker = self.exchanges[exchange].get_ticker(normalize_symbol(symbol))
+                if ticker:
+                    prices[symbol] = ticker['last']
+        return prices
+    
+    def start_price_stream(self, symbols: List[str], on_ticker: Callable[[str, str, float], None]):
+        """Stream live Bitget tickers; on_ticker(exchange, symbol, price) runs on the WebSocket thread"""
+        self.exchanges['bitget'].setup_public_websocket(
+            symbols,
+            on_ticker=lambda symbol, price: on_ticker('bitget', symbol, price)
+        )
+    
+    def stop_price_stream(self):
+        """Close the live ticker stream started by start_price_stream"""
+        self.exchanges['bitget'].close_websocket()
+    
+    def format_price_message(self, prices: Dict, rate: float = None) -> str:
+        """Format price data into readable message, with every quote also shown in USDT and IDR"""
         if not prices:
             return "❌ Could not fetch prices from any exchange"
-            
+        
+        rate = rate or self.get_usdt_idr_rate()
         message = "💰 *Price Comparison*\n\n"
+        usdt_prices = {}
         for exchange, data in prices.items():
+            currency = EXCHANGE_CURRENCY.get(exchange, 'USDT')
+            other = 'USDT' if currency == 'IDR' else 'IDR'
+            converted = self.convert(data['last'], currency, other, rate)
+            usdt = data['last'] if currency == 'USDT' else converted
+            if usdt:
+                usdt_prices[exchange] = usdt
+            
+            message += f"*{exchange.upper()}*\nPrice: {data['formatted_price']}"
+            if converted is not None:
+                message += f" (≈ {format_currency(converted, other)})"
             message += (
-                f"*{exchange.upper()}*\n"
-                f"Price: {data['formatted_price']}\n"
-                f"24h High: {data['high']:,.2f}\n"
-                f"24h Low: {data['low']:,.2f}\n"
+                f"\n24h High: {format_currency(data['high'], currency)}\n"
+                f"24h Low: {format_currency(data['low'], currency)}\n"
                 f"24h Change: {data['percentage']:+.2f}%\n"
                 f"Volume: {data['volume']:.2f}\n\n"
             )
         
-        return message 
+        if len(usdt_prices) > 1:
+            low = min(usdt_prices, key=usdt_prices.get)
+            high = max(usdt_prices, key=usdt_prices.get)
+            spread = (usdt_prices[high] - usdt_prices[low]) / usdt_prices[low] * 100
+            message += f"Spread: {spread:.2f}% ({high.upper()} lebih mahal dari {low.upper()})\n"
+        if rate and 'indodax' in prices:
+            message += f"Kurs USDT/IDR: Rp {rate:,.0f}\n"
+        
+        return message
 
     def get_available_pairs(self, exchange: str = None) -> Dict[str, List[str]]:
         """Get available pairs from exchanges"""
@@ -0,0 +1,371 @@
+"""Backtesting over stored OHLCV.
+
+Both execution paths share the same conventions: a signal is taken on a
+candle's close and filled at the next candle's open, fee and slippage are
+charged per side, and each position uses the full equity.
+
+- run_vectorized: positions are held from signal to opposite signal and
+  the whole equity curve is computed with array operations. It has no
+  intrabar exits and is meant for fast parameter sweeps.
+- run_event: walks trade by trade and adds stop-loss/take-profit exits
+  against each candle's high/low. A gap through a level fills at the open,
+  and when both levels fall inside one candle the stop is assumed to hit
+  first. Bars between events are still processed with array operations.
+
+sweep() runs a parameter grid for one or many markets on a process pool.
+"""
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Union
+import numpy as np
+from src.indicators import batch
+from src.backtest.strategies import STRATEGIES
+from src.utils.timeframes import TIMEFRAME_SECONDS
+
+MAX_CACHED_INDICATORS = 32
+
+INDICATOR_FUNCTIONS = {
+    'ema': lambda bars, period: batch.ema(bars.close, period),
+    'rsi': lambda bars, period=14: batch.rsi(bars.close, period),
+    'macd': lambda bars, fast=12, slow=26, signal=9: batch.macd(bars.close, fast, slow, signal),
+    'bb': lambda bars, period=20, k=2.0: batch.bollinger(bars.close, period, k),
+    'atr': lambda bars, period=14: batch.atr(bars.high, bars.low, bars.close, period),
+    'vwap': lambda bars: batch.vwap(bars.timestamp, bars.high, bars.low, bars.close, bars.volume),
+    'volatility': lambda bars, period=6: batch.volatility(bars.close, period)
+}
+
+class Bars:
+    """Column arrays of one market's candles plus a cache of indicator arrays"""
+
+    def __init__(self, timestamp, open_, high, low, close, volume, symbol: str = '', timeframe: str = '1h'):
+        self.timestamp = np.asarray(timestamp, dtype=np.int64)
+        self.open = np.asarray(open_, dtype=float)
+        self.high = np.asarray(high, dtype=float)
+        self.low = np.asarray(low, dtype=float)
+        self.close = np.asarray(close, dtype=float)
+        self.volume = np.asarray(volume, dtype=float)
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self._indicators = {}
+
+    @classmethod
+    def from_ohlcv(cls, ohlcv: List, symbol: str = '', timeframe: str = '1h') -> 'Bars':
+        """Build from the repo's [timestamp_ms, open, high, low, close, volume] rows"""
+        candles = np.asarray(ohlcv, dtype=float).reshape(-1, 6)
+        return cls(candles[:, 0], candles[:, 1], candles[:, 2], candles[:, 3], candles[:, 4], candles[:, 5],
+                   symbol, timeframe)
+
+    def __len__(self):
+        return len(self.close)
+
+    def __getstate__(self):
+        # Indikator dihitung ulang di proses worker, jangan ikut di-pickle
+        state = self.__dict__.copy()
+        state['_indicators'] = {}
+        return state
+
+    def indicator(self, name: str, *params):
+        """Indicator array(s) for the whole history, computed once per (name, params)"""
+        key = (name, params)
+        value = self._indicators.get(key)
+        if value is None:
+            value = INDICATOR_FUNCTIONS[name](self, *params)
+            if len(self._indicators) >= MAX_CACHED_INDICATORS:
+                self._indicators.pop(next(iter(self._indicators)))
+            self._indicators[key] = value
+        return value
+
+def load_bars(exchange: str, timeframe: str, symbol: str,
+              start: datetime = None, end: datetime = None) -> Bars:
+    """Load stored candle history for one market"""
+    from src.database.connection import DatabaseManager
+    from src.database.operations import DatabaseOps
+
+    session = next(DatabaseManager().get_session())
+    try:
+        rows = DatabaseOps.load_candle_history(session, exchange, timeframe, symbol, start, end)
+    finally:
+        session.close()
+    if not rows:
+        return Bars([], [], [], [], [], [], symbol, timeframe)
+
+    timestamps, open_, high, low, close, volume = zip(*rows)
+    return Bars(
+        np.array(timestamps, dtype='datetime64[ms]').astype(np.int64),
+        open_, high, low, close, volume, symbol, timeframe
+    )
+
+def _targets(signals: np.ndarray, allow_short: bool) -> np.ndarray:
+    """Forward-fill signals into the position wanted after each candle's close"""
+    values = signals.astype(float)
+    if not allow_short:
+        values = np.maximum(values, 0.0)  # Sinyal short berarti keluar ke posisi flat
+    mask = signals != 0
+    index = np.where(mask, np.arange(len(signals)), 0)
+    np.maximum.accumulate(index, out=index)
+    targets = values[index]
+    targets[:np.argmax(mask) if mask.any() else len(signals)] = 0.0
+    return targets
+
+def run_vectorized(bars: Bars, signals: np.ndarray, fee: float = 0.001, slippage: float = 0.0,
+                   allow_short: bool = True, initial: float = 1000.0) -> Dict:
+    """Signal-to-signal backtest computed entirely with array operations"""
+    n = len(bars)
+    if n == 0:
+        return _result(bars, 'fast', np.array([]), np.array([]), [], initial)
+
+    position = np.zeros(n)
+    position[1:] = _targets(np.asarray(signals), allow_short)[:-1]
+    previous = np.r_[0.0, position[:-1]]
+    prev_close = np.r_[bars.open[0], bars.close[:-1]]
+
+    gap = previous * (bars.open / prev_close - 1.0)
+    intrabar = position * (bars.close / bars.open - 1.0)
+    # Pembalikan posisi dihitung sebagai dua transaksi (keluar lalu masuk)
+    growth = (1.0 + gap) * (1.0 + intrabar) * (1.0 - (fee + slippage)) ** np.abs(position - previous)
+
+    changes = np.flatnonzero(position != previous)
+    entries = changes[position[changes] != 0]
+    following = np.searchsorted(changes, entries, side='right')
+    exits = np.where(following < len(changes), changes[np.minimum(following, len(changes) - 1)], n - 1)
+    closed = following < len(changes)
+    sides = position[entries]
+    exit_prices = np.where(closed, bars.open[exits], bars.close[exits])
+    costs = np.where(closed, 2, 1) * (fee + slippage)
+    returns = sides * (exit_prices / bars.open[entries] - 1.0) - costs
+
+    trades = [
+        {
+            'side': 'long' if side > 0 else 'short',
+            'entry_time': int(bars.timestamp[entry]),
+            'exit_time': int(bars.timestamp[exit_]),
+            'entry_price': float(bars.open[entry]),
+            'exit_price': float(price),
+            'return': float(ret),
+            'reason': 'signal' if is_closed else 'end'
+        }
+        for entry, exit_, side, price, ret, is_closed in zip(entries, exits, sides, exit_prices, returns, closed)
+    ]
+    return _result(bars, 'fast', growth, position != 0, trades, initial)
+
+def _first_hit(bars: Bars, side: int, stop: float, target: float, start: int, end: int) -> Optional[int]:
+    """Index of the first candle in [start, end) touching stop or target, scanning in growing chunks"""
+    size = 64
+    while start < end:
+        stop_at = min(end, start + size)
+        if side > 0:
+            mask = (bars.low[start:stop_at] <= stop) | (bars.high[start:stop_at] >= target)
+        else:
+            mask = (bars.high[start:stop_at] >= stop) | (bars.low[start:stop_at] <= target)
+        hits = np.flatnonzero(mask)
+        if hits.size:
+            return start + int(hits[0])
+        start = stop_at
+        size *= 2
+    return None
+
+def run_event(bars: Bars, signals: np.ndarray, fee: float = 0.001, slippage: float = 0.0,
+              allow_short: bool = True, initial: float = 1000.0,
+              stop_loss: float = None, take_profit: float = None,
+              sl_atr: float = None, tp_atr: float = None, atr_period: int = 14) -> Dict:
+    """Trade-by-trade backtest with stop-loss/take-profit exits.
+
+    stop_loss/take_profit are fractions of the entry price (0.02 = 2%),
+    sl_atr/tp_atr are multiples of ATR(atr_period) at the signal candle.
+    """
+    n = len(bars)
+    signals = np.asarray(signals)
+    growth = np.ones(n)
+    exposure = np.zeros(n, dtype=bool)
+    trades = []
+    if n == 0:
+        return _result(bars, 'accurate', growth, exposure, trades, initial)
+
+    atr = bars.indicator('atr', atr_period) if sl_atr or tp_atr else None
+    longs = np.flatnonzero(signals > 0)
+    shorts = np.flatnonzero(signals < 0)
+    opens, highs, lows, closes = bars.open, bars.high, bars.low, bars.close
+
+    search = 0
+    while True:
+        next_long = np.searchsorted(longs, search)
+        next_short = np.searchsorted(shorts, search)
+        candidates = []
+        if next_long < len(longs):
+            candidates.append((longs[next_long], 1))
+        if allow_short and next_short < len(shorts):
+            candidates.append((shorts[next_short], -1))
+        if not candidates:
+            break
+        signal_bar, side = min(candidates)
+        entry_bar = signal_bar + 1
+        if entry_bar >= n:
+            break
+
+        entry = opens[entry_bar] * (1 + side * slippage)
+        stop = target = None
+        if stop_loss:
+            stop = entry * (1 - side * stop_loss)
+        elif sl_atr and not math.isnan(atr[signal_bar]):
+            stop = entry - side * sl_atr * atr[signal_bar]
+        if take_profit:
+            target = entry * (1 + side * take_profit)
+        elif tp_atr and not math.isnan(atr[signal_bar]):
+            target = entry + side * tp_atr * atr[signal_bar]
+
+        # Sinyal berlawanan berikutnya menutup posisi di open candle setelahnya
+        opposite = shorts if side > 0 else longs
+        k = np.searchsorted(opposite, entry_bar)
+        signal_exit = opposite[k] + 1 if k < len(opposite) and opposite[k] + 1 < n else None
+        limit = signal_exit if signal_exit is not None else n
+
+        hit = None
+        if stop is not None or target is not None:
+            hit = _first_hit(bars, side,
+                             stop if stop is not None else -side * np.inf,
+                             target if target is not None else side * np.inf,
+                             entry_bar, limit)
+
+        if hit is not None:
+            exit_bar = hit
+            open_ = opens[hit] if hit > entry_bar else entry
+            if stop is not None and (lows[hit] <= stop if side > 0 else highs[hit] >= stop):
+                # Gap melewati stop terisi di harga open
+                gapped = open_ <= stop if side > 0 else open_ >= stop
+                exit_price, reason = (open_ if gapped else stop), 'stop'
+            else:
+                gapped = open_ >= target if side > 0 else open_ <= target
+                exit_price, reason = (open_ if gapped else target), 'target'
+            search = hit
+        elif signal_exit is not None:
+            exit_bar, exit_price, reason = signal_exit, opens[signal_exit], 'signal'
+            search = signal_exit - 1  # Sinyal berlawanan langsung membuka posisi baru
+        else:
+            exit_bar, exit_price, reason = n - 1, closes[n - 1], 'end'
+            search = n
+        exit_price *= (1 - side * slippage)
+
+        # Faktor equity per candle selama posisi terbuka
+        if exit_bar == entry_bar:
+            segment = np.array([1 + side * (exit_price / entry - 1)])
+        else:
+            segment = np.empty(exit_bar - entry_bar + 1)
+            segment[0] = 1 + side * (closes[entry_bar] / entry - 1)
+            segment[1:-1] = 1 + side * (closes[entry_bar + 1:exit_bar] / closes[entry_bar:exit_bar - 1] - 1)
+            segment[-1] = 1 + side * (exit_price / closes[exit_bar - 1] - 1)
+        segment[0] *= 1 - fee
+        if reason != 'end':
+            segment[-1] *= 1 - fee  # Posisi yang masih terbuka hanya dinilai, belum dijual
+        growth[entry_bar:exit_bar + 1] *= segment
+        exposure[entry_bar:exit_bar + 1] = True
+
+        trades.append({
+            'side': 'long' if side > 0 else 'short',
+            'entry_time': int(bars.timestamp[entry_bar]),
+            'exit_time': int(bars.timestamp[exit_bar]),
+            'entry_price': float(entry),
+            'exit_price': float(exit_price),
+            'return': float(segment.prod() - 1),
+            'reason': reason
+        })
+        if search >= n:
+            break
+
+    return _result(bars, 'accurate', growth, exposure, trades, initial)
+
+def _result(bars: Bars, mode: str, growth: np.ndarray, exposure: np.ndarray, trades: List[Dict],
+            initial: float) -> Dict:
+    equity = initial * np.cumprod(growth) if len(growth) else np.array([initial])
+    return {
+        'symbol': bars.symbol,
+        'timeframe': bars.timeframe,
+        'mode': mode,
+        'stats': statistics(equity, growth - 1.0, exposure, trades, bars.timeframe, initial),
+        'equity': equity,
+        'trades': trades
+    }
+
+def statistics(equity: np.ndarray, returns: np.ndarray, exposure: np.ndarray, trades: List[Dict],
+               timeframe: str, initial: float) -> Dict:
+    """Equity and trade statistics of one backtest run"""
+    bars_per_year = 365 * 86400 / TIMEFRAME_SECONDS.get(timeframe, 3600)
+    total_return = equity[-1] / initial - 1
+    years = len(returns) / bars_per_year if len(returns) else 0
+    peak = np.maximum.accumulate(equity)
+    drawdown = equity / peak - 1
+    std = returns.std() if len(returns) > 1 else 0.0
+
+    trade_returns = np.array([trade['return'] for trade in trades])
+    wins = trade_returns[trade_returns > 0]
+    losses = trade_returns[trade_returns <= 0]
+    return {
+        'final_equity': float(equity[-1]),
+        'total_return': float(total_return),
+        'cagr': float((1 + total_return) ** (1 / years) - 1) if years > 0 and total_return > -1 else None,
+        'max_drawdown': float(drawdown.min()),
+        'sharpe': float(returns.mean() / std * math.sqrt(bars_per_year)) if std > 0 else 0.0,
+        'exposure': float(exposure.mean()) if len(exposure) else 0.0,
+        'trades': len(trades),
+        'win_rate': float(len(wins) / len(trade_returns)) if len(trade_returns) else 0.0,
+        'avg_trade': float(trade_returns.mean()) if len(trade_returns) else 0.0,
+        'best_trade': float(trade_returns.max()) if len(trade_returns) else 0.0,
+        'worst_trade': float(trade_returns.min()) if len(trade_returns) else 0.0,
+        'profit_factor': float(wins.sum() / -losses.sum()) if losses.sum() < 0 else None
+    }
+
+def backtest(bars: Bars, strategy: Union[str, Callable], params: Dict = None, mode: str = 'fast', **options) -> Dict:
+    """Run a strategy (name from STRATEGIES or a callable) with the fast or accurate path"""
+    params = params or {}
+    function = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+    signals = function(bars, **params)
+    if mode == 'fast':
+        options = {key: value for key, value in options.items()
+                   if key in ('fee', 'slippage', 'allow_short', 'initial')}
+        result = run_vectorized(bars, signals, **options)
+    elif mode == 'accurate':
+        result = run_event(bars, signals, **options)
+    else:
+        raise ValueError(f"Unknown backtest mode: {mode}")
+    result['params'] = params
+    return result
+
+_worker_markets: Dict[str, Bars] = {}
+
+def _init_worker(markets: Dict[str, Bars]):
+    # Data market dikirim sekali per proses, bukan per kombinasi parameter
+    global _worker_markets
+    _worker_markets = markets
+
+def _run_task(task) -> Dict:
+    symbol, strategy, params, mode, options = task
+    result = backtest(_worker_markets[symbol], strategy, params, mode, **options)
+    return {'symbol': symbol, 'params': params, 'mode': mode, 'stats': result['stats']}
+
+def sweep(markets: Union[Bars, Iterable[Bars]], strategy: str, grid: Dict[str, Iterable],
+          mode: str = 'fast', workers: int = None, sort_by: str = 'sharpe', **options) -> List[Dict]:
+    """Backtest every parameter combination on every market across CPU cores.
+
+    Returns summaries (symbol, params, stats) sorted by `sort_by`, best first.
+    Equity curves and trade lists are not returned to keep results small;
+    rerun backtest() for the combination of interest.
+    """
+    if isinstance(markets, Bars):
+        markets = [markets]
+    markets = {bars.symbol or str(i): bars for i, bars in enumerate(markets)}
+    names = list(grid)
+    combinations = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    # Kelompokkan per market agar cache indikator di worker terpakai ulang
+    tasks = [(symbol, strategy, params, mode, options) for symbol in markets for params in combinations]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(markets)
+        results = [_run_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(markets,)) as pool:
+            results = list(pool.map(_run_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    return sorted(results, key=lambda result: result['stats'].get(sort_by) or -np.inf, reverse=True)
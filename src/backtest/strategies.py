@@ -0,0 +1,65 @@
+"""Backtest strategies defined over indicator arrays.
+
+A strategy is a function strategy(bars, **params) -> int8 array aligned
+with the bars: 1 = go long, -1 = go short, 0 = no new signal. Signals are
+computed on a candle's close and executed at the next candle's open.
+"""
+import numpy as np
+from src.services.signal_engine import DEFAULT_RULES
+
+def _crosses(a: np.ndarray, b) -> np.ndarray:
+    """+1 where a crosses above b, -1 where it crosses below"""
+    diff = a - b
+    out = np.zeros(len(diff), dtype=np.int8)
+    prev, cur = diff[:-1], diff[1:]
+    with np.errstate(invalid='ignore'):
+        out[1:][(prev <= 0) & (cur > 0)] = 1
+        out[1:][(prev >= 0) & (cur < 0)] = -1
+    return out
+
+def _sign(values: np.ndarray) -> np.ndarray:
+    return np.nan_to_num(np.sign(values)).astype(np.int8)
+
+def ema_cross(bars, fast: int = 20, slow: int = 50) -> np.ndarray:
+    return _crosses(bars.indicator('ema', fast), bars.indicator('ema', slow))
+
+def macd_cross(bars, fast: int = 12, slow: int = 26, signal: int = 9) -> np.ndarray:
+    return _crosses(bars.indicator('macd', fast, slow, signal)[2], 0.0)
+
+def rsi_reversal(bars, period: int = 14, lower: float = 30, upper: float = 70) -> np.ndarray:
+    rsi = bars.indicator('rsi', period)
+    out = np.zeros(len(rsi), dtype=np.int8)
+    prev, cur = rsi[:-1], rsi[1:]
+    with np.errstate(invalid='ignore'):
+        out[1:][(prev < lower) & (cur >= lower)] = 1
+        out[1:][(prev > upper) & (cur <= upper)] = -1
+    return out
+
+def signal_rules(bars, threshold: float = 70) -> np.ndarray:
+    """Vectorized equivalent of the live SignalEngine rules (without cooldown)"""
+    close = bars.close
+    _, upper, lower = bars.indicator('bb', 20, 2.0)
+    bb = np.zeros(len(close), dtype=np.int8)
+    with np.errstate(invalid='ignore'):
+        bb[1:][(close[:-1] < lower[:-1]) & (close[1:] >= lower[1:])] = 1
+        bb[1:][(close[:-1] > upper[:-1]) & (close[1:] <= upper[1:])] = -1
+
+    votes = {
+        'MACD cross': macd_cross(bars),
+        'RSI reversal': rsi_reversal(bars),
+        'Bollinger re-entry': bb,
+        'EMA 20/50 trend': _sign(bars.indicator('ema', 20) - bars.indicator('ema', 50)),
+        'VWAP': _sign(close - bars.indicator('vwap'))
+    }
+    trigger = sum(rule.weight * votes[rule.name].astype(float) for rule in DEFAULT_RULES if rule.trigger)
+    side = np.sign(trigger).astype(np.int8)
+    total = sum(rule.weight for rule in DEFAULT_RULES)
+    confidence = sum(rule.weight * (votes[rule.name] == side) for rule in DEFAULT_RULES) * (100.0 / total)
+    return np.where((side != 0) & (confidence >= threshold), side, 0).astype(np.int8)
+
+STRATEGIES = {
+    'ema_cross': ema_cross,
+    'macd_cross': macd_cross,
+    'rsi_reversal': rsi_reversal,
+    'signal_rules': signal_rules
+}
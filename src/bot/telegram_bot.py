@@ -9,22 +9,91 @@ from config.config import Config
 from src.database.connection import DatabaseManager
 from src.utils.logger import activity_logger, error_logger
 from src.database.models import User, UserRole
+from src.database.operations import DatabaseOps, StaleFenceError
 from src.api.price_service import PriceService
+from src.indicators.streaming import IndicatorEngine, IndicatorSeries
+from src.services.alert_engine import AlertEngine, PriceAlert, CONDITION_ALIASES
+from src.services.alert_store import AlertStore
+from src.services.portfolio_service import PortfolioService
+from src.services.market_scanner import MarketScanner, SCAN_CRITERIA
+from src.services.signal_engine import SignalEngine
+from src.services.spread_monitor import SpreadMonitor
+from src.services.market_overview import MarketOverview
+from src.services.correlation_engine import CorrelationEngine
+from src.services.condition_alerts import ConditionAlert, ConditionEngine
+from src.services.live_prices import LivePriceService, live_callback_data
+from src.utils.message_queue import OutboundMessageQueue, PRIORITY_ALERT, PRIORITY_INFO, PRIORITY_SIGNAL
+from src.utils.update_scheduler import UpdateScheduler
+from src.utils.metrics import last_outcome, start_http_server, summary as metrics_summary
+from src.utils.profiler import HandlerProfiler, SamplingProfiler
+from src.utils.cache_manager import CacheManager
+from src.utils.cluster import ChangeFeed, LeaderLease, UpdateRelay
+from src.utils.chart_cache import ChartCache, ChartKey
+from src.utils.lazy_imports import lazy, warm_up
+from src.utils.symbols import exchange_for_symbol, market_key, normalize_symbol
+from src.utils.timeframes import TIMEFRAME_SECONDS, last_closed_candle, next_candle_close
 import asyncio
+import functools
 import io
-import matplotlib.pyplot as mpf
-import pandas as pd
-import matplotlib.pyplot as plt
+import json
+import os
+import socket
+import time
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
 import numpy as np
 
+# Dimuat saat pertama dipakai atau oleh warm_up() setelah polling berjalan
+pd = lazy('pandas')
+# Chart dirender di worker thread, jadi langsung lewat Figure dan canvas Agg, bukan pyplot
+mpl_figure = lazy('matplotlib.figure')
+mpl_patches = lazy('matplotlib.patches')
+backend_agg = lazy('matplotlib.backends.backend_agg')
+
 class TradingBot:
     def __init__(self, db_session=None):
         self.db = DatabaseManager()
         self.price_service = PriceService()
-        self.price_alerts = {}  # {user_id: {symbol: {price: float, condition: 'above'|'below'}}}
+        self.portfolio_service = PortfolioService(self.price_service)
+        self.scanner = MarketScanner(self.price_service)
+        self.spread_monitor = SpreadMonitor()
+        self.market_overview = MarketOverview(self.price_service)
+        self.correlation = CorrelationEngine(
+            Config.CORRELATION_TIMEFRAME, Config.CORRELATION_WINDOW, Config.CORRELATION_SHORT_WINDOW
+        )
+        self.chart_cache = ChartCache()
+        self.cache = CacheManager()
+        self.indicators = IndicatorEngine()
+        # Status untuk perintah pengguna, terpisah: hanya stream candle yang memicu sinyal dan kondisi
+        self.command_indicators = IndicatorEngine()
+        self.signal_engine = SignalEngine(self.indicators)
+        self.condition_engine = ConditionEngine(self.indicators)
+        self.alert_engine = AlertEngine()
+        self.alert_store = AlertStore(self.alert_engine)
+        self.sync_lock = asyncio.Lock()
+        self.loop = None
+        self._tasks: Set[asyncio.Task] = set()
+        
+        # Beberapa proses bisa berbagi satu Redis; tugas tunggal hanya berjalan di pemimpin
+        self.instance_id = Config.INSTANCE_ID or f"{socket.gethostname()}:{os.getpid()}"
+        cluster_url = Config.REDIS_URL if Config.CLUSTER_ENABLED else None
+        if Config.CLUSTER_ENABLED and not cluster_url:
+            raise ValueError("CLUSTER_ENABLED requires REDIS_URL")
+        self.leader = LeaderLease(cluster_url, self.instance_id)
+        self.relay = UpdateRelay(cluster_url) if cluster_url else None
+        self.changes = ChangeFeed(cluster_url, self.instance_id)
+        for kind in ('alerts', 'conditions', 'candles'):
+            self.changes.subscribe(kind, self.on_change)
         
         # Initialize application
-        self.app = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+        # Update diproses bersamaan dengan prioritas dan kuota per role
+        self.scheduler = UpdateScheduler()
+        self.app = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).base_url(Config.TELEGRAM_API_URL) \
+            .concurrent_updates(self.scheduler).build()
+        self.send_queue = OutboundMessageQueue(self.app.bot)
+        self.live_prices = LivePriceService(self.send_queue)
+        self.handler_profiler = HandlerProfiler()
+        self.sampler = SamplingProfiler()
         
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
@@ -75,7 +144,16 @@ class TradingBot:
             "/price - Cek harga cryptocurrency\n"
             "/status - Cek status bot\n"
             "/pairs - Cek pasangan trading yang tersedia\n"
-            "/chart - Lihat grafik cryptocurrency\n\n"
+            "/chart - Lihat grafik cryptocurrency\n"
+            "/scan - Pindai semua pair (RSI, volume, breakout)\n"
+            "/spread - Selisih harga antar exchange\n"
+            "/market - Ringkasan pasar (tambahkan 'heatmap' untuk gambar)\n"
+            "/korelasi - Korelasi antar pair (tambahkan 'chart' untuk matriks)\n"
+            "/alert - Atur notifikasi harga\n"
+            "/alerts - Lihat notifikasi aktif\n"
+            "/hapusalert - Hapus notifikasi\n"
+            "/kondisi - Notifikasi kondisi indikator (mis. RSI(14) on 1h below 30)\n"
+            "/hapuskondisi - Hapus notifikasi kondisi\n\n"
             "Untuk masalah teknis, silakan hubungi support."
         )
         await update.message.reply_text(help_text, parse_mode='Markdown')
@@ -87,10 +165,14 @@ class TradingBot:
                 symbol = context.args[0].upper()
                 exchange = context.args[1].lower() if len(context.args) > 1 else None
                 
-                prices = self.price_service.get_price(symbol, exchange)
-                message = self.price_service.format_price_message(prices)
+                prices = await asyncio.to_thread(self.price_service.get_price, symbol, exchange)
+                rate = await asyncio.to_thread(self.price_service.get_usdt_idr_rate)
+                message = self.price_service.format_price_message(prices, rate)
                 
-                await update.message.reply_text(message, parse_mode='Markdown')
+                await update.message.reply_text(
+                    message, parse_mode='Markdown',
+                    reply_markup=self.live_button(symbol, exchange) if prices else None
+                )
             else:
                 keyboard = [
                     [
@@ -118,22 +200,116 @@ class TradingBot:
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Menangani perintah /status"""
         try:
-            ticker = self.price_service.get_ticker("BTC/USDT")
-            ws_status = "Terhubung" if self.price_service.ws_connected else "Terputus"
+            now = time.time()
+            status_text = "🤖 *Status Bot*\n\nKoneksi Exchange:\n"
+            last_update = 0.0
+            for exchange in self.price_service.exchanges:
+                # Diambil dari hasil request sebenarnya, bukan asumsi
+                last_ok, last_error = last_outcome('exchange_request', exchange=exchange)
+                last_update = max(last_update, last_ok)
+                if not last_ok and not last_error:
+                    state = "❔ belum ada request"
+                elif last_ok >= last_error:
+                    state = f"✅ OK ({now - last_ok:.0f} detik lalu)"
+                else:
+                    state = f"⚠️ gagal {now - last_error:.0f} detik lalu"
+                status_text += f"• {exchange.upper()}: {state}\n"
             
-            status_text = (
-                "🤖 *Status Bot*\n\n"
-                f"Koneksi Exchange: ✅\n"
+            if Config.PRICE_STREAM_ENABLED:
+                ws_status = "Terhubung" if self.price_service.exchanges['bitget'].ws_connected else "Terputus"
+            else:
+                ws_status = "Nonaktif"
+            updated = f"{datetime.utcfromtimestamp(last_update):%Y-%m-%d %H:%M:%S} UTC" if last_update else "-"
+            status_text += (
                 f"Status WebSocket: {ws_status}\n"
-                f"Pembaruan Harga Terakhir: {ticker['timestamp']}\n"
+                f"Pembaruan Harga Terakhir: {updated}\n"
                 f"Versi Bot: 1.0.0"
             )
             
-            await update.message.reply_text(status_text, parse_mode='Markdown')
+            await update.effective_message.reply_text(status_text, parse_mode='Markdown')
             
         except Exception as e:
             error_logger.error(f"Error pada perintah status: {str(e)}")
-            await update.message.reply_text("❌ Beberapa layanan sedang tidak tersedia.")
+            await update.effective_message.reply_text("❌ Beberapa layanan sedang tidak tersedia.")
+    
+    async def metrics_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Menangani perintah /metrics (khusus admin)"""
+        if not await self.require_admin(update):
+            return
+        
+        text = metrics_summary() + "\n\nScheduler:\n" + "".join(
+            f"• {role}: antri {stats['queued']}, diproses {stats['processed']}, ditolak {stats['shed']}, "
+            f"tunggu p99 {stats['p99_wait'] * 1000:.0f}ms\n"
+            for role, stats in self.scheduler.stats().items()
+        )
+        # Teks biasa: nama metrik mengandung garis bawah yang merusak Markdown
+        await update.message.reply_text(text[:4096])
+    
+    async def require_admin(self, update: Update) -> bool:
+        """True for admins; everyone else gets a refusal"""
+        if self.scheduler.role(update.effective_user.id) == UserRole.ADMIN:
+            return True
+        await update.message.reply_text("❌ Perintah ini khusus admin.")
+        return False
+    
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Menangani perintah /profile [detik|stop] untuk sampling profiler (khusus admin)"""
+        if not await self.require_admin(update):
+            return
+        
+        if context.args and context.args[0].lower() == 'stop':
+            if self.sampler.running:
+                self.sampler.stop()
+                await update.message.reply_text("⏹ Profiler dihentikan, hasil segera dikirim.")
+            else:
+                await update.message.reply_text("Profiler tidak sedang berjalan.")
+            return
+        
+        try:
+            seconds = float(context.args[0]) if context.args else 30.0
+        except ValueError:
+            await update.message.reply_text("Penggunaan: /profile [detik|stop]\nContoh: /profile 30")
+            return
+        
+        chat_id = update.effective_chat.id
+        loop = asyncio.get_running_loop()
+        
+        def deliver(sampler: SamplingProfiler):
+            # Dipanggil dari thread profiler; pengiriman harus lewat event loop
+            document = sampler.folded().encode()
+            loop.call_soon_threadsafe(lambda: self.send_queue.enqueue(
+                'send_document', chat_id, PRIORITY_INFO, document=document, filename='profile.folded',
+                caption=f"🔥 {sampler.samples} sampel. Buka dengan speedscope.app atau flamegraph.pl"
+            ))
+        
+        if not self.sampler.start(seconds, deliver):
+            await update.message.reply_text("Profiler sudah berjalan. Hentikan dengan /profile stop")
+            return
+        await update.message.reply_text(
+            f"▶️ Profiler berjalan {min(seconds, Config.PROFILE_MAX_SECONDS):.0f} detik "
+            f"({1 / self.sampler.interval:.0f} sampel/detik)."
+        )
+    
+    async def slowlog_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Menangani perintah /slowlog [nomor] untuk handler lambat (khusus admin)"""
+        if not await self.require_admin(update):
+            return
+        
+        if not context.args:
+            await update.message.reply_text(self.handler_profiler.format_captures())
+            return
+        
+        captures = list(reversed(self.handler_profiler.captures))
+        try:
+            capture = captures[int(context.args[0]) - 1]
+        except (ValueError, IndexError):
+            await update.message.reply_text("Nomor tidak valid. Lihat daftar dengan /slowlog")
+            return
+        self.send_queue.enqueue(
+            'send_document', update.effective_chat.id, PRIORITY_INFO,
+            document=capture['report'].encode(), filename=f"slow-{capture['name'].strip('/')}.txt",
+            caption=f"{capture['name']} {capture['duration']:.2f}s ({capture['kind']})"
+        )
     
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button callbacks"""
@@ -142,29 +318,44 @@ class TradingBot:
         
         try:
             if query.data.startswith('price_'):
-                symbol = query.data.replace('price_', '')
-                ticker_data = self.price_service.get_public_ticker(symbol)
+                # price_<SIMBOL>_<exchange|all>
+                symbol, _, exchange = query.data.replace('price_', '').partition('_')
+                exchange = None if exchange in ('', 'all') else exchange
+                prices = await asyncio.to_thread(self.price_service.get_price, symbol, exchange)
+                rate = await asyncio.to_thread(self.price_service.get_usdt_idr_rate)
                 
-                if ticker_data:
-                    # Format angka untuk tampilan yang lebih baik
-                    last_price = f"${ticker_data['last']:,.2f}"
-                    high_price = f"${ticker_data['high']:,.2f}"
-                    low_price = f"${ticker_data['low']:,.2f}"
-                    volume = f"{ticker_data['baseVolume']:.2f}"
-                    change = f"{ticker_data['percentage']:+.2f}"
-                    
-                    price_text = (
-                        f"💰 *{symbol[:3]}/{symbol[3:]}*\n\n"
-                        f"Harga: {last_price}\n"
-                        f"24j Tertinggi: {high_price}\n"
-                        f"24j Terendah: {low_price}\n"
-                        f"Volume 24j: {volume} {symbol[:3]}\n"
-                        f"Perubahan 24j: {change}%"
+                if prices:
+                    await query.edit_message_text(
+                        self.price_service.format_price_message(prices, rate), parse_mode='Markdown',
+                        reply_markup=self.live_button(symbol, exchange)
                     )
-                    
-                    await query.edit_message_text(price_text, parse_mode='Markdown')
                 else:
                     await query.edit_message_text(f"❌ Could not find price for {symbol}")
+            
+            elif query.data == 'livestop':
+                final = self.live_prices.stop(query.message.chat_id, query.message.message_id)
+                if final:
+                    text, reply_markup = final
+                    await query.edit_message_text(text, parse_mode='Markdown', reply_markup=reply_markup)
+            
+            elif query.data.startswith('live_'):
+                # live_<SIMBOL>_<exchange|all>: ambil alih pesan ini dan perbarui dari stream
+                symbol, _, exchange = query.data.replace('live_', '').partition('_')
+                exchange = None if exchange in ('', 'all') else exchange
+                prices = await asyncio.to_thread(self.price_service.get_price, symbol, exchange)
+                if not prices:
+                    await query.edit_message_text(f"❌ Could not find price for {symbol}")
+                    return
+                self.live_prices.set_rate(await asyncio.to_thread(self.price_service.get_usdt_idr_rate))
+                text, reply_markup = self.live_prices.start(
+                    query.message.chat_id, query.message.message_id, symbol, exchange, prices
+                )
+                await query.edit_message_text(text, parse_mode='Markdown', reply_markup=reply_markup)
+                    
+            elif query.data.startswith('analyze_'):
+                symbol = query.data.replace('analyze_', '')
+                series = await asyncio.to_thread(self.load_indicators, symbol, '1h', exchange_for_symbol(symbol))
+                await query.edit_message_text(format_analysis_message(symbol, series), parse_mode='Markdown')
                     
             elif query.data in ['help', 'status']:
                 if query.data == 'help':
@@ -198,42 +389,24 @@ class TradingBot:
     
     async def portfolio_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /portfolio command"""
+        session = None
         try:
             user = update.effective_user
             session = next(self.db.get_session())
             
-            # Get user's trades
-            trades = session.query(Trade).filter_by(
-                user_id=user.id,
-                status='open'
-            ).all()
+            # Trade.user_id merujuk ke users.id, bukan telegram id
+            db_user = session.query(User).filter_by(telegram_id=str(user.id)).first()
+            positions = DatabaseOps.load_positions(session, db_user.id) if db_user else []
             
-            if not trades:
+            if not positions:
                 await update.message.reply_text(
                     "Anda tidak memiliki posisi terbuka.\n"
                     "Gunakan /trade untuk mulai trading!"
                 )
                 return
             
-            portfolio_text = "📊 *Portofolio Anda*\n\n"
-            total_pnl = 0
-            
-            for trade in trades:
-                current_price = self.price_service.get_ticker(trade.symbol)['last']
-                pnl = (current_price - trade.entry_price) * trade.quantity
-                if trade.direction == 'short':
-                    pnl = -pnl
-                
-                total_pnl += pnl
-                portfolio_text += (
-                    f"*{trade.symbol}*\n"
-                    f"Direction: {trade.direction.upper()}\n"
-                    f"Entry: ${trade.entry_price:.2f}\n"
-                    f"Current: ${current_price:.2f}\n"
-                    f"PnL: ${pnl:.2f}\n\n"
-                )
-            
-            portfolio_text += f"*Total PnL: ${total_pnl:.2f}*"
+            valuation = await asyncio.to_thread(self.portfolio_service.value_positions, positions)
+            portfolio_text = self.portfolio_service.format_portfolio_message(valuation)
             
             await update.message.reply_text(portfolio_text, parse_mode='Markdown')
             
@@ -241,36 +414,44 @@ class TradingBot:
             error_logger.error(f"Error in portfolio command: {str(e)}")
             await update.message.reply_text("Sorry, couldn't fetch portfolio data.")
         finally:
-            session.close()
+            if session:
+                session.close()
     
     async def alert_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Menangani perintah /alert untuk notifikasi harga"""
         try:
-            if len(context.args) != 3:
+            if len(context.args) not in (3, 4):
                 await update.message.reply_text(
-                    "Penggunaan: /alert SIMBOL HARGA KONDISI\n"
-                    "Contoh: /alert BTCUSDT 50000 diatas"
+                    "Penggunaan: /alert SIMBOL HARGA KONDISI [exchange]\n"
+                    "Contoh: /alert BTC 1000000000 diatas\n"
+                    "Contoh: /alert BTCUSDT 50000 dibawah bitget"
                 )
                 return
             
-            symbol, price, condition = context.args
+            symbol, price, condition = context.args[:3]
+            exchange = context.args[3].lower() if len(context.args) > 3 else "indodax"
             price = float(price)
             
-            if condition not in ['diatas', 'dibawah']:
+            if condition.lower() not in CONDITION_ALIASES:
                 await update.message.reply_text("Kondisi harus 'diatas' atau 'dibawah'")
                 return
             
-            user_id = update.effective_user.id
-            if user_id not in self.price_alerts:
-                self.price_alerts[user_id] = {}
+            if exchange not in self.price_service.exchanges:
+                await update.message.reply_text("❌ Exchange tidak didukung. Gunakan 'indodax' atau 'bitget'")
+                return
             
-            self.price_alerts[user_id][symbol] = {
-                'price': price,
-                'condition': condition
-            }
+            alert = await self.alert_store.create(
+                update.effective_user.id,
+                symbol,
+                exchange,
+                price,
+                condition.lower()
+            )
+            self.changes.notify('alerts')
             
             await update.message.reply_text(
-                f"Notifikasi diatur untuk {symbol} ketika harga {condition} Rp {price:,.0f}"
+                f"Notifikasi #{alert.id} diatur untuk {alert.symbol} ({exchange.upper()}) ketika harga "
+                f"{condition.lower()} {format_alert_price(exchange, alert.price)}"
             )
             
         except ValueError:
@@ -279,31 +460,170 @@ class TradingBot:
             error_logger.error(f"Error pada perintah alert: {str(e)}")
             await update.message.reply_text("Maaf, tidak bisa mengatur notifikasi.")
     
+    async def alerts_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Menangani perintah /alerts untuk melihat notifikasi aktif"""
+        try:
+            alerts = sorted(self.alert_engine.user_alerts(update.effective_user.id), key=lambda alert: alert.id)
+            if not alerts:
+                await update.message.reply_text(
+                    "Anda tidak memiliki notifikasi aktif.\n"
+                    "Gunakan /alert untuk membuat notifikasi."
+                )
+                return
+            
+            alerts_text = "🔔 *Notifikasi Aktif*\n\n"
+            for alert in alerts:
+                condition = 'diatas' if alert.condition == 'above' else 'dibawah'
+                alerts_text += (
+                    f"#{alert.id} {alert.symbol} ({alert.exchange.upper()}) "
+                    f"{condition} {format_alert_price(alert.exchange, alert.price)}\n"
+                )
+            alerts_text += "\nHapus dengan /hapusalert <id>"
+            
+            await update.message.reply_text(alerts_text, parse_mode='Markdown')
+            
+        except Exception as e:
+            error_logger.error(f"Error pada perintah alerts: {str(e)}")
+            await update.message.reply_text("Maaf, tidak bisa mengambil daftar notifikasi.")
+    
+    async def delete_alert_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Menangani perintah /hapusalert untuk menghapus notifikasi"""
+        try:
+            if len(context.args) != 1:
+                await update.message.reply_text("Penggunaan: /hapusalert <id>\nContoh: /hapusalert 12")
+                return
+            
+            alert_id = int(context.args[0].lstrip('#'))
+            if await self.alert_store.delete(alert_id, update.effective_user.id):
+                self.changes.notify('alerts')
+                await update.message.reply_text(f"Notifikasi #{alert_id} dihapus.")
+            else:
+                await update.message.reply_text(f"Notifikasi #{alert_id} tidak ditemukan.")
+            
+        except ValueError:
+            await update.message.reply_text("ID notifikasi tidak valid")
+        except Exception as e:
+            error_logger.error(f"Error pada perintah hapusalert: {str(e)}")
+            await update.message.reply_text("Maaf, tidak bisa menghapus notifikasi.")
+    
+    async def condition_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Menangani perintah /kondisi untuk notifikasi kondisi indikator"""
+        try:
+            if len(context.args) < 2:
+                alerts = sorted(self.condition_engine.user_alerts(update.effective_user.id), key=lambda alert: alert.id)
+                message = (
+                    "Penggunaan: /kondisi SIMBOL KONDISI [exchange]\n"
+                    "Contoh: /kondisi BTC RSI(14) on 1h below 30\n"
+                    "Contoh: /kondisi ETHUSDT close crosses above EMA(50) on 4h bitget\n"
+                    "Contoh: /kondisi SOL MACD.hist crosses above 0\n"
+                )
+                if alerts:
+                    message += "\n🔔 Kondisi aktif:\n" + "".join(
+                        f"#{alert.id} {alert.symbol} ({alert.exchange.upper()}) {alert.text}\n" for alert in alerts
+                    ) + "\nHapus dengan /hapuskondisi <id>"
+                await update.message.reply_text(message)
+                return
+            
+            symbol, words = context.args[0], context.args[1:]
+            exchange = exchange_for_symbol(symbol)
+            if len(words) > 1 and words[-1].lower() in self.price_service.exchanges:
+                exchange = words.pop().lower()
+            
+            alert = await asyncio.to_thread(
+                self.condition_engine.create, update.effective_user.id, symbol, exchange, ' '.join(words)
+            )
+            self.changes.notify('conditions')
+            await update.message.reply_text(
+                f"Notifikasi kondisi #{alert.id} diatur untuk {alert.symbol} ({exchange.upper()}) "
+                f"ketika {alert.text}. Dicek setiap candle close."
+            )
+            
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {str(e)}")
+        except Exception as e:
+            error_logger.error(f"Error pada perintah kondisi: {str(e)}")
+            await update.message.reply_text("Maaf, tidak bisa mengatur notifikasi kondisi.")
+    
+    async def delete_condition_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Menangani perintah /hapuskondisi untuk menghapus notifikasi kondisi"""
+        try:
+            if len(context.args) != 1:
+                await update.message.reply_text("Penggunaan: /hapuskondisi <id>\nContoh: /hapuskondisi 12")
+                return
+            
+            alert_id = int(context.args[0].lstrip('#'))
+            if await asyncio.to_thread(self.condition_engine.delete, alert_id, update.effective_user.id):
+                self.changes.notify('conditions')
+                await update.message.reply_text(f"Notifikasi kondisi #{alert_id} dihapus.")
+            else:
+                await update.message.reply_text(f"Notifikasi kondisi #{alert_id} tidak ditemukan.")
+            
+        except ValueError:
+            await update.message.reply_text("ID notifikasi tidak valid")
+        except Exception as e:
+            error_logger.error(f"Error pada perintah hapuskondisi: {str(e)}")
+            await update.message.reply_text("Maaf, tidak bisa menghapus notifikasi kondisi.")
+    
+    async def load_conditions(self, context: ContextTypes.DEFAULT_TYPE):
+        """Compile active condition alerts from the database"""
+        try:
+            async with self.sync_lock:
+                await asyncio.to_thread(self.condition_engine.load)
+        except Exception as e:
+            error_logger.error(f"Error loading condition alerts: {str(e)}")
+    
+    def send_condition_alert(self, alert: ConditionAlert, close: float):
+        """Queue a fired condition alert for delivery"""
+        self.send_queue.send_message(
+            alert.user_id,
+            f"🔔 Kondisi #{alert.id} terpenuhi!\n\n"
+            f"{alert.symbol} ({alert.exchange.upper()}): {alert.text}\n"
+            f"Harga penutupan: {format_alert_price(alert.exchange, close)}",
+            PRIORITY_ALERT
+        )
+    
+    def load_indicators(self, symbol: str, timeframe: str, exchange: str):
+        """Get up-to-date indicator state, fetching candles only when a new one has closed"""
+        key = market_key(exchange, symbol)
+        closed_ts = last_closed_candle(timeframe)
+        series = self.command_indicators.get(key, timeframe)
+        if series is not None and series.last_ts is not None and series.last_ts >= closed_ts:
+            return series
+        
+        ohlcv = self.price_service.get_ohlcv(normalize_symbol(symbol), timeframe, exchange) or []
+        return self.command_indicators.sync(key, timeframe, [candle for candle in ohlcv if candle[0] <= closed_ts])
+    
     async def sentiment_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /sentiment command for market sentiment analysis"""
         try:
             symbol = "BTC/USDT"  # Default to BTC
             if context.args:
                 symbol = context.args[0]
+            exchange = context.args[1].lower() if len(context.args) > 1 else exchange_for_symbol(symbol)
             
-            # Get recent OHLCV data
-            ohlcv = self.price_service.get_ohlcv(symbol, timeframe='1h', limit=24)
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+            # Indikator dibaca dari state streaming, bukan dihitung ulang dari DataFrame
+            series = await asyncio.to_thread(self.load_indicators, symbol, '1h', exchange)
+            candles = list(series.candles)[-24:]
+            if len(candles) < 2:
+                await update.message.reply_text("Data pasar belum cukup untuk analisis sentimen.")
+                return
             
-            # Calculate basic indicators
-            df['returns'] = df['close'].pct_change()
-            df['volatility'] = df['returns'].rolling(6).std()
+            closes = [candle[4] for candle in candles]
+            volumes = [candle[5] for candle in candles]
+            volume_mean = sum(volumes) / len(volumes)
+            volatility_history = [value for value in list(series.get('volatility', 6).history)[-24:] if value is not None]
             
             # Simple sentiment analysis
-            price_change_24h = ((df['close'].iloc[-1] - df['close'].iloc[0]) / df['close'].iloc[0]) * 100
-            volume_change = ((df['volume'].iloc[-1] - df['volume'].mean()) / df['volume'].mean()) * 100
-            volatility = df['volatility'].iloc[-1]
+            price_change_24h = ((closes[-1] - closes[0]) / closes[0]) * 100
+            volume_change = ((volumes[-1] - volume_mean) / volume_mean) * 100 if volume_mean else 0.0
+            volatility = series.value('volatility', 6) or 0.0
+            volatility_mean = sum(volatility_history) / len(volatility_history) if volatility_history else 0.0
             
             # Determine sentiment
             sentiment_score = 0
             sentiment_score += 1 if price_change_24h > 0 else -1
             sentiment_score += 1 if volume_change > 20 else (-1 if volume_change < -20 else 0)
-            sentiment_score += -1 if volatility > df['volatility'].mean() * 1.5 else 0
+            sentiment_score += -1 if volatility > volatility_mean * 1.5 else 0
             
             sentiment = "Bullish 🟢" if sentiment_score > 0 else "Bearish 🔴" if sentiment_score < 0 else "Netral ⚪"
             
@@ -323,45 +643,225 @@ class TradingBot:
             await update.message.reply_text("Sorry, couldn't analyze market sentiment.")
     
     async def check_alerts(self, context: ContextTypes.DEFAULT_TYPE):
-        """Background task to check price alerts"""
-        while True:
-            try:
-                for user_id, alerts in self.price_alerts.items():
-                    for symbol, alert in alerts.items():
-                        current_price = self.price_service.get_ticker(symbol)['last']
-                        
-                        alert_triggered = (
-                            (alert['condition'] == 'above' and current_price > alert['price']) or
-                            (alert['condition'] == 'below' and current_price < alert['price'])
-                        )
-                        
-                        if alert_triggered:
-                            alert_text = (
-                                f"🚨 *Price Alert*\n\n"
-                                f"{symbol} is now {alert['condition']} ${alert['price']}\n"
-                                f"Current price: ${current_price}"
-                            )
-                            
-                            # Send alert to user using application instead of bot
-                            await self.app.bot.send_message(
-                                chat_id=user_id,
-                                text=alert_text,
-                                parse_mode='Markdown'
-                            )
-                            
-                            # Remove triggered alert
-                            del self.price_alerts[user_id][symbol]
-                            
-            except Exception as e:
-                error_logger.error(f"Error checking alerts: {str(e)}")
+        """Background task to match price alerts against batched ticker snapshots"""
+        try:
+            for exchange in self.alert_engine.exchanges():
+                # Satu request all-tickers per exchange, berapapun jumlah alert
+                tickers = await asyncio.to_thread(self.price_service.get_all_tickers, exchange)
+                prices = {symbol: ticker['last'] for symbol, ticker in tickers.items()}
+                
+                # Token fencing dicek sebelum mencocokkan: alert yang terpicu langsung ditandai tanpa jeda
+                if not await self.leader.fence():
+                    return
+                fired = self.alert_engine.on_tickers(exchange, prices)
+                if fired:
+                    await self.deliver_alerts(fired, self.leader.write_token)
+                    
+        except Exception as e:
+            error_logger.error(f"Error checking alerts: {str(e)}")
+    
+    def on_stream_tick(self, exchange: str, symbol: str, price: float):
+        """Feed a live ticker from the WebSocket thread into the alert engine"""
+        self.loop.call_soon_threadsafe(self._match_stream_tick, exchange, symbol, price)
+    
+    def _match_stream_tick(self, exchange: str, symbol: str, price: float):
+        self.spread_monitor.on_price(exchange, normalize_symbol(symbol), price)
+        self.live_prices.on_price(exchange, normalize_symbol(symbol), price)
+        if not self.leader.is_leader:
+            return  # Tick yang masih antre setelah lease lepas
+        fired = self.alert_engine.on_price(exchange, symbol, price)
+        if fired:
+            fired = [(alert, price) for alert in fired]
+            task = self.loop.create_task(self.deliver_alerts(fired, self.leader.write_token))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def deliver_alerts(self, fired: List[Tuple[PriceAlert, float]], fence_token: Optional[int] = None):
+        """Mark fired alerts as triggered in the database, then notify only the rows that changed"""
+        try:
+            changed = await self.alert_store.mark_triggered([alert for alert, _ in fired], fence_token)
+        except StaleFenceError as e:
+            # Pemimpin yang lebih baru sudah menulis: alert tetap aktif dan dikirim olehnya
+            activity_logger.info(f"Not sending {len(fired)} price alerts: {str(e)}")
+            self.alert_engine.load(alert for alert, _ in fired if alert.id not in self.alert_engine.alerts)
+            return
+        except Exception as e:
+            # Status di database tidak diketahui: kembalikan ke indeks agar dicoba lagi di tick berikutnya
+            error_logger.error(f"Error saving triggered alerts: {str(e)}")
+            self.alert_engine.load(alert for alert, _ in fired if alert.id not in self.alert_engine.alerts)
+            return
+        
+        self.changes.notify('alerts')
+        changed_ids = {alert.id for alert in changed}
+        for alert, price in fired:
+            if alert.id in changed_ids:
+                self.send_alert(alert, price)
+    
+    async def refresh_spreads(self, context: ContextTypes.DEFAULT_TYPE):
+        """Background task to feed all-tickers snapshots and the USDT/IDR rate into the spread monitor"""
+        try:
+            rate = await asyncio.to_thread(self.price_service.get_usdt_idr_rate)
+            self.spread_monitor.set_rate(rate)
+            self.live_prices.set_rate(rate)
+            for exchange in self.price_service.exchanges:
+                tickers = await asyncio.to_thread(self.price_service.get_all_tickers, exchange)
+                self.live_prices.on_tickers(exchange, tickers)
+                # Pair tanpa volume biasanya harga basi dan menghasilkan spread palsu
+                self.spread_monitor.on_tickers(exchange, {
+                    symbol: ticker['last'] for symbol, ticker in tickers.items() if ticker['volume'] > 0
+                })
+        except Exception as e:
+            error_logger.error(f"Error refreshing spreads: {str(e)}")
+    
+    async def flush_live_prices(self, context: ContextTypes.DEFAULT_TYPE):
+        """Background task to push coalesced edits to live price messages"""
+        try:
+            self.live_prices.flush()
+        except Exception as e:
+            error_logger.error(f"Error updating live prices: {str(e)}")
+    
+    @staticmethod
+    def live_button(symbol: str, exchange: str = None) -> InlineKeyboardMarkup:
+        return InlineKeyboardMarkup(
+            [[InlineKeyboardButton("🔴 Live", callback_data=live_callback_data(symbol.upper(), exchange))]]
+        )
+    
+    async def market_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Menangani perintah /market untuk ringkasan pergerakan semua pair"""
+        try:
+            args = [arg.lower() for arg in context.args]
+            exchange = next((arg for arg in args if arg in self.price_service.exchanges), None)
+            with_heatmap = 'heatmap' in args
+            
+            overview = await asyncio.to_thread(self.market_overview.get, exchange)
+            await update.message.reply_text(
+                self.market_overview.format_market_message(overview), parse_mode='Markdown'
+            )
+            
+            if with_heatmap and overview['tiles']:
+                # Heatmap dirender sekali per snapshot, lalu file_id dipakai ulang
+                photo = overview['heatmap_file_id'] or await asyncio.to_thread(self.market_overview.heatmap, overview)
+                message = await update.message.reply_photo(photo=photo, caption="🌡️ Heatmap pasar 24 jam")
+                if message and message.photo:
+                    overview['heatmap_file_id'] = message.photo[-1].file_id
+                    
+        except Exception as e:
+            error_logger.error(f"Error in market command: {str(e)}", exc_info=True)
+            await update.message.reply_text("Maaf, ringkasan pasar sedang tidak tersedia.")
+    
+    async def correlation_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Menangani perintah /korelasi untuk korelasi antar pair"""
+        try:
+            args = [arg.upper() for arg in context.args]
+            with_chart = 'CHART' in args
+            symbols = [normalize_symbol(arg) for arg in args if arg != 'CHART']
+            symbol = symbols[0] if len(symbols) == 1 else None
+            
+            correlated = self.correlation.top_correlated(10, symbol)
+            diverging = self.correlation.most_diverging(5, symbol)
+            await update.message.reply_text(
+                self.correlation.format_correlation_message(
+                    self.correlation.timeframe, self.correlation.long.window, correlated, diverging, symbol
+                ),
+                parse_mode='Markdown'
+            )
+            
+            if with_chart:
+                if symbol:
+                    # Matriks simbol tersebut beserta pasangan paling berkorelasi
+                    symbols = [symbol] + [other for _, other, _ in correlated]
+                png = await asyncio.to_thread(self.correlation.render, symbols or None)
+                if png:
+                    await update.message.reply_photo(photo=png, caption="🔗 Matriks korelasi")
+                    
+        except Exception as e:
+            error_logger.error(f"Error in correlation command: {str(e)}", exc_info=True)
+            await update.message.reply_text("Maaf, data korelasi sedang tidak tersedia.")
+    
+    async def spread_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Menangani perintah /spread untuk melihat selisih harga antar exchange"""
+        try:
+            if context.args and not context.args[0].isdigit():
+                symbol = normalize_symbol(context.args[0])
+                spread = self.spread_monitor.get(symbol)
+                spreads = [spread] if spread else []
+            else:
+                limit = min(int(context.args[0]), 30) if context.args else 10
+                spreads = self.spread_monitor.top(limit)
             
-            await asyncio.sleep(60)  # Check every minute
+            await update.message.reply_text(
+                self.spread_monitor.format_spread_message(spreads, self.spread_monitor.rate),
+                parse_mode='Markdown'
+            )
+        except Exception as e:
+            error_logger.error(f"Error in spread command: {str(e)}")
+            await update.message.reply_text("Maaf, data spread sedang tidak tersedia.")
+    
+    async def reconcile_alerts(self, context: ContextTypes.DEFAULT_TYPE):
+        """Background task to sync the alert index with the database after a warm start"""
+        try:
+            async with self.sync_lock:
+                await self.alert_store.reconcile()
+        except Exception as e:
+            error_logger.error(f"Error reconciling alerts: {str(e)}", exc_info=True)
+    
+    async def sync_indexes(self, context: ContextTypes.DEFAULT_TYPE):
+        """Background task to pick up alerts and conditions changed by other bot processes"""
+        await self.reconcile_alerts(context)
+        await self.load_conditions(context)
+    
+    async def on_change(self, topic: str):
+        """Apply a change notice published by another bot process"""
+        kind, _, timeframe = topic.partition(':')
+        if kind == 'alerts':
+            await self.reconcile_alerts(None)
+        elif kind == 'conditions':
+            await self.load_conditions(None)
+        elif kind == 'candles' and not self.leader.is_leader:
+            await self.follow_market_candles(timeframe)
+    
+    async def warm_up_imports(self, context: ContextTypes.DEFAULT_TYPE):
+        """Load the heavy libraries in the background once the bot is already answering"""
+        warm_up()
+    
+    async def snapshot_alerts(self, context: ContextTypes.DEFAULT_TYPE):
+        """Background task to persist the alert index snapshot for fast restarts"""
+        try:
+            if self.alert_store.dirty:
+                self.alert_store.write_snapshot()
+        except Exception as e:
+            error_logger.error(f"Error writing alert snapshot: {str(e)}")
+    
+    def send_alert(self, alert: PriceAlert, current_price: float):
+        """Notify a user that their price alert was triggered"""
+        condition = 'diatas' if alert.condition == 'above' else 'dibawah'
+        alert_text = (
+            f"🚨 *Notifikasi Harga*\n\n"
+            f"{alert.symbol} ({alert.exchange.upper()}) sekarang {condition} "
+            f"{format_alert_price(alert.exchange, alert.price)}\n"
+            f"Harga saat ini: {format_alert_price(alert.exchange, current_price)}"
+        )
+        
+        # Antrian menangani flood limit, prioritas dan penggabungan pesan per chat
+        self.send_queue.send_message(alert.user_id, alert_text, PRIORITY_ALERT, parse_mode='Markdown')
     
     async def pairs_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /pairs command"""
         try:
             exchange = context.args[0].lower() if context.args else None
-            pairs = self.price_service.get_available_pairs(exchange)
+            if exchange not in self.price_service.exchanges:
+                exchange = None
+            
+            async def fetch_pairs():
+                pairs = await asyncio.to_thread(self.price_service.get_available_pairs, exchange)
+                # Hasil gagal (semua kosong) tidak disimpan
+                return pairs if any(pairs.values()) else None
+            
+            # Satu proses saja yang mengambil ulang saat kedaluwarsa; lainnya memakai nilai lama
+            pairs = await self.cache.get_or_compute(f"pairs:{exchange or 'all'}", fetch_pairs, Config.PAIRS_CACHE_TTL)
+            if not pairs:
+                await update.message.reply_text("Sorry, couldn't fetch available pairs.")
+                return
             message = self.price_service.format_pairs_message(pairs)
             
             await update.message.reply_text(message, parse_mode='Markdown')
@@ -369,8 +869,114 @@ class TradingBot:
             error_logger.error(f"Error in pairs command: {str(e)}")
             await update.message.reply_text("Sorry, couldn't fetch available pairs.")
     
+    async def scan_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Menangani perintah /scan untuk memindai semua pair"""
+        try:
+            criterion = context.args[0].lower() if context.args else None
+            timeframe = context.args[1] if len(context.args) > 1 else Config.SCAN_TIMEFRAMES[0]
+            if criterion in ('all', 'semua'):
+                criterion = None
+            
+            if criterion and criterion not in SCAN_CRITERIA:
+                await update.message.reply_text(
+                    "Penggunaan: /scan [kriteria] [timeframe]\n"
+                    "Kriteria: rsi, volume, breakout, all\n"
+                    f"Timeframe: {', '.join(Config.SCAN_TIMEFRAMES)}\n"
+                    "Contoh: /scan rsi 1h"
+                )
+                return
+            
+            if timeframe not in Config.SCAN_TIMEFRAMES:
+                await update.message.reply_text(
+                    f"❌ Timeframe scan yang didukung: {', '.join(Config.SCAN_TIMEFRAMES)}"
+                )
+                return
+            
+            results = await self.scanner.scan(timeframe)
+            top = self.scanner.top(results, criterion)
+            await update.message.reply_text(
+                self.scanner.format_scan_message(top, timeframe, criterion),
+                parse_mode='Markdown'
+            )
+            
+        except Exception as e:
+            error_logger.error(f"Error in scan command: {str(e)}", exc_info=True)
+            await update.message.reply_text("Maaf, scan pasar sedang tidak tersedia.")
+    
+    async def refresh_market_candles(self, context: ContextTypes.DEFAULT_TYPE):
+        """Background task to store newly closed candles and evaluate signals and conditions on them"""
+        timeframe = context.job.data
+        if not self.leader.is_leader:
+            await self.follow_market_candles(timeframe)
+            return
+        try:
+            markets = None
+            if timeframe not in Config.SCAN_TIMEFRAMES and timeframe not in Config.SIGNAL_TIMEFRAMES \
+                    and timeframe != Config.CORRELATION_TIMEFRAME:
+                # Timeframe khusus kondisi: cukup pair yang memiliki kondisi aktif
+                markets = self.condition_engine.markets(timeframe)
+                if not markets:
+                    return
+            candles = await asyncio.to_thread(self.scanner.refresh_candles, timeframe, markets)
+            self.scanner.invalidate(timeframe)
+            self.changes.notify(f"candles:{timeframe}")
+            if timeframe == Config.CORRELATION_TIMEFRAME:
+                await asyncio.to_thread(self.correlation.update, {
+                    symbol: ohlcv for (exchange, symbol), ohlcv in candles.items()
+                    if exchange == Config.CORRELATION_EXCHANGE
+                })
+            # Sinyal dan kondisi hanya dikirim bila token fencing kita masih yang berlaku
+            if not await self.leader.fence():
+                return
+            signals, conditions = await asyncio.to_thread(self.apply_candles, timeframe, candles,
+                                                          self.leader.write_token)
+            if signals and timeframe in Config.SIGNAL_TIMEFRAMES:
+                await self.send_signals(signals)
+            if conditions:
+                self.changes.notify('conditions')
+            for alert, close in conditions:
+                self.send_condition_alert(alert, close)
+        except Exception as e:
+            error_logger.error(f"Error refreshing {timeframe} candles: {str(e)}", exc_info=True)
+    
+    async def follow_market_candles(self, timeframe: str):
+        """Follower side of refresh_market_candles: use the candles the leader stored"""
+        try:
+            self.scanner.invalidate(timeframe)
+            if timeframe == Config.CORRELATION_TIMEFRAME:
+                candles = await asyncio.to_thread(self.load_stored_candles, timeframe)
+                await asyncio.to_thread(self.correlation.update, candles)
+        except Exception as e:
+            error_logger.error(f"Error loading stored {timeframe} candles: {str(e)}", exc_info=True)
+    
+    def load_stored_candles(self, timeframe: str) -> dict:
+        """Latest stored candles of the correlation exchange as {symbol: ohlcv} (blocking)"""
+        session = next(self.db.get_session())
+        try:
+            return DatabaseOps.load_candles(
+                session, Config.CORRELATION_EXCHANGE, timeframe, limit=self.correlation.long.window + 1
+            )
+        finally:
+            session.close()
+    
+    def apply_candles(self, timeframe: str, candles: dict, fence_token: Optional[int] = None) -> tuple:
+        """Stream closed candles into the indicator engine and flush the signals and conditions they fired"""
+        for (exchange, symbol), ohlcv in candles.items():
+            self.indicators.sync(market_key(exchange, symbol), timeframe, ohlcv)
+        return self.signal_engine.flush(fence_token), self.condition_engine.flush(fence_token)
+    
+    async def send_signals(self, signals: list):
+        """Broadcast new signals to subscribers through the send queue"""
+        recipients = await asyncio.to_thread(self.signal_engine.recipients)
+        for signal in signals:
+            self.send_queue.broadcast(
+                recipients, self.signal_engine.format_signal_message(signal),
+                PRIORITY_SIGNAL, parse_mode='Markdown'
+            )
+    
     async def chart_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Menangani perintah /chart"""
+        key = None
         try:
             if not context.args:
                 await update.message.reply_text(
@@ -392,87 +998,50 @@ class TradingBot:
                 await update.message.reply_text("❌ Exchange tidak didukung. Gunakan 'indodax' atau 'bitget'")
                 return
 
-            progress_msg = await update.message.reply_text("📊 Mengambil data dan membuat grafik...")
-
-            # Get OHLCV data with error handling
-            ohlcv = self.price_service.get_ohlcv(symbol, timeframe, exchange)
-            if not ohlcv or len(ohlcv) < 2:
-                await progress_msg.edit_text(
-                    "❌ Tidak dapat mengambil data chart.\n"
-                    "Pastikan:\n"
-                    "- Simbol valid (contoh: BTC, ETH)\n"
-                    "- Timeframe didukung (1m, 5m, 15m, 1h, 4h, 1d)\n"
-                    "- Exchange didukung dan tersedia"
-                )
+            if timeframe not in TIMEFRAME_SECONDS:
+                await update.message.reply_text("❌ Timeframe tidak didukung. Gunakan 1m, 5m, 15m, 1h, 4h atau 1d")
                 return
 
-            # Convert to DataFrame with better error handling
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
+            key = ChartKey(symbol, timeframe, exchange, last_closed_candle(timeframe), CHART_STYLE)
+            caption = f"📊 {symbol}/IDR {timeframe} Chart dari {exchange.upper()}"
 
-            # Calculate width for bars based on time difference
-            if len(df) > 1:
-                time_diff = (df.index[1] - df.index[0]).total_seconds()
-                bar_width = 0.8 * time_diff / 86400  # Convert to days for matplotlib
-            else:
-                bar_width = 0.8  # Default width if only one data point
+            async with self.chart_cache.lock(key):
+                entry = self.chart_cache.get(key)
+                if entry and entry.file_id:
+                    # Chart identik sudah pernah dikirim, cukup pakai ulang file_id
+                    await update.message.reply_photo(photo=entry.file_id, caption=caption)
+                    return
 
-            # Create figure with dark theme
-            plt.style.use('dark_background')
-            fig = plt.figure(figsize=(12, 8))
-            fig.patch.set_facecolor('#1e222d')
+                progress_msg = None
+                if entry is None:
+                    progress_msg = await update.message.reply_text("📊 Mengambil data dan membuat grafik...")
 
-            # Create subplots with specific ratios
-            gs = fig.add_gridspec(2, 1, height_ratios=[3, 1], hspace=0.1)
-            ax1 = fig.add_subplot(gs[0])
-            ax2 = fig.add_subplot(gs[1], sharex=ax1)
-
-            # Calculate colors for volume bars
-            volume_colors = np.where(df.close >= df.open, '#26a69a', '#ef5350')
-
-            # Plot candlesticks and volume with the calculated bar_width
-            plot_candlestick(ax1, df)
-            ax2.bar(df.index, df.volume, color=volume_colors, alpha=0.5, width=bar_width)  # Fixed: using bar_width instead of width
-
-            # Calculate price change for title
-            price_change = df['close'].iloc[-1] - df['close'].iloc[0]
-            price_change_pct = (price_change / df['close'].iloc[0]) * 100
-
-            # Style improvements
-            for ax in [ax1, ax2]:
-                ax.set_facecolor('#1e222d')
-                ax.grid(True, color='#2a2e39', linestyle='--', alpha=0.3)
-                ax.tick_params(axis='both', colors='#787b86', labelsize=9)
-                ax.spines['top'].set_visible(False)
-                ax.spines['right'].set_visible(False)
-                for spine in ax.spines.values():
-                    spine.set_color('#2a2e39')
-
-            # Add custom title with OHLCV info
-            title = (
-                f"{symbol}/IDR • {timeframe} • {exchange.upper()}\n"
-                f"O: {df['open'].iloc[-1]:,.0f}  "
-                f"H: {df['high'].iloc[-1]:,.0f}  "
-                f"L: {df['low'].iloc[-1]:,.0f}  "
-                f"C: {df['close'].iloc[-1]:,.0f}  "
-                f"({price_change_pct:+.2f}%)"
-            )
-            ax1.set_title(title, color='#787b86', pad=10)
+                    # Get OHLCV data with error handling
+                    ohlcv = await asyncio.to_thread(self.price_service.get_ohlcv, symbol, timeframe, exchange)
+                    # Hanya gunakan candle yang sudah close agar chart sesuai dengan cache key
+                    ohlcv = [candle for candle in ohlcv or [] if candle[0] <= key.candle_ts]
+                    if len(ohlcv) < 2:
+                        await progress_msg.edit_text(
+                            "❌ Tidak dapat mengambil data chart.\n"
+                            "Pastikan:\n"
+                            "- Simbol valid (contoh: BTC, ETH)\n"
+                            "- Timeframe didukung (1m, 5m, 15m, 1h, 4h, 1d)\n"
+                            "- Exchange didukung dan tersedia"
+                        )
+                        return
 
-            # Save chart with high quality
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100, bbox_inches='tight',
-                       facecolor='#1e222d', edgecolor='none')
-            buf.seek(0)
+                    # Render ~0.5 detik; di luar event loop agar slot mahal scheduler benar-benar membatasi
+                    png = await asyncio.to_thread(render_chart, ohlcv, symbol, timeframe, exchange)
+                    self.chart_cache.put(key, png=png)
+                else:
+                    png = entry.png
 
-            # Send chart and cleanup
-            await progress_msg.delete()
-            await update.message.reply_photo(
-                photo=buf,
-                caption=f"📊 {symbol}/IDR {timeframe} Chart dari {exchange.upper()}"
-            )
-            plt.close()
+                # Send chart and remember Telegram's file_id for the next request
+                if progress_msg:
+                    await progress_msg.delete()
+                message = await update.message.reply_photo(photo=png, caption=caption)
+                if message and message.photo:
+                    self.chart_cache.put(key, file_id=message.photo[-1].file_id)
 
         except Exception as e:
             error_logger.error(f"Error dalam chart command: {str(e)}", exc_info=True)
@@ -480,6 +1049,48 @@ class TradingBot:
                 "❌ Terjadi kesalahan saat membuat grafik.\n"
                 "Mohon coba lagi nanti."
             )
+        finally:
+            if key is not None:
+                self.chart_cache.release(key)
+    
+    async def on_handler_error(self, update: object, context: ContextTypes.DEFAULT_TYPE):
+        """Log an exception that escaped a handler and count its update as an error"""
+        error_logger.error(f"Unhandled error in handler: {str(context.error)}", exc_info=context.error)
+        if update is not None:
+            self.scheduler.mark_failed(update)
+    
+    def leader_only(self, job):
+        """Wrap a job_queue callback so it only runs while this process is the leader"""
+        @functools.wraps(job)
+        async def run(context: ContextTypes.DEFAULT_TYPE):
+            if self.leader.is_leader:
+                await job(context)
+        return run
+    
+    async def on_leadership(self, leading: bool):
+        """Start or stop the singleton duties when this process wins or loses the leader lease"""
+        if leading:
+            if self.leader.clustered:
+                # Indeks alert/kondisi bisa tertinggal dari perubahan di proses lain
+                self.app.job_queue.run_once(self.sync_indexes, when=0)
+            if self.relay is not None:
+                await self.relay.start_polling(self.app.bot)
+            # Live ticks make alerts fire between snapshot sweeps
+            if Config.PRICE_STREAM_ENABLED:
+                self.price_service.start_price_stream(Config.TRADING_PAIRS, self.on_stream_tick)
+        else:
+            if Config.PRICE_STREAM_ENABLED:
+                self.price_service.stop_price_stream()
+            if self.relay is not None:
+                await self.relay.stop_polling()
+            # Hasil evaluasi yang belum di-flush milik term yang sudah berakhir; alertnya dimuat ulang oleh load()
+            self.signal_engine.discard_pending()
+            self.condition_engine.discard_pending()
+    
+    async def handle_relayed_update(self, payload: bytes):
+        """Process an update taken from the cluster's Redis list like a polled one"""
+        update = Update.de_json(json.loads(payload), self.app.bot)
+        await self.scheduler.process_update(update, self.app.process_update(update))
     
     async def initialize(self):
         """Initialize bot handlers"""
@@ -498,13 +1109,63 @@ class TradingBot:
             self.app.add_handler(CommandHandler("analyze", self.analyze_command))
             self.app.add_handler(CommandHandler("portfolio", self.portfolio_command))
             self.app.add_handler(CommandHandler("alert", self.alert_command))
+            self.app.add_handler(CommandHandler("alerts", self.alerts_command))
+            self.app.add_handler(CommandHandler("hapusalert", self.delete_alert_command))
             self.app.add_handler(CommandHandler("sentiment", self.sentiment_command))
             self.app.add_handler(CommandHandler("pairs", self.pairs_command))
             self.app.add_handler(CommandHandler("chart", self.chart_command))
+            self.app.add_handler(CommandHandler("scan", self.scan_command))
+            self.app.add_handler(CommandHandler("spread", self.spread_command))
+            self.app.add_handler(CommandHandler("market", self.market_command))
+            self.app.add_handler(CommandHandler("korelasi", self.correlation_command))
+            self.app.add_handler(CommandHandler("kondisi", self.condition_command))
+            self.app.add_handler(CommandHandler("hapuskondisi", self.delete_condition_command))
+            self.app.add_handler(CommandHandler("metrics", self.metrics_command))
+            self.app.add_handler(CommandHandler("profile", self.profile_command))
+            self.app.add_handler(CommandHandler("slowlog", self.slowlog_command))
             self.app.add_handler(CallbackQueryHandler(self.button_callback))
+            self.app.add_error_handler(self.on_handler_error)
+            
+            # Setiap handler diukur; yang melewati ambang direkam stack/profilnya
+            for handler in self.app.handlers[0]:
+                name = f"/{next(iter(handler.commands))}" if isinstance(handler, CommandHandler) else "callback"
+                handler.callback = self.handler_profiler.wrap(name, handler.callback)
+            self.scheduler.commands = {
+                command for handler in self.app.handlers[0] if isinstance(handler, CommandHandler)
+                for command in handler.commands
+            } | CALLBACK_PREFIXES
+            if Config.METRICS_PORT:
+                start_http_server(Config.METRICS_PORT, Config.METRICS_HOST, Config.METRICS_PORT_SPAN)
             
-            # Start background tasks
-            self.app.job_queue.run_repeating(self.check_alerts, interval=60)
+            # Serve alerts from the snapshot right away, then sync with the database
+            self.alert_store.warm_start()
+            
+            # Start background tasks; alert matching and snapshots only on the leader
+            self.app.job_queue.run_repeating(
+                self.leader_only(self.check_alerts), interval=Config.ALERT_CHECK_INTERVAL, first=0
+            )
+            self.app.job_queue.run_once(self.reconcile_alerts, when=0)
+            self.app.job_queue.run_repeating(self.refresh_spreads, interval=Config.TICKER_SNAPSHOT_TTL, first=1)
+            self.app.job_queue.run_repeating(
+                self.leader_only(self.snapshot_alerts), interval=Config.ALERT_SNAPSHOT_INTERVAL
+            )
+            self.app.job_queue.run_repeating(self.flush_live_prices, interval=Config.LIVE_FLUSH_INTERVAL)
+            self.app.job_queue.run_once(self.load_conditions, when=0)
+            if self.leader.clustered:
+                self.app.job_queue.run_repeating(
+                    self.sync_indexes, interval=Config.CLUSTER_SYNC_INTERVAL, first=Config.CLUSTER_SYNC_INTERVAL
+                )
+            timeframes = set(Config.SCAN_TIMEFRAMES) | set(Config.SIGNAL_TIMEFRAMES) | \
+                set(Config.CONDITION_TIMEFRAMES) | {Config.CORRELATION_TIMEFRAME}
+            for timeframe in sorted(timeframes, key=TIMEFRAME_SECONDS.get):
+                # Isi data saat startup, lalu tepat setelah setiap candle close
+                self.app.job_queue.run_once(self.refresh_market_candles, when=5, data=timeframe)
+                self.app.job_queue.run_repeating(
+                    self.refresh_market_candles,
+                    interval=TIMEFRAME_SECONDS[timeframe],
+                    first=(next_candle_close(timeframe) - int(time.time() * 1000)) / 1000 + 5,
+                    data=timeframe
+                )
             
             activity_logger.info("Bot handlers initialized successfully")
         except Exception as e:
@@ -521,13 +1182,26 @@ class TradingBot:
             # Start the application
             await self.app.initialize()
             await self.app.start()
-            await self.app.updater.start_polling()
+            await self.send_queue.start()
+            self.loop = asyncio.get_running_loop()
+            if self.relay is None:
+                await self.app.updater.start_polling()
+            else:
+                # Pemimpin mem-polling Telegram; semua proses mengambil update dari Redis
+                self.relay.start(self.handle_relayed_update)
+                self.changes.start()
+            if Config.IMPORT_WARM_UP_DELAY >= 0:
+                self.app.job_queue.run_once(self.warm_up_imports, when=Config.IMPORT_WARM_UP_DELAY)
+            
+            # Tanpa cluster proses ini langsung menjadi pemimpin
+            self.leader.add_listener(self.on_leadership)
+            await self.leader.start()
             
-            activity_logger.info("Bot is running...")
+            activity_logger.info(f"Bot is running as {self.instance_id}...")
             
-            # Keep the bot running
+            # Keep the bot running until the application is stopped (SIGTERM/SIGINT)
             try:
-                while True:
+                while self.app.running:
                     await asyncio.sleep(1)
             except asyncio.CancelledError:
                 activity_logger.info("Received cancel signal")
@@ -539,14 +1213,123 @@ class TradingBot:
             raise
         finally:
             activity_logger.info("Stopping bot...")
+            try:
+                if self.leader.is_leader:
+                    self.alert_store.write_snapshot()
+            except Exception as e:
+                error_logger.error(f"Error writing alert snapshot: {str(e)}")
             try:
                 if hasattr(self.app.updater, 'running') and self.app.updater.running:
                     await self.app.updater.stop()
+                # Melepas lease agar proses lain langsung mengambil alih
+                await self.leader.stop()
+                if self.relay is not None:
+                    await self.relay.stop()
+                await self.changes.stop()
+                await self.send_queue.stop()
+                await self.cache.close()
+                self.scanner.shutdown()
                 if hasattr(self.app, 'running') and self.app.running:
                     await self.app.stop()
             except Exception as e:
                 error_logger.error(f"Error during shutdown: {str(e)}", exc_info=True)
 
+CHART_STYLE = 'dark'
+
+# Prefix callback_data tombol inline (sebelum '_' pertama)
+CALLBACK_PREFIXES = {'price', 'live', 'livestop', 'analyze', 'help', 'status'}
+
+def format_alert_price(exchange: str, price: float) -> str:
+    """Format an alert price in the exchange's quote currency"""
+    if exchange == 'indodax':
+        return f"Rp {price:,.0f}"
+    return f"${price:,.2f}"
+
+def render_chart(ohlcv, symbol: str, timeframe: str, exchange: str) -> bytes:
+    """Render OHLCV data into a TradingView style PNG chart"""
+    # Convert to DataFrame with better error handling
+    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    df.set_index('timestamp', inplace=True)
+
+    # Calculate width for bars based on time difference
+    if len(df) > 1:
+        time_diff = (df.index[1] - df.index[0]).total_seconds()
+        bar_width = 0.8 * time_diff / 86400  # Convert to days for matplotlib
+    else:
+        bar_width = 0.8  # Default width if only one data point
+
+    # Create figure with dark theme
+    fig = mpl_figure.Figure(figsize=(12, 8), facecolor='#1e222d')
+    backend_agg.FigureCanvasAgg(fig)
+
+    # Create subplots with specific ratios
+    gs = fig.add_gridspec(2, 1, height_ratios=[3, 1], hspace=0.1)
+    ax1 = fig.add_subplot(gs[0])
+    ax2 = fig.add_subplot(gs[1], sharex=ax1)
+
+    # Calculate colors for volume bars
+    volume_colors = np.where(df.close >= df.open, '#26a69a', '#ef5350')
+
+    # Plot candlesticks and volume with the calculated bar_width
+    plot_candlestick(ax1, df)
+    ax2.bar(df.index, df.volume, color=volume_colors, alpha=0.5, width=bar_width)
+
+    # Calculate price change for title
+    price_change = df['close'].iloc[-1] - df['close'].iloc[0]
+    price_change_pct = (price_change / df['close'].iloc[0]) * 100
+
+    # Style improvements
+    for ax in [ax1, ax2]:
+        ax.set_facecolor('#1e222d')
+        ax.grid(True, color='#2a2e39', linestyle='--', alpha=0.3)
+        ax.tick_params(axis='both', colors='#787b86', labelsize=9)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        for spine in ax.spines.values():
+            spine.set_color('#2a2e39')
+
+    # Add custom title with OHLCV info
+    title = (
+        f"{symbol}/IDR • {timeframe} • {exchange.upper()}\n"
+        f"O: {df['open'].iloc[-1]:,.0f}  "
+        f"H: {df['high'].iloc[-1]:,.0f}  "
+        f"L: {df['low'].iloc[-1]:,.0f}  "
+        f"C: {df['close'].iloc[-1]:,.0f}  "
+        f"({price_change_pct:+.2f}%)"
+    )
+    ax1.set_title(title, color='#787b86', pad=10)
+
+    # Save chart with high quality
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=100, bbox_inches='tight',
+                facecolor='#1e222d', edgecolor='none')
+    return buf.getvalue()
+
+def format_analysis_message(symbol: str, series: IndicatorSeries) -> str:
+    """Format the current indicator state of a series for the analyze buttons"""
+    if not series.candles or series.value('rsi', 14) is None:
+        return f"❌ Data indikator untuk {symbol} belum cukup."
+    
+    close = series.candles[-1][4]
+    ema20 = series.value('ema', 20)
+    ema50 = series.value('ema', 50)
+    macd = series.value('macd', 12, 26, 9)
+    bands = series.value('bb', 20, 2.0)
+    atr = series.value('atr', 14)
+    
+    lines = [f"📈 *Analisis {symbol}* (1h)\n", f"Close: {close:,.2f}", f"RSI(14): {series.value('rsi', 14):.1f}"]
+    if ema20 is not None and ema50 is not None:
+        trend = "Naik 🟢" if ema20 > ema50 else "Turun 🔴"
+        lines.append(f"EMA20/EMA50: {ema20:,.2f} / {ema50:,.2f} ({trend})")
+    if macd is not None:
+        lines.append(f"MACD: {macd[0]:,.4f} (histogram {macd[2]:+,.4f})")
+    if bands is not None:
+        lines.append(f"Bollinger: {bands[2]:,.2f} - {bands[1]:,.2f}")
+    if atr is not None:
+        lines.append(f"ATR(14): {atr:,.2f}")
+    return "\n".join(lines)
+
 def plot_candlestick(ax, df):
     """Plot candlesticks in TradingView style"""
     # Calculate bar width based on data frequency
@@ -564,7 +1347,7 @@ def plot_candlestick(ax, df):
         body_height = body_top - body_bottom
         
         # Plot body
-        rect = plt.Rectangle(
+        rect = mpl_patches.Rectangle(
             xy=(idx - width/2, body_bottom),
             width=width,
             height=body_height,
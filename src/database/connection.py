@@ -3,6 +3,7 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
 from config.config import Config
 from .models import Base
+from .migrations import upgrade_schema
 
 class DatabaseManager:
     _instance = None
@@ -29,6 +30,7 @@ class DatabaseManager:
         
     def create_tables(self):
         Base.metadata.create_all(bind=self.engine)
+        upgrade_schema(self.engine)
     
     def get_session(self):
         session = self.SessionLocal()
@@ -0,0 +1,56 @@
+"""Additive schema changes for databases created by an older version.
+
+Base.metadata.create_all only creates missing tables, it never alters one
+that already exists. Columns and indexes added to existing models are
+applied here at startup, after create_all. Every step checks the live
+schema first, so running it again is a no-op.
+"""
+from typing import List
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from src.utils.logger import activity_logger
+from .models import OHLCV, Signal
+
+def _add_columns(conn: Connection, table: Table, names: List[str]) -> List[str]:
+    """ALTER TABLE ... ADD COLUMN for the model columns missing in the database"""
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    quote = conn.dialect.identifier_preparer.quote
+    added = []
+    for name in names:
+        if name in existing:
+            continue
+        column_type = table.columns[name].type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(name)} {column_type}"))
+        added.append(name)
+    if added:
+        activity_logger.info(f"Added columns {', '.join(added)} to {table.name}")
+    return added
+
+def _create_indexes(conn: Connection, table: Table):
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+def upgrade_ohlcv(conn: Connection):
+    """Exchange and timeframe columns for stored candles (ix_ohlcv_market)"""
+    table = OHLCV.__table__
+    if 'exchange' in _add_columns(conn, table, ['exchange', 'timeframe']):
+        # Baris lama hanya snapshot ticker dari WebSocket Bitget (timeframe tetap kosong)
+        conn.execute(text("UPDATE ohlcv SET exchange = 'bitget' WHERE exchange IS NULL"))
+    _create_indexes(conn, table)
+
+def upgrade_signals(conn: Connection):
+    """Exchange and timeframe of market-wide signals"""
+    if 'exchange' in _add_columns(conn, Signal.__table__, ['exchange', 'timeframe']):
+        # Sama dengan exchange_for_symbol: pair IDR di Indodax, lainnya di Bitget
+        conn.execute(text(
+            "UPDATE signals SET exchange = CASE WHEN UPPER(symbol) LIKE '%IDR' THEN 'indodax' ELSE 'bitget' END "
+            "WHERE exchange IS NULL"
+        ))
+
+STEPS = [upgrade_ohlcv, upgrade_signals]
+
+def upgrade_schema(engine: Engine):
+    """Bring tables created by an older version up to the current models (call after create_all)"""
+    with engine.begin() as conn:
+        for step in STEPS:
+            step(conn)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Enum, JSON
+from sqlalchemy import Index, UniqueConstraint, Column, Integer, BigInteger, String, Float, DateTime, Boolean, ForeignKey, Enum, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import enum
@@ -27,8 +27,11 @@ class User(Base):
 
 class OHLCV(Base):
     __tablename__ = 'ohlcv'
+    __table_args__ = (Index('ix_ohlcv_market', 'exchange', 'timeframe', 'symbol', 'timestamp'),)
     
     id = Column(Integer, primary_key=True)
+    exchange = Column(String, nullable=True)
+    timeframe = Column(String, nullable=True)  # Kosong untuk snapshot ticker dari WebSocket
     symbol = Column(String)
     timestamp = Column(DateTime)
     open = Column(Float)
@@ -46,7 +49,9 @@ class Signal(Base):
     __tablename__ = 'signals'
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)  # Kosong untuk sinyal pasar umum
+    exchange = Column(String, nullable=True)
+    timeframe = Column(String, nullable=True)
     symbol = Column(String)
     direction = Column(String)  # 'long' or 'short'
     entry_price = Column(Float)
@@ -76,6 +81,19 @@ class Trade(Base):
     
     user = relationship("User", back_populates="trades")
 
+class PositionAggregate(Base):
+    __tablename__ = 'position_aggregates'
+    __table_args__ = (UniqueConstraint('user_id', 'symbol', 'direction'),)
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
+    symbol = Column(String)
+    direction = Column(String)  # 'long' or 'short'
+    quantity = Column(Float, default=0.0)
+    cost_basis = Column(Float, default=0.0)  # Jumlah entry_price * quantity dari trade yang masih open
+    open_trades = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class OrderBook(Base):
     __tablename__ = 'order_books'
     
@@ -88,4 +106,36 @@ class OrderBook(Base):
     class Config:
         indexes = [
             ('symbol', 'timestamp')
-        ] 
\ No newline at end of file
+        ]
+
+class PriceAlertRecord(Base):
+    __tablename__ = 'price_alerts'
+    
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(BigInteger, index=True)  # Chat tujuan notifikasi
+    symbol = Column(String)
+    exchange = Column(String)
+    price = Column(Float)
+    condition = Column(String)  # 'above' or 'below'
+    is_active = Column(Boolean, default=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    triggered_at = Column(DateTime, nullable=True)
+
+class ConditionAlertRecord(Base):
+    __tablename__ = 'condition_alerts'
+    
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(BigInteger, index=True)  # Chat tujuan notifikasi
+    symbol = Column(String)
+    exchange = Column(String)
+    expression = Column(String)  # Bentuk kanonik, mis. "RSI(14) below 30 on 1h"
+    is_active = Column(Boolean, default=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    triggered_at = Column(DateTime, nullable=True)
+
+class ClusterFence(Base):
+    __tablename__ = 'cluster_fence'
+    
+    name = Column(String, primary_key=True)  # CLUSTER_NAME
+    token = Column(BigInteger, nullable=False)  # Token fencing tertinggi yang pernah menulis
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -1,9 +1,45 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, insert, select, update
 from sqlalchemy.orm import Session
-from .models import OHLCV, User, Trade, Signal, OrderBook
+from config.config import Config
+from .models import (OHLCV, User, UserRole, Trade, Signal, OrderBook, PriceAlertRecord, ConditionAlertRecord,
+                     PositionAggregate, ClusterFence)
+from src.utils.logger import activity_logger, error_logger
+from src.utils.metrics import instrument
 from datetime import datetime
 import json
 
+class StaleFenceError(Exception):
+    """A fenced write carried a token older than one a newer leader term already wrote with"""
+
+@instrument('db_operation')
 class DatabaseOps:
+    @staticmethod
+    def _claim_fence(session: Session, token: Optional[int]):
+        """Record `token` as the newest writer in the caller's transaction, or raise StaleFenceError.
+
+        The conditional UPDATE locks the fence row until commit, so a write
+        from an older leader term either commits before the newer term's
+        first write or sees its token and is rejected. None means no
+        cluster: nothing to fence.
+        """
+        if token is None:
+            return
+        name = Config.CLUSTER_NAME
+        result = session.execute(
+            update(ClusterFence)
+            .where(ClusterFence.name == name, ClusterFence.token <= token)
+            .values(token=token, updated_at=datetime.utcnow())
+        )
+        if result.rowcount:
+            return
+        current = session.execute(select(ClusterFence.token).where(ClusterFence.name == name)).scalar()
+        if current is not None:
+            raise StaleFenceError(f"Fencing token {token} is older than {current}")
+        # Penulisan pertama dalam cluster ini
+        session.add(ClusterFence(name=name, token=token))
+        session.flush()
+    
     @staticmethod
     def save_ohlcv(session: Session, data: dict):
         """Save OHLCV data to database"""
@@ -19,7 +55,7 @@ class DatabaseOps:
             )
             session.add(ohlcv)
             session.commit()
-            activity_logger.info(f"Saved OHLCV data for {data['symbol']}")
+            activity_logger.debug("Saved OHLCV data for %s", data['symbol'])
         except Exception as e:
             session.rollback()
             error_logger.error(f"Error saving OHLCV data: {str(e)}")
@@ -37,8 +73,379 @@ class DatabaseOps:
             )
             session.add(order_book)
             session.commit()
-            activity_logger.info(f"Saved order book for {data['symbol']}")
+            activity_logger.debug("Saved order book for %s", data['symbol'])
         except Exception as e:
             session.rollback()
             error_logger.error(f"Error saving order book: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+    
+    @staticmethod
+    def add_price_alert(session: Session, telegram_id: int, symbol: str, exchange: str,
+                        price: float, condition: str) -> int:
+        """Persist a new price alert and return its id"""
+        try:
+            alert = PriceAlertRecord(
+                telegram_id=telegram_id,
+                symbol=symbol,
+                exchange=exchange,
+                price=price,
+                condition=condition
+            )
+            session.add(alert)
+            session.commit()
+            return alert.id
+        except Exception as e:
+            session.rollback()
+            error_logger.error(f"Error saving price alert: {str(e)}")
+            raise
+    
+    @staticmethod
+    def deactivate_price_alerts(session: Session, alert_ids: List[int], triggered: bool = False,
+                                fence_token: Optional[int] = None) -> List[int]:
+        """Deactivate alerts in one UPDATE and return the ids of the rows that were still active"""
+        if not alert_ids:
+            return []
+        try:
+            DatabaseOps._claim_fence(session, fence_token)
+            values = {'is_active': False}
+            if triggered:
+                values['triggered_at'] = datetime.utcnow()
+            result = session.execute(
+                update(PriceAlertRecord)
+                .where(PriceAlertRecord.id.in_(alert_ids), PriceAlertRecord.is_active.is_(True))
+                .values(**values)
+                .returning(PriceAlertRecord.id)
+            )
+            changed = list(result.scalars())
+            session.commit()
+            return changed
+        except StaleFenceError:
+            session.rollback()
+            raise
+        except Exception as e:
+            session.rollback()
+            error_logger.error(f"Error deactivating price alerts: {str(e)}")
+            raise
+    
+    @staticmethod
+    def load_active_price_alerts(session: Session) -> List[Tuple]:
+        """Load all active alerts as plain (id, telegram_id, symbol, exchange, price, condition) rows"""
+        return session.execute(
+            select(
+                PriceAlertRecord.id,
+                PriceAlertRecord.telegram_id,
+                PriceAlertRecord.symbol,
+                PriceAlertRecord.exchange,
+                PriceAlertRecord.price,
+                PriceAlertRecord.condition
+            ).where(PriceAlertRecord.is_active.is_(True))
+        ).all()
+    
+    @staticmethod
+    def add_condition_alert(session: Session, telegram_id: int, symbol: str, exchange: str, expression: str) -> int:
+        """Persist a new condition alert and return its id"""
+        try:
+            alert = ConditionAlertRecord(
+                telegram_id=telegram_id,
+                symbol=symbol,
+                exchange=exchange,
+                expression=expression
+            )
+            session.add(alert)
+            session.commit()
+            return alert.id
+        except Exception as e:
+            session.rollback()
+            error_logger.error(f"Error saving condition alert: {str(e)}")
+            raise
+    
+    @staticmethod
+    def deactivate_condition_alerts(session: Session, alert_ids: List[int], triggered: bool = False,
+                                    fence_token: Optional[int] = None) -> List[int]:
+        """Deactivate condition alerts in one UPDATE and return the ids of the rows that were still active"""
+        if not alert_ids:
+            return []
+        try:
+            DatabaseOps._claim_fence(session, fence_token)
+            values = {'is_active': False}
+            if triggered:
+                values['triggered_at'] = datetime.utcnow()
+            result = session.execute(
+                update(ConditionAlertRecord)
+                .where(ConditionAlertRecord.id.in_(alert_ids), ConditionAlertRecord.is_active.is_(True))
+                .values(**values)
+                .returning(ConditionAlertRecord.id)
+            )
+            changed = list(result.scalars())
+            session.commit()
+            return changed
+        except StaleFenceError:
+            session.rollback()
+            raise
+        except Exception as e:
+            session.rollback()
+            error_logger.error(f"Error deactivating condition alerts: {str(e)}")
+            raise
+    
+    @staticmethod
+    def load_active_condition_alerts(session: Session) -> List[Tuple]:
+        """Load all active condition alerts as plain (id, telegram_id, symbol, exchange, expression) rows"""
+        return session.execute(
+            select(
+                ConditionAlertRecord.id,
+                ConditionAlertRecord.telegram_id,
+                ConditionAlertRecord.symbol,
+                ConditionAlertRecord.exchange,
+                ConditionAlertRecord.expression
+            ).where(ConditionAlertRecord.is_active.is_(True))
+        ).all()
+    
+    @staticmethod
+    def save_signals(session: Session, signals: List[Dict], fence_token: Optional[int] = None) -> int:
+        """Insert generated signals in one executemany batch"""
+        if not signals:
+            return 0
+        try:
+            DatabaseOps._claim_fence(session, fence_token)
+            session.execute(insert(Signal), [
+                {
+                    'exchange': signal['exchange'],
+                    'timeframe': signal['timeframe'],
+                    'symbol': signal['symbol'],
+                    'direction': signal['direction'],
+                    'entry_price': signal['entry_price'],
+                    'stop_loss': signal['stop_loss'],
+                    'take_profit': signal['take_profit'],
+                    'confidence': signal['confidence'],
+                    'created_at': signal['created_at'],
+                    'status': 'pending'
+                }
+                for signal in signals
+            ])
+            session.commit()
+            return len(signals)
+        except StaleFenceError:
+            session.rollback()
+            raise
+        except Exception as e:
+            session.rollback()
+            error_logger.error(f"Error saving signals: {str(e)}")
+            raise
+    
+    @staticmethod
+    def load_signal_recipients(session: Session) -> List[str]:
+        """Telegram ids of active premium/admin users with a valid subscription"""
+        now = datetime.utcnow()
+        return list(session.execute(
+            select(User.telegram_id).where(
+                User.is_active.is_(True),
+                User.role.in_([UserRole.PREMIUM, UserRole.ADMIN]),
+                (User.subscription_end.is_(None)) | (User.subscription_end > now)
+            )
+        ).scalars())
+    
+    @staticmethod
+    def load_user_roles(session: Session) -> Dict[str, UserRole]:
+        """Roles of active premium/admin users with a valid subscription; everyone else is FREE"""
+        now = datetime.utcnow()
+        return dict(session.execute(
+            select(User.telegram_id, User.role).where(
+                User.is_active.is_(True),
+                User.role.in_([UserRole.PREMIUM, UserRole.ADMIN]),
+                (User.subscription_end.is_(None)) | (User.subscription_end > now)
+            )
+        ).all())
+    
+    @staticmethod
+    def _apply_position(session: Session, trade: Trade, sign: int):
+        """Add (sign=1) or remove (sign=-1) a trade from its user's position aggregate"""
+        aggregate = session.execute(
+            select(PositionAggregate).where(
+                PositionAggregate.user_id == trade.user_id,
+                PositionAggregate.symbol == trade.symbol,
+                PositionAggregate.direction == trade.direction
+            )
+        ).scalar_one_or_none()
+        if aggregate is None:
+            if sign < 0:
+                return  # Tidak ada agregat yang perlu dikurangi
+            aggregate = PositionAggregate(
+                user_id=trade.user_id,
+                symbol=trade.symbol,
+                direction=trade.direction,
+                quantity=0.0,
+                cost_basis=0.0,
+                open_trades=0
+            )
+            session.add(aggregate)
+        
+        aggregate.quantity += sign * trade.quantity
+        aggregate.cost_basis += sign * trade.entry_price * trade.quantity
+        aggregate.open_trades += sign
+        if aggregate.open_trades <= 0:
+            session.delete(aggregate)
+    
+    @staticmethod
+    def open_trade(session: Session, user_id: int, symbol: str, direction: str, entry_price: float,
+                   quantity: float, signal_id: int = None) -> Trade:
+        """Open a trade and update the user's position aggregate in the same transaction"""
+        try:
+            trade = Trade(
+                user_id=user_id,
+                signal_id=signal_id,
+                symbol=symbol,
+                direction=direction,
+                entry_price=entry_price,
+                quantity=quantity,
+                status='open'
+            )
+            session.add(trade)
+            DatabaseOps._apply_position(session, trade, 1)
+            session.commit()
+            return trade
+        except Exception as e:
+            session.rollback()
+            error_logger.error(f"Error opening trade: {str(e)}")
+            raise
+    
+    @staticmethod
+    def close_trade(session: Session, trade: Trade, exit_price: float) -> Trade:
+        """Close a trade, record its PnL and update the user's position aggregate"""
+        try:
+            pnl = (exit_price - trade.entry_price) * trade.quantity
+            if trade.direction == 'short':
+                pnl = -pnl
+            
+            trade.exit_price = exit_price
+            trade.pnl = pnl
+            trade.status = 'closed'
+            trade.closed_at = datetime.utcnow()
+            DatabaseOps._apply_position(session, trade, -1)
+            session.commit()
+            return trade
+        except Exception as e:
+            session.rollback()
+            error_logger.error(f"Error closing trade: {str(e)}")
+            raise
+    
+    @staticmethod
+    def rebuild_position_aggregates(session: Session):
+        """Recompute every position aggregate from open trades with one GROUP BY"""
+        try:
+            session.execute(delete(PositionAggregate))
+            rows = session.execute(
+                select(
+                    Trade.user_id,
+                    Trade.symbol,
+                    Trade.direction,
+                    func.sum(Trade.quantity),
+                    func.sum(Trade.entry_price * Trade.quantity),
+                    func.count(Trade.id)
+                )
+                .where(Trade.status == 'open')
+                .group_by(Trade.user_id, Trade.symbol, Trade.direction)
+            ).all()
+            session.add_all([
+                PositionAggregate(
+                    user_id=user_id,
+                    symbol=symbol,
+                    direction=direction,
+                    quantity=quantity,
+                    cost_basis=cost_basis,
+                    open_trades=open_trades
+                )
+                for user_id, symbol, direction, quantity, cost_basis, open_trades in rows
+            ])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            error_logger.error(f"Error rebuilding position aggregates: {str(e)}")
+            raise
+    
+    @staticmethod
+    def load_positions(session: Session, user_id: int) -> List[Tuple]:
+        """Load a user's open positions as (symbol, direction, quantity, cost_basis, open_trades) rows"""
+        return session.execute(
+            select(
+                PositionAggregate.symbol,
+                PositionAggregate.direction,
+                PositionAggregate.quantity,
+                PositionAggregate.cost_basis,
+                PositionAggregate.open_trades
+            ).where(PositionAggregate.user_id == user_id)
+        ).all()
+    
+    @staticmethod
+    def save_candles(session: Session, exchange: str, timeframe: str, symbol: str, ohlcv: List) -> int:
+        """Bulk insert closed candles newer than the latest stored one; returns rows inserted"""
+        try:
+            latest = session.execute(
+                select(func.max(OHLCV.timestamp)).where(
+                    OHLCV.exchange == exchange,
+                    OHLCV.timeframe == timeframe,
+                    OHLCV.symbol == symbol
+                )
+            ).scalar()
+            rows = [
+                {
+                    'exchange': exchange,
+                    'timeframe': timeframe,
+                    'symbol': symbol,
+                    'timestamp': datetime.utcfromtimestamp(candle[0] / 1000),
+                    'open': candle[1],
+                    'high': candle[2],
+                    'low': candle[3],
+                    'close': candle[4],
+                    'volume': candle[5]
+                }
+                for candle in ohlcv
+            ]
+            if latest is not None:
+                rows = [row for row in rows if row['timestamp'] > latest]
+            if rows:
+                session.execute(OHLCV.__table__.insert(), rows)
+                session.commit()
+            return len(rows)
+        except Exception as e:
+            session.rollback()
+            error_logger.error(f"Error saving candles for {exchange}:{symbol} {timeframe}: {str(e)}")
+            raise
+    
+    @staticmethod
+    def load_candles(session: Session, exchange: str, timeframe: str, symbols: Iterable[str] = None,
+                     limit: int = 100) -> Dict[str, List]:
+        """Load the latest `limit` candles per symbol in one query, oldest first"""
+        row_number = func.row_number().over(
+            partition_by=OHLCV.symbol,
+            order_by=OHLCV.timestamp.desc()
+        ).label('rn')
+        query = select(
+            OHLCV.symbol, OHLCV.timestamp, OHLCV.open, OHLCV.high, OHLCV.low, OHLCV.close, OHLCV.volume, row_number
+        ).where(OHLCV.exchange == exchange, OHLCV.timeframe == timeframe)
+        if symbols is not None:
+            query = query.where(OHLCV.symbol.in_(list(symbols)))
+        ranked = query.subquery()
+        
+        candles = {}
+        rows = session.execute(
+            select(ranked).where(ranked.c.rn <= limit).order_by(ranked.c.symbol, ranked.c.timestamp)
+        ).all()
+        epoch = datetime(1970, 1, 1)
+        for symbol, timestamp, open_, high, low, close, volume, _ in rows:
+            candles.setdefault(symbol, []).append([
+                int((timestamp - epoch).total_seconds() * 1000), open_, high, low, close, volume
+            ])
+        return candles
+    
+    @staticmethod
+    def load_candle_history(session: Session, exchange: str, timeframe: str, symbol: str,
+                            start: datetime = None, end: datetime = None) -> List[Tuple]:
+        """Load the full stored candle history of one market as plain rows, oldest first"""
+        query = select(
+            OHLCV.timestamp, OHLCV.open, OHLCV.high, OHLCV.low, OHLCV.close, OHLCV.volume
+        ).where(OHLCV.exchange == exchange, OHLCV.timeframe == timeframe, OHLCV.symbol == symbol)
+        if start is not None:
+            query = query.where(OHLCV.timestamp >= start)
+        if end is not None:
+            query = query.where(OHLCV.timestamp < end)
+        return session.execute(query.order_by(OHLCV.timestamp)).all()
@@ -0,0 +1,129 @@
+"""Batch NumPy implementations of the streaming indicators.
+
+Each function takes full price arrays and returns arrays aligned with the
+input (NaN until the indicator has enough data). The recursive indicators
+(EMA, RSI, MACD, ATR) use exactly the same seeding and update arithmetic as
+the streaming classes in src.indicators.streaming, so a streaming state
+seeded from these arrays continues where the batch run stopped.
+"""
+import math
+from typing import Tuple
+import numpy as np
+
+def _ema_loop(values: np.ndarray, period: int, out: np.ndarray, start: int = 0):
+    """EMA over values[start:], seeded with the SMA of the first period values"""
+    valid = values[start:]
+    if len(valid) < period:
+        return
+    alpha = 2.0 / (period + 1)
+    prev = math.fsum(valid[:period].tolist()) / period
+    out[start + period - 1] = prev
+    for i, x in enumerate(valid[period:].tolist(), start + period):
+        prev = prev + alpha * (x - prev)
+        out[i] = prev
+
+def ema(values, period: int) -> np.ndarray:
+    """Exponential moving average"""
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    _ema_loop(values, period, out)
+    return out
+
+def _wilder(values: np.ndarray, period: int, start: int) -> np.ndarray:
+    """Wilder smoothing over values[start:], seeded with an SMA"""
+    out = np.full(len(values), np.nan)
+    valid = values[start:]
+    if len(valid) < period:
+        return out
+    prev = math.fsum(valid[:period].tolist()) / period
+    out[start + period - 1] = prev
+    for i, x in enumerate(valid[period:].tolist(), start + period):
+        prev = (prev * (period - 1) + x) / period
+        out[i] = prev
+    return out
+
+def rsi_components(close, period: int = 14) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """RSI plus the smoothed average gain and loss it was computed from"""
+    close = np.asarray(close, dtype=float)
+    change = np.full(len(close), np.nan)
+    change[1:] = np.diff(close)
+    gains = np.where(change > 0, change, 0.0)
+    losses = np.where(change < 0, -change, 0.0)
+
+    avg_gain = _wilder(gains, period, 1)
+    avg_loss = _wilder(losses, period, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    rsi[np.isnan(avg_gain)] = np.nan
+    return rsi, avg_gain, avg_loss
+
+def rsi(close, period: int = 14) -> np.ndarray:
+    """Relative strength index (Wilder)"""
+    return rsi_components(close, period)[0]
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD line, signal line and histogram"""
+    close = np.asarray(close, dtype=float)
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = np.full(len(close), np.nan)
+    _ema_loop(line, signal, signal_line, start=slow - 1)
+    return line, signal_line, line - signal_line
+
+def bollinger(close, period: int = 20, k: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bollinger bands (middle, upper, lower) with population standard deviation"""
+    close = np.asarray(close, dtype=float)
+    middle = np.full(len(close), np.nan)
+    std = np.full(len(close), np.nan)
+    if len(close) >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(close, period)
+        middle[period - 1:] = windows.mean(axis=1)
+        std[period - 1:] = windows.std(axis=1)
+    return middle, middle + k * std, middle - k * std
+
+def true_range(high, low, close) -> np.ndarray:
+    """True range; the first candle uses high - low"""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    if len(tr):
+        tr[0] = high[0] - low[0]
+    return tr
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """Average true range (Wilder)"""
+    return _wilder(true_range(high, low, close), period, 0)
+
+def vwap(timestamp, high, low, close, volume, session_ms: int = 86400000) -> np.ndarray:
+    """Volume weighted average price, reset at every session (UTC day by default)"""
+    timestamp = np.asarray(timestamp, dtype=np.int64)
+    typical = (np.asarray(high, dtype=float) + np.asarray(low, dtype=float) + np.asarray(close, dtype=float)) / 3.0
+    volume = np.asarray(volume, dtype=float)
+    if not len(timestamp):
+        return np.array([])
+
+    session = timestamp // session_ms
+    starts = np.flatnonzero(np.r_[True, session[1:] != session[:-1]])
+    cum_pv = np.cumsum(typical * volume)
+    cum_v = np.cumsum(volume)
+    # Kurangi akumulasi sebelum awal sesi masing-masing candle
+    offsets = np.repeat(np.r_[0, starts[1:]], np.diff(np.r_[starts, len(session)]))
+    base_pv = np.where(offsets > 0, cum_pv[offsets - 1], 0.0)
+    base_v = np.where(offsets > 0, cum_v[offsets - 1], 0.0)
+    pv = cum_pv - base_pv
+    v = cum_v - base_v
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(v > 0, pv / v, np.nan)
+
+def volatility(close, period: int = 6) -> np.ndarray:
+    """Rolling sample standard deviation of close-to-close returns"""
+    close = np.asarray(close, dtype=float)
+    out = np.full(len(close), np.nan)
+    if len(close) > period:
+        returns = close[1:] / close[:-1] - 1.0
+        windows = np.lib.stride_tricks.sliding_window_view(returns, period)
+        out[period:] = windows.std(axis=1, ddof=1)
+    return out
@@ -0,0 +1,562 @@
+"""Streaming technical indicators.
+
+Every indicator is a small state object updated in O(1) when a candle
+closes. Values are exposed through `value` (latest) and `history` (recent
+values) so readers never recompute from raw candles. `warm_up` seeds the
+state from the batch NumPy implementations in src.indicators.batch.
+
+Candles use the repo's OHLCV list format: [timestamp_ms, open, high, low, close, volume].
+"""
+import math
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from src.indicators import batch
+from src.utils.logger import error_logger
+
+HISTORY_LENGTH = 100
+
+class StreamingIndicator:
+    name = ''
+    width = 1  # Jumlah komponen nilai (MACD dan Bollinger bernilai tuple)
+
+    def __init__(self, history: int = HISTORY_LENGTH):
+        self.history = deque(maxlen=history)
+
+    @property
+    def params(self) -> Tuple:
+        return ()
+
+    @property
+    def lookback(self) -> int:
+        """Closed candles needed before the first value"""
+        return 1
+
+    @property
+    def value(self):
+        """Latest value, or None while the indicator is warming up"""
+        return self.history[-1] if self.history else None
+
+    @property
+    def ready(self) -> bool:
+        return self.value is not None
+
+    def update(self, candle):
+        """Process one closed candle and return the new value"""
+        value = self._update(candle)
+        self.history.append(value)
+        return value
+
+    def warm_up(self, candles: np.ndarray):
+        """Seed state from a (n, 6) OHLCV array using the batch implementation"""
+        raise NotImplementedError
+
+    def _update(self, candle):
+        raise NotImplementedError
+
+    def _fill_history(self, values: Iterable):
+        self.history.clear()
+        self.history.extend(_to_optional(value) for value in values)
+
+def _to_optional(value):
+    """Convert batch NaN markers to None (tuples become None if any part is NaN)"""
+    if isinstance(value, tuple):
+        return None if any(math.isnan(part) for part in value) else value
+    return None if math.isnan(value) else float(value)
+
+class _EMAState:
+    """EMA recursion shared by EMA and MACD, seeded with an SMA"""
+
+    __slots__ = ('period', 'alpha', 'seed', 'prev')
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.seed = []
+        self.prev = None
+
+    def update(self, x: float) -> Optional[float]:
+        if self.prev is None:
+            self.seed.append(x)
+            if len(self.seed) == self.period:
+                self.prev = math.fsum(self.seed) / self.period
+                self.seed = None
+            return self.prev
+        self.prev = self.prev + self.alpha * (x - self.prev)
+        return self.prev
+
+    def restore(self, values: np.ndarray, out: np.ndarray):
+        """Continue from a batch run: values are the inputs, out the batch EMA"""
+        if len(values) >= self.period:
+            self.prev = float(out[-1])
+            self.seed = None
+        else:
+            self.prev = None
+            self.seed = [float(x) for x in values]
+
+class _WilderState:
+    """Wilder smoothing (RSI, ATR), seeded with an SMA"""
+
+    __slots__ = ('period', 'seed', 'prev')
+
+    def __init__(self, period: int):
+        self.period = period
+        self.seed = []
+        self.prev = None
+
+    def update(self, x: float) -> Optional[float]:
+        if self.prev is None:
+            self.seed.append(x)
+            if len(self.seed) == self.period:
+                self.prev = math.fsum(self.seed) / self.period
+                self.seed = None
+            return self.prev
+        self.prev = (self.prev * (self.period - 1) + x) / self.period
+        return self.prev
+
+    def restore(self, values: np.ndarray, out: np.ndarray):
+        if len(values) >= self.period:
+            self.prev = float(out[-1])
+            self.seed = None
+        else:
+            self.prev = None
+            self.seed = [float(x) for x in values]
+
+class EMA(StreamingIndicator):
+    name = 'ema'
+
+    def __init__(self, period: int = 20, **kwargs):
+        super().__init__(**kwargs)
+        self.period = period
+        self.state = _EMAState(period)
+
+    @property
+    def params(self):
+        return (self.period,)
+
+    @property
+    def lookback(self):
+        return self.period
+
+    def _update(self, candle):
+        return self.state.update(float(candle[4]))
+
+    def warm_up(self, candles):
+        close = candles[:, 4]
+        out = batch.ema(close, self.period)
+        self.state.restore(close, out)
+        self._fill_history(out[-self.history.maxlen:])
+
+class RSI(StreamingIndicator):
+    name = 'rsi'
+
+    def __init__(self, period: int = 14, **kwargs):
+        super().__init__(**kwargs)
+        self.period = period
+        self.prev_close = None
+        self.avg_gain = _WilderState(period)
+        self.avg_loss = _WilderState(period)
+
+    @property
+    def params(self):
+        return (self.period,)
+
+    @property
+    def lookback(self):
+        return self.period + 1
+
+    def _update(self, candle):
+        close = float(candle[4])
+        if self.prev_close is None:
+            self.prev_close = close
+            return None
+
+        change = close - self.prev_close
+        self.prev_close = close
+        avg_gain = self.avg_gain.update(change if change > 0 else 0.0)
+        avg_loss = self.avg_loss.update(-change if change < 0 else 0.0)
+        if avg_gain is None:
+            return None
+        if avg_loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    def warm_up(self, candles):
+        close = candles[:, 4]
+        out, avg_gain, avg_loss = batch.rsi_components(close, self.period)
+        if len(close):
+            change = np.diff(close)
+            self.prev_close = float(close[-1])
+            self.avg_gain.restore(np.where(change > 0, change, 0.0), avg_gain)
+            self.avg_loss.restore(np.where(change < 0, -change, 0.0), avg_loss)
+        self._fill_history(out[-self.history.maxlen:])
+
+class MACD(StreamingIndicator):
+    """Value is (macd, signal, histogram)"""
+    name = 'macd'
+    width = 3
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9, **kwargs):
+        super().__init__(**kwargs)
+        self.fast, self.slow, self.signal = fast, slow, signal
+        self.fast_ema = _EMAState(fast)
+        self.slow_ema = _EMAState(slow)
+        self.signal_ema = _EMAState(signal)
+
+    @property
+    def params(self):
+        return (self.fast, self.slow, self.signal)
+
+    @property
+    def lookback(self):
+        return self.slow + self.signal - 1
+
+    def _update(self, candle):
+        close = float(candle[4])
+        fast = self.fast_ema.update(close)
+        slow = self.slow_ema.update(close)
+        if fast is None or slow is None:
+            return None
+        line = fast - slow
+        signal = self.signal_ema.update(line)
+        if signal is None:
+            return None
+        return (line, signal, line - signal)
+
+    def warm_up(self, candles):
+        close = candles[:, 4]
+        fast = batch.ema(close, self.fast)
+        slow = batch.ema(close, self.slow)
+        line, signal, hist = batch.macd(close, self.fast, self.slow, self.signal)
+        self.fast_ema.restore(close, fast)
+        self.slow_ema.restore(close, slow)
+        self.signal_ema.restore(line[self.slow - 1:], signal[self.slow - 1:])
+        tail = slice(-self.history.maxlen, None)
+        self._fill_history(zip(line[tail], signal[tail], hist[tail]))
+
+class Bollinger(StreamingIndicator):
+    """Value is (middle, upper, lower); O(1) updates from running sums"""
+    name = 'bb'
+    width = 3
+
+    def __init__(self, period: int = 20, k: float = 2.0, **kwargs):
+        super().__init__(**kwargs)
+        self.period = period
+        self.k = k
+        self.window = deque(maxlen=period)
+        self.ref = None  # Offset untuk mengurangi pembatalan numerik pada harga besar (IDR)
+        self.sum = 0.0
+        self.sum_sq = 0.0
+
+    @property
+    def params(self):
+        return (self.period, self.k)
+
+    @property
+    def lookback(self):
+        return self.period
+
+    def _update(self, candle):
+        close = float(candle[4])
+        if self.ref is None:
+            self.ref = close
+        if len(self.window) == self.period:
+            old = self.window[0] - self.ref
+            self.sum -= old
+            self.sum_sq -= old * old
+        self.window.append(close)
+        x = close - self.ref
+        self.sum += x
+        self.sum_sq += x * x
+
+        if len(self.window) < self.period:
+            return None
+        mean = self.sum / self.period
+        std = math.sqrt(max(self.sum_sq / self.period - mean * mean, 0.0))
+        middle = mean + self.ref
+        return (middle, middle + self.k * std, middle - self.k * std)
+
+    def warm_up(self, candles):
+        close = candles[:, 4]
+        middle, upper, lower = batch.bollinger(close, self.period, self.k)
+        self.window.clear()
+        self.window.extend(float(x) for x in close[-self.period:])
+        self.ref = self.window[0] if self.window else None
+        offsets = [x - self.ref for x in self.window]
+        self.sum = math.fsum(offsets)
+        self.sum_sq = math.fsum(x * x for x in offsets)
+        tail = slice(-self.history.maxlen, None)
+        self._fill_history(zip(middle[tail], upper[tail], lower[tail]))
+
+class ATR(StreamingIndicator):
+    name = 'atr'
+
+    def __init__(self, period: int = 14, **kwargs):
+        super().__init__(**kwargs)
+        self.period = period
+        self.prev_close = None
+        self.state = _WilderState(period)
+
+    @property
+    def params(self):
+        return (self.period,)
+
+    @property
+    def lookback(self):
+        return self.period
+
+    def _update(self, candle):
+        high, low, close = float(candle[2]), float(candle[3]), float(candle[4])
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        return self.state.update(tr)
+
+    def warm_up(self, candles):
+        tr = batch.true_range(candles[:, 2], candles[:, 3], candles[:, 4])
+        out = batch.atr(candles[:, 2], candles[:, 3], candles[:, 4], self.period)
+        self.prev_close = float(candles[-1, 4]) if len(candles) else None
+        self.state.restore(tr, out)
+        self._fill_history(out[-self.history.maxlen:])
+
+class VWAP(StreamingIndicator):
+    """Session VWAP, reset at each UTC day"""
+    name = 'vwap'
+
+    def __init__(self, session_ms: int = 86400000, **kwargs):
+        super().__init__(**kwargs)
+        self.session_ms = session_ms
+        self.session = None
+        self.cum_pv = 0.0
+        self.cum_v = 0.0
+
+    def _update(self, candle):
+        session = int(candle[0]) // self.session_ms
+        if session != self.session:
+            self.session = session
+            self.cum_pv = 0.0
+            self.cum_v = 0.0
+        typical = (float(candle[2]) + float(candle[3]) + float(candle[4])) / 3.0
+        self.cum_pv += typical * float(candle[5])
+        self.cum_v += float(candle[5])
+        return self.cum_pv / self.cum_v if self.cum_v > 0 else None
+
+    def warm_up(self, candles):
+        out = batch.vwap(candles[:, 0], candles[:, 2], candles[:, 3], candles[:, 4], candles[:, 5], self.session_ms)
+        self.session = None
+        self.cum_pv = self.cum_v = 0.0
+        if len(candles):
+            # Akumulasi ulang hanya candle dari sesi terakhir
+            self.session = int(candles[-1, 0]) // self.session_ms
+            in_session = candles[candles[:, 0].astype(np.int64) // self.session_ms == self.session]
+            typical = (in_session[:, 2] + in_session[:, 3] + in_session[:, 4]) / 3.0
+            for pv, v in zip((typical * in_session[:, 5]).tolist(), in_session[:, 5].tolist()):
+                self.cum_pv += pv
+                self.cum_v += v
+        self._fill_history(out[-self.history.maxlen:])
+
+class Volatility(StreamingIndicator):
+    """Sample standard deviation of close-to-close returns over a window"""
+    name = 'volatility'
+
+    def __init__(self, period: int = 6, **kwargs):
+        super().__init__(**kwargs)
+        self.period = period
+        self.prev_close = None
+        self.returns = deque(maxlen=period)
+
+    @property
+    def params(self):
+        return (self.period,)
+
+    @property
+    def lookback(self):
+        return self.period + 1
+
+    def _update(self, candle):
+        close = float(candle[4])
+        if self.prev_close is not None and self.prev_close != 0:
+            self.returns.append(close / self.prev_close - 1.0)
+        self.prev_close = close
+        if len(self.returns) < self.period:
+            return None
+        return float(np.std(np.fromiter(self.returns, dtype=float, count=self.period), ddof=1))
+
+    def warm_up(self, candles):
+        close = candles[:, 4]
+        out = batch.volatility(close, self.period)
+        self.prev_close = float(close[-1]) if len(close) else None
+        self.returns.clear()
+        if len(close) > 1:
+            self.returns.extend((close[1:] / close[:-1] - 1.0)[-self.period:].tolist())
+        self._fill_history(out[-self.history.maxlen:])
+
+INDICATORS = {cls.name: cls for cls in (EMA, RSI, MACD, Bollinger, ATR, VWAP, Volatility)}
+
+# Indikator yang dilacak untuk setiap (symbol, timeframe) secara default
+DEFAULT_INDICATORS = (
+    ('ema', (20,)),
+    ('ema', (50,)),
+    ('rsi', (14,)),
+    ('macd', (12, 26, 9)),
+    ('bb', (20, 2.0)),
+    ('atr', (14,)),
+    ('vwap', ()),
+    ('volatility', (6,))
+)
+
+def create_indicator(name: str, params: Tuple = ()) -> StreamingIndicator:
+    if name not in INDICATORS:
+        raise ValueError(f"Unknown indicator: {name}")
+    return INDICATORS[name](*params)
+
+class IndicatorSeries:
+    """All indicator states plus recent closed candles for one (symbol, timeframe).
+
+    Updates may come from worker threads and the event loop at once; `lock`
+    serialises them (readers of single values do not need it).
+    """
+
+    def __init__(self, symbol: str, timeframe: str, indicators: Iterable[Tuple[str, Tuple]] = DEFAULT_INDICATORS):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.last_ts = None
+        self.candles = deque(maxlen=HISTORY_LENGTH)
+        self.indicators: Dict[Tuple[str, Tuple], StreamingIndicator] = {}
+        self.lock = threading.RLock()
+        for name, params in indicators:
+            self.add(name, params)
+
+    def add(self, name: str, params: Tuple = ()) -> StreamingIndicator:
+        key = (name, tuple(params))
+        with self.lock:
+            indicator = self.indicators.get(key)
+            if indicator is None:
+                indicator = create_indicator(name, tuple(params))
+                if self.candles:
+                    indicator.warm_up(np.asarray(self.candles, dtype=float))
+                self.indicators[key] = indicator
+        return indicator
+
+    def get(self, name: str, *params) -> Optional[StreamingIndicator]:
+        return self.indicators.get((name, tuple(params)))
+
+    def value(self, name: str, *params):
+        indicator = self.get(name, *params)
+        return indicator.value if indicator else None
+
+    def update(self, candle) -> bool:
+        """Apply one closed candle; older or duplicate candles are ignored"""
+        with self.lock:
+            if self.last_ts is not None and candle[0] <= self.last_ts:
+                return False
+            self.last_ts = candle[0]
+            self.candles.append(list(candle))
+            for indicator in self.indicators.values():
+                indicator.update(candle)
+            return True
+
+    def warm_up(self, ohlcv: List):
+        """Seed every indicator from a history of closed candles in one batch pass"""
+        candles = np.asarray(ohlcv, dtype=float).reshape(-1, 6)
+        with self.lock:
+            for indicator in self.indicators.values():
+                indicator.warm_up(candles)
+            self.candles.clear()
+            self.candles.extend(list(candle) for candle in ohlcv[-HISTORY_LENGTH:])
+            self.last_ts = ohlcv[-1][0] if len(ohlcv) else None
+
+class IndicatorEngine:
+    """Registry of streaming indicator state keyed by (symbol, timeframe, indicator, params)"""
+
+    def __init__(self):
+        self.series: Dict[Tuple[str, str], IndicatorSeries] = {}
+        self.listeners: List[Callable[[IndicatorSeries, List], None]] = []
+        self._lock = threading.Lock()
+
+    def track(self, symbol: str, timeframe: str, indicators: Iterable[Tuple[str, Tuple]] = DEFAULT_INDICATORS) -> IndicatorSeries:
+        key = (symbol, timeframe)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = IndicatorSeries(symbol, timeframe, indicators)
+                return series
+        for name, params in indicators:
+            series.add(name, params)
+        return series
+
+    def get(self, symbol: str, timeframe: str) -> Optional[IndicatorSeries]:
+        return self.series.get((symbol, timeframe))
+
+    def add_listener(self, callback: Callable[[IndicatorSeries, List], None]):
+        """Register callback(series, candle), called after each candle close is applied"""
+        self.listeners.append(callback)
+
+    def on_candle_close(self, symbol: str, timeframe: str, candle: List) -> Optional[IndicatorSeries]:
+        """O(1) update of every indicator tracked for (symbol, timeframe)"""
+        series = self.track(symbol, timeframe)
+        with series.lock:
+            if not series.update(candle):
+                return None
+            # Listener dipanggil di dalam lock agar melihat status tepat setelah candle ini
+            for callback in self.listeners:
+                try:
+                    callback(series, candle)
+                except Exception as e:
+                    error_logger.error(f"Error in indicator listener for {symbol} {timeframe}: {str(e)}")
+        return series
+
+    def sync(self, symbol: str, timeframe: str, closed_ohlcv: List) -> IndicatorSeries:
+        """Bring (symbol, timeframe) up to date with a list of closed candles.
+
+        An empty series is warmed up in one batch pass; otherwise only candles
+        newer than the last one seen are streamed in. The check and the
+        update happen under the series lock, so concurrent syncs apply each
+        candle once.
+        """
+        series = self.track(symbol, timeframe)
+        with series.lock:
+            if series.last_ts is None:
+                if closed_ohlcv:
+                    series.warm_up(closed_ohlcv)
+                return series
+
+            for candle in closed_ohlcv:
+                if candle[0] > series.last_ts:
+                    self.on_candle_close(symbol, timeframe, candle)
+        return series
+
+def verify_against_batch(ohlcv: List, indicators: Iterable[Tuple[str, Tuple]] = DEFAULT_INDICATORS,
+                         rtol: float = 1e-9) -> Dict[str, float]:
+    """Replay candles through the streaming indicators and compare with a batch warm-up.
+
+    Returns the maximum relative difference per indicator; raises AssertionError
+    if any value (or warm-up NaN position) does not match within rtol.
+    """
+    differences = {}
+    history = len(ohlcv)
+    for name, params in indicators:
+        streaming = INDICATORS[name](*params, history=history)
+        for candle in ohlcv:
+            streaming.update(candle)
+        warmed = INDICATORS[name](*params, history=history)
+        warmed.warm_up(np.asarray(ohlcv, dtype=float).reshape(-1, 6))
+
+        a = np.array([_flatten(value, streaming.width) for value in streaming.history], dtype=float)
+        b = np.array([_flatten(value, warmed.width) for value in warmed.history], dtype=float)
+        if a.shape != b.shape or not np.array_equal(np.isnan(a), np.isnan(b)):
+            raise AssertionError(f"{name}{params}: warm-up positions differ")
+        mask = ~np.isnan(a)
+        if not np.allclose(a[mask], b[mask], rtol=rtol, atol=0):
+            raise AssertionError(f"{name}{params}: streaming and batch values differ")
+        scale = np.maximum(np.abs(b[mask]), np.finfo(float).tiny)
+        differences[f"{name}{params}"] = float(np.max(np.abs(a[mask] - b[mask]) / scale)) if mask.any() else 0.0
+    return differences
+
+def _flatten(value, width: int):
+    if value is None:
+        return [np.nan] * width if width > 1 else np.nan
+    return list(value) if width > 1 else value
@@ -1,5 +1,6 @@
 from src.bot.telegram_bot import TradingBot
 from src.database.connection import DatabaseManager
+from src.database.operations import DatabaseOps
 from src.utils.logger import activity_logger, error_logger
 from src.utils.admin_notifier import AdminNotifier
 import asyncio
@@ -16,6 +17,13 @@ async def main():
         # Initialize database
         db = DatabaseManager()
         db.create_tables()
+        
+        # Pastikan agregat posisi sesuai dengan trade yang masih open
+        session = next(db.get_session())
+        try:
+            DatabaseOps.rebuild_position_aggregates(session)
+        finally:
+            session.close()
         activity_logger.info("Database initialized")
         
         # Initialize bot
@@ -0,0 +1,197 @@
+from bisect import bisect_left, bisect_right
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.utils.logger import activity_logger
+from src.utils.symbols import normalize_symbol
+
+# Kondisi dari /alert (bahasa Indonesia) dipetakan ke kondisi internal
+CONDITION_ALIASES = {
+    'diatas': 'above',
+    'above': 'above',
+    'dibawah': 'below',
+    'below': 'below'
+}
+
+class PriceAlert:
+    __slots__ = ('id', 'user_id', 'symbol', 'exchange', 'price', 'condition')
+
+    def __init__(self, id: int, user_id: int, symbol: str, exchange: str, price: float, condition: str):
+        self.id = id
+        self.user_id = user_id
+        self.symbol = normalize_symbol(symbol)
+        self.exchange = exchange
+        self.price = float(price)
+        self.condition = CONDITION_ALIASES[condition]
+
+    @classmethod
+    def restore(cls, id: int, user_id: int, symbol: str, exchange: str, price: float, condition: str) -> 'PriceAlert':
+        """Rebuild an already normalized alert (e.g. from a snapshot) without re-validating it"""
+        alert = cls.__new__(cls)
+        alert.id = id
+        alert.user_id = user_id
+        alert.symbol = symbol
+        alert.exchange = exchange
+        alert.price = price
+        alert.condition = condition
+        return alert
+
+class SymbolAlerts:
+    """Alerts for one (exchange, symbol), kept as sorted threshold arrays.
+
+    Above-triggers fire when price > threshold, i.e. a prefix of the sorted
+    array; below-triggers fire when price < threshold, i.e. a suffix. Each tick
+    is one binary search per side plus the cost of the alerts that fire.
+    """
+
+    __slots__ = ('above_prices', 'above_alerts', 'below_prices', 'below_alerts')
+
+    def __init__(self):
+        self.above_prices: List[float] = []
+        self.above_alerts: List[PriceAlert] = []
+        self.below_prices: List[float] = []
+        self.below_alerts: List[PriceAlert] = []
+
+    def __len__(self):
+        return len(self.above_prices) + len(self.below_prices)
+
+    def _side(self, condition: str):
+        if condition == 'above':
+            return self.above_prices, self.above_alerts
+        return self.below_prices, self.below_alerts
+
+    def add(self, alert: PriceAlert):
+        prices, alerts = self._side(alert.condition)
+        idx = bisect_right(prices, alert.price)
+        prices.insert(idx, alert.price)
+        alerts.insert(idx, alert)
+
+    def extend(self, new_alerts: Iterable[PriceAlert]):
+        """Add many alerts with one sort per side instead of one insert each"""
+        for condition in ('above', 'below'):
+            prices, alerts = self._side(condition)
+            merged = alerts + [alert for alert in new_alerts if alert.condition == condition]
+            merged.sort(key=lambda alert: alert.price)
+            alerts[:] = merged
+            prices[:] = [alert.price for alert in merged]
+
+    def remove(self, alert: PriceAlert) -> bool:
+        prices, alerts = self._side(alert.condition)
+        idx = bisect_left(prices, alert.price)
+        while idx < len(prices) and prices[idx] == alert.price:
+            if alerts[idx].id == alert.id:
+                del prices[idx]
+                del alerts[idx]
+                return True
+            idx += 1
+        return False
+
+    def match(self, price: float) -> List[PriceAlert]:
+        """Pop every alert triggered by price"""
+        fired = []
+
+        k = bisect_left(self.above_prices, price)
+        if k:
+            fired.extend(self.above_alerts[:k])
+            del self.above_prices[:k]
+            del self.above_alerts[:k]
+
+        k = bisect_right(self.below_prices, price)
+        if k < len(self.below_prices):
+            fired.extend(self.below_alerts[k:])
+            del self.below_prices[k:]
+            del self.below_alerts[k:]
+
+        return fired
+
+class AlertEngine:
+    """In-memory index of price alerts, fed by stream ticks or batched tickers"""
+
+    def __init__(self):
+        self.books: Dict[Tuple[str, str], SymbolAlerts] = {}
+        self.alerts: Dict[int, PriceAlert] = {}
+        self._ids = count(1)
+
+    def __len__(self):
+        return len(self.alerts)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, alert: PriceAlert) -> PriceAlert:
+        """Index a new alert"""
+        if alert.id in self.alerts:
+            self.remove(alert.id)
+        key = (alert.exchange, alert.symbol)
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = SymbolAlerts()
+        book.add(alert)
+        self.alerts[alert.id] = alert
+        return alert
+
+    def remove(self, alert_id: int) -> Optional[PriceAlert]:
+        """Remove an alert by id"""
+        alert = self.alerts.pop(alert_id, None)
+        if alert is None:
+            return None
+        key = (alert.exchange, alert.symbol)
+        book = self.books.get(key)
+        if book is not None:
+            book.remove(alert)
+            if not len(book):
+                del self.books[key]
+        return alert
+
+    def user_alerts(self, user_id: int) -> List[PriceAlert]:
+        """List alerts belonging to a user"""
+        return [alert for alert in self.alerts.values() if alert.user_id == user_id]
+
+    def exchanges(self) -> List[str]:
+        """Exchanges that currently have at least one alert"""
+        return sorted({exchange for exchange, _ in self.books})
+
+    def symbols(self, exchange: str) -> List[str]:
+        """Symbols with at least one alert on an exchange"""
+        return [symbol for ex, symbol in self.books if ex == exchange]
+
+    def on_price(self, exchange: str, symbol: str, price: float) -> List[PriceAlert]:
+        """Process one price tick and return (and remove) the alerts it triggers"""
+        key = (exchange, normalize_symbol(symbol))
+        book = self.books.get(key)
+        if book is None:
+            return []
+
+        fired = book.match(price)
+        if fired:
+            for alert in fired:
+                del self.alerts[alert.id]
+            if not len(book):
+                del self.books[key]
+            activity_logger.info("%d alert(s) triggered for %s on %s at %s", len(fired), key[1], exchange, price)
+        return fired
+
+    def on_tickers(self, exchange: str, prices: Dict[str, float]) -> List[Tuple[PriceAlert, float]]:
+        """Process a batch of last prices ({symbol: price}) from one exchange"""
+        fired = []
+        for symbol in self.symbols(exchange):
+            price = prices.get(symbol)
+            if price is None:
+                continue
+            fired.extend((alert, price) for alert in self.on_price(exchange, symbol, price))
+        return fired
+
+    def load(self, alerts: Iterable[PriceAlert]):
+        """Bulk load alerts (with ids not yet in the index), e.g. at startup"""
+        grouped: Dict[Tuple[str, str], List[PriceAlert]] = {}
+        for alert in alerts:
+            self.alerts[alert.id] = alert
+            grouped.setdefault((alert.exchange, alert.symbol), []).append(alert)
+
+        for key, items in grouped.items():
+            book = self.books.get(key)
+            if book is None:
+                book = self.books[key] = SymbolAlerts()
+            book.extend(items)
+
+        if self.alerts:
+            self._ids = count(max(self.alerts) + 1)
@@ -0,0 +1,211 @@
+import asyncio
+import os
+import struct
+import time
+from array import array
+from typing import List, Optional, Set
+from config.config import Config
+from src.database.connection import DatabaseManager
+from src.database.operations import DatabaseOps
+from src.services.alert_engine import AlertEngine, PriceAlert
+from src.utils.logger import activity_logger, error_logger
+
+SNAPSHOT_MAGIC = b'ALRT'
+SNAPSHOT_VERSION = 1
+# magic, version, alert count, string table size (bytes)
+SNAPSHOT_HEADER = struct.Struct('<4sHIi')
+
+class AlertStore:
+    """Durable storage for price alerts behind the in-memory AlertEngine.
+
+    The database is the source of truth: creates and deletes are written
+    through before the index changes. A compact binary snapshot of the
+    index lets a restart serve alerts immediately; the database is then
+    reconciled in the background with one bulk query.
+    """
+
+    def __init__(self, engine: AlertEngine, snapshot_path: str = None):
+        self.engine = engine
+        self.db = DatabaseManager()
+        self.snapshot_path = snapshot_path or Config.ALERT_SNAPSHOT_PATH
+        self.dirty = False
+        # Alert yang dihapus/terpicu selama rekonsiliasi, agar tidak dimuat ulang
+        self._removed_during_reconcile: Optional[Set[int]] = None
+        # Alert yang dibuat selama rekonsiliasi, agar tidak dibuang sebagai basi
+        self._created_during_reconcile: Optional[Set[int]] = None
+
+    async def create(self, telegram_id: int, symbol: str, exchange: str, price: float, condition: str) -> PriceAlert:
+        """Write a new alert through to the database in a worker thread, then index it on the loop"""
+        alert = PriceAlert(0, telegram_id, symbol, exchange, price, condition)
+        alert.id = await asyncio.to_thread(self._insert_row, alert)
+        if self._created_during_reconcile is not None:
+            self._created_during_reconcile.add(alert.id)
+
+        self.engine.add(alert)
+        self.dirty = True
+        return alert
+
+    async def delete(self, alert_id: int, telegram_id: int) -> bool:
+        """Delete one of a user's alerts from the database (worker thread) and the index"""
+        alert = self.engine.alerts.get(alert_id)
+        if alert is None or alert.user_id != telegram_id:
+            return False
+
+        await asyncio.to_thread(self._update_rows, [alert_id], False)
+        self._note_removed([alert_id])
+        self.engine.remove(alert_id)
+        return True
+
+    def _insert_row(self, alert: PriceAlert) -> int:
+        session = next(self.db.get_session())
+        try:
+            return DatabaseOps.add_price_alert(
+                session, alert.user_id, alert.symbol, alert.exchange, alert.price, alert.condition
+            )
+        finally:
+            session.close()
+
+    async def mark_triggered(self, alerts: List[PriceAlert], fence_token: Optional[int] = None) -> List[PriceAlert]:
+        """Record fired alerts (already removed from the index) in one UPDATE.
+
+        Runs in a worker thread. Returns only the alerts whose row was still
+        active, so an alert that an older snapshot or another process's index
+        fired again is not sent twice. With a fencing token the UPDATE is
+        rejected (StaleFenceError) once a newer leader term has written.
+        """
+        if not alerts:
+            return []
+        changed = set(await asyncio.to_thread(self._update_rows, [alert.id for alert in alerts], True, fence_token))
+        self._note_removed([alert.id for alert in alerts])
+        return [alert for alert in alerts if alert.id in changed]
+
+    def _update_rows(self, alert_ids: List[int], triggered: bool, fence_token: Optional[int] = None) -> List[int]:
+        session = next(self.db.get_session())
+        try:
+            return DatabaseOps.deactivate_price_alerts(session, alert_ids, triggered=triggered, fence_token=fence_token)
+        finally:
+            session.close()
+
+    def _note_removed(self, alert_ids: List[int]):
+        if self._removed_during_reconcile is not None:
+            self._removed_during_reconcile.update(alert_ids)
+        self.dirty = True
+
+    def warm_start(self) -> int:
+        """Load the snapshot into the engine so alerts are live before the DB is read"""
+        start = time.perf_counter()
+        try:
+            alerts = self.read_snapshot()
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            error_logger.error(f"Error reading alert snapshot: {str(e)}")
+            return 0
+
+        self.engine.load(alerts)
+        activity_logger.info(
+            f"Loaded {len(alerts)} alerts from snapshot in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        return len(alerts)
+
+    async def reconcile(self) -> int:
+        """Rebuild the index from the database with one bulk query.
+
+        Runs after warm_start; the query executes in a worker thread and the
+        resulting diff (alerts created or removed while the snapshot was
+        stale) is applied on the event loop. Indexed alerts missing from the
+        result are dropped unless they were created while the query ran.
+        """
+        start = time.perf_counter()
+        self._removed_during_reconcile = set()
+        self._created_during_reconcile = set()
+        try:
+            rows = await asyncio.to_thread(self._load_rows)
+        finally:
+            removed, self._removed_during_reconcile = self._removed_during_reconcile, None
+            created, self._created_during_reconcile = self._created_during_reconcile, None
+
+        db_ids = set()
+        new_alerts = []
+        for alert_id, telegram_id, symbol, exchange, price, condition in rows:
+            db_ids.add(alert_id)
+            if alert_id not in self.engine.alerts and alert_id not in removed:
+                new_alerts.append(PriceAlert(alert_id, telegram_id, symbol, exchange, price, condition))
+
+        stale_ids = [
+            alert_id for alert_id in self.engine.alerts
+            if alert_id not in db_ids and alert_id not in created
+        ]
+        for alert_id in stale_ids:
+            self.engine.remove(alert_id)
+        self.engine.load(new_alerts)
+
+        if new_alerts or stale_ids:
+            self.dirty = True
+        activity_logger.info(
+            f"Reconciled {len(rows)} alerts from database in {(time.perf_counter() - start) * 1000:.1f} ms "
+            f"(+{len(new_alerts)} / -{len(stale_ids)})"
+        )
+        return len(rows)
+
+    def _load_rows(self):
+        session = next(self.db.get_session())
+        try:
+            return DatabaseOps.load_active_price_alerts(session)
+        finally:
+            session.close()
+
+    def write_snapshot(self):
+        """Atomically write the current index as a compact binary snapshot"""
+        alerts = list(self.engine.alerts.values())
+        strings = {}
+        ids = array('q')
+        users = array('q')
+        prices = array('d')
+        conditions = array('b')
+        symbols = array('I')
+        exchanges = array('I')
+
+        for alert in alerts:
+            ids.append(alert.id)
+            users.append(alert.user_id)
+            prices.append(alert.price)
+            conditions.append(1 if alert.condition == 'above' else 0)
+            symbols.append(strings.setdefault(alert.symbol, len(strings)))
+            exchanges.append(strings.setdefault(alert.exchange, len(strings)))
+
+        string_table = '\n'.join(strings).encode('utf-8')
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(alerts), len(string_table)))
+            f.write(string_table)
+            for column in (ids, users, prices, conditions, symbols, exchanges):
+                column.tofile(f)
+        os.replace(tmp_path, self.snapshot_path)
+        self.dirty = False
+
+    def read_snapshot(self) -> List[PriceAlert]:
+        """Read alerts back from a snapshot written by write_snapshot"""
+        with open(self.snapshot_path, 'rb') as f:
+            magic, version, count, table_size = SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError("Unknown alert snapshot format")
+
+            strings = f.read(table_size).decode('utf-8').split('\n') if table_size else []
+            columns = []
+            for typecode in ('q', 'q', 'd', 'b', 'I', 'I'):
+                column = array(typecode)
+                column.fromfile(f, count)
+                columns.append(column)
+
+        ids, users, prices, conditions, symbols, exchanges = columns
+        restore = PriceAlert.restore
+        return [
+            restore(alert_id, user_id, strings[symbol], strings[exchange], price, 'above' if condition else 'below')
+            for alert_id, user_id, price, condition, symbol, exchange
+            in zip(ids, users, prices, conditions, symbols, exchanges)
+        ]
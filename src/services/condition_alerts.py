@@ -0,0 +1,500 @@
+"""Indicator condition alerts, e.g. "RSI(14) on 1h below 30" or "close crosses above EMA(50)".
+
+A condition is parsed and compiled once into operands that read streaming
+indicator state. Conditions are grouped per (market, timeframe) and, inside
+that, per shared left operand and comparator: thresholds against constants
+are kept sorted, so one candle close is matched with a bisect per group no
+matter how many users subscribed, and expressions between two indicators
+are evaluated once per distinct expression.
+"""
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Set, Tuple
+from config.config import Config
+from src.database.connection import DatabaseManager
+from src.database.operations import DatabaseOps, StaleFenceError
+from src.indicators.streaming import HISTORY_LENGTH, INDICATORS, IndicatorEngine, IndicatorSeries
+from src.utils.logger import activity_logger, error_logger
+from src.utils.symbols import market_key, normalize_symbol
+from src.utils.timeframes import TIMEFRAME_SECONDS
+
+DEFAULT_TIMEFRAME = '1h'
+
+PRICE_FIELDS = {'open': 1, 'high': 2, 'low': 3, 'close': 4, 'price': 4, 'harga': 4, 'volume': 5}
+COMPONENTS = {
+    'macd': {'line': 0, 'macd': 0, 'signal': 1, 'hist': 2, 'histogram': 2},
+    'bb': {'middle': 0, 'mid': 0, 'upper': 1, 'lower': 2}
+}
+
+# Urutan penting: frasa yang lebih panjang dicocokkan lebih dulu
+COMPARATORS = (
+    ('crosses above', 'cross_up'), ('cross above', 'cross_up'), ('memotong ke atas', 'cross_up'),
+    ('crosses below', 'cross_down'), ('cross below', 'cross_down'), ('memotong ke bawah', 'cross_down'),
+    ('di atas', '>'), ('diatas', '>'), ('above', '>'), ('>', '>'),
+    ('di bawah', '<'), ('dibawah', '<'), ('below', '<'), ('<', '<')
+)
+COMPARATOR_TEXT = {'>': 'above', '<': 'below', 'cross_up': 'crosses above', 'cross_down': 'crosses below'}
+
+_TIMEFRAME_RE = re.compile(r'\b(?:on|pada|di)\s+(' + '|'.join(TIMEFRAME_SECONDS) + r')\b')
+_COMPARATOR_RE = re.compile(
+    r'^(.+?)\s*(' + '|'.join(re.escape(text) for text, _ in COMPARATORS) + r')\s*(.+)$'
+)
+_OPERAND_RE = re.compile(r'^([a-z]+)\s*(?:\(([\d.,\s]*)\))?\s*(?:\.([a-z]+))?$')
+
+class Operand:
+    """A price field, indicator value (optionally one component) or constant"""
+
+    __slots__ = ('kind', 'name', 'params', 'component', 'constant', 'key')
+
+    def __init__(self, kind: str, name: str = '', params: Tuple = (), component: int = None, constant: float = None):
+        self.kind = kind
+        self.name = name
+        self.params = params
+        self.component = component
+        self.constant = constant
+        self.key = (kind, name, params, component, constant)
+
+    def value(self, series: IndicatorSeries, back: int = 0) -> Optional[float]:
+        """Value at the latest closed candle (back=0) or `back` candles earlier"""
+        if self.kind == 'const':
+            return self.constant
+        if self.kind == 'price':
+            if len(series.candles) <= back:
+                return None
+            return series.candles[-1 - back][self.component]
+
+        indicator = series.get(self.name, *self.params)
+        if indicator is None or len(indicator.history) <= back:
+            return None
+        value = indicator.history[-1 - back]
+        if value is None or self.component is None:
+            return value
+        return value[self.component]
+
+    def __str__(self):
+        if self.kind == 'const':
+            return f"{self.constant:g}"
+        if self.kind == 'price':
+            return self.name
+        text = self.name.upper()
+        if self.params:
+            text += f"({','.join(f'{param:g}' for param in self.params)})"
+        if self.component is not None:
+            name = next(name for name, index in COMPONENTS[self.name].items() if index == self.component)
+            text += f".{name}"
+        return text
+
+def _parse_operand(text: str) -> Operand:
+    text = text.strip()
+    try:
+        return Operand('const', constant=float(text.replace(',', '')))
+    except ValueError:
+        pass
+
+    match = _OPERAND_RE.match(text)
+    if not match:
+        raise ValueError(f"Operand tidak dikenali: '{text}'")
+    name, params, component = match.groups()
+
+    if name in PRICE_FIELDS:
+        if params or component:
+            raise ValueError(f"'{name}' tidak memakai parameter")
+        return Operand('price', 'close' if name in ('price', 'harga') else name, component=PRICE_FIELDS[name])
+
+    if name not in INDICATORS:
+        raise ValueError(f"Indikator tidak dikenali: '{name}'")
+    values = tuple(float(param) for param in params.split(',') if param.strip()) if params else ()
+    # Parameter periode berupa bilangan bulat; k Bollinger boleh pecahan
+    values = tuple(int(value) if value.is_integer() and not (name == 'bb' and i == 1) else value
+                   for i, value in enumerate(values))
+    try:
+        indicator = INDICATORS[name](*values)
+    except TypeError:
+        raise ValueError(f"Parameter {name.upper()} tidak valid")
+
+    index = None
+    if INDICATORS[name].width > 1:
+        components = COMPONENTS[name]
+        # Tanpa komponen: garis MACD atau middle band Bollinger
+        component = component or next(iter(components))
+        if component not in components:
+            raise ValueError(f"Komponen {name.upper()} harus salah satu dari: {', '.join(components)}")
+        index = components[component]
+    elif component:
+        raise ValueError(f"{name.upper()} tidak memiliki komponen")
+    return Operand('indicator', name, tuple(indicator.params), index)
+
+class Condition:
+    __slots__ = ('left', 'op', 'right', 'timeframe')
+
+    def __init__(self, left: Operand, op: str, right: Operand, timeframe: str):
+        self.left = left
+        self.op = op
+        self.right = right
+        self.timeframe = timeframe
+
+    def indicators(self) -> List[Tuple[str, Tuple]]:
+        return [(operand.name, operand.params) for operand in (self.left, self.right) if operand.kind == 'indicator']
+
+    def __str__(self):
+        return f"{self.left} {COMPARATOR_TEXT[self.op]} {self.right} on {self.timeframe}"
+
+def compile_condition(text: str, default_timeframe: str = DEFAULT_TIMEFRAME) -> Condition:
+    """Parse a condition; raises ValueError with a user-facing message"""
+    text = ' '.join(text.lower().split())
+    timeframe = default_timeframe
+    match = _TIMEFRAME_RE.search(text)
+    if match:
+        timeframe = match.group(1)
+        text = (text[:match.start()] + ' ' + text[match.end():]).strip()
+
+    match = _COMPARATOR_RE.match(text)
+    if not match:
+        raise ValueError("Kondisi harus berbentuk: <nilai> above|below|crosses above|crosses below <nilai>")
+    left_text, comparator, right_text = match.groups()
+    op = dict(COMPARATORS)[comparator]
+
+    left, right = _parse_operand(left_text), _parse_operand(right_text)
+    if left.kind == 'const':
+        if right.kind == 'const':
+            raise ValueError("Salah satu sisi kondisi harus harga atau indikator")
+        # Normalisasi "30 above RSI" menjadi "RSI below 30"
+        flipped = {'>': '<', '<': '>', 'cross_up': 'cross_down', 'cross_down': 'cross_up'}
+        left, right, op = right, left, flipped[op]
+
+    # Indikator di-warm-up dari paling banyak HISTORY_LENGTH candle; periode lebih panjang
+    # baru siap setelah ratusan candle berikutnya tutup, jadi ditolak sejak awal
+    crossing = op in ('cross_up', 'cross_down')
+    for operand in (left, right):
+        if operand.kind == 'indicator':
+            needed = INDICATORS[operand.name](*operand.params).lookback + crossing
+            if needed > HISTORY_LENGTH:
+                raise ValueError(
+                    f"{operand} membutuhkan {needed} candle riwayat, maksimal {HISTORY_LENGTH}. "
+                    f"Gunakan periode yang lebih pendek."
+                )
+    return Condition(left, op, right, timeframe)
+
+class ConditionAlert:
+    __slots__ = ('id', 'user_id', 'exchange', 'symbol', 'condition', 'text')
+
+    def __init__(self, alert_id: int, user_id: int, exchange: str, symbol: str, condition: Condition, text: str):
+        self.id = alert_id
+        self.user_id = user_id
+        self.exchange = exchange
+        self.symbol = symbol
+        self.condition = condition
+        self.text = text
+
+class ThresholdGroup:
+    """Alerts comparing one operand against constants, sorted by threshold"""
+
+    __slots__ = ('values', 'alerts')
+
+    def __init__(self):
+        self.values: List[float] = []
+        self.alerts: List[ConditionAlert] = []
+
+    def add(self, value: float, alert: ConditionAlert):
+        index = bisect_right(self.values, value)
+        self.values.insert(index, value)
+        self.alerts.insert(index, alert)
+
+    def remove(self, value: float, alert_id: int) -> bool:
+        for index in range(bisect_left(self.values, value), bisect_right(self.values, value)):
+            if self.alerts[index].id == alert_id:
+                del self.values[index]
+                del self.alerts[index]
+                return True
+        return False
+
+    def match(self, op: str, current: float, previous: Optional[float]) -> List[ConditionAlert]:
+        """Pop the alerts whose threshold is satisfied (a contiguous slice)"""
+        values = self.values
+        if op == '>':
+            lo, hi = 0, bisect_left(values, current)  # threshold < current
+        elif op == '<':
+            lo, hi = bisect_right(values, current), len(values)  # threshold > current
+        elif previous is None:
+            return []
+        elif op == 'cross_up':
+            lo, hi = bisect_left(values, previous), bisect_left(values, current)  # previous <= t < current
+        else:
+            lo, hi = bisect_right(values, current), bisect_right(values, previous)  # current < t <= previous
+        if lo >= hi:
+            return []
+        fired = self.alerts[lo:hi]
+        del self.values[lo:hi]
+        del self.alerts[lo:hi]
+        return fired
+
+def _compare(op: str, left: float, right: float, prev_left: Optional[float], prev_right: Optional[float]) -> bool:
+    if op == '>':
+        return left > right
+    if op == '<':
+        return left < right
+    if prev_left is None or prev_right is None:
+        return False
+    if op == 'cross_up':
+        return prev_left <= prev_right and left > right
+    return prev_left >= prev_right and left < right
+
+class ConditionBook:
+    """All condition alerts of one (market, timeframe)"""
+
+    def __init__(self):
+        self.operands: Dict[Tuple, Operand] = {}
+        self.thresholds: Dict[Tuple, ThresholdGroup] = {}  # (left key, op) -> group
+        self.expressions: Dict[Tuple, List[ConditionAlert]] = {}  # (left key, op, right key) -> alerts
+
+    def __len__(self):
+        return sum(len(group.alerts) for group in self.thresholds.values()) + \
+            sum(len(alerts) for alerts in self.expressions.values())
+
+    def add(self, alert: ConditionAlert):
+        condition = alert.condition
+        self.operands[condition.left.key] = condition.left
+        if condition.right.kind == 'const':
+            group = self.thresholds.setdefault((condition.left.key, condition.op), ThresholdGroup())
+            group.add(condition.right.constant, alert)
+        else:
+            self.operands[condition.right.key] = condition.right
+            self.expressions.setdefault((condition.left.key, condition.op, condition.right.key), []).append(alert)
+
+    def remove(self, alert: ConditionAlert) -> bool:
+        condition = alert.condition
+        if condition.right.kind == 'const':
+            key = (condition.left.key, condition.op)
+            group = self.thresholds.get(key)
+            removed = group is not None and group.remove(condition.right.constant, alert.id)
+            if group is not None and not group.alerts:
+                del self.thresholds[key]
+            return removed
+
+        key = (condition.left.key, condition.op, condition.right.key)
+        alerts = self.expressions.get(key, [])
+        remaining = [other for other in alerts if other.id != alert.id]
+        if remaining:
+            self.expressions[key] = remaining
+        else:
+            self.expressions.pop(key, None)
+        return len(remaining) != len(alerts)
+
+    def evaluate(self, series: IndicatorSeries) -> List[ConditionAlert]:
+        """Match every condition against the series' latest close; fired alerts are removed"""
+        fired = []
+        values = {}
+
+        def value(key, back):
+            cache_key = (key, back)
+            if cache_key not in values:
+                values[cache_key] = self.operands[key].value(series, back)
+            return values[cache_key]
+
+        for key in list(self.thresholds):
+            left_key, op = key
+            current = value(left_key, 0)
+            if current is None:
+                continue
+            previous = value(left_key, 1) if op in ('cross_up', 'cross_down') else None
+            group = self.thresholds[key]
+            fired.extend(group.match(op, current, previous))
+            if not group.alerts:
+                del self.thresholds[key]
+
+        for key in list(self.expressions):
+            left_key, op, right_key = key
+            left, right = value(left_key, 0), value(right_key, 0)
+            if left is None or right is None:
+                continue
+            crossing = op in ('cross_up', 'cross_down')
+            if _compare(op, left, right,
+                        value(left_key, 1) if crossing else None,
+                        value(right_key, 1) if crossing else None):
+                fired.extend(self.expressions.pop(key))
+        return fired
+
+class ConditionEngine:
+    """Condition alerts for all markets, evaluated on candle close.
+
+    Registered as an IndicatorEngine listener. Evaluation runs on whichever
+    thread applies candles, so book access is guarded by a lock. Fired
+    alerts are one-shot, like price alerts: they are buffered, marked in the
+    database in one UPDATE by flush() and returned for notification.
+    """
+
+    def __init__(self, indicators: IndicatorEngine):
+        self.indicators = indicators
+        self.db = DatabaseManager()
+        self.books: Dict[Tuple[str, str], ConditionBook] = {}
+        self.alerts: Dict[int, ConditionAlert] = {}
+        self.pending: List[Tuple[ConditionAlert, float]] = []
+        self._lock = threading.Lock()
+        # Id yang dibuat di proses ini selama query load() berjalan, agar tidak dibuang
+        self._created_during_load: Optional[Set[int]] = None
+        indicators.add_listener(self.on_candle_close)
+
+    def create(self, telegram_id: int, symbol: str, exchange: str, text: str) -> ConditionAlert:
+        """Compile a condition, write it through to the database and index it"""
+        condition = compile_condition(text)
+        if condition.timeframe not in Config.CONDITION_TIMEFRAMES:
+            # Candle hanya di-refresh untuk CONDITION_TIMEFRAMES; kondisi lain tidak akan pernah dicek
+            raise ValueError(f"Timeframe {condition.timeframe} tidak didukung untuk kondisi. "
+                             f"Gunakan {', '.join(Config.CONDITION_TIMEFRAMES)}.")
+        symbol = normalize_symbol(symbol)
+        session = next(self.db.get_session())
+        try:
+            alert_id = DatabaseOps.add_condition_alert(session, telegram_id, symbol, exchange, str(condition))
+        finally:
+            session.close()
+        with self._lock:
+            if self._created_during_load is not None:
+                self._created_during_load.add(alert_id)
+
+        alert = ConditionAlert(alert_id, telegram_id, exchange, symbol, condition, str(condition))
+        self.add(alert)
+        return alert
+
+    def add(self, alert: ConditionAlert):
+        key = (market_key(alert.exchange, alert.symbol), alert.condition.timeframe)
+        series = self.indicators.track(*key)
+        for name, params in alert.condition.indicators():
+            series.add(name, params)
+        with self._lock:
+            self.books.setdefault(key, ConditionBook()).add(alert)
+            self.alerts[alert.id] = alert
+
+    def delete(self, alert_id: int, telegram_id: int) -> bool:
+        alert = self.alerts.get(alert_id)
+        if alert is None or alert.user_id != telegram_id:
+            return False
+
+        session = next(self.db.get_session())
+        try:
+            DatabaseOps.deactivate_condition_alerts(session, [alert_id], triggered=False)
+        finally:
+            session.close()
+
+        self._remove(alert)
+        return True
+
+    def _remove(self, alert: ConditionAlert):
+        key = (market_key(alert.exchange, alert.symbol), alert.condition.timeframe)
+        with self._lock:
+            self.alerts.pop(alert.id, None)
+            book = self.books.get(key)
+            if book is not None:
+                book.remove(alert)
+                if not len(book):
+                    del self.books[key]
+
+    def load(self) -> int:
+        """Compile and index every active condition alert from the database (blocking).
+
+        Alerts that are no longer active in the database are dropped, so this
+        also syncs an index that another bot process changed.
+        """
+        with self._lock:
+            self._created_during_load = set()
+        session = next(self.db.get_session())
+        try:
+            rows = DatabaseOps.load_active_condition_alerts(session)
+        finally:
+            session.close()
+            with self._lock:
+                created, self._created_during_load = self._created_during_load, None
+
+        active = {row[0] for row in rows}
+        for alert in [alert for alert_id, alert in list(self.alerts.items())
+                      if alert_id not in active and alert_id not in created]:
+            self._remove(alert)
+
+        loaded = 0
+        for alert_id, telegram_id, symbol, exchange, expression in rows:
+            if alert_id in self.alerts:
+                continue
+            try:
+                condition = compile_condition(expression)
+            except ValueError as e:
+                error_logger.error(f"Skipping condition alert #{alert_id}: {str(e)}")
+                continue
+            self.add(ConditionAlert(alert_id, telegram_id, exchange, symbol, condition, expression))
+            loaded += 1
+        activity_logger.info(f"Loaded {loaded} condition alerts")
+        return loaded
+
+    def user_alerts(self, telegram_id: int) -> List[ConditionAlert]:
+        return [alert for alert in self.alerts.values() if alert.user_id == telegram_id]
+
+    def markets(self, timeframe: str) -> Dict[str, List[str]]:
+        """Markets with conditions on a timeframe, as {exchange: [symbols]}"""
+        markets: Dict[str, Set[str]] = {}
+        with self._lock:
+            for market, book_timeframe in self.books:
+                if book_timeframe == timeframe:
+                    exchange, symbol = market.split(':', 1)
+                    markets.setdefault(exchange, set()).add(symbol)
+        return {exchange: sorted(symbols) for exchange, symbols in markets.items()}
+
+    def timeframes(self) -> Set[str]:
+        with self._lock:
+            return {timeframe for _, timeframe in self.books}
+
+    def on_candle_close(self, series: IndicatorSeries, candle: List):
+        key = (series.symbol, series.timeframe)
+        if key not in self.books:
+            return
+        with self._lock:
+            book = self.books.get(key)
+            if book is None:
+                return
+            fired = book.evaluate(series)
+            if not len(book):
+                del self.books[key]
+            for alert in fired:
+                self.alerts.pop(alert.id, None)
+                self.pending.append((alert, candle[4]))
+
+    def flush(self, fence_token: Optional[int] = None) -> List[Tuple[ConditionAlert, float]]:
+        """Mark buffered fired alerts in the database and return them with the close price (blocking).
+
+        Only alerts whose row was still active are returned, once each.
+        Returns nothing when the write is rejected for a stale fencing token
+        (a newer leader evaluates and sends those alerts itself). If the
+        write fails otherwise, the alerts stay buffered for the next flush
+        instead of being sent while their rows are still active.
+        """
+        with self._lock:
+            fired, self.pending = self.pending, []
+        if not fired:
+            return []
+
+        session = next(self.db.get_session())
+        try:
+            changed = set(DatabaseOps.deactivate_condition_alerts(
+                session, [alert.id for alert, _ in fired], triggered=True, fence_token=fence_token
+            ))
+        except StaleFenceError as e:
+            activity_logger.info(f"Dropped {len(fired)} fired condition alerts: {str(e)}")
+            return []
+        except Exception as e:
+            error_logger.error(f"Error saving triggered condition alerts: {str(e)}")
+            with self._lock:
+                self.pending[:0] = fired
+            return []
+        finally:
+            session.close()
+
+        # Alert yang juga dimuat ulang oleh load() bisa terpicu dua kali; kirim sekali saja
+        result = []
+        for alert, close in fired:
+            if alert.id in changed:
+                changed.discard(alert.id)
+                result.append((alert, close))
+        return result
+
+    def discard_pending(self):
+        """Drop buffered fired alerts without writing them (the process is no longer leader)"""
+        with self._lock:
+            self.pending = []
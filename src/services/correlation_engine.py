@@ -0,0 +1,209 @@
+import io
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from src.utils.lazy_imports import lazy
+
+# Figure dengan canvas Agg, tanpa state global pyplot: aman dirender di worker thread
+mpl_figure = lazy('matplotlib.figure')
+backend_agg = lazy('matplotlib.backends.backend_agg')
+
+class RollingMoments:
+    """Rolling sums and cross products of a return vector over a fixed window.
+
+    push() is O(N²): the oldest row leaves the sums as the new one enters.
+    Every `window` pushes the sums are rebuilt from the ring buffer to stop
+    floating point drift, which amortises to O(N²) as well.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buffer = np.zeros((window, 0))
+        self.present = np.zeros((window, 0), dtype=bool)
+        self.sum = np.zeros(0)
+        self.cross = np.zeros((0, 0))
+        self.counts = np.zeros(0, dtype=int)  # Jumlah return asli per aset di dalam window
+        self.pos = 0
+        self.rows = 0
+
+    def grow(self, size: int):
+        extra = size - len(self.sum)
+        if extra <= 0:
+            return
+        self.buffer = np.pad(self.buffer, ((0, 0), (0, extra)))
+        self.present = np.pad(self.present, ((0, 0), (0, extra)))
+        self.sum = np.pad(self.sum, (0, extra))
+        self.cross = np.pad(self.cross, ((0, extra), (0, extra)))
+        self.counts = np.pad(self.counts, (0, extra))
+
+    def push(self, returns: np.ndarray, present: np.ndarray):
+        old = self.buffer[self.pos]
+        self.sum += returns - old
+        self.cross += np.outer(returns, returns) - np.outer(old, old)
+        self.counts += present.astype(int) - self.present[self.pos]
+        self.buffer[self.pos] = returns
+        self.present[self.pos] = present
+        self.pos = (self.pos + 1) % self.window
+        self.rows += 1
+        if self.rows % self.window == 0:
+            self.sum = self.buffer.sum(axis=0)
+            self.cross = self.buffer.T @ self.buffer
+
+    def covariance(self) -> np.ndarray:
+        n = min(self.rows, self.window)
+        if n < 2:
+            return np.full(self.cross.shape, np.nan)
+        return (self.cross - np.outer(self.sum, self.sum) / n) / (n - 1)
+
+    def correlation(self) -> np.ndarray:
+        covariance = self.covariance()
+        std = np.sqrt(np.clip(np.diag(covariance), 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = covariance / np.outer(std, std)
+        return np.clip(correlation, -1.0, 1.0)
+
+    def complete(self) -> np.ndarray:
+        """Assets with a real return in every slot of the window"""
+        return self.counts >= self.window
+
+class CorrelationEngine:
+    """Rolling correlation and covariance of log returns for many pairs on one timeframe.
+
+    update() aligns newly closed candles by timestamp and applies each candle
+    close in O(N²). Two windows are kept: the full window for correlation
+    and covariance, and a short one used to find pairs that usually move
+    together but have recently decoupled.
+    """
+
+    def __init__(self, timeframe: str, window: int = 72, short_window: int = 24):
+        self.timeframe = timeframe
+        self.long = RollingMoments(window)
+        self.short = RollingMoments(short_window)
+        self.symbols: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.prev_close = np.zeros(0)
+        self.last_ts: Optional[int] = None
+
+    def _add_symbol(self, symbol: str):
+        self.index[symbol] = len(self.symbols)
+        self.symbols.append(symbol)
+        self.prev_close = np.append(self.prev_close, np.nan)
+        self.long.grow(len(self.symbols))
+        self.short.grow(len(self.symbols))
+
+    def update(self, candles: Dict[str, List]) -> int:
+        """Apply closed candles {symbol: ohlcv}; returns how many candle closes were applied"""
+        rows: Dict[int, Dict[str, float]] = {}
+        for symbol, ohlcv in candles.items():
+            if symbol not in self.index:
+                self._add_symbol(symbol)
+            start = 0
+            if self.last_ts is None:
+                start = max(0, len(ohlcv) - self.long.window - 1)  # Cukup untuk mengisi window
+            for candle in ohlcv[start:]:
+                if self.last_ts is None or candle[0] > self.last_ts:
+                    rows.setdefault(candle[0], {})[symbol] = candle[4]
+
+        for timestamp in sorted(rows):
+            closes = np.full(len(self.symbols), np.nan)
+            for symbol, close in rows[timestamp].items():
+                closes[self.index[symbol]] = close
+            present = ~np.isnan(closes) & ~np.isnan(self.prev_close) & (closes > 0) & (self.prev_close > 0)
+            returns = np.zeros(len(self.symbols))
+            returns[present] = np.log(closes[present] / self.prev_close[present])
+            # Pair tanpa candle baru dianggap tidak bergerak
+            self.prev_close = np.where(np.isnan(closes), self.prev_close, closes)
+            self.long.push(returns, present)
+            self.short.push(returns, present)
+            self.last_ts = timestamp
+        return len(rows)
+
+    def matrix(self, covariance: bool = False) -> Tuple[List[str], np.ndarray]:
+        """Correlation (or covariance) matrix of the pairs with a full window"""
+        complete = np.flatnonzero(self.long.complete())
+        values = self.long.covariance() if covariance else self.long.correlation()
+        return [self.symbols[i] for i in complete], values[np.ix_(complete, complete)]
+
+    def _pairs(self, scores: np.ndarray, complete: np.ndarray, n: int, symbol: str = None) -> List[Tuple[str, str, float]]:
+        if symbol is not None:
+            if symbol not in self.index or not complete[self.index[symbol]]:
+                return []
+            i = self.index[symbol]
+            candidates = np.flatnonzero(complete)
+            candidates = candidates[(candidates != i) & ~np.isnan(scores[i, candidates])]
+            order = candidates[np.argsort(-scores[i, candidates])][:n]
+            return [(symbol, self.symbols[j], float(scores[i, j])) for j in order]
+
+        index = np.flatnonzero(complete)
+        rows, cols = np.triu_indices(len(index), k=1)
+        values = scores[index[rows], index[cols]]
+        valid = np.flatnonzero(~np.isnan(values))
+        if not len(valid):
+            return []
+        k = min(n, len(valid))
+        best = valid[np.argpartition(-values[valid], k - 1)[:k]]
+        best = best[np.argsort(-values[best])]
+        return [(self.symbols[index[rows[b]]], self.symbols[index[cols[b]]], float(values[b])) for b in best]
+
+    def top_correlated(self, n: int = 10, symbol: str = None) -> List[Tuple[str, str, float]]:
+        """Most positively correlated pairs (or partners of one symbol)"""
+        return self._pairs(self.long.correlation(), self.long.complete(), n, symbol)
+
+    def most_diverging(self, n: int = 10, symbol: str = None) -> List[Tuple[str, str, float, float]]:
+        """Pairs whose recent correlation fell furthest below their window correlation"""
+        long, short = self.long.correlation(), self.short.correlation()
+        complete = self.long.complete() & self.short.complete()
+        # Hanya pair yang biasanya searah; penurunan korelasi pada pair acak tidak bermakna
+        drop = np.where(long > 0.5, long - short, np.nan)
+        return [
+            (a, b, float(long[self.index[a], self.index[b]]), float(short[self.index[a], self.index[b]]))
+            for a, b, _ in self._pairs(drop, complete, n, symbol)
+        ]
+
+    @staticmethod
+    def format_correlation_message(timeframe: str, window: int, correlated: List, diverging: List,
+                                   symbol: str = None) -> str:
+        """Format correlation queries for Telegram"""
+        title = f" {symbol}" if symbol else ""
+        message = f"🔗 *Korelasi{title} ({timeframe}, {window} candle)*\n\n"
+        if not correlated and not diverging:
+            return message + "Data korelasi belum cukup."
+
+        message += "*Paling berkorelasi*\n"
+        message += "".join(f"• {a} / {b}: {value:+.2f}\n" for a, b, value in correlated) or "-\n"
+        message += "\n*Mulai berpisah (korelasi window → terbaru)*\n"
+        message += "".join(f"• {a} / {b}: {long:+.2f} → {short:+.2f}\n" for a, b, long, short in diverging) or "-\n"
+        return message
+
+    def render(self, symbols: List[str] = None, limit: int = 25) -> Optional[bytes]:
+        """Heatmap PNG of the correlation matrix (at most `limit` pairs)"""
+        names, matrix = self.matrix()
+        if symbols:
+            keep = [i for i, name in enumerate(names) if name in set(symbols)]
+        else:
+            keep = list(range(min(limit, len(names))))
+        if len(keep) < 2:
+            return None
+        names = [names[i] for i in keep]
+        matrix = matrix[np.ix_(keep, keep)]
+
+        size = max(6, len(names) * 0.45)
+        fig = mpl_figure.Figure(figsize=(size + 1.5, size), facecolor='#1e222d')
+        backend_agg.FigureCanvasAgg(fig)
+        ax = fig.add_subplot(facecolor='#1e222d')
+        image = ax.imshow(matrix, cmap='RdYlGn', vmin=-1, vmax=1)
+        ax.set_xticks(range(len(names)))
+        ax.set_yticks(range(len(names)))
+        ax.set_xticklabels(names, rotation=90, fontsize=8, color='#787b86')
+        ax.set_yticklabels(names, fontsize=8, color='#787b86')
+        ax.tick_params(colors='#787b86')
+        if len(names) <= 12:
+            for i in range(len(names)):
+                for j in range(len(names)):
+                    ax.text(j, i, f"{matrix[i, j]:.2f}", ha='center', va='center', fontsize=7, color='black')
+        colorbar = fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04)
+        colorbar.ax.tick_params(colors='#787b86')
+        ax.set_title(f"Korelasi return {self.timeframe} • {self.long.window} candle", color='#787b86')
+
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=100, bbox_inches='tight', facecolor='#1e222d', edgecolor='none')
+        return buf.getvalue()
@@ -0,0 +1,200 @@
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from config.config import Config
+from src.api.price_service import format_currency
+from src.utils.logger import error_logger
+from src.utils.message_queue import OutboundMessageQueue, PRIORITY_INFO
+from src.utils.symbols import EXCHANGE_CURRENCY, normalize_symbol
+
+class LiveSession:
+    __slots__ = ('chat_id', 'message_id', 'view', 'expires_at', 'last_text', 'last_edit', 'pending')
+
+    def __init__(self, chat_id, message_id: int, view: Tuple[str, Optional[str]], expires_at: float):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.view = view  # (symbol, exchange atau None untuk semua exchange)
+        self.expires_at = expires_at
+        self.last_text = None
+        self.last_edit = 0.0
+        self.pending = None  # Future edit yang masih di antrian
+
+def live_callback_data(symbol: str, exchange: Optional[str]) -> str:
+    return f"live_{symbol}_{exchange or 'all'}"
+
+class LivePriceService:
+    """Price messages that are edited in place from the shared tick source.
+
+    Stream ticks and all-tickers snapshots only update the latest quote per
+    (exchange, symbol) and mark the affected views dirty. flush(), run on a
+    short interval, renders each dirty view once, skips sessions whose text
+    did not change, limits every message to one edit per LIVE_EDIT_INTERVAL
+    and the whole service to LIVE_MAX_EDITS_PER_FLUSH edits per run, serving
+    the longest-waiting messages first. Edits go through the outbound queue,
+    so they also respect its per-chat and global rate limits.
+    """
+
+    def __init__(self, send_queue: OutboundMessageQueue, ttl: float = None):
+        self.send_queue = send_queue
+        self.ttl = ttl or Config.LIVE_PRICE_TTL
+        self.rate: Optional[float] = None
+        self.quotes: Dict[Tuple[str, str], Dict] = {}  # (exchange, symbol) -> ticker
+        self.sessions: Dict[Tuple, LiveSession] = {}  # (chat_id, message_id) -> session
+        self.views: Dict[Tuple[str, Optional[str]], Set[Tuple]] = {}  # view -> session keys
+        self.dirty: Set[Tuple[str, Optional[str]]] = set()
+        self.edits = 0
+        self.skipped = 0
+
+    def _views_for(self, exchange: str, symbol: str):
+        for view in ((symbol, exchange), (symbol, None)):
+            if view in self.views:
+                self.dirty.add(view)
+
+    def on_price(self, exchange: str, symbol: str, price: float):
+        """Apply one live tick (native currency)"""
+        quote = self.quotes.get((exchange, symbol))
+        if quote is None or quote['last'] == price or price <= 0:
+            return
+        quote['last'] = price
+        quote['formatted_price'] = format_currency(price, EXCHANGE_CURRENCY.get(exchange, 'USDT'))
+        self._views_for(exchange, symbol)
+
+    def on_tickers(self, exchange: str, tickers: Dict[str, Dict]):
+        """Apply an all-tickers snapshot for the symbols that have live messages"""
+        for symbol, _ in self.views:
+            ticker = tickers.get(symbol)
+            if ticker is not None and ticker != self.quotes.get((exchange, symbol)):
+                self.quotes[(exchange, symbol)] = dict(ticker)
+                self._views_for(exchange, symbol)
+
+    def set_rate(self, rate: Optional[float]):
+        if rate and rate != self.rate:
+            self.rate = rate
+            self.dirty.update(self.views)
+
+    def start(self, chat_id, message_id: int, symbol: str, exchange: Optional[str], prices: Dict) -> Tuple[str, InlineKeyboardMarkup]:
+        """Take over a message; returns the first text and keyboard to edit it with"""
+        symbol = normalize_symbol(symbol)
+        for name, ticker in prices.items():
+            self.quotes[(name, symbol)] = dict(ticker)
+
+        # Batasi jumlah pesan live per chat; sesi tertua dihentikan
+        own = sorted((s for s in self.sessions.values() if s.chat_id == chat_id), key=lambda s: s.expires_at)
+        for session in own[:max(0, len(own) - Config.LIVE_MAX_PER_CHAT + 1)]:
+            self.stop(session.chat_id, session.message_id)
+
+        key = (chat_id, message_id)
+        self.stop(chat_id, message_id)
+        session = LiveSession(chat_id, message_id, (symbol, exchange), time.monotonic() + self.ttl)
+        self.sessions[key] = session
+        self.views.setdefault(session.view, set()).add(key)
+
+        session.last_text = self.render(session.view)
+        session.last_edit = time.monotonic()
+        return self._live_text(session.last_text), self._live_markup()
+
+    def stop(self, chat_id, message_id: int) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+        """End a session; returns the final text and keyboard, or None if it was not live"""
+        session = self.sessions.pop((chat_id, message_id), None)
+        if session is None:
+            return None
+        keys = self.views.get(session.view)
+        if keys is not None:
+            keys.discard((chat_id, message_id))
+            if not keys:
+                del self.views[session.view]
+                self.dirty.discard(session.view)
+                symbol, _ = session.view
+                if not any(view[0] == symbol for view in self.views):
+                    for quote_key in [quote_key for quote_key in self.quotes if quote_key[1] == symbol]:
+                        del self.quotes[quote_key]
+        text = session.last_text or self.render(session.view)
+        return f"{text}\n⏹ Live berakhir", InlineKeyboardMarkup(
+            [[InlineKeyboardButton("🔴 Live lagi", callback_data=live_callback_data(*session.view))]]
+        )
+
+    def render(self, view: Tuple[str, Optional[str]]) -> str:
+        symbol, exchange = view
+        prices = {
+            name: quote for (name, quote_symbol), quote in self.quotes.items()
+            if quote_symbol == symbol and (exchange is None or name == exchange)
+        }
+        return format_live_message(symbol, prices, self.rate)
+
+    @staticmethod
+    def _live_text(text: str) -> str:
+        return f"{text}\n🔴 Live • {datetime.utcnow():%H:%M:%S} UTC"
+
+    @staticmethod
+    def _live_markup() -> InlineKeyboardMarkup:
+        return InlineKeyboardMarkup([[InlineKeyboardButton("⏹ Stop live", callback_data='livestop')]])
+
+    def flush(self):
+        """Queue edits for changed live messages and end expired sessions"""
+        now = time.monotonic()
+        for session in [s for s in self.sessions.values() if s.expires_at <= now]:
+            final = self.stop(session.chat_id, session.message_id)
+            self._edit(session, *final)
+
+        candidates: List[Tuple[float, LiveSession, str]] = []
+        still_dirty = set()
+        for view in self.dirty:
+            text = self.render(view)
+            for key in self.views.get(view, ()):
+                session = self.sessions[key]
+                if text == session.last_text:
+                    self.skipped += 1
+                    continue
+                if (session.pending is not None and not session.pending.done()) or \
+                        now - session.last_edit < Config.LIVE_EDIT_INTERVAL:
+                    still_dirty.add(view)
+                    continue
+                candidates.append((session.last_edit, session, text))
+
+        candidates.sort(key=lambda candidate: candidate[0])
+        for _, session, text in candidates[Config.LIVE_MAX_EDITS_PER_FLUSH:]:
+            still_dirty.add(session.view)
+        for _, session, text in candidates[:Config.LIVE_MAX_EDITS_PER_FLUSH]:
+            session.last_text = text
+            session.last_edit = now
+            self._edit(session, self._live_text(text), self._live_markup())
+        self.dirty = still_dirty
+
+    def _edit(self, session: LiveSession, text: str, reply_markup: InlineKeyboardMarkup):
+        self.edits += 1
+        session.pending = self.send_queue.enqueue(
+            'edit_message_text', session.chat_id, PRIORITY_INFO,
+            message_id=session.message_id, text=text, parse_mode='Markdown', reply_markup=reply_markup
+        )
+        session.pending.add_done_callback(lambda future: self._edited(session, future))
+
+    def _edited(self, session: LiveSession, future):
+        error = future.exception() if not future.cancelled() else None
+        if error is None or (isinstance(error, BadRequest) and 'not modified' in str(error)):
+            return
+        # Pesan dihapus atau tidak bisa diedit lagi: hentikan sesi tanpa edit lanjutan
+        if (session.chat_id, session.message_id) in self.sessions:
+            self.stop(session.chat_id, session.message_id)
+            error_logger.error(f"Live price message {session.message_id} in {session.chat_id} stopped: {str(error)}")
+
+def format_live_message(symbol: str, prices: Dict, rate: Optional[float]) -> str:
+    """Compact price text of a live message; only visible values go into it"""
+    if not prices:
+        return f"⏳ Menunggu harga {symbol}..."
+
+    message = f"💰 *{symbol}*\n\n"
+    for exchange in sorted(prices):
+        data = prices[exchange]
+        currency = EXCHANGE_CURRENCY.get(exchange, 'USDT')
+        message += f"*{exchange.upper()}*: {format_currency(data['last'], currency)}"
+        if currency == 'IDR' and rate:
+            message += f" (≈ {format_currency(data['last'] / rate, 'USDT')})"
+        elif currency == 'USDT' and rate:
+            message += f" (≈ {format_currency(data['last'] * rate, 'IDR')})"
+        message += (
+            f"\n24h: {data['percentage']:+.2f}% • "
+            f"H {format_currency(data['high'], currency)} • L {format_currency(data['low'], currency)}\n\n"
+        )
+    return message.rstrip('\n')
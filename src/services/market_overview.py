@@ -0,0 +1,153 @@
+import io
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from config.config import Config
+from src.api.price_service import PriceService, format_currency
+from src.utils.lazy_imports import lazy
+from src.utils.symbols import EXCHANGE_CURRENCY
+
+# Figure dengan canvas Agg, tanpa state global pyplot: aman dirender di worker thread
+mpl = lazy('matplotlib')
+mpl_figure = lazy('matplotlib.figure')
+mpl_patches = lazy('matplotlib.patches')
+backend_agg = lazy('matplotlib.backends.backend_agg')
+
+HEATMAP_TILES = 48
+
+class MarketOverview:
+    """Top movers across every pair of the all-tickers snapshots.
+
+    One overview is computed per exchange selection with a single vectorized
+    pass and shared by every caller until the snapshot refresh interval
+    (TICKER_SNAPSHOT_TTL) has passed.
+    """
+
+    def __init__(self, price_service: PriceService, ttl: float = None):
+        self.price_service = price_service
+        self.ttl = ttl or Config.TICKER_SNAPSHOT_TTL
+        self._cache: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, exchange: str = None, limit: int = 10) -> Dict:
+        """Cached overview for one exchange (or all when None); blocking on a cache miss"""
+        key = exchange or 'all'
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and time.monotonic() - cached['computed_at'] < self.ttl:
+                return cached
+            overview = self._compute(exchange, limit)
+            self._cache[key] = overview
+            return overview
+
+    def _compute(self, exchange: Optional[str], limit: int) -> Dict:
+        rate = self.price_service.get_usdt_idr_rate()
+        names, exchanges, columns = [], [], []
+        for name in ([exchange] if exchange else list(self.price_service.exchanges)):
+            tickers = self.price_service.get_all_tickers(name)
+            if EXCHANGE_CURRENCY.get(name) == 'IDR' and not rate:
+                continue  # Tanpa kurs, volume IDR tidak bisa dibandingkan dengan USDT
+            to_usdt = 1.0 / rate if EXCHANGE_CURRENCY.get(name) == 'IDR' else 1.0
+            for symbol, ticker in tickers.items():
+                names.append(symbol)
+                exchanges.append(name)
+                columns.append((ticker['last'], ticker['high'], ticker['low'], ticker['percentage'],
+                                ticker['volume'] * ticker['last'] * to_usdt))
+
+        data = np.array(columns, dtype=float).reshape(-1, 5)
+        last, high, low, change, quote_volume = data.T
+        valid = (last > 0) & (quote_volume > 0) & (low > 0)
+        index = np.flatnonzero(valid)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            range_pct = np.where(valid, (high - low) / low * 100, np.nan)
+
+        def top(values: np.ndarray, largest: bool = True, k: int = limit) -> List[Dict]:
+            """k best pairs by values in O(n) selection plus an O(k log k) sort"""
+            if not len(index):
+                return []
+            scores = values[index] if largest else -values[index]
+            k = min(k, len(index))
+            best = index[np.argpartition(-scores, k - 1)[:k]]
+            best = best[np.argsort(-(values[best] if largest else -values[best]), kind='stable')]
+            return [
+                {
+                    'symbol': names[i],
+                    'exchange': exchanges[i],
+                    'last': float(last[i]),
+                    'change': float(change[i]),
+                    'quote_volume': float(quote_volume[i]),
+                    'range': float(range_pct[i])
+                }
+                for i in best
+            ]
+
+        return {
+            'exchange': exchange,
+            'pairs': int(len(index)),
+            'gainers': top(change),
+            'losers': top(change, largest=False),
+            'volume': top(quote_volume),
+            'volatility': top(range_pct),
+            # Petak heatmap: pair dengan volume terbesar, diwarnai perubahan 24 jam
+            'tiles': top(quote_volume, k=HEATMAP_TILES),
+            'rate': rate,
+            'computed_at': time.monotonic(),
+            'heatmap': None,
+            'heatmap_file_id': None
+        }
+
+    def heatmap(self, overview: Dict) -> bytes:
+        """PNG heatmap of the overview, rendered once per cached overview (blocking)"""
+        with self._lock:
+            if overview['heatmap'] is None:
+                overview['heatmap'] = render_heatmap(overview['tiles'])
+            return overview['heatmap']
+
+    @staticmethod
+    def format_market_message(overview: Dict, count: int = 5) -> str:
+        """Format the overview for Telegram"""
+        scope = overview['exchange'].upper() if overview['exchange'] else "SEMUA EXCHANGE"
+        if not overview['pairs']:
+            return f"❌ Data pasar {scope} belum tersedia."
+
+        def line(item: Dict, value: str) -> str:
+            return f"• *{item['symbol']}* ({item['exchange'][:3].upper()}) " \
+                   f"{format_currency(item['last'], EXCHANGE_CURRENCY[item['exchange']])} {value}\n"
+
+        message = f"🌐 *Ringkasan Pasar ({scope})*\n{overview['pairs']} pair aktif\n\n"
+        message += "🚀 *Top Gainers*\n"
+        message += "".join(line(item, f"{item['change']:+.2f}%") for item in overview['gainers'][:count])
+        message += "\n📉 *Top Losers*\n"
+        message += "".join(line(item, f"{item['change']:+.2f}%") for item in overview['losers'][:count])
+        message += "\n💧 *Volume Tertinggi (24j)*\n"
+        message += "".join(line(item, f"${item['quote_volume']:,.0f}") for item in overview['volume'][:count])
+        message += "\n⚡ *Paling Volatil (range 24j)*\n"
+        message += "".join(line(item, f"{item['range']:.2f}%") for item in overview['volatility'][:count])
+        return message
+
+def render_heatmap(tiles: List[Dict]) -> bytes:
+    """Grid heatmap: tiles ordered by volume, coloured by 24h change"""
+    columns = 8
+    rows = max(1, -(-len(tiles) // columns))
+    fig = mpl_figure.Figure(figsize=(columns * 1.5, rows * 1.1), facecolor='#1e222d')
+    backend_agg.FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    cmap = mpl.colormaps['RdYlGn']
+    for i, tile in enumerate(tiles):
+        x, y = i % columns, rows - 1 - i // columns
+        # Skala warna dijenuhkan pada +-10%
+        color = cmap(0.5 + max(-10.0, min(10.0, tile['change'])) / 20)
+        ax.add_patch(mpl_patches.Rectangle((x, y), 0.96, 0.92, color=color))
+        ax.text(x + 0.48, y + 0.58, tile['symbol'], ha='center', va='center',
+                fontsize=10, fontweight='bold', color='black')
+        ax.text(x + 0.48, y + 0.28, f"{tile['change']:+.1f}%", ha='center', va='center',
+                fontsize=9, color='black')
+    ax.set_xlim(0, columns)
+    ax.set_ylim(0, rows)
+    ax.set_axis_off()
+    ax.set_title("Perubahan 24 jam • pair dengan volume terbesar", color='#787b86')
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=100, bbox_inches='tight', facecolor='#1e222d', edgecolor='none')
+    return buf.getvalue()
@@ -0,0 +1,204 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config.config import Config
+from src.api.price_service import PriceService
+from src.database.connection import DatabaseManager
+from src.database.operations import DatabaseOps
+from src.indicators import batch
+from src.utils.logger import activity_logger
+from src.utils.timeframes import last_closed_candle, next_candle_close
+
+SCAN_CRITERIA = ('rsi', 'volume', 'breakout')
+SCAN_CANDLES = 100
+LOOKBACK = 20
+
+def scan_markets(chunk: List[Tuple[str, str, List]], params: Dict) -> List[Dict]:
+    """Evaluate scan criteria for a chunk of (exchange, symbol, ohlcv) markets.
+
+    Runs inside a worker process, so it only uses NumPy and plain data.
+    """
+    results = []
+    for exchange, symbol, ohlcv in chunk:
+        candles = np.asarray(ohlcv, dtype=float)
+        if len(candles) < LOOKBACK + 2:
+            continue
+        close, high, low, volume = candles[:, 4], candles[:, 2], candles[:, 3], candles[:, 5]
+        last = close[-1]
+
+        rsi = batch.rsi(close, params['rsi_period'])[-1]
+        if not np.isnan(rsi):
+            if rsi <= params['rsi_oversold']:
+                results.append(_result(exchange, symbol, 'rsi', f"RSI {rsi:.1f} (oversold)",
+                                       params['rsi_oversold'] - rsi, last))
+            elif rsi >= params['rsi_overbought']:
+                results.append(_result(exchange, symbol, 'rsi', f"RSI {rsi:.1f} (overbought)",
+                                       rsi - params['rsi_overbought'], last))
+
+        avg_volume = volume[-LOOKBACK - 1:-1].mean()
+        if avg_volume > 0:
+            ratio = volume[-1] / avg_volume
+            if ratio >= params['volume_multiple']:
+                results.append(_result(exchange, symbol, 'volume', f"Volume {ratio:.1f}x rata-rata", ratio, last))
+
+        resistance = high[-LOOKBACK - 1:-1].max()
+        support = low[-LOOKBACK - 1:-1].min()
+        if last > resistance > 0:
+            move = (last / resistance - 1) * 100
+            results.append(_result(exchange, symbol, 'breakout', f"Breakout +{move:.2f}% di atas high {LOOKBACK}", move, last))
+        elif 0 < last < support:
+            move = (1 - last / support) * 100
+            results.append(_result(exchange, symbol, 'breakout', f"Breakdown -{move:.2f}% di bawah low {LOOKBACK}", move, last))
+    return results
+
+def _result(exchange: str, symbol: str, criterion: str, detail: str, score: float, price: float) -> Dict:
+    return {
+        'exchange': exchange,
+        'symbol': symbol,
+        'criterion': criterion,
+        'detail': detail,
+        'score': float(score),
+        'price': float(price)
+    }
+
+class MarketScanner:
+    """Scans every listed pair on both exchanges for indicator-based setups.
+
+    Candles come from the local OHLCV table (kept current by refresh_candles),
+    computation is split across a process pool, and results are reused until
+    the next candle of the scanned timeframe closes.
+    """
+
+    def __init__(self, price_service: PriceService):
+        self.price_service = price_service
+        self.db = DatabaseManager()
+        self.params = {
+            'rsi_period': 14,
+            'rsi_oversold': 30,
+            'rsi_overbought': 70,
+            'volume_multiple': 3.0
+        }
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cache: Dict[str, Tuple[int, List[Dict]]] = {}  # timeframe -> (valid until ms, results)
+        self._lock = asyncio.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=Config.SCAN_WORKERS or os.cpu_count())
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def list_markets(self) -> Dict[str, List[str]]:
+        """Listed pairs per exchange, taken from the batched all-tickers snapshots"""
+        return {
+            exchange: sorted(self.price_service.get_all_tickers(exchange))
+            for exchange in self.price_service.exchanges
+        }
+
+    def refresh_candles(self, timeframe: str, markets: Dict[str, List[str]] = None) -> Dict[Tuple[str, str], List]:
+        """Fetch and store the latest closed candles for every listed pair (blocking, I/O bound).
+
+        `markets` ({exchange: [symbols]}) limits the refresh to a subset. Returns
+        the fetched closed candles keyed by (exchange, symbol) so they can also
+        be streamed into the indicator engine.
+        """
+        closed_ts = last_closed_candle(timeframe)
+        jobs = [
+            (exchange, symbol)
+            for exchange, symbols in (self.list_markets() if markets is None else markets).items()
+            for symbol in symbols
+        ]
+
+        def fetch(job):
+            exchange, symbol = job
+            ohlcv = self.price_service.get_ohlcv(symbol, timeframe, exchange) or []
+            return exchange, symbol, [candle for candle in ohlcv if candle[0] <= closed_ts]
+
+        stored = 0
+        fetched = {}
+        session = next(self.db.get_session())
+        try:
+            with ThreadPoolExecutor(max_workers=Config.SCAN_FETCH_WORKERS) as executor:
+                for exchange, symbol, ohlcv in executor.map(fetch, jobs):
+                    if ohlcv:
+                        fetched[(exchange, symbol)] = ohlcv
+                        stored += DatabaseOps.save_candles(session, exchange, timeframe, symbol, ohlcv)
+        finally:
+            session.close()
+        activity_logger.info(f"Stored {stored} new {timeframe} candles for {len(jobs)} pairs")
+        return fetched
+
+    def _load_markets(self, timeframe: str) -> List[Tuple[str, str, List]]:
+        markets = []
+        listed = self.list_markets()
+        session = next(self.db.get_session())
+        try:
+            for exchange, symbols in listed.items():
+                candles = DatabaseOps.load_candles(session, exchange, timeframe, symbols or None, limit=SCAN_CANDLES)
+                markets.extend((exchange, symbol, ohlcv) for symbol, ohlcv in candles.items())
+        finally:
+            session.close()
+        return markets
+
+    async def scan(self, timeframe: str = '1h') -> List[Dict]:
+        """Scan all markets, reusing results until the next candle close"""
+        async with self._lock:
+            now_ms = int(time.time() * 1000)
+            cached = self._cache.get(timeframe)
+            if cached and now_ms < cached[0]:
+                return cached[1]
+
+            start = time.perf_counter()
+            markets = await asyncio.to_thread(self._load_markets, timeframe)
+            loop = asyncio.get_running_loop()
+            workers = Config.SCAN_WORKERS or os.cpu_count() or 1
+            chunk_size = max(1, -(-len(markets) // (workers * 4)))
+            chunks = [markets[i:i + chunk_size] for i in range(0, len(markets), chunk_size)]
+
+            results = []
+            for chunk_results in await asyncio.gather(*[
+                loop.run_in_executor(self.pool, scan_markets, chunk, self.params) for chunk in chunks
+            ]):
+                results.extend(chunk_results)
+
+            self._cache[timeframe] = (next_candle_close(timeframe, now_ms), results)
+            activity_logger.info(
+                f"Scanned {len(markets)} markets ({timeframe}) in {time.perf_counter() - start:.2f}s, "
+                f"{len(results)} hits"
+            )
+            return results
+
+    def invalidate(self, timeframe: str):
+        """Drop cached results, e.g. once fresh candles have been stored"""
+        self._cache.pop(timeframe, None)
+
+    @staticmethod
+    def top(results: List[Dict], criterion: str = None, limit: int = 10) -> List[Dict]:
+        """Best results, optionally for one criterion"""
+        if criterion:
+            results = [result for result in results if result['criterion'] == criterion]
+        return sorted(results, key=lambda result: result['score'], reverse=True)[:limit]
+
+    @staticmethod
+    def format_scan_message(results: List[Dict], timeframe: str, criterion: str = None) -> str:
+        """Format scan results for Telegram"""
+        title = criterion.upper() if criterion else "SEMUA KRITERIA"
+        if not results:
+            return f"🔎 *Hasil Scan {timeframe} ({title})*\n\nTidak ada pair yang memenuhi kriteria."
+
+        message = f"🔎 *Hasil Scan {timeframe} ({title})*\n\n"
+        for i, result in enumerate(results, 1):
+            price = f"Rp {result['price']:,.0f}" if result['exchange'] == 'indodax' else f"${result['price']:,.4f}"
+            message += (
+                f"{i}. *{result['symbol']}* ({result['exchange'].upper()}) {price}\n"
+                f"   {result['detail']}\n"
+            )
+        return message
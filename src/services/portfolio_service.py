@@ -0,0 +1,101 @@
+from typing import Dict, Iterable, Tuple
+import numpy as np
+from src.api.price_service import PriceService, format_currency
+from src.utils.symbols import EXCHANGE_CURRENCY, exchange_for_symbol
+
+class PortfolioService:
+    """Values a user's open positions with one batched price lookup per exchange"""
+
+    def __init__(self, price_service: PriceService):
+        self.price_service = price_service
+
+    def value_positions(self, positions: Iterable[Tuple]) -> Dict:
+        """Value (symbol, direction, quantity, cost_basis, open_trades) rows.
+
+        Positions are grouped by symbol so each distinct symbol is priced once,
+        then PnL is computed for all positions at once with NumPy. IDR pairs
+        are priced on Indodax and the rest on Bitget in USDT, so totals are
+        kept per currency ({'IDR': {'pnl', 'cost'}, 'USDT': ...}).
+        """
+        positions = list(positions)
+        if not positions:
+            return {'positions': [], 'totals': {}, 'missing': []}
+
+        symbols = sorted({row[0] for row in positions})
+        prices = self.price_service.get_prices(symbols)
+
+        symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+        price_array = np.array([prices.get(symbol, np.nan) for symbol in symbols], dtype=float)
+        idx = np.fromiter((symbol_index[row[0]] for row in positions), dtype=np.int64, count=len(positions))
+        sign = np.fromiter((-1.0 if row[1] == 'short' else 1.0 for row in positions), dtype=float, count=len(positions))
+        quantity = np.fromiter((row[2] for row in positions), dtype=float, count=len(positions))
+        cost = np.fromiter((row[3] for row in positions), dtype=float, count=len(positions))
+
+        current = price_array[idx]
+        avg_entry = np.divide(cost, quantity, out=np.zeros_like(cost), where=quantity != 0)
+        pnl = sign * (current * quantity - cost)
+        pnl_pct = np.divide(pnl, cost, out=np.zeros_like(pnl), where=cost != 0) * 100
+
+        priced = ~np.isnan(current)
+        currencies = [EXCHANGE_CURRENCY[exchange_for_symbol(row[0])] for row in positions]
+        result = []
+        for i, row in enumerate(positions):
+            result.append({
+                'symbol': row[0],
+                'currency': currencies[i],
+                'direction': row[1],
+                'quantity': float(quantity[i]),
+                'avg_entry': float(avg_entry[i]),
+                'current': float(current[i]) if priced[i] else None,
+                'pnl': float(pnl[i]) if priced[i] else None,
+                'pnl_pct': float(pnl_pct[i]) if priced[i] else None,
+                'open_trades': row[4]
+            })
+
+        # Rupiah dan USDT tidak dijumlahkan menjadi satu angka
+        totals = {}
+        currency_array = np.array(currencies)
+        for currency in sorted(set(currencies)):
+            mask = priced & (currency_array == currency)
+            if mask.any():
+                totals[currency] = {'pnl': float(pnl[mask].sum()), 'cost': float(cost[mask].sum())}
+
+        return {
+            'positions': result,
+            'totals': totals,
+            'missing': [symbol for symbol in symbols if symbol not in prices]
+        }
+
+    @staticmethod
+    def format_portfolio_message(valuation: Dict) -> str:
+        """Format a valuation into the /portfolio reply"""
+        portfolio_text = "📊 *Portofolio Anda*\n\n"
+        for position in valuation['positions']:
+            currency = position['currency']
+            portfolio_text += (
+                f"*{position['symbol']}* ({position['open_trades']} trade)\n"
+                f"Direction: {position['direction'].upper()}\n"
+                f"Quantity: {position['quantity']:,.6g}\n"
+                f"Avg Entry: {format_currency(position['avg_entry'], currency)}\n"
+            )
+            if position['current'] is None:
+                portfolio_text += "Current: tidak tersedia\n\n"
+                continue
+            portfolio_text += (
+                f"Current: {format_currency(position['current'], currency)}\n"
+                f"PnL: {format_pnl(position['pnl'], currency)} ({position['pnl_pct']:+.2f}%)\n\n"
+            )
+
+        for currency, total in valuation['totals'].items():
+            portfolio_text += f"*Total PnL {currency}: {format_pnl(total['pnl'], currency)}*\n"
+        portfolio_text = portfolio_text.rstrip('\n')
+        if valuation['missing']:
+            portfolio_text += f"\n_Harga tidak tersedia: {', '.join(valuation['missing'])}_"
+        return portfolio_text
+
+def format_pnl(value: float, currency: str) -> str:
+    """Signed amount in a position's currency, e.g. -Rp 150,000 or +$12.50"""
+    sign = '-' if value < 0 else '+'
+    if currency == 'IDR':
+        return f"{sign}Rp {abs(value):,.0f}"
+    return f"{sign}${abs(value):,.2f}"
@@ -0,0 +1,207 @@
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from config.config import Config
+from src.database.connection import DatabaseManager
+from src.database.operations import DatabaseOps, StaleFenceError
+from src.indicators.streaming import IndicatorEngine, IndicatorSeries
+from src.utils.logger import activity_logger, error_logger
+from src.utils.timeframes import timeframe_ms
+
+STOP_ATR = 1.5
+TARGET_ATR = 3.0
+COOLDOWN_CANDLES = 5  # Sinyal searah pada market yang sama ditahan selama N candle
+
+class Rule:
+    """One weighted vote: check(series) returns 1 (long), -1 (short) or 0.
+
+    Trigger rules mark the candle where something happened (a cross or a
+    reversal); a signal is only considered when at least one trigger fires.
+    Context rules (trend, VWAP) only add to the confidence.
+    """
+
+    __slots__ = ('name', 'weight', 'check', 'trigger')
+
+    def __init__(self, name: str, weight: float, check: Callable[[IndicatorSeries], int], trigger: bool = False):
+        self.name = name
+        self.weight = weight
+        self.check = check
+        self.trigger = trigger
+
+def _previous(series: IndicatorSeries, name: str, *params):
+    indicator = series.get(name, *params)
+    if indicator is None or len(indicator.history) < 2:
+        return None, None
+    return indicator.history[-2], indicator.history[-1]
+
+def _ema_trend(series: IndicatorSeries) -> int:
+    fast, slow = series.value('ema', 20), series.value('ema', 50)
+    if fast is None or slow is None:
+        return 0
+    return 1 if fast > slow else -1 if fast < slow else 0
+
+def _macd_cross(series: IndicatorSeries) -> int:
+    previous, current = _previous(series, 'macd', 12, 26, 9)
+    if previous is None or current is None:
+        return 0
+    if previous[2] <= 0 < current[2]:
+        return 1
+    if previous[2] >= 0 > current[2]:
+        return -1
+    return 0
+
+def _rsi_reversal(series: IndicatorSeries) -> int:
+    previous, current = _previous(series, 'rsi', 14)
+    if previous is None or current is None:
+        return 0
+    if previous < 30 <= current:
+        return 1
+    if previous > 70 >= current:
+        return -1
+    return 0
+
+def _bollinger_reentry(series: IndicatorSeries) -> int:
+    previous, current = _previous(series, 'bb', 20, 2.0)
+    if previous is None or current is None or len(series.candles) < 2:
+        return 0
+    prev_close, close = series.candles[-2][4], series.candles[-1][4]
+    if prev_close < previous[2] and close >= current[2]:
+        return 1
+    if prev_close > previous[1] and close <= current[1]:
+        return -1
+    return 0
+
+def _vwap_side(series: IndicatorSeries) -> int:
+    vwap = series.value('vwap')
+    if vwap is None or not series.candles:
+        return 0
+    close = series.candles[-1][4]
+    return 1 if close > vwap else -1 if close < vwap else 0
+
+# Bobot dijumlahkan menjadi confidence 0-100
+DEFAULT_RULES = (
+    Rule('MACD cross', 30, _macd_cross, trigger=True),
+    Rule('RSI reversal', 25, _rsi_reversal, trigger=True),
+    Rule('Bollinger re-entry', 15, _bollinger_reentry, trigger=True),
+    Rule('EMA 20/50 trend', 20, _ema_trend),
+    Rule('VWAP', 10, _vwap_side)
+)
+
+def evaluate(series: IndicatorSeries, rules=DEFAULT_RULES) -> Optional[Tuple[str, float, List[str]]]:
+    """Score one series; returns (direction, confidence, reasons) or None"""
+    votes = [(rule, rule.check(series)) for rule in rules]
+    trigger = sum(rule.weight * vote for rule, vote in votes if rule.trigger)
+    if trigger == 0:
+        return None
+
+    side = 1 if trigger > 0 else -1
+    total = sum(rule.weight for rule in rules)
+    agreeing = [rule for rule, vote in votes if vote == side]
+    confidence = 100.0 * sum(rule.weight for rule in agreeing) / total
+    return ('long' if side > 0 else 'short'), confidence, [rule.name for rule in agreeing]
+
+class SignalEngine:
+    """Generates trading signals from streaming indicator state.
+
+    Registered as an IndicatorEngine listener, so every tracked (market,
+    timeframe) is evaluated in O(rules) right after a candle close is
+    applied. Qualifying signals are buffered and written to the Signal table
+    in one batch by flush(), which also returns them for notification.
+    """
+
+    def __init__(self, indicators: IndicatorEngine, rules=DEFAULT_RULES,
+                 threshold: float = None, timeframes=None):
+        self.rules = rules
+        self.threshold = Config.CONFIDENCE_THRESHOLD if threshold is None else threshold
+        self.timeframes = set(timeframes or Config.SIGNAL_TIMEFRAMES)
+        self.db = DatabaseManager()
+        self.pending: List[Dict] = []
+        self.last: Dict[Tuple[str, str], Tuple[str, int]] = {}  # (market, timeframe) -> (direction, candle ts)
+        indicators.add_listener(self.on_candle_close)
+
+    def on_candle_close(self, series: IndicatorSeries, candle: List):
+        if series.timeframe not in self.timeframes:
+            return
+        result = evaluate(series, self.rules)
+        if result is None:
+            return
+
+        direction, confidence, reasons = result
+        atr = series.value('atr', 14)
+        if confidence < self.threshold or not atr:
+            return
+
+        key = (series.symbol, series.timeframe)
+        last = self.last.get(key)
+        if last and last[0] == direction and \
+                candle[0] - last[1] < COOLDOWN_CANDLES * timeframe_ms(series.timeframe):
+            return
+        self.last[key] = (direction, candle[0])
+
+        entry = float(candle[4])
+        side = 1 if direction == 'long' else -1
+        exchange, symbol = series.symbol.split(':', 1)
+        self.pending.append({
+            'exchange': exchange,
+            'symbol': symbol,
+            'timeframe': series.timeframe,
+            'direction': direction,
+            'entry_price': entry,
+            'stop_loss': entry - side * STOP_ATR * atr,
+            'take_profit': entry + side * TARGET_ATR * atr,
+            'confidence': round(confidence, 1),
+            'reasons': reasons,
+            'created_at': datetime.utcfromtimestamp(candle[0] / 1000 + timeframe_ms(series.timeframe) / 1000)
+        })
+
+    def flush(self, fence_token: Optional[int] = None) -> List[Dict]:
+        """Write buffered signals in one batch and return them (blocking).
+
+        Nothing is returned, and so nothing sent, when a newer leader term
+        has already written (stale fencing token).
+        """
+        signals, self.pending = self.pending, []
+        if not signals:
+            return []
+
+        session = next(self.db.get_session())
+        try:
+            DatabaseOps.save_signals(session, signals, fence_token=fence_token)
+        except StaleFenceError as e:
+            activity_logger.info(f"Dropped {len(signals)} signals: {str(e)}")
+            return []
+        except Exception as e:
+            error_logger.error(f"Error saving {len(signals)} signals: {str(e)}")
+        finally:
+            session.close()
+        activity_logger.info(f"Generated {len(signals)} signals")
+        return signals
+
+    def discard_pending(self):
+        """Drop buffered signals without saving them (the process is no longer leader)"""
+        self.pending = []
+
+    def recipients(self) -> List[str]:
+        """Telegram ids that receive signal notifications (blocking)"""
+        session = next(self.db.get_session())
+        try:
+            return DatabaseOps.load_signal_recipients(session)
+        finally:
+            session.close()
+
+    @staticmethod
+    def format_signal_message(signal: Dict) -> str:
+        """Format one signal for Telegram"""
+        emoji = "🟢" if signal['direction'] == 'long' else "🔴"
+        if signal['exchange'] == 'indodax':
+            price = lambda value: f"Rp {value:,.0f}"
+        else:
+            price = lambda value: f"${value:,.4f}"
+        return (
+            f"{emoji} *Sinyal {signal['direction'].upper()} {signal['symbol']}* "
+            f"({signal['exchange'].upper()} {signal['timeframe']})\n\n"
+            f"Entry: {price(signal['entry_price'])}\n"
+            f"Stop Loss: {price(signal['stop_loss'])}\n"
+            f"Take Profit: {price(signal['take_profit'])}\n"
+            f"Confidence: {signal['confidence']:.0f}%\n"
+            f"Alasan: {', '.join(signal['reasons'])}"
+        )
@@ -0,0 +1,105 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+from src.utils.symbols import EXCHANGE_CURRENCY
+
+# Selisih sebesar ini hampir pasti dua aset berbeda dengan ticker yang sama
+MAX_SPREAD_PERCENT = 50.0
+
+class SpreadMonitor:
+    """Cross-exchange spreads for every pair listed on more than one exchange.
+
+    Quotes are kept in their native currency and normalised to USDT with the
+    Indodax USDT/IDR rate. Spreads live in a list kept sorted with bisect, so
+    a tick costs O(log n) and top(n) is a slice whose cost does not depend on
+    the number of pairs.
+    """
+
+    def __init__(self):
+        self.rate: Optional[float] = None  # IDR per USDT
+        self.native: Dict[str, Dict[str, float]] = {}  # symbol -> {exchange: native price}
+        self.spreads: Dict[str, Dict] = {}
+        self.ranking: List[Tuple[float, str]] = []  # (-spread_percent, symbol)
+
+    def to_usdt(self, exchange: str, price: float) -> Optional[float]:
+        if EXCHANGE_CURRENCY.get(exchange) == 'IDR':
+            return price / self.rate if self.rate else None
+        return price
+
+    def set_rate(self, rate: Optional[float]):
+        """Update the USDT/IDR rate and re-normalise every spread"""
+        if not rate or rate == self.rate:
+            return
+        self.rate = rate
+        for symbol in self.native:
+            self._update(symbol)
+
+    def on_price(self, exchange: str, symbol: str, price: float):
+        """Apply one live tick (native currency)"""
+        if price <= 0:
+            return
+        quotes = self.native.setdefault(symbol, {})
+        if quotes.get(exchange) == price:
+            return
+        quotes[exchange] = price
+        if len(quotes) > 1:
+            self._update(symbol)
+
+    def on_tickers(self, exchange: str, prices: Dict[str, float]):
+        """Apply an all-tickers snapshot {symbol: native price}"""
+        for symbol, price in prices.items():
+            self.on_price(exchange, symbol, price)
+
+    def _update(self, symbol: str):
+        old = self.spreads.pop(symbol, None)
+        if old is not None:
+            index = bisect_left(self.ranking, (-old['spread_percent'], symbol))
+            del self.ranking[index]
+
+        quotes = [
+            (usdt, exchange, price)
+            for exchange, price in self.native[symbol].items()
+            for usdt in (self.to_usdt(exchange, price),) if usdt
+        ]
+        if len(quotes) < 2:
+            return
+
+        low, high = min(quotes), max(quotes)
+        spread = (high[0] - low[0]) / low[0] * 100
+        if spread > MAX_SPREAD_PERCENT:
+            return
+        self.spreads[symbol] = {
+            'symbol': symbol,
+            'buy_exchange': low[1],
+            'buy_price': low[2],
+            'buy_usdt': low[0],
+            'sell_exchange': high[1],
+            'sell_price': high[2],
+            'sell_usdt': high[0],
+            'spread_percent': spread
+        }
+        insort(self.ranking, (-spread, symbol))
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        return self.spreads.get(symbol)
+
+    def top(self, n: int = 10) -> List[Dict]:
+        """Widest spreads, widest first"""
+        return [self.spreads[symbol] for _, symbol in self.ranking[:n]]
+
+    @staticmethod
+    def format_spread_message(spreads: List[Dict], rate: Optional[float]) -> str:
+        """Format top spreads for Telegram"""
+        if not spreads:
+            return "❌ Belum ada data spread antar exchange."
+
+        message = "⚖️ *Spread Antar Exchange*\n"
+        if rate:
+            message += f"Kurs USDT/IDR: Rp {rate:,.0f}\n"
+        message += "\n"
+        for i, spread in enumerate(spreads, 1):
+            message += (
+                f"{i}. *{spread['symbol']}* {spread['spread_percent']:.2f}%\n"
+                f"   Beli {spread['buy_exchange'].upper()} ${spread['buy_usdt']:,.4f} → "
+                f"Jual {spread['sell_exchange'].upper()} ${spread['sell_usdt']:,.4f}\n"
+            )
+        return message
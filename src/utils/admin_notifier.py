@@ -1,5 +1,7 @@
 from telegram import Bot
 from config.config import Config
+from src.utils.logger import error_logger
+from src.utils.message_queue import OutboundMessageQueue, PRIORITY_INFO
 
 class AdminNotifier:
     def __init__(self):
@@ -8,11 +10,18 @@ class AdminNotifier:
     async def notify_error(self, error_message: str):
         """Send error notification to admin"""
         try:
+            text = f"❌ *Error Alert*\n\n{error_message}"
+            queue = OutboundMessageQueue.default
+            if queue:
+                # Lewat antrian agar tidak bentrok dengan flood limit Telegram
+                queue.send_message(Config.TELEGRAM_ADMIN_ID, text, PRIORITY_INFO, parse_mode='Markdown')
+                return
+            
             await self.bot.send_message(
                 chat_id=Config.TELEGRAM_ADMIN_ID,
-                text=f"❌ *Error Alert*\n\n{error_message}",
+                text=text,
                 parse_mode='Markdown'
             )
         except Exception as e:
             # Log to file since we can't notify admin
-            error_logger.critical(f"Failed to notify admin: {str(e)}") 
\ No newline at end of file
+            error_logger.critical(f"Failed to notify admin: {str(e)}") 
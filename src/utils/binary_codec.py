@@ -0,0 +1,170 @@
+"""Compact binary encoding for cached values.
+
+The first byte names the format. Plain values (None, bool, int, float, str,
+bytes, list, tuple, dict) are written with marshal, which is C-speed and
+about 40% smaller than JSON for ticker-style dicts. Values that contain
+NumPy arrays use a small tagged format: each value is a one-byte tag
+followed by a fixed-size or length-prefixed payload, and arrays are stored
+as dtype, shape and the raw C-contiguous buffer. Decoding an array is a
+zero-copy np.frombuffer view, so the result is read-only; callers that
+need to modify it must copy it first.
+"""
+import marshal
+import struct
+from typing import Any, List, Tuple
+import numpy as np
+
+TAGGED = 1
+MARSHAL = 2
+MARSHAL_VERSION = 4  # Format stabil lintas versi Python 3.4+
+
+(NONE, TRUE, FALSE, INT, BIGINT, FLOAT, STR8, STR32, BYTES,
+ LIST8, LIST32, TUPLE8, TUPLE32, DICT8, DICT32, ARRAY) = range(16)
+
+_INT = struct.Struct('<q')
+_FLOAT = struct.Struct('<d')
+_LEN = struct.Struct('<I')
+
+# marshal diam-diam menulis objek buffer (array NumPy, np.float64) sebagai bytes,
+# jadi jalur cepat hanya untuk struktur yang tipenya persis salah satu dari ini
+_MARSHAL_SAFE = {type(None), bool, int, float, str, bytes}
+
+def _marshal_safe(value: Any) -> bool:
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        kind = type(item)
+        if kind is dict:
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif kind is list or kind is tuple:
+            stack.extend(item)
+        elif kind not in _MARSHAL_SAFE:
+            return False
+    return True
+
+def dumps(value: Any) -> bytes:
+    if _marshal_safe(value):
+        return bytes((MARSHAL,)) + marshal.dumps(value, MARSHAL_VERSION)
+    parts: List[bytes] = [bytes((TAGGED,))]
+    _encode(value, parts)
+    return b''.join(parts)
+
+def loads(data: bytes) -> Any:
+    if data[:1] == bytes((MARSHAL,)):
+        return marshal.loads(memoryview(data)[1:])
+    if data[:1] != bytes((TAGGED,)):
+        raise ValueError(f"Unknown cache encoding {data[:1]!r}")
+    value, offset = _decode(data, memoryview(data), 1)
+    if offset != len(data):
+        raise ValueError(f"{len(data) - offset} trailing bytes after cached value")
+    return value
+
+def _sized(short: int, long: int, size: int) -> bytes:
+    if size < 256:
+        return bytes((short, size))
+    return bytes((long,)) + _LEN.pack(size)
+
+def _encode(value: Any, parts: List[bytes]):
+    # bool sebelum int: bool adalah subclass int
+    if value is None:
+        parts.append(bytes((NONE,)))
+    elif value is True:
+        parts.append(bytes((TRUE,)))
+    elif value is False:
+        parts.append(bytes((FALSE,)))
+    elif isinstance(value, int):
+        if -2 ** 63 <= value < 2 ** 63:
+            parts.append(bytes((INT,)) + _INT.pack(value))
+        else:
+            payload = str(value).encode()
+            parts.append(bytes((BIGINT, len(payload))) + payload)
+    elif isinstance(value, float):
+        parts.append(bytes((FLOAT,)) + _FLOAT.pack(value))
+    elif isinstance(value, str):
+        payload = value.encode()
+        parts.append(_sized(STR8, STR32, len(payload)))
+        parts.append(payload)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        payload = bytes(value)
+        parts.append(bytes((BYTES,)) + _LEN.pack(len(payload)))
+        parts.append(payload)
+    elif isinstance(value, dict):
+        parts.append(_sized(DICT8, DICT32, len(value)))
+        for key, item in value.items():
+            _encode(key, parts)
+            _encode(item, parts)
+    elif isinstance(value, list):
+        parts.append(_sized(LIST8, LIST32, len(value)))
+        for item in value:
+            _encode(item, parts)
+    elif isinstance(value, tuple):
+        parts.append(_sized(TUPLE8, TUPLE32, len(value)))
+        for item in value:
+            _encode(item, parts)
+    elif isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            raise TypeError("Object arrays cannot be cached")
+        dtype = value.dtype.str.encode()
+        payload = np.ascontiguousarray(value).tobytes()
+        parts.append(bytes((ARRAY, len(dtype))) + dtype + bytes((value.ndim,)) +
+                     struct.pack(f'<{value.ndim}I', *value.shape) + _LEN.pack(len(payload)))
+        parts.append(payload)
+    elif isinstance(value, np.generic):
+        _encode(value.item(), parts)
+    else:
+        raise TypeError(f"Cannot encode {type(value).__name__} for the cache")
+
+def _decode(data: bytes, view: memoryview, offset: int) -> Tuple[Any, int]:
+    tag = data[offset]
+    offset += 1
+    if tag == STR8:
+        end = offset + 1 + data[offset]
+        return data[offset + 1:end].decode(), end
+    if tag == INT:
+        return _INT.unpack_from(data, offset)[0], offset + 8
+    if tag == FLOAT:
+        return _FLOAT.unpack_from(data, offset)[0], offset + 8
+    if tag == NONE:
+        return None, offset
+    if tag == TRUE:
+        return True, offset
+    if tag == FALSE:
+        return False, offset
+    if tag in (DICT8, DICT32, LIST8, LIST32, TUPLE8, TUPLE32):
+        if tag in (DICT8, LIST8, TUPLE8):
+            count = data[offset]
+            offset += 1
+        else:
+            (count,) = _LEN.unpack_from(data, offset)
+            offset += 4
+        if tag in (DICT8, DICT32):
+            result = {}
+            for _ in range(count):
+                key, offset = _decode(data, view, offset)
+                result[key], offset = _decode(data, view, offset)
+            return result, offset
+        items = []
+        for _ in range(count):
+            item, offset = _decode(data, view, offset)
+            items.append(item)
+        return (items if tag in (LIST8, LIST32) else tuple(items)), offset
+    if tag in (STR32, BYTES):
+        (length,) = _LEN.unpack_from(data, offset)
+        offset += 4
+        payload = data[offset:offset + length]
+        return (payload.decode() if tag == STR32 else payload), offset + length
+    if tag == BIGINT:
+        end = offset + 1 + data[offset]
+        return int(data[offset + 1:end]), end
+    if tag == ARRAY:
+        end = offset + 1 + data[offset]
+        dtype = np.dtype(data[offset + 1:end].decode())
+        ndim = data[end]
+        shape = struct.unpack_from(f'<{ndim}I', data, end + 1)
+        offset = end + 1 + 4 * ndim
+        (length,) = _LEN.unpack_from(data, offset)
+        offset += 4
+        array = np.frombuffer(view[offset:offset + length], dtype=dtype).reshape(shape)
+        return array, offset + length
+    raise ValueError(f"Unknown cache value tag {tag} at offset {offset - 1}")
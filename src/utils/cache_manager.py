@@ -1,42 +1,350 @@
+"""Two-tier cache: a bounded in-process LRU in front of a shared Redis.
+
+Values are stored as src.utils.binary_codec bytes in both tiers, so a local
+hit is a dict lookup plus a decode and the byte budget is exact. Local
+entries live at most CACHE_LOCAL_TTL seconds (or until the Redis expiry,
+whichever is first). A write or delete publishes the key on
+CACHE_INVALIDATION_CHANNEL, and every other process drops its local copy.
+
+When Redis errors or times out, the cache keeps working local-only and
+retries Redis after CACHE_REDIS_RETRY seconds. It logs once per outage.
+Because invalidations may have been missed meanwhile, the local tier is
+cleared when Redis comes back.
+
+get_or_compute() adds stale-while-revalidate for values that are
+expensive to build. Each value has a soft TTL, after which it is still
+served but refreshed in the background, and a hard TTL, after which it is
+gone. Only the holder of a Redis lock on the key recomputes, so across
+all processes a key is rebuilt once. Refreshes also start early with a
+probability that grows as the soft TTL approaches, weighted by how long
+the last computation took (the XFetch rule), so popular keys do not all
+expire at the same moment.
+"""
+import asyncio
+import inspect
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 import redis
-import json
+import redis.asyncio as aioredis
 from config.config import Config
-from src.utils.logger import error_logger
+from src.utils import binary_codec
+from src.utils.logger import activity_logger, error_logger
+from src.utils.metrics import REGISTRY
+
+CACHE_HITS = REGISTRY.counter('cache_requests_total', 'Cache lookups by result', cache='redis', result='hit')
+CACHE_MISSES = REGISTRY.counter('cache_requests_total', 'Cache lookups by result', cache='redis', result='miss')
+CACHE_ERRORS = REGISTRY.counter('cache_requests_total', 'Cache lookups by result', cache='redis', result='error')
+LOCAL_HITS = REGISTRY.counter('cache_requests_total', 'Cache lookups by result', cache='local', result='hit')
+LOCAL_MISSES = REGISTRY.counter('cache_requests_total', 'Cache lookups by result', cache='local', result='miss')
+LOCAL_BYTES = REGISTRY.gauge('cache_local_bytes', 'Bytes held by the in-process cache tier')
+SWR_OUTCOMES = {outcome: REGISTRY.counter('cache_swr_total', 'get_or_compute lookups by outcome', outcome=outcome)
+                for outcome in ('fresh', 'early', 'stale', 'miss', 'computed', 'waited')}
+
+class LocalCache:
+    """LRU of encoded values bounded by entry count and total bytes"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()  # key -> (blob, expires_at)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            self.delete(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: str, blob: bytes, ttl: float):
+        self.delete(key)
+        if ttl <= 0 or len(blob) > self.max_bytes:
+            return
+        self.entries[key] = (blob, time.monotonic() + ttl)
+        self.size += len(blob)
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            _, (old, _) = self.entries.popitem(last=False)
+            self.size -= len(old)
+        LOCAL_BYTES.value = self.size
+
+    def delete(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+            LOCAL_BYTES.value = self.size
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+        LOCAL_BYTES.value = 0
 
 class CacheManager:
     _instance = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(CacheManager, cls).__new__(cls)
             cls._instance._initialize()
         return cls._instance
-    
-    def _initialize(self):
-        try:
-            self.redis = redis.from_url(Config.REDIS_URL)
-        except redis.ConnectionError as e:
-            error_logger.error(f"Redis connection error: {str(e)}")
-            self.redis = None
-    
-    def set_data(self, key: str, value: any, expiry: int = 3600):
-        """Store data in cache with expiry in seconds"""
+
+    def _initialize(self, redis_url: str = None):
+        self.local = LocalCache(Config.CACHE_LOCAL_MAX_ENTRIES, Config.CACHE_LOCAL_MAX_BYTES)
+        self.instance_id = uuid.uuid4().hex
+        self.channel = Config.CACHE_INVALIDATION_CHANNEL
+        self.redis_down_until = 0.0
+        self.redis_was_down = False
+        self._listener: Optional[asyncio.Task] = None
+        self._inflight: Dict[str, Tuple[asyncio.Task, bool]] = {}  # key -> (task refresh, menunggu holder lain)
+        redis_url = redis_url if redis_url is not None else Config.REDIS_URL
+        # Tanpa REDIS_URL cache hanya lokal
+        self.redis = aioredis.from_url(
+            redis_url,
+            socket_timeout=Config.CACHE_REDIS_TIMEOUT,
+            socket_connect_timeout=Config.CACHE_REDIS_TIMEOUT
+        ) if redis_url else None
+
+    @classmethod
+    def for_url(cls, redis_url: str) -> 'CacheManager':
+        """Separate (non-singleton) instance, e.g. for a test Redis"""
+        instance = super(CacheManager, cls).__new__(cls)
+        instance._initialize(redis_url)
+        return instance
+
+    @property
+    def redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self.redis_down_until
+
+    async def _call(self, operation: Callable[[], Awaitable[Any]]) -> Tuple[bool, Any]:
+        """Run a Redis operation; (False, None) when Redis is down or failed"""
+        if not self.redis_available:
+            return False, None
+        self._ensure_listener()
         try:
-            if self.redis:
-                self.redis.setex(
-                    key,
-                    expiry,
-                    json.dumps(value)
-                )
-        except Exception as e:
-            error_logger.error(f"Cache set error: {str(e)}")
-    
-    def get_data(self, key: str):
-        """Retrieve data from cache"""
+            result = await asyncio.wait_for(operation(), Config.CACHE_REDIS_TIMEOUT)
+        except (redis.RedisError, OSError, asyncio.TimeoutError) as e:
+            CACHE_ERRORS.value += 1
+            self.redis_down_until = time.monotonic() + Config.CACHE_REDIS_RETRY
+            if not self.redis_was_down:
+                self.redis_was_down = True
+                error_logger.error(f"Redis unavailable, cache is local-only: {str(e) or type(e).__name__}")
+            return False, None
+        if self.redis_was_down:
+            self._redis_recovered()
+        return True, result
+
+    def _redis_recovered(self):
+        # Invalidasi selama Redis mati mungkin terlewat; salinan lokal tidak bisa dipercaya
+        self.redis_was_down = False
+        self.local.clear()
+        activity_logger.info("Redis available again, local cache cleared")
+
+    def _ensure_listener(self):
+        if self._listener is None or self._listener.done():
+            try:
+                self._listener = asyncio.get_running_loop().create_task(self._listen())
+            except RuntimeError:
+                pass  # Tidak ada event loop: invalidasi antar proses tidak diterima
+
+    async def _listen(self):
+        """Drop local copies of keys written by other processes"""
+        prefix = f"{self.instance_id} ".encode()
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                if self.redis_was_down:
+                    self._redis_recovered()
+                async for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    data = message['data']
+                    if not data.startswith(prefix):
+                        self.local.delete(data.split(b' ', 1)[1].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self.redis_was_down:
+                    self.redis_was_down = True
+                    error_logger.error(f"Cache invalidation listener lost Redis: {str(e) or type(e).__name__}")
+                self.redis_down_until = time.monotonic() + Config.CACHE_REDIS_RETRY
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(Config.CACHE_REDIS_RETRY)
+
+    async def get_data(self, key: str):
+        """Retrieve data from cache, local tier first"""
+        blob = await self._get_blob(key)
+        return binary_codec.loads(blob) if blob is not None else None
+
+    async def _get_blob(self, key: str) -> Optional[bytes]:
+        blob = self.local.get(key)
+        if blob is not None:
+            LOCAL_HITS.value += 1
+            return blob
+        LOCAL_MISSES.value += 1
+
+        async def fetch():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                return await pipe.get(key).pttl(key).execute()
+
+        ok, result = await self._call(fetch)
+        if not ok:
+            return None
+        blob, ttl_ms = result
+        if blob is None:
+            CACHE_MISSES.value += 1
+            return None
+        CACHE_HITS.value += 1
+        ttl = Config.CACHE_LOCAL_TTL if ttl_ms < 0 else min(Config.CACHE_LOCAL_TTL, ttl_ms / 1000)
+        self.local.set(key, blob, ttl)
+        return blob
+
+    async def set_data(self, key: str, value: Any, expiry: int = 3600):
+        """Store data in both tiers with expiry in seconds"""
+        await self._set_blob(key, binary_codec.dumps(value), expiry)
+
+    async def _set_blob(self, key: str, blob: bytes, expiry: float):
+        self.local.set(key, blob, min(expiry, Config.CACHE_LOCAL_TTL))
+
+        async def store():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                await pipe.set(key, blob, px=int(expiry * 1000)).publish(
+                    self.channel, f"{self.instance_id} {key}").execute()
+
+        await self._call(store)
+
+    async def delete(self, key: str):
+        """Remove a key from both tiers and from other processes' local tiers"""
+        self.local.delete(key)
+
+        async def remove():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                await pipe.delete(key).publish(self.channel, f"{self.instance_id} {key}").execute()
+
+        await self._call(remove)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Any], soft_ttl: float,
+                             hard_ttl: float = None, lock_ttl: float = None):
+        """Cached value of compute(), refreshed once per cluster after soft_ttl.
+
+        compute may be a plain or an async callable; wrap blocking work in
+        asyncio.to_thread. A None result is returned but not cached. Between
+        soft_ttl and hard_ttl the stale value is returned immediately and
+        refreshed in the background; after hard_ttl (or on first use) callers
+        wait for whichever process holds the lock to store a new value.
+        """
+        hard_ttl = hard_ttl if hard_ttl is not None else soft_ttl * Config.CACHE_STALE_FACTOR
+        lock_ttl = lock_ttl if lock_ttl is not None else Config.CACHE_LOCK_TTL
+        blob = await self._get_blob(key)
+        if blob is not None:
+            entry = binary_codec.loads(blob)
+            now = time.time()
+            # XFetch: -log(u) >= 0, jadi refresh makin mungkin mendekati fresh_until
+            early = entry['delta'] * Config.CACHE_EARLY_BETA * -math.log(1.0 - random.random())
+            if now + early < entry['fresh_until']:
+                SWR_OUTCOMES['fresh'].value += 1
+                return entry['value']
+            SWR_OUTCOMES['stale' if now >= entry['fresh_until'] else 'early'].value += 1
+            if key not in self._inflight:
+                self._start_refresh(key, compute, soft_ttl, hard_ttl, lock_ttl, wait=False)
+            return entry['value']
+
+        SWR_OUTCOMES['miss'].value += 1
+        inflight = self._inflight.get(key)
+        task = inflight[0] if inflight and inflight[1] else \
+            self._start_refresh(key, compute, soft_ttl, hard_ttl, lock_ttl, wait=True)
+        return await asyncio.shield(task)
+
+    def _start_refresh(self, key: str, compute, soft_ttl: float, hard_ttl: float, lock_ttl: float,
+                       wait: bool) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(
+            self._refresh(key, compute, soft_ttl, hard_ttl, lock_ttl, wait))
+        self._inflight[key] = (task, wait)
+
+        def done(task: asyncio.Task):
+            if self._inflight.get(key, (None,))[0] is task:
+                del self._inflight[key]
+            if not wait and not task.cancelled() and task.exception() is not None:
+                error_logger.error(f"Background refresh of {key} failed: {str(task.exception())}")
+
+        task.add_done_callback(done)
+        return task
+
+    async def _refresh(self, key: str, compute, soft_ttl: float, hard_ttl: float, lock_ttl: float, wait: bool):
+        token = await self._acquire(key, lock_ttl)
+        if token is None:
+            if not wait:
+                return None  # Proses lain sedang me-refresh; nilai basi tetap dipakai
+            deadline = time.monotonic() + lock_ttl
+            while token is None and time.monotonic() < deadline:
+                await asyncio.sleep(Config.CACHE_WAIT_POLL)
+                blob = await self._get_blob(key)
+                if blob is not None:
+                    SWR_OUTCOMES['waited'].value += 1
+                    return binary_codec.loads(blob)['value']
+                # Pemegang lock gagal atau mati: ambil alih
+                token = await self._acquire(key, lock_ttl)
         try:
-            if self.redis:
-                data = self.redis.get(key)
-                return json.loads(data) if data else None
-        except Exception as e:
-            error_logger.error(f"Cache get error: {str(e)}")
-            return None 
\ No newline at end of file
+            start = time.perf_counter()
+            value = compute()
+            if inspect.isawaitable(value):
+                value = await value
+            delta = time.perf_counter() - start
+            SWR_OUTCOMES['computed'].value += 1
+            if value is not None:
+                entry = {'value': value, 'fresh_until': time.time() + soft_ttl, 'delta': delta}
+                await self._set_blob(key, binary_codec.dumps(entry), hard_ttl)
+            return value
+        finally:
+            if token:
+                await self._release(key, token)
+
+    async def _acquire(self, key: str, lock_ttl: float) -> Optional[str]:
+        """Lock token; '' when Redis is unavailable (single-flight is then per process); None if held"""
+        token = uuid.uuid4().hex
+        ok, acquired = await self._call(lambda: self.redis.set(f"lock:{key}", token, nx=True,
+                                                               px=int(lock_ttl * 1000)))
+        if not ok:
+            return ''
+        return token if acquired else None
+
+    async def _release(self, key: str, token: str):
+        lock_key = f"lock:{key}"
+
+        async def release():
+            # Hapus hanya bila lock masih milik kita (bisa sudah kedaluwarsa dan diambil proses lain)
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(lock_key)
+                    if await pipe.get(lock_key) == token.encode():
+                        pipe.multi()
+                        pipe.delete(lock_key)
+                        await pipe.execute()
+                except redis.WatchError:
+                    pass
+
+        await self._call(release)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        if self.redis is not None:
+            await self.redis.aclose()
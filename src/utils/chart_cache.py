@@ -0,0 +1,95 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+from config.config import Config
+from src.utils.logger import activity_logger
+from src.utils.metrics import REGISTRY
+
+CACHE_HITS = REGISTRY.counter('cache_requests_total', 'Cache lookups by result', cache='chart', result='hit')
+CACHE_MISSES = REGISTRY.counter('cache_requests_total', 'Cache lookups by result', cache='chart', result='miss')
+
+class ChartKey(NamedTuple):
+    symbol: str
+    timeframe: str
+    exchange: str
+    candle_ts: int  # Open time (ms) dari candle terakhir yang sudah close
+    style: str
+
+class ChartEntry:
+    __slots__ = ('png', 'file_id')
+
+    def __init__(self, png: Optional[bytes] = None, file_id: Optional[str] = None):
+        self.png = png
+        self.file_id = file_id
+
+    @property
+    def size(self) -> int:
+        return len(self.png or b'') + len(self.file_id or '')
+
+class ChartCache:
+    """LRU cache of rendered charts, bounded by a byte budget.
+
+    An entry starts out holding the rendered PNG. Once Telegram has accepted
+    the upload, the file_id is stored and the PNG is dropped, so subsequent
+    sends of the same chart re-use the file_id without rendering or uploading.
+    """
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes if max_bytes is not None else Config.CHART_CACHE_MAX_BYTES
+        self.entries: "OrderedDict[ChartKey, ChartEntry]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._locks: Dict[ChartKey, asyncio.Lock] = {}
+
+    def lock(self, key: ChartKey) -> asyncio.Lock:
+        """Per-key lock so concurrent requests for one chart render it only once"""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    def release(self, key: ChartKey):
+        """Forget the lock for a key once nobody is rendering it"""
+        lock = self._locks.get(key)
+        if lock is not None and not lock.locked():
+            del self._locks[key]
+
+    def get(self, key: ChartKey) -> Optional[ChartEntry]:
+        """Get cached chart and mark it as recently used"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            CACHE_MISSES.value += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        CACHE_HITS.value += 1
+        return entry
+
+    def put(self, key: ChartKey, png: Optional[bytes] = None, file_id: Optional[str] = None):
+        """Store rendered PNG and/or Telegram file_id for a chart"""
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old.size
+            png = png if png is not None else old.png
+            file_id = file_id or old.file_id
+
+        # PNG tidak diperlukan lagi setelah Telegram menyimpan file-nya
+        entry = ChartEntry(None if file_id else png, file_id)
+        if entry.size > self.max_bytes:
+            return
+
+        self.entries[key] = entry
+        self.size += entry.size
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until within byte budget"""
+        while self.size > self.max_bytes and self.entries:
+            key, entry = self.entries.popitem(last=False)
+            self.size -= entry.size
+            lock = self._locks.get(key)
+            if lock is not None and not lock.locked():
+                del self._locks[key]
+            activity_logger.debug(f"Evicted chart {key} ({entry.size} bytes)")
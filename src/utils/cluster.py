@@ -0,0 +1,457 @@
+"""Coordination between several bot processes sharing one Redis.
+
+Telegram serves getUpdates to a single poller per bot token, and some
+duties must run once however many processes there are: matching price
+alerts, the WebSocket stream, storing candles and sending signals and
+condition alerts. With CLUSTER_ENABLED every process competes for a
+leader lease in Redis. The leader polls Telegram and pushes each update
+onto a Redis list. Every process, the leader included, pops updates from
+that list whenever it has a free slot (CLUSTER_PREFETCH), so handling is
+spread over all of them. The singleton duties run only on the leader.
+
+The lease is a key holding the leader's instance id with a TTL of
+LEADER_LEASE_TTL seconds, renewed every LEADER_RENEW_INTERVAL. Every new
+term increments a fencing token in Redis. The leader trusts its lease
+only until the start of its last successful renewal plus the TTL minus
+one renew interval. That is earlier than the key can expire in Redis,
+so a stalled leader steps down before anyone else can be elected. Before
+it commits a batch of side effects, the leader calls fence() to confirm
+that its token is still the current one. A pause right after that check
+can still let an old leader act, so the token (write_token) is also
+carried into the database writes that precede messages: each is
+conditional on no newer token having written (the cluster_fence table),
+and a rejected write sends nothing. The table keeps the highest token, so
+clear it as well if the Redis data is ever wiped. If the leader dies, its
+key expires and another process takes over within about
+LEADER_LEASE_TTL + LEADER_RENEW_INTERVAL seconds. On a clean shutdown the
+lease is released and the handover is immediate.
+
+Without CLUSTER_ENABLED the process is the permanent leader, polls
+Telegram itself and never talks to Redis.
+"""
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import redis
+import redis.asyncio as aioredis
+from telegram import Bot, Update
+from telegram.ext import Updater
+from config.config import Config
+from src.utils.logger import activity_logger, error_logger
+from src.utils.metrics import REGISTRY
+
+LEADER = REGISTRY.gauge('cluster_leader', 'Whether this process holds the leader lease')
+FENCING_TOKEN = REGISTRY.gauge('cluster_fencing_token', 'Fencing token of the current leader term, 0 = follower')
+ELECTIONS = REGISTRY.counter('cluster_elections_total', 'Leader terms won by this process')
+PUBLISHED = REGISTRY.counter('cluster_updates_total', 'Updates passed through the Redis list', direction='published')
+DUPLICATES = REGISTRY.counter('cluster_updates_total', 'Updates passed through the Redis list', direction='duplicate')
+HANDLED = REGISTRY.counter('cluster_updates_total', 'Updates passed through the Redis list', direction='handled')
+
+REDIS_ERRORS = (redis.RedisError, OSError, asyncio.TimeoutError)
+POP_TIMEOUT = 1  # Detik; BLPOP dibatasi agar penghentian tidak menunggu lama
+SEEN_TTL = 3600  # Detik; update_id yang sudah masuk list, untuk membuang kiriman ulang setelah failover
+
+class _Outage:
+    """Log a Redis failure once per outage and the recovery once"""
+
+    def __init__(self, what: str):
+        self.what = what
+        self.down = False
+
+    def failed(self, e: Exception):
+        if not self.down:
+            self.down = True
+            error_logger.error(f"{self.what}: Redis unavailable: {str(e) or type(e).__name__}")
+
+    def ok(self):
+        if self.down:
+            self.down = False
+            activity_logger.info(f"{self.what}: Redis available again")
+
+class LeaderLease:
+    """Lease-based leader election with fencing tokens"""
+
+    def __init__(self, redis_url: Optional[str], instance_id: str, name: str = None,
+                 ttl: float = None, renew_interval: float = None):
+        name = name or Config.CLUSTER_NAME
+        self.instance_id = instance_id
+        self.key = f"{name}:leader"
+        self.fence_key = f"{name}:fence"
+        self.ttl = ttl or Config.LEADER_LEASE_TTL
+        self.renew_interval = renew_interval or Config.LEADER_RENEW_INTERVAL
+        if self.renew_interval * 2 > self.ttl:
+            raise ValueError("LEADER_RENEW_INTERVAL must be at most half of LEADER_LEASE_TTL")
+        self.redis = aioredis.from_url(
+            redis_url,
+            socket_timeout=self.renew_interval,
+            socket_connect_timeout=self.renew_interval
+        ) if redis_url else None
+        self.token: Optional[int] = None
+        self.valid_until = 0.0
+        self.listeners: List[Callable[[bool], Awaitable]] = []
+        self._leading = False  # Status terakhir yang sudah diberitahukan ke listener
+        self._task: Optional[asyncio.Task] = None
+        self._outage = _Outage("Leader lease")
+
+    @property
+    def clustered(self) -> bool:
+        return self.redis is not None
+
+    @property
+    def is_leader(self) -> bool:
+        """Local check, no Redis round trip; turns False on time even if renewal is stuck"""
+        return self.token is not None and time.monotonic() < self.valid_until
+
+    @property
+    def write_token(self) -> Optional[int]:
+        """Fencing token for conditional database writes; None without a cluster (nothing to fence)"""
+        return self.token if self.clustered else None
+
+    def add_listener(self, listener: Callable[[bool], Awaitable]):
+        """listener(is_leader) is awaited on every change of leadership"""
+        self.listeners.append(listener)
+
+    async def start(self):
+        if self.redis is None:
+            self.token = 0
+            self.valid_until = math.inf
+            await self._set_leading(True)
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                held = await asyncio.wait_for(self._campaign(), self.renew_interval)
+                self._outage.ok()
+            except asyncio.CancelledError:
+                raise
+            except REDIS_ERRORS as e:
+                # Tidak diketahui: tetap pemimpin sampai lease lokal habis
+                self._outage.failed(e)
+                held = None
+            if held:
+                self.valid_until = started + self.ttl - self.renew_interval
+            elif held is False:
+                self.valid_until = 0.0
+            await self._set_leading(self.is_leader)
+
+            delay = self.renew_interval - (time.monotonic() - started)
+            if self._leading:
+                delay = min(delay, self.valid_until - time.monotonic())
+            await asyncio.sleep(max(0.0, delay))
+
+    async def _campaign(self) -> bool:
+        """Renew our lease or start a new term if the key is free; False if another process holds it"""
+        ttl_ms = int(self.ttl * 1000)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self.key)
+                holder = await pipe.get(self.key)
+                # Key masih milik kita tetapi lease lokal sudah habis: term baru dengan token baru
+                renewing = holder == self.instance_id.encode() and self.is_leader
+                if holder is not None and not renewing and holder != self.instance_id.encode():
+                    return False
+                pipe.multi()
+                if renewing:
+                    pipe.pexpire(self.key, ttl_ms)
+                else:
+                    pipe.incr(self.fence_key)
+                    pipe.set(self.key, self.instance_id, px=ttl_ms)
+                results = await pipe.execute()
+            except redis.WatchError:
+                return False
+        if not renewing:
+            self.token = int(results[0])
+            FENCING_TOKEN.value = self.token
+            ELECTIONS.value += 1
+            activity_logger.info(f"{self.instance_id} elected leader (fencing token {self.token})")
+        return True
+
+    async def _set_leading(self, leading: bool):
+        if leading == self._leading:
+            return
+        self._leading = leading
+        if not leading:
+            if self.clustered:
+                activity_logger.info(f"{self.instance_id} is no longer leader (fencing token {self.token})")
+            self.token = None
+        LEADER.value = 1 if leading else 0
+        FENCING_TOKEN.value = self.token or 0
+        for listener in self.listeners:
+            try:
+                await listener(leading)
+            except Exception as e:
+                error_logger.error(f"Error in leadership listener: {str(e)}", exc_info=True)
+
+    async def fence(self) -> bool:
+        """True if this process is leader and its fencing token is still the current one in Redis"""
+        if not self.is_leader:
+            return False
+        if self.redis is None:
+            return True
+        try:
+            holder, token = await asyncio.wait_for(self.redis.mget(self.key, self.fence_key), self.renew_interval)
+        except REDIS_ERRORS as e:
+            self._outage.failed(e)
+            return False
+        return holder == self.instance_id.encode() and token is not None and int(token) == self.token
+
+    async def stop(self):
+        """Stop campaigning and hand the lease over right away if we hold it"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self.redis is not None:
+            if self.is_leader:
+                try:
+                    await self._release()
+                except REDIS_ERRORS as e:
+                    error_logger.error(f"Error releasing leader lease: {str(e) or type(e).__name__}")
+            self.valid_until = 0.0
+        await self._set_leading(False)
+        if self.redis is not None:
+            await self.redis.aclose()
+
+    async def _release(self):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self.key)
+                if await pipe.get(self.key) == self.instance_id.encode():
+                    pipe.multi()
+                    pipe.delete(self.key)
+                    await pipe.execute()
+            except redis.WatchError:
+                pass
+
+class UpdateRelay:
+    """Redis list of incoming Telegram updates: the leader pushes, every process pops"""
+
+    def __init__(self, redis_url: str, name: str = None, prefetch: int = None):
+        name = name or Config.CLUSTER_NAME
+        self.key = f"{name}:updates"
+        self.seen_prefix = f"{name}:seen:"
+        self.prefetch = prefetch or Config.CLUSTER_PREFETCH
+        # BLPOP menahan koneksi sampai POP_TIMEOUT, jadi socket timeout harus lebih lama
+        self.redis = aioredis.from_url(
+            redis_url,
+            socket_timeout=POP_TIMEOUT + Config.LEADER_RENEW_INTERVAL,
+            socket_connect_timeout=Config.LEADER_RENEW_INTERVAL
+        )
+        self.updater: Optional[Updater] = None
+        self._updates: Optional[asyncio.Queue] = None
+        self._forwarder: Optional[asyncio.Task] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._handling: Set[asyncio.Task] = set()
+        self._outage = _Outage("Update relay")
+
+    async def start_polling(self, bot: Bot):
+        """Poll Telegram on this process (the leader) and push every update onto the list"""
+        if self._forwarder is not None:
+            return
+        if self.updater is None:
+            self._updates = asyncio.Queue()
+            self.updater = Updater(bot, self._updates)
+            await self.updater.initialize()
+        await self.updater.start_polling()
+        self._forwarder = asyncio.get_running_loop().create_task(self._forward())
+        activity_logger.info("Polling Telegram and relaying updates through Redis")
+
+    async def stop_polling(self):
+        """Stop polling; updates already fetched are still pushed before this returns"""
+        if self._forwarder is None:
+            return
+        try:
+            if self.updater.running:
+                await self.updater.stop()
+        finally:
+            await self._updates.put(None)
+            await self._forwarder
+            self._forwarder = None
+            activity_logger.info("Stopped polling Telegram")
+
+    async def _forward(self):
+        while True:
+            update = await self._updates.get()
+            if update is None:
+                return
+            while True:
+                try:
+                    await self.push(update)
+                    self._outage.ok()
+                    break
+                except REDIS_ERRORS as e:
+                    # Update sudah dikonfirmasi ke Telegram; coba lagi daripada hilang
+                    self._outage.failed(e)
+                    await asyncio.sleep(Config.LEADER_RENEW_INTERVAL)
+
+    async def push(self, update: Update) -> bool:
+        """Queue an update once; False if it was queued before (redelivered after a failover)"""
+        seen = f"{self.seen_prefix}{update.update_id}"
+        # Penanda dan isi list ditulis dalam satu MULTI/EXEC: kegagalan di antaranya tidak menghilangkan update
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(seen)
+                if await pipe.exists(seen):
+                    DUPLICATES.value += 1
+                    return False
+                pipe.multi()
+                pipe.set(seen, 1, ex=SEEN_TTL)
+                pipe.rpush(self.key, update.to_json())
+                await pipe.execute()
+            except redis.WatchError:
+                DUPLICATES.value += 1
+                return False
+        PUBLISHED.value += 1
+        return True
+
+    def start(self, handle: Callable[[bytes], Awaitable]):
+        """Pop updates and run handle(payload) for each, at most `prefetch` at a time"""
+        if self._consumer is None:
+            self._consumer = asyncio.get_running_loop().create_task(self._consume(handle))
+
+    async def _consume(self, handle: Callable[[bytes], Awaitable]):
+        # Hanya mengambil update saat ada slot kosong, agar proses yang sibuk tidak menimbun antrean
+        slots = asyncio.Semaphore(self.prefetch)
+
+        def done(task: asyncio.Task):
+            self._handling.discard(task)
+            slots.release()
+            if not task.cancelled() and task.exception() is not None:
+                error_logger.error(f"Error handling relayed update: {str(task.exception())}")
+
+        while True:
+            await slots.acquire()
+            try:
+                item = await self.redis.blpop([self.key], timeout=POP_TIMEOUT)
+                self._outage.ok()
+            except asyncio.CancelledError:
+                raise
+            except REDIS_ERRORS as e:
+                slots.release()
+                self._outage.failed(e)
+                await asyncio.sleep(Config.CACHE_REDIS_RETRY)
+                continue
+            if item is None:
+                slots.release()
+                continue
+            HANDLED.value += 1
+            task = asyncio.get_running_loop().create_task(handle(item[1]))
+            self._handling.add(task)
+            task.add_done_callback(done)
+
+    async def stop(self):
+        await self.stop_polling()
+        if self._consumer is not None:
+            self._consumer.cancel()
+            try:
+                await self._consumer
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._consumer = None
+        if self._handling:
+            await asyncio.wait(self._handling, timeout=Config.LEADER_LEASE_TTL)
+        await self.redis.aclose()
+
+class ChangeFeed:
+    """Tell the other processes that shared state changed, coalescing bursts per topic.
+
+    Topics are strings like 'alerts' or 'candles:1h'; handlers subscribe
+    to the part before ':' and receive the full topic. A process does not
+    receive its own notices.
+    """
+
+    def __init__(self, redis_url: Optional[str], instance_id: str, name: str = None, delay: float = None):
+        self.instance_id = instance_id
+        self.channel = f"{name or Config.CLUSTER_NAME}:changes"
+        self.delay = delay if delay is not None else Config.CLUSTER_SYNC_DELAY
+        self.redis = aioredis.from_url(
+            redis_url,
+            socket_timeout=Config.LEADER_RENEW_INTERVAL,
+            socket_connect_timeout=Config.LEADER_RENEW_INTERVAL
+        ) if redis_url else None
+        self.handlers: Dict[str, Callable[[str], Awaitable]] = {}
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._listener: Optional[asyncio.Task] = None
+        self._outage = _Outage("Change feed")
+
+    def subscribe(self, kind: str, handler: Callable[[str], Awaitable]):
+        self.handlers[kind] = handler
+
+    def start(self):
+        if self.redis is not None and self._listener is None:
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    def notify(self, topic: str):
+        """Publish a change notice without waiting (safe to call from sync code on the loop)"""
+        if self.redis is not None:
+            self._spawn(self._publish(topic))
+
+    def _spawn(self, coroutine: Awaitable):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _publish(self, topic: str):
+        try:
+            await self.redis.publish(self.channel, f"{self.instance_id} {topic}")
+        except REDIS_ERRORS as e:
+            # Sinkron berkala (CLUSTER_SYNC_INTERVAL) menutup notifikasi yang hilang
+            self._outage.failed(e)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._outage.ok()
+                async for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    sender, topic = message['data'].decode().split(' ', 1)
+                    if sender != self.instance_id:
+                        self._schedule(topic)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._outage.failed(e)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(Config.CACHE_REDIS_RETRY)
+
+    def _schedule(self, topic: str):
+        if topic in self._pending or topic.split(':', 1)[0] not in self.handlers:
+            return
+        self._pending.add(topic)
+        asyncio.get_running_loop().call_later(self.delay, self._fire, topic)
+
+    def _fire(self, topic: str):
+        self._pending.discard(topic)
+        self._spawn(self._run_handler(topic))
+
+    async def _run_handler(self, topic: str):
+        try:
+            await self.handlers[topic.split(':', 1)[0]](topic)
+        except Exception as e:
+            error_logger.error(f"Error applying change {topic}: {str(e)}", exc_info=True)
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        if self.redis is not None:
+            await self.redis.aclose()
@@ -0,0 +1,126 @@
+"""Deferred imports for heavy optional-at-startup dependencies.
+
+`pd = lazy('pandas')` binds a placeholder at import time; the real module
+is imported on first attribute access (or by warm_up() on a background
+thread once the bot is polling). After loading, the module's attributes are
+copied onto the placeholder, so later `pd.DataFrame` lookups cost the same
+as on the module itself.
+
+    python -m src.utils.lazy_imports   # import-time report for the bot
+"""
+import argparse
+import importlib
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List
+from src.utils.logger import activity_logger, error_logger
+
+# Modul berat yang dipanaskan setelah polling berjalan
+HEAVY_MODULES = ('pandas', 'matplotlib.figure', 'matplotlib.backends.backend_agg', 'ccxt')
+
+class LazyModule:
+    def __init__(self, name: str):
+        object.__setattr__(self, '_lazy_name', name)
+        object.__setattr__(self, '_lazy_module', None)
+
+    def _load(self):
+        module = self._lazy_module
+        if module is None:
+            module = _import(self._lazy_name, 'first use')
+            self.__dict__.update(module.__dict__)
+            object.__setattr__(self, '_lazy_module', module)
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._lazy_module is not None else 'not loaded'
+        return f"<lazy module {self._lazy_name!r} ({state})>"
+
+# name -> {'seconds': durasi import, 'trigger': 'first use'/'warm-up', 'thread': nama thread}
+_loaded: Dict[str, Dict] = {}
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+def _initialized(name: str):
+    """The module if it is fully imported; one still being imported on another thread is not"""
+    module = sys.modules.get(name)
+    if module is None or getattr(getattr(module, '__spec__', None), '_initializing', False):
+        return None
+    return module
+
+def _import(name: str, trigger: str):
+    module = _initialized(name)
+    if module is not None:
+        return module
+    with _locks_guard:
+        lock = _locks.setdefault(name, threading.Lock())
+    # Kunci per modul: pemakaian ccxt tidak menunggu pemanasan pandas
+    with lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            # Diimpor di luar modul ini (import biasa di thread lain): import_module menunggu sampai selesai
+            return importlib.import_module(name)
+        start = time.perf_counter()
+        if name == 'matplotlib.pyplot':
+            import matplotlib
+            matplotlib.use('Agg')  # Bot hanya merender ke PNG; tanpa GUI backend
+        module = importlib.import_module(name)
+        seconds = time.perf_counter() - start
+        _loaded[name] = {'seconds': seconds, 'trigger': trigger, 'thread': threading.current_thread().name}
+    activity_logger.info("Imported %s in %.2fs (%s)", name, seconds, trigger)
+    return module
+
+def lazy(name: str) -> LazyModule:
+    """Placeholder for module `name` that imports it on first attribute access"""
+    return LazyModule(name)
+
+def warm_up(names: Iterable[str] = HEAVY_MODULES) -> threading.Thread:
+    """Import the given modules on a daemon thread so first use does not pay for it"""
+    def run():
+        for name in names:
+            try:
+                _import(name, 'warm-up')
+            except Exception as e:
+                error_logger.error(f"Error warming up {name}: {str(e)}")
+
+    thread = threading.Thread(target=run, name='import-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+def report() -> List[Dict]:
+    """Deferred imports done so far, slowest first"""
+    return sorted(({'module': name, **info} for name, info in _loaded.items()),
+                  key=lambda item: item['seconds'], reverse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='src.bot.telegram_bot')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--heavy', action='store_true', help="Also import HEAVY_MODULES, as after warm-up")
+    args = parser.parse_args()
+
+    code = f"import {args.module}"
+    if args.heavy:
+        code += "\nimport matplotlib; matplotlib.use('Agg')\n" + "\n".join(f"import {name}" for name in HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(result.stderr)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    # Baris tanpa indentasi adalah import tingkat atas; jumlahnya = total waktu import
+    total = sum(cumulative for cumulative, _, name in rows if not name.startswith('  '))
+    print(f"import {args.module}{' + HEAVY_MODULES' if args.heavy else ''}: {total / 1e6:.2f}s")
+    for cumulative, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative / 1e3:9.1f} ms  {self_us / 1e3:8.1f} ms self  {name}")
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,177 @@
+"""Logging setup: callers only enqueue records, a background thread writes them.
+
+Every logger gets a QueueHandler, so a log call on the event loop costs a
+level check, a per-call-site rate limit and a queue put. The message itself
+is formatted later on the writer thread, together with the file and console
+I/O. Log files are JSON lines (one object per record, `extra=` fields
+included); the console keeps the plain text format.
+
+Each call site (logger, file, line) may emit LOG_RATE records per second
+with bursts of LOG_BURST; the excess is dropped and the count is attached
+to the next record from that site as `suppressed`. When the writer falls
+behind and the queue is full, records are dropped and counted as `dropped`.
+"""
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List
+from config.config import Config
+
+# Atribut bawaan LogRecord; selain ini berasal dari extra= dan ikut ditulis ke JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+_PLAIN_ARGS = (str, int, float, bool, type(None))
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, extra fields and exc"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per call site; suppressed records are counted, not formatted"""
+
+    def __init__(self, rate: float, burst: float):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.sites: Dict[tuple, List[float]] = {}  # site -> [token, waktu terakhir, jumlah ditekan]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0:
+            return True
+        site = (record.name, record.pathname, record.lineno)
+        now = record.created
+        state = self.sites.get(site)
+        if state is None:
+            state = self.sites[site] = [self.burst, now, 0]
+        else:
+            state[0] = min(self.burst, state[0] + (now - state[1]) * self.rate)
+            state[1] = now
+        if state[0] < 1:
+            state[2] += 1
+            return False
+        state[0] -= 1
+        if state[2]:
+            record.suppressed = int(state[2])
+            state[2] = 0
+        return True
+
+class _LazyQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the writer thread"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Argumen yang bisa berubah (dict, list, objek) dirender sekarang agar
+        # pesan mencerminkan nilai saat log dipanggil, bukan saat ditulis
+        args = record.args
+        if args and (not isinstance(args, tuple) or not all(isinstance(arg, _PLAIN_ARGS) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # Traceback dirender di sini; frame-nya tidak boleh ditahan antrean
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if self.dropped:
+            record.dropped = self.dropped
+            self.dropped = 0
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _RoutingHandler(logging.Handler):
+    """Writer-thread side: send each record to the handlers of its logger"""
+
+    def __init__(self):
+        super().__init__()
+        self.routes: Dict[str, List[logging.Handler]] = {}
+
+    def handle(self, record: logging.LogRecord):
+        for handler in self.routes.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def flush(self):
+        for handlers in self.routes.values():
+            for handler in handlers:
+                handler.flush()
+
+_queue: queue.Queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+_router = _RoutingHandler()
+_listener = QueueListener(_queue, _router)
+_rate_limit = RateLimitFilter(Config.LOG_RATE, Config.LOG_BURST)
+_lock = threading.Lock()
+_running = False
+
+def _start():
+    global _running
+    with _lock:
+        if not _running:
+            _listener.start()
+            _running = True
+            atexit.register(shutdown)
+
+def shutdown():
+    """Drain the queue and flush the files (runs at exit)"""
+    global _running
+    with _lock:
+        if _running:
+            _listener.stop()
+            _router.flush()
+            _running = False
 
 def setup_logger(name, log_file, level=logging.INFO):
-    """Function to setup a logger with file and console handlers"""
-    
+    """Function to setup a logger whose file and console handlers run on the writer thread"""
+
     # Create logs directory if it doesn't exist
     os.makedirs('logs', exist_ok=True)
-    
-    # Create formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    # Create and set up file handler
+
     file_handler = RotatingFileHandler(
         f'logs/{log_file}',
         maxBytes=10485760,  # 10MB
         backupCount=5
     )
-    file_handler.setFormatter(formatter)
-    
-    # Create and set up console handler
+    file_handler.setFormatter(JsonFormatter() if Config.LOG_FORMAT == 'json' else logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    
-    # Get logger
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    _router.routes[name] = [file_handler, console_handler]
+
+    queue_handler = _LazyQueueHandler(_queue)
+    queue_handler.addFilter(_rate_limit)
+
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
-    # Add handlers
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
+    logger.propagate = False
+    logger.addHandler(queue_handler)
+
+    _start()
     return logger
 
 # Create main loggers
-activity_logger = setup_logger('activity', 'activity.log')
-error_logger = setup_logger('error', 'error.log', level=logging.ERROR) 
\ No newline at end of file
+activity_logger = setup_logger('activity', 'activity.log', level=getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO))
+error_logger = setup_logger('error', 'error.log', level=logging.ERROR)
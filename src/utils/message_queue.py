@@ -0,0 +1,322 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from telegram.error import Forbidden, BadRequest, NetworkError, RetryAfter
+from config.config import Config
+from src.utils.logger import activity_logger, error_logger
+
+# Semakin kecil semakin didahulukan
+PRIORITY_ALERT = 0
+PRIORITY_SIGNAL = 1
+PRIORITY_INFO = 2
+
+MAX_MESSAGE_LENGTH = 4096
+MERGE_SEPARATOR = "\n\n"
+MAX_IDLE_BUCKETS = 10000
+
+class TokenBucket:
+    """Token bucket rate limiter (rate tokens/second, up to capacity)"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float = None, amount: float = 1) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, now: float = None, amount: float = 1):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= amount
+
+class OutboundMessage:
+    __slots__ = ('method', 'chat_id', 'kwargs', 'priority', 'futures', 'attempts')
+
+    def __init__(self, method: str, chat_id, kwargs: Dict, priority: int, future: asyncio.Future):
+        self.method = method
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.priority = priority
+        self.futures = [future]
+        self.attempts = 0
+
+    @property
+    def mergeable(self) -> bool:
+        return self.method == 'send_message' and set(self.kwargs) <= {'text', 'parse_mode'}
+
+class OutboundMessageQueue:
+    """Central scheduler for outgoing Telegram calls.
+
+    Messages are delivered by priority under a global and a per-chat token
+    bucket; within a chat, alerts go ahead of signals and info messages
+    queued earlier. Pending plain messages of the same priority to the same
+    chat are merged into one message, RetryAfter pauses sending for the
+    requested time and requeues the message, and transient network errors
+    hold the chat back for an exponential backoff before the retry.
+    """
+
+    default: Optional['OutboundMessageQueue'] = None
+
+    def __init__(self, bot, global_rate: float = None, chat_rate: float = None,
+                 chat_burst: float = None, max_in_flight: int = None, max_retries: int = 3):
+        self.bot = bot
+        # Kapasitas 1: kirim merata, tanpa burst yang melewati batas per detik
+        self.global_bucket = TokenBucket(global_rate or Config.TELEGRAM_GLOBAL_RATE, 1)
+        self.chat_rate = chat_rate or Config.TELEGRAM_CHAT_RATE
+        self.chat_burst = chat_burst or Config.TELEGRAM_CHAT_BURST
+        self.max_retries = max_retries
+        self._in_flight = asyncio.Semaphore(max_in_flight or Config.TELEGRAM_MAX_IN_FLIGHT)
+
+        self._pending: Dict[object, Dict[int, Deque[OutboundMessage]]] = {}  # chat_id -> priority -> FIFO
+        self._buckets: Dict[object, TokenBucket] = {}
+        # chat_id -> (seq, priority, ready_at) entri heap yang berlaku; entri lain dengan seq berbeda usang
+        self._scheduled: Dict[object, Tuple[int, int, float]] = {}
+        self._backoff: Dict[object, float] = {}  # chat_id -> chat tidak dikirimi sebelum waktu ini (retry jaringan)
+        self._ready: List = []  # (priority, seq, chat_id)
+        self._waiting: List = []  # (ready_at, priority, seq, chat_id)
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._paused_until = 0.0
+        self._worker: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+        self.sent = 0
+        self.merged = 0
+        self.retried = 0
+        self.failed = 0
+
+    def __len__(self):
+        return sum(len(messages) for queues in self._pending.values() for messages in queues.values())
+
+    async def start(self):
+        """Start the delivery worker and make this the default queue"""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+        OutboundMessageQueue.default = self
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Try to deliver what is pending, then stop the worker"""
+        deadline = time.monotonic() + drain_timeout
+        while (len(self) or self._tasks) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if OutboundMessageQueue.default is self:
+            OutboundMessageQueue.default = None
+
+    def send_message(self, chat_id, text: str, priority: int = PRIORITY_INFO, **kwargs) -> asyncio.Future:
+        """Queue a message; the returned future resolves to the sent Message"""
+        return self.enqueue('send_message', chat_id, priority, text=text, **kwargs)
+
+    def broadcast(self, chat_ids: Iterable, text: str, priority: int = PRIORITY_INFO, **kwargs) -> List[asyncio.Future]:
+        """Queue the same message for many chats"""
+        return [self.send_message(chat_id, text, priority, **kwargs) for chat_id in chat_ids]
+
+    def enqueue(self, method: str, chat_id, priority: int = PRIORITY_INFO, **kwargs) -> asyncio.Future:
+        """Queue any chat-scoped Bot API call (send_message, send_photo, edit_message_text, ...)"""
+        future = asyncio.get_running_loop().create_future()
+        message = OutboundMessage(method, chat_id, kwargs, priority, future)
+        self._pending.setdefault(chat_id, {}).setdefault(priority, deque()).append(message)
+        self._schedule(chat_id, priority)
+        return future
+
+    def _schedule(self, chat_id, priority: int, ready_at: float = 0.0):
+        now = time.monotonic()
+        backoff = self._backoff.get(chat_id)
+        if backoff is not None:
+            if backoff > now:
+                ready_at = max(ready_at, backoff)
+            else:
+                del self._backoff[chat_id]
+
+        current = self._scheduled.get(chat_id)
+        if current is not None and current[1] <= priority and current[2] <= ready_at:
+            return  # Entri yang ada sudah sama cepat dan sama penting
+
+        seq = next(self._seq)
+        self._scheduled[chat_id] = (seq, priority, ready_at)
+        if ready_at > now:
+            heapq.heappush(self._waiting, (ready_at, priority, seq, chat_id))
+        else:
+            heapq.heappush(self._ready, (priority, seq, chat_id))
+        self._wakeup.set()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _next_chat(self, now: float):
+        """Pop the highest priority chat that may receive a message now"""
+        while self._waiting and self._waiting[0][0] <= now:
+            _, priority, seq, chat_id = heapq.heappop(self._waiting)
+            heapq.heappush(self._ready, (priority, seq, chat_id))
+
+        while self._ready:
+            priority, seq, chat_id = heapq.heappop(self._ready)
+            current = self._scheduled.get(chat_id)
+            if current is None or current[0] != seq or not self._pending.get(chat_id):
+                continue  # Entri usang
+
+            delay = self._chat_bucket(chat_id).delay(now)
+            if delay > 0:
+                seq = next(self._seq)
+                self._scheduled[chat_id] = (seq, priority, now + delay)
+                heapq.heappush(self._waiting, (now + delay, priority, seq, chat_id))
+                continue
+
+            del self._scheduled[chat_id]
+            return chat_id
+        return None
+
+    def _take_batch(self, chat_id) -> OutboundMessage:
+        """Pop the chat's most urgent call, merging following plain messages of the same priority"""
+        queues = self._pending[chat_id]
+        priority = min(queues)
+        pending = queues[priority]
+        message = pending.popleft()
+        if message.mergeable:
+            length = len(message.kwargs['text'])
+            while pending and pending[0].mergeable and \
+                    pending[0].kwargs.get('parse_mode') == message.kwargs.get('parse_mode'):
+                extra = len(MERGE_SEPARATOR) + len(pending[0].kwargs['text'])
+                if length + extra > MAX_MESSAGE_LENGTH:
+                    break
+                other = pending.popleft()
+                message.kwargs['text'] += MERGE_SEPARATOR + other.kwargs['text']
+                message.futures.extend(other.futures)
+                length += extra
+                self.merged += 1
+
+        if not pending:
+            del queues[priority]
+        if queues:
+            self._schedule(chat_id, min(queues))
+        else:
+            del self._pending[chat_id]
+            self._backoff.pop(chat_id, None)  # Chat hanya diambil setelah backoff-nya lewat
+            if len(self._buckets) > MAX_IDLE_BUCKETS:
+                self._prune_buckets()
+        return message
+
+    def _prune_buckets(self):
+        """Forget rate limiter state of idle chats whose bucket has refilled"""
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, bucket in self._buckets.items()
+                        if chat_id not in self._pending and bucket.delay(now) == 0
+                        and bucket.tokens >= bucket.capacity]:
+            del self._buckets[chat_id]
+
+    async def _run(self):
+        while True:
+            try:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                # Tunggu token global sebelum memilih chat, agar pilihan tidak basi saat
+                # dikirim (mis. pesan yang baru gagal dan masuk backoff selama tidur)
+                delay = self.global_bucket.delay(now)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+
+                chat_id = self._next_chat(now)
+                if chat_id is None:
+                    self._wakeup.clear()
+                    timeout = self._waiting[0][0] - now if self._waiting else None
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                self.global_bucket.take()
+                self._chat_bucket(chat_id).take()
+
+                message = self._take_batch(chat_id)
+                await self._in_flight.acquire()
+                task = asyncio.create_task(self._deliver(message))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error_logger.error(f"Error in outbound message queue: {str(e)}", exc_info=True)
+                await asyncio.sleep(1)
+
+    def _requeue(self, message: OutboundMessage, ready_at: float = 0.0):
+        queues = self._pending.setdefault(message.chat_id, {})
+        queues.setdefault(message.priority, deque()).appendleft(message)
+        if ready_at:
+            # Tahan seluruh chat: pesan lain tidak boleh menyalip pesan yang sedang backoff
+            self._backoff[message.chat_id] = max(ready_at, self._backoff.get(message.chat_id, 0.0))
+        self._scheduled.pop(message.chat_id, None)  # Entri heap lama tidak berlaku lagi
+        self._schedule(message.chat_id, min(queues), ready_at)
+
+    async def _deliver(self, message: OutboundMessage):
+        try:
+            result = await getattr(self.bot, message.method)(chat_id=message.chat_id, **message.kwargs)
+            self.sent += 1
+            for future in message.futures:
+                if not future.done():
+                    future.set_result(result)
+
+        except RetryAfter as e:
+            # Flood limit: hentikan semua pengiriman sementara lalu coba lagi
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+            self._paused_until = max(self._paused_until, time.monotonic() + float(retry_after))
+            self.retried += 1
+            activity_logger.warning(f"Telegram flood limit hit, pausing sends for {retry_after}s")
+            self._requeue(message)
+
+        except (Forbidden, BadRequest) as e:
+            self._fail(message, e)
+
+        except NetworkError as e:
+            message.attempts += 1
+            if message.attempts > self.max_retries:
+                self._fail(message, e)
+            else:
+                self.retried += 1
+                self._requeue(message, time.monotonic() + 2 ** message.attempts)
+
+        except Exception as e:
+            self._fail(message, e)
+
+        finally:
+            self._in_flight.release()
+
+    def _fail(self, message: OutboundMessage, exc: Exception):
+        self.failed += 1
+        error_logger.error(f"Failed to {message.method} to {message.chat_id}: {str(exc)}")
+        for future in message.futures:
+            if not future.done():
+                future.set_exception(exc)
+                # Hindari warning "exception was never retrieved" untuk pemanggil fire-and-forget
+                future.exception()
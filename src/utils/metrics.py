@@ -0,0 +1,375 @@
+"""In-process metrics: counters, gauges and latency histograms.
+
+Metric objects are created once (at import or decoration time) and the hot
+path is a couple of attribute increments plus a bisect over fixed bucket
+bounds, well under a microsecond per event. Updates take no lock: under
+heavy thread contention an increment can occasionally be lost, which is an
+acceptable error for monitoring and keeps the cost low enough to leave on.
+"""
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from src.utils import lazy_imports
+from src.utils.logger import activity_logger, error_logger
+
+# Batas bucket latensi dalam detik
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# perf_counter_ns + offset = waktu Unix dalam ns, tanpa memanggil time.time() di jalur panas
+_WALL_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+class Counter:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+class Gauge:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+class ClockGauge:
+    """Timestamp gauge set from perf_counter_ns; converted to Unix seconds only when read"""
+    __slots__ = ('ns',)
+
+    def __init__(self):
+        self.ns = 0
+
+    @property
+    def value(self) -> float:
+        return (self.ns + _WALL_OFFSET_NS) / 1e9 if self.ns else 0.0
+
+    @value.setter
+    def value(self, value: float):
+        self.ns = round(value * 1e9) - _WALL_OFFSET_NS if value else 0
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Bucket terakhir: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (0 if empty)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class Registry:
+    """Metric families keyed by name, each holding one metric per label set"""
+
+    def __init__(self):
+        self.families: Dict[str, Tuple[str, str, Dict[LabelKey, object]]] = {}  # name -> (type, help, metrics)
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def _get(self, kind: str, factory: Callable, name: str, help_text: str, labels: Dict[str, str]):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        family = self.families.get(name)
+        if family is None or key not in family[2]:
+            with self._lock:
+                family = self.families.setdefault(name, (kind, help_text, {}))
+                if family[0] != kind:
+                    raise ValueError(f"Metric {name} already registered as {family[0]}")
+                if key not in family[2]:
+                    family[2][key] = factory()
+        return family[2][key]
+
+    def counter(self, name: str, help_text: str = '', **labels) -> Counter:
+        return self._get('counter', Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str = '', **labels) -> Gauge:
+        return self._get('gauge', Gauge, name, help_text, labels)
+
+    def clock_gauge(self, name: str, help_text: str = '', **labels) -> ClockGauge:
+        return self._get('gauge', ClockGauge, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str = '', **labels) -> Histogram:
+        return self._get('histogram', Histogram, name, help_text, labels)
+
+    def collect(self, name: str) -> List[Tuple[Dict[str, str], object]]:
+        family = self.families.get(name)
+        if family is None:
+            return []
+        return [(dict(key), metric) for key, metric in list(family[2].items())]
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for name, (kind, help_text, metrics) in sorted(self.families.items()):
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in sorted(metrics.items()):
+                if kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.bounds + (float('inf'),), metric.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(key)} {metric.sum}")
+                    lines.append(f"{name}_count{_labels(key)} {metric.count}")
+                else:
+                    lines.append(f"{name}{_labels(key)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+def _labels(key: LabelKey) -> str:
+    if not key:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in key)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + '}'
+
+REGISTRY = Registry()
+
+def timed(name: str, failure_on_empty: bool = False, **labels):
+    """Record latency into `<name>_seconds` and outcomes into `<name>_total{status}`.
+
+    Works for plain and coroutine functions; the method label is the
+    function name. With failure_on_empty an empty result (None, {} or [])
+    counts as an error, for clients that log and return nothing instead of
+    raising.
+    """
+    def decorator(func):
+        method_labels = dict(labels, method=func.__name__)
+        histogram = REGISTRY.histogram(f"{name}_seconds", f"Latency of {name}", **method_labels)
+        ok = REGISTRY.counter(f"{name}_total", f"Calls of {name} by outcome", status='ok', **method_labels)
+        failed = REGISTRY.counter(f"{name}_total", f"Calls of {name} by outcome", status='error', **method_labels)
+        last_ok = REGISTRY.clock_gauge(f"{name}_last_success_timestamp", f"Last successful {name}", **labels)
+        last_error = REGISTRY.clock_gauge(f"{name}_last_error_timestamp", f"Last failed {name}", **labels)
+
+        # Jalur panas memakai nanodetik integer: bisect pada batas int, tanpa lookup label
+        bounds = tuple(round(bound * 1e9) for bound in histogram.bounds)
+        counts = histogram.counts
+        clock = time.perf_counter_ns
+
+        def record(start: int, success: bool):
+            end = clock()
+            elapsed = end - start
+            counts[bisect_left(bounds, elapsed)] += 1
+            histogram.sum += elapsed * 1e-9
+            histogram.count += 1
+            if success:
+                ok.value += 1
+                last_ok.ns = end
+            else:
+                failed.value += 1
+                last_error.ns = end
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = clock()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    record(start, False)
+                    raise
+                record(start, not (failure_on_empty and not result))
+                return result
+            return async_wrapper
+
+        if failure_on_empty:
+            @functools.wraps(func)
+            def checked_wrapper(*args, **kwargs):
+                start = clock()
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    record(start, False)
+                    raise
+                record(start, bool(result))
+                return result
+            return checked_wrapper
+
+        # Jalur tersering (sinkron, tanpa failure_on_empty) ditulis inline: satu frame lebih sedikit
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                record(start, False)
+                raise
+            end = clock()
+            elapsed = end - start
+            counts[bisect_left(bounds, elapsed)] += 1
+            histogram.sum += elapsed * 1e-9
+            histogram.count += 1
+            ok.value += 1
+            last_ok.ns = end
+            return result
+        return wrapper
+    return decorator
+
+def instrument(name: str, methods: Iterable[str] = None, failure_on_empty: bool = False, **labels):
+    """Class decorator applying timed() to public methods (or only `methods`), static methods included"""
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if methods is not None and attr not in methods:
+                continue
+            if methods is None and attr.startswith('_'):
+                continue
+            if isinstance(value, staticmethod):
+                setattr(cls, attr, staticmethod(timed(name, failure_on_empty, **labels)(value.__func__)))
+            elif callable(value) and not isinstance(value, type):
+                setattr(cls, attr, timed(name, failure_on_empty, **labels)(value))
+        return cls
+    return decorator
+
+def last_outcome(name: str, **labels) -> Tuple[float, float]:
+    """Unix times of the last success and last failure recorded by timed(name, **labels) (0 if never)"""
+    return (REGISTRY.clock_gauge(f"{name}_last_success_timestamp", **labels).value,
+            REGISTRY.clock_gauge(f"{name}_last_error_timestamp", **labels).value)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrape berkala tidak perlu dicatat
+
+def start_http_server(port: int, host: str = '127.0.0.1', span: int = 1) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics for a local Prometheus scraper on a daemon thread.
+
+    With span > 1 the next ports are tried when `port` is taken, so several
+    bot processes on one host each get an endpoint (port, port + 1, ...).
+    """
+    server = None
+    for candidate in range(port, port + max(1, span)):
+        try:
+            server = ThreadingHTTPServer((host, candidate), _MetricsHandler)
+            port = candidate
+            break
+        except OSError as e:
+            error = e
+    if server is None:
+        error_logger.error(f"Metrics endpoint not started on {host}:{port}-{port + max(1, span) - 1}: {str(error)}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    activity_logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
+
+class RateTracker:
+    """Per-second rates of counters between two summary() calls"""
+
+    def __init__(self):
+        self._previous: Dict[Tuple, Tuple[float, float]] = {}
+
+    def rate(self, key: Tuple, value: float, now: float = None) -> float:
+        now = time.monotonic() if now is None else now
+        previous = self._previous.get(key)
+        self._previous[key] = (now, value)
+        if previous is None or now <= previous[0]:
+            return 0.0
+        return (value - previous[1]) / (now - previous[0])
+
+def _ms(seconds: float) -> str:
+    if seconds == float('inf'):
+        return '>30s'
+    return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.1f}s"
+
+def _latency_lines(name: str, label: str, prefix: str = '', limit: int = 10) -> List[str]:
+    outcomes: Dict[Tuple, Dict[str, float]] = {}
+    for labels, counter in REGISTRY.collect(f"{name}_total"):
+        status = labels.pop('status')
+        outcomes.setdefault(tuple(sorted(labels.items())), {})[status] = counter.value
+
+    rows = []
+    for labels, histogram in REGISTRY.collect(f"{name}_seconds"):
+        if not histogram.count:
+            continue
+        counts = outcomes.get(tuple(sorted(labels.items())), {})
+        errors = counts.get('error', 0)
+        total = errors + counts.get('ok', 0)
+        text = f"• {prefix}{label.format(**labels)} n={histogram.count} " \
+               f"p50 {_ms(histogram.quantile(0.5))} p99 {_ms(histogram.quantile(0.99))}"
+        if total and errors:
+            text += f" err {errors / total * 100:.1f}%"
+        rows.append((histogram.count, text))
+    rows.sort(reverse=True)
+    return [text for _, text in rows[:limit]]
+
+_rates = RateTracker()
+
+def summary() -> str:
+    """Compact plain-text overview for the admin /metrics command"""
+    uptime = int(time.time() - REGISTRY.started_at)
+    lines = [f"📊 Metrics (uptime {uptime // 3600}j {uptime % 3600 // 60}m)", ""]
+
+    sections = (
+        ("Handler Telegram", 'telegram_handler', "/{command}"),
+        ("Exchange", 'exchange_request', "{exchange}.{method}"),
+        ("Database", 'db_operation', "{method}")
+    )
+    for title, name, label in sections:
+        rows = _latency_lines(name, label)
+        lines.append(f"{title}:")
+        lines.extend(rows or ["• -"])
+        lines.append("")
+
+    lines.append("Cache:")
+    caches: Dict[str, Dict[str, float]] = {}
+    for labels, counter in REGISTRY.collect('cache_requests_total'):
+        caches.setdefault(labels['cache'], {})[labels['result']] = counter.value
+    for cache, results in sorted(caches.items()):
+        total = sum(results.values())
+        hits = results.get('hit', 0)
+        lines.append(f"• {cache}: hit {hits / total * 100 if total else 0:.1f}% dari {total:.0f}")
+    if not caches:
+        lines.append("• -")
+    lines.append("")
+
+    lines.append("WebSocket:")
+    streams = REGISTRY.collect('websocket_messages_total')
+    for labels, counter in sorted(streams, key=lambda item: sorted(item[0].items())):
+        key = tuple(sorted(labels.items()))
+        rate = _rates.rate(key, counter.value)
+        lines.append(f"• {labels.get('exchange')}/{labels.get('stream')}: {counter.value:.0f} pesan, {rate:.1f}/detik")
+    if not streams:
+        lines.append("• -")
+    lines.append("")
+
+    lines.append("Import tertunda:")
+    deferred = lazy_imports.report()
+    for item in deferred:
+        lines.append(f"• {item['module']}: {item['seconds']:.2f}s ({item['trigger']})")
+    if not deferred:
+        lines.append("• -")
+    return "\n".join(lines)
@@ -0,0 +1,205 @@
+"""Slow-handler capture and an on-demand sampling profiler.
+
+HandlerProfiler wraps every registered handler callback. A watchdog thread
+notices handlers running longer than SLOW_HANDLER_THRESHOLD and captures,
+while they are still slow, the handler's coroutine stack, the event loop
+thread's stack (shows a handler blocking the loop) and the stacks of the
+executor threads doing its asyncio.to_thread work. In 'cprofile' mode one
+handler at a time additionally runs under cProfile and the report is kept
+when it turns out slow.
+
+SamplingProfiler samples every thread's stack at a fixed interval for a
+time window and aggregates them in the folded format ("frame;frame;frame
+count") read by flamegraph.pl and speedscope.
+"""
+import asyncio
+import cProfile
+import functools
+import io
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, List, Optional
+from config.config import Config
+from src.utils.logger import activity_logger, error_logger
+
+def _format_frame(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+def _folded_stack(frame) -> List[str]:
+    """Frames from outermost to innermost"""
+    stack = []
+    while frame is not None:
+        stack.append(_format_frame(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+class HandlerProfiler:
+    """Times handler callbacks and keeps captures of the slow ones"""
+
+    def __init__(self, threshold: float = None, mode: str = None, keep: int = 20):
+        self.threshold = threshold if threshold is not None else Config.SLOW_HANDLER_THRESHOLD
+        self.mode = mode or Config.SLOW_HANDLER_CAPTURE
+        self.captures: Deque[Dict] = deque(maxlen=keep)
+        self._active: Dict[int, Dict] = {}  # id(task) -> {'name', 'start', 'task', 'captured'}
+        self._lock = threading.Lock()
+        self._watchdog: Optional[threading.Thread] = None
+        self._loop_thread: Optional[int] = None
+        self._profiling = False
+
+    def wrap(self, name: str, callback: Callable) -> Callable:
+        """Wrap an async handler callback(update, context)"""
+        @functools.wraps(callback)
+        async def wrapper(update, context):
+            task = asyncio.current_task()
+            self._loop_thread = threading.get_ident()
+            self._ensure_watchdog()
+            entry = {'name': name, 'start': time.monotonic(), 'task': task, 'captured': False}
+            with self._lock:
+                self._active[id(task)] = entry
+
+            profile = None
+            if self.mode == 'cprofile' and not self._profiling:
+                # Hanya satu cProfile aktif per thread; handler lain cukup dengan sampel stack
+                self._profiling = True
+                profile = cProfile.Profile()
+                profile.enable()
+            try:
+                return await callback(update, context)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                    self._profiling = False
+                with self._lock:
+                    self._active.pop(id(task), None)
+                duration = time.monotonic() - entry['start']
+                if duration >= self.threshold:
+                    activity_logger.warning(f"Slow handler {name}: {duration:.2f}s")
+                    if profile is not None:
+                        out = io.StringIO()
+                        pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(30)
+                        self._store(name, duration, 'cprofile', out.getvalue())
+                    elif entry.get('capture'):
+                        entry['capture']['duration'] = duration
+        return wrapper
+
+    def _ensure_watchdog(self):
+        if self._watchdog is None or not self._watchdog.is_alive():
+            self._watchdog = threading.Thread(target=self._watch, name='slow-handler-watchdog', daemon=True)
+            self._watchdog.start()
+
+    def _watch(self):
+        interval = max(0.05, self.threshold / 4)
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self._lock:
+                overdue = [entry for entry in self._active.values()
+                           if not entry['captured'] and now - entry['start'] >= self.threshold]
+                for entry in overdue:
+                    entry['captured'] = True
+            for entry in overdue:
+                try:
+                    entry['capture'] = self._store(entry['name'], now - entry['start'], 'stack', self._sample(entry['task']))
+                except Exception as e:
+                    error_logger.error(f"Error capturing slow handler stack: {str(e)}")
+
+    def _sample(self, task: asyncio.Task) -> str:
+        frames = sys._current_frames()
+        out = io.StringIO()
+        out.write("Coroutine stack:\n")
+        # Stack coroutine hanya dibaca; cukup aman meski task berjalan di thread loop
+        for frame in task.get_stack(limit=50) if task else []:
+            out.write(f"  {_format_frame(frame)} line {frame.f_lineno}\n")
+
+        for thread in threading.enumerate():
+            frame = frames.get(thread.ident)
+            if frame is None:
+                continue
+            is_loop = thread.ident == self._loop_thread
+            if not is_loop and not thread.name.startswith('asyncio_'):
+                continue  # Hanya thread loop dan thread executor asyncio.to_thread
+            label = "Event loop thread" if is_loop else f"Executor thread {thread.name}"
+            out.write(f"\n{label}:\n")
+            out.write("".join(traceback.format_stack(frame, limit=40)))
+        return out.getvalue()
+
+    def _store(self, name: str, duration: float, kind: str, report: str) -> Dict:
+        capture = {'name': name, 'duration': duration, 'kind': kind, 'at': time.time(), 'report': report}
+        self.captures.append(capture)
+        return capture
+
+    def format_captures(self) -> str:
+        if not self.captures:
+            return f"Belum ada handler yang melewati {self.threshold:.1f} detik."
+        lines = [f"🐢 Handler lambat (> {self.threshold:.1f} detik):"]
+        for i, capture in enumerate(reversed(self.captures), 1):
+            lines.append(
+                f"{i}. {capture['name']} {capture['duration']:.2f}s ({capture['kind']}, "
+                f"{time.strftime('%H:%M:%S', time.gmtime(capture['at']))} UTC)"
+            )
+        lines.append("\nDetail: /slowlog <nomor>")
+        return "\n".join(lines)
+
+class SamplingProfiler:
+    """Samples all thread stacks into folded stacks for a time window"""
+
+    def __init__(self, interval: float = None):
+        self.interval = interval or Config.PROFILE_SAMPLE_INTERVAL
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, on_done: Callable[['SamplingProfiler'], None] = None) -> bool:
+        """Start a window of at most `seconds`; False if one is already running"""
+        if self.running:
+            return False
+        self._stop.clear()
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, args=(min(seconds, Config.PROFILE_MAX_SECONDS), on_done),
+            name='sampling-profiler', daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, seconds: float, on_done):
+        own = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline and not self._stop.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = [names.get(ident, str(ident))] + _folded_stack(frame)
+                self.stacks[';'.join(stack)] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+        activity_logger.info(f"Sampling profiler collected {self.samples} samples")
+        if on_done:
+            try:
+                on_done(self)
+            except Exception as e:
+                error_logger.error(f"Error delivering profile: {str(e)}")
+
+    def folded(self) -> str:
+        """Flamegraph input: one 'thread;outer;...;inner count' line per distinct stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
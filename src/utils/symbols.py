@@ -0,0 +1,31 @@
+QUOTE_CURRENCIES = ('USDT', 'IDR')
+
+# Mata uang kuotasi harga di setiap exchange
+EXCHANGE_CURRENCY = {
+    'indodax': 'IDR',
+    'bitget': 'USDT'
+}
+
+def normalize_symbol(symbol: str) -> str:
+    """Normalize BTC, btc_idr, BTC/USDT or BTCUSDT to the base asset (BTC)"""
+    symbol = symbol.upper().replace('/', '').replace('-', '').replace('_', '')
+    for quote in QUOTE_CURRENCIES:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)]
+    return symbol
+
+def quote_currency(symbol: str) -> str:
+    """Get the quote currency of a symbol, defaulting to USDT"""
+    symbol = symbol.upper().replace('/', '').replace('-', '').replace('_', '')
+    for quote in QUOTE_CURRENCIES:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return quote
+    return 'USDT'
+
+def exchange_for_symbol(symbol: str) -> str:
+    """Pick the exchange that quotes a symbol: IDR pairs on Indodax, others on Bitget"""
+    return 'indodax' if quote_currency(symbol) == 'IDR' else 'bitget'
+
+def market_key(exchange: str, symbol: str) -> str:
+    """Identifier of one market across exchanges, e.g. indodax:BTC"""
+    return f"{exchange}:{normalize_symbol(symbol)}"
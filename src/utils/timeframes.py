@@ -0,0 +1,35 @@
+import time
+from typing import Optional
+
+# Durasi setiap timeframe yang didukung, dalam detik
+TIMEFRAME_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '1h': 3600,
+    '4h': 14400,
+    '1d': 86400
+}
+
+def timeframe_ms(timeframe: str) -> int:
+    """Get timeframe duration in milliseconds"""
+    if timeframe not in TIMEFRAME_SECONDS:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return TIMEFRAME_SECONDS[timeframe] * 1000
+
+def candle_open_time(timestamp_ms: int, timeframe: str) -> int:
+    """Get the open time (ms) of the candle containing timestamp_ms"""
+    step = timeframe_ms(timeframe)
+    return (int(timestamp_ms) // step) * step
+
+def last_closed_candle(timeframe: str, now_ms: Optional[int] = None) -> int:
+    """Get the open time (ms) of the most recently closed candle"""
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    return candle_open_time(now_ms, timeframe) - timeframe_ms(timeframe)
+
+def next_candle_close(timeframe: str, now_ms: Optional[int] = None) -> int:
+    """Get the time (ms) at which the currently forming candle closes"""
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    return candle_open_time(now_ms, timeframe) + timeframe_ms(timeframe)
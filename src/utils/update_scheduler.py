@@ -0,0 +1,302 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Awaitable, Dict, List, Optional, Set, Tuple
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from config.config import Config
+from src.database.connection import DatabaseManager
+from src.database.models import UserRole
+from src.database.operations import DatabaseOps
+from src.utils.logger import activity_logger, error_logger
+from src.utils.message_queue import OutboundMessageQueue, TokenBucket, PRIORITY_INFO
+from src.utils.metrics import REGISTRY, Counter, Histogram
+
+# Batas per role. cost_rate dalam unit biaya per detik, cost_burst kapasitas bucket.
+ROLE_LIMITS = {
+    UserRole.ADMIN: {'priority': 0, 'max_queued': None, 'max_wait': None, 'concurrency': None,
+                     'cost_rate': None, 'cost_burst': None},
+    UserRole.PREMIUM: {'priority': 1, 'max_queued': 500, 'max_wait': 60.0, 'concurrency': 3,
+                       'cost_rate': 1.0, 'cost_burst': 30},
+    UserRole.FREE: {'priority': 2, 'max_queued': 200, 'max_wait': 15.0, 'concurrency': 1,
+                    'cost_rate': 0.2, 'cost_burst': 10}
+}
+
+# Biaya per perintah (atau prefix callback); yang lebih dari 1 memakai slot mahal
+COMMAND_COST = {
+    'chart': 5,
+    'scan': 5,
+    'korelasi': 3
+}
+
+BUSY_REPLY_INTERVAL = 10.0  # Detik, agar balasan "sibuk" tidak membanjiri pengguna
+WAIT_SAMPLES = 1000
+MAX_IDLE_USERS = 10000
+
+class UpdateScheduler(BaseUpdateProcessor):
+    """Role-aware admission and priority scheduling of incoming updates.
+
+    Plugged into the Application as its update processor. At most
+    SCHEDULER_WORKERS updates run at once, of which SCHEDULER_EXPENSIVE_SLOTS
+    may be expensive (chart, scan), so heavy requests can never take every
+    worker. Waiting updates are served by role priority (ADMIN, PREMIUM,
+    FREE) and then in arrival order. Updates are shed with a "busy" reply
+    when a role's queue is full, the user already has their concurrency
+    limit of updates in the scheduler, the user's cost bucket is empty, or
+    the update waited longer than the role's max_wait.
+    """
+
+    def __init__(self, workers: int = None, expensive_slots: int = None, max_pending: int = None):
+        super().__init__(max_pending or Config.SCHEDULER_MAX_PENDING)
+        self.workers = workers or Config.SCHEDULER_WORKERS
+        self.expensive_slots = expensive_slots or Config.SCHEDULER_EXPENSIVE_SLOTS
+        self.db = DatabaseManager()
+        self.running = 0
+        self.running_expensive = 0
+        self._waiting: Dict[bool, List] = {False: [], True: []}  # expensive -> heap (priority, seq, future)
+        self._seq = itertools.count()
+        self._queued: Dict[UserRole, int] = {role: 0 for role in ROLE_LIMITS}
+        self._user_active: Dict[int, int] = {}
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._busy_replied: Dict[int, float] = {}
+        self.roles: Dict[str, UserRole] = {}
+        self._roles_loaded_at = 0.0
+        self._roles_task: Optional[asyncio.Task] = None
+        # Nama perintah/callback yang dikenal; selainnya dicatat sebagai 'other' agar label metrik terbatas
+        self.commands: Set[str] = set()
+        self._handler_metrics: Dict[str, Tuple[Histogram, Counter, Counter]] = {}
+        self._failed: Set[int] = set()  # id() update yang handler-nya melempar exception
+
+        self.processed = {role: 0 for role in ROLE_LIMITS}
+        self.shed = {role: 0 for role in ROLE_LIMITS}
+        self.waits = {role: deque(maxlen=WAIT_SAMPLES) for role in ROLE_LIMITS}
+
+    async def initialize(self):
+        await self._refresh_roles()
+
+    async def shutdown(self):
+        if self._roles_task is not None:
+            self._roles_task.cancel()
+
+    def _load_roles(self) -> Dict[str, UserRole]:
+        session = next(self.db.get_session())
+        try:
+            return DatabaseOps.load_user_roles(session)
+        finally:
+            session.close()
+
+    async def _refresh_roles(self):
+        try:
+            self.roles = await asyncio.to_thread(self._load_roles)
+            activity_logger.info(f"Loaded {len(self.roles)} premium/admin roles for the update scheduler")
+        except Exception as e:
+            error_logger.error(f"Error loading user roles: {str(e)}")
+        finally:
+            self._roles_loaded_at = time.monotonic()
+
+    def role(self, user_id: Optional[int]) -> UserRole:
+        if user_id is None:
+            return UserRole.FREE
+        if Config.TELEGRAM_ADMIN_ID and str(user_id) == str(Config.TELEGRAM_ADMIN_ID):
+            return UserRole.ADMIN
+        if time.monotonic() - self._roles_loaded_at > Config.SCHEDULER_ROLE_TTL and \
+                (self._roles_task is None or self._roles_task.done()):
+            self._roles_task = asyncio.create_task(self._refresh_roles())
+        return self.roles.get(str(user_id), UserRole.FREE)
+
+    @staticmethod
+    def command(update: object) -> Optional[str]:
+        """Command name (/chart@bot -> chart) or callback prefix (price_BTC_all -> price)"""
+        if not isinstance(update, Update):
+            return None
+        if update.message and update.message.text and update.message.text.startswith('/'):
+            return update.message.text.split()[0][1:].split('@')[0].lower()
+        if update.callback_query and update.callback_query.data:
+            return update.callback_query.data.split('_')[0]
+        return None
+
+    def handler_metrics(self, label: str) -> Tuple[Histogram, Counter, Counter]:
+        """Latency histogram and ok/error counters of one command, looked up once"""
+        metrics = self._handler_metrics.get(label)
+        if metrics is None:
+            metrics = self._handler_metrics[label] = (
+                REGISTRY.histogram('telegram_handler_seconds', 'Latency of Telegram update handlers', command=label),
+                REGISTRY.counter('telegram_handler_total', 'Handled Telegram updates', command=label, status='ok'),
+                REGISTRY.counter('telegram_handler_total', 'Handled Telegram updates', command=label, status='error')
+            )
+        return metrics
+
+    def mark_failed(self, update: object):
+        """Count an update as failed; called from the Application's error handler"""
+        self._failed.add(id(update))
+
+    def _admit(self, user_id: Optional[int], role: UserRole, cost: int, now: float) -> Optional[str]:
+        """Reason to shed the update, or None if it may queue (its cost is charged once it starts)"""
+        limits = ROLE_LIMITS[role]
+        if limits['max_queued'] is not None and self._queued[role] >= limits['max_queued']:
+            return "⏳ Bot sedang sibuk. Silakan coba lagi dalam beberapa saat."
+        if user_id is None:
+            return None
+        if limits['concurrency'] is not None and self._user_active.get(user_id, 0) >= limits['concurrency']:
+            return "⏳ Permintaan anda sebelumnya masih diproses. Silakan tunggu sebentar."
+        if limits['cost_rate'] is not None:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                if len(self._buckets) > MAX_IDLE_USERS:
+                    self._prune(now)
+                bucket = self._buckets[user_id] = TokenBucket(limits['cost_rate'], limits['cost_burst'])
+            delay = bucket.delay(now, cost)
+            if delay > 0:
+                return f"⏳ Batas penggunaan tercapai. Silakan coba lagi dalam {delay:.0f} detik."
+        return None
+
+    def _charge(self, user_id: Optional[int], cost: int):
+        """Take the cost of an update that got a worker slot; shed updates cost nothing"""
+        bucket = self._buckets.get(user_id)
+        if bucket is not None:
+            # Bisa minus bila beberapa update user ini lolos bersamaan; dibatasi oleh concurrency role
+            bucket.take(time.monotonic(), cost)
+
+    def _prune(self, now: float):
+        """Forget quota state of users whose bucket has refilled and busy-reply marks that expired"""
+        for user_id in [user_id for user_id, bucket in self._buckets.items()
+                        if user_id not in self._user_active and bucket.delay(now, bucket.capacity) == 0]:
+            del self._buckets[user_id]
+        self._busy_replied = {
+            user_id: at for user_id, at in self._busy_replied.items() if now - at < BUSY_REPLY_INTERVAL
+        }
+
+    def _dispatch(self):
+        """Hand free worker slots to the best waiting updates"""
+        while self.running < self.workers:
+            for heap in self._waiting.values():
+                while heap and heap[0][2].done():
+                    heapq.heappop(heap)  # Sudah melewati batas tunggu
+
+            candidates: List[Tuple] = []
+            if self._waiting[False]:
+                candidates.append((self._waiting[False][0], False))
+            if self._waiting[True] and self.running_expensive < self.expensive_slots:
+                candidates.append((self._waiting[True][0], True))
+            if not candidates:
+                return
+
+            _, expensive = min(candidates, key=lambda candidate: candidate[0][:2])
+            _, _, future = heapq.heappop(self._waiting[expensive])
+            self.running += 1
+            if expensive:
+                self.running_expensive += 1
+            future.set_result(None)
+
+    async def _acquire(self, priority: int, expensive: bool, max_wait: Optional[float]) -> bool:
+        """Wait for a worker slot; False if the update waited longer than max_wait"""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting[expensive], (priority, next(self._seq), future))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, max_wait)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(expensive)  # Slot sudah diberikan tepat sebelum dibatalkan
+            raise
+
+    def _release(self, expensive: bool):
+        self.running -= 1
+        if expensive:
+            self.running_expensive -= 1
+        self._dispatch()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable):
+        user = update.effective_user if isinstance(update, Update) else None
+        user_id = user.id if user else None
+        role = self.role(user_id)
+        limits = ROLE_LIMITS[role]
+        command = self.command(update)
+        cost = COMMAND_COST.get(command, 1)
+        expensive = cost > 1
+        now = time.monotonic()
+
+        reason = self._admit(user_id, role, cost, now)
+        if reason:
+            coroutine.close()
+            await self._reject(update, role, reason)
+            return
+
+        self._queued[role] += 1
+        if user_id is not None:
+            self._user_active[user_id] = self._user_active.get(user_id, 0) + 1
+        try:
+            try:
+                started = await self._acquire(limits['priority'], expensive, limits['max_wait'])
+            finally:
+                self._queued[role] -= 1
+            if not started:
+                coroutine.close()
+                await self._reject(update, role, "⏳ Bot sedang sibuk. Silakan coba lagi dalam beberapa saat.")
+                return
+
+            self._charge(user_id, cost)
+            self.waits[role].append(time.monotonic() - now)
+            self.processed[role] += 1
+            histogram, succeeded, failed = self.handler_metrics(command if command in self.commands else 'other')
+            start = time.perf_counter_ns()
+            ok = False
+            try:
+                await coroutine
+                ok = True
+            finally:
+                self._release(expensive)
+                histogram.observe((time.perf_counter_ns() - start) * 1e-9)
+                # Application menangkap exception handler sendiri dan melapor lewat mark_failed
+                if id(update) in self._failed:
+                    self._failed.discard(id(update))
+                    ok = False
+                (succeeded if ok else failed).inc()
+        finally:
+            if user_id is not None:
+                remaining = self._user_active.get(user_id, 1) - 1
+                if remaining:
+                    self._user_active[user_id] = remaining
+                else:
+                    self._user_active.pop(user_id, None)
+
+    async def _reject(self, update: object, role: UserRole, text: str):
+        self.shed[role] += 1
+        REGISTRY.counter('telegram_updates_shed_total', 'Updates rejected by the scheduler', role=role.value).inc()
+        if not isinstance(update, Update):
+            return
+        try:
+            if update.callback_query:
+                # Jawaban callback wajib agar tombol tidak terus memuat
+                await update.callback_query.answer(text)
+                return
+
+            user_id = update.effective_user.id if update.effective_user else None
+            now = time.monotonic()
+            if update.effective_chat is None or now - self._busy_replied.get(user_id, 0.0) < BUSY_REPLY_INTERVAL:
+                return
+            self._busy_replied[user_id] = now
+            queue = OutboundMessageQueue.default
+            if queue:
+                queue.send_message(update.effective_chat.id, text, PRIORITY_INFO)
+        except Exception as e:
+            error_logger.error(f"Error sending busy reply: {str(e)}")
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-role counters and queue wait percentiles (seconds)"""
+        result = {}
+        for role in ROLE_LIMITS:
+            waits = sorted(self.waits[role])
+            result[role.value] = {
+                'queued': self._queued[role],
+                'processed': self.processed[role],
+                'shed': self.shed[role],
+                'p50_wait': waits[len(waits) // 2] if waits else 0.0,
+                'p99_wait': waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0
+            }
+        return result
@@ -0,0 +1,218 @@
+"""Check a multi-process deployment: update spreading, one leader, failover.
+
+Starts the Redis stand-in (tools.redis_stub), the fake Bot API and the
+exchange simulator, then N `run.py` workers with CLUSTER_ENABLED against
+them, and checks that:
+
+1. exactly one worker holds the leader lease;
+2. a burst of /help commands from distinct users gets exactly one reply
+   each, spread over the workers (cluster_updates_total from each
+   worker's /metrics);
+3. after the leader is killed with SIGKILL another worker takes the lease
+   with a higher fencing token, and a second burst sent right after the
+   kill is still answered exactly once.
+
+    python -m tools.cluster_check --workers 3
+    python -m tools.cluster_check --workers 4 --messages 400 --lease-ttl 3 --renew 0.5
+"""
+import argparse
+import math
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from typing import Dict, List
+import redis
+from tools.exchange_simulator import ExchangeSimulator, MarketSimulator
+from tools.fake_telegram_api import FakeTelegramAPI
+from tools.redis_stub import RedisStub
+from tools.telegram_load import TOKEN, USER_ID_BASE, seed_roles
+
+HANDLED_LINE = re.compile(r'^cluster_updates_total\{direction="handled"\} (\S+)$', re.MULTILINE)
+
+class Replies:
+    """sendMessage calls per chat, recorded from the fake API's server threads"""
+
+    def __init__(self, server: FakeTelegramAPI):
+        self.lock = threading.Lock()
+        self.counts: Counter = Counter()
+        self.first_at: Dict[int, float] = {}
+        server.listeners.append(self.on_bot_call)
+
+    def on_bot_call(self, method: str, chat_id, params: dict, result):
+        if method != 'sendMessage' or chat_id is None:
+            return
+        with self.lock:
+            self.counts[int(chat_id)] += 1
+            self.first_at.setdefault(int(chat_id), time.monotonic())
+
+    def wait(self, chats: List[int], timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if all(self.counts[chat] for chat in chats):
+                    return True
+            time.sleep(0.1)
+        return False
+
+def free_ports(count: int) -> List[int]:
+    sockets = []
+    try:
+        for _ in range(count):
+            sock = socket.socket()
+            sock.bind(('127.0.0.1', 0))
+            sockets.append(sock)
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+def handled(port: int) -> float:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=2) as response:
+            match = HANDLED_LINE.search(response.read().decode())
+    except OSError:
+        return float('nan')
+    return float(match.group(1)) if match else 0.0
+
+def send_burst(server: FakeTelegramAPI, users: range) -> Dict[int, float]:
+    sent_at = {}
+    for user_id in users:
+        sent_at[user_id] = time.monotonic()
+        server.push_update({'message': {
+            'message_id': user_id, 'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"Cluster{user_id}"},
+            'text': '/help', 'entities': [{'type': 'bot_command', 'offset': 0, 'length': 5}]
+        }})
+    return sent_at
+
+def check_burst(name: str, replies: Replies, sent_at: Dict[int, float], timeout: float) -> List[str]:
+    chats = list(sent_at)
+    replies.wait(chats, timeout)
+    time.sleep(1)  # Balasan ganda datang sedikit terlambat
+    with replies.lock:
+        missing = [chat for chat in chats if not replies.counts[chat]]
+        duplicated = [chat for chat in chats if replies.counts[chat] > 1]
+        latencies = sorted(replies.first_at[chat] - sent_at[chat] for chat in chats if chat in replies.first_at)
+    if latencies:
+        print(f"{name}: {len(chats) - len(missing)}/{len(chats)} answered, "
+              f"p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms")
+    problems = []
+    if missing:
+        problems.append(f"{name}: {len(missing)} updates without a reply")
+    if duplicated:
+        problems.append(f"{name}: {len(duplicated)} updates answered more than once")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--messages', type=int, default=200, help="Commands per burst")
+    parser.add_argument('--lease-ttl', type=float, default=5.0)
+    parser.add_argument('--renew', type=float, default=1.0)
+    parser.add_argument('--timeout', type=float, default=60.0, help="Seconds to wait for each burst")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cluster-check-')
+    stub = RedisStub().start()
+    client = redis.Redis.from_url(stub.url)
+    server = FakeTelegramAPI(global_limit=0, chat_limit=0).start()
+    server.keep_sent = False
+    server.server.handle_error = lambda request, address: None  # Koneksi pemimpin yang dibunuh terputus
+    replies = Replies(server)
+    simulator = ExchangeSimulator(MarketSimulator(), latency=0.01).start()
+    database_url = f"sqlite:///{workdir}/cluster.db"
+    seed_roles(database_url, 2 * args.messages, 0, 0, 1)
+
+    env = dict(os.environ,
+               TELEGRAM_BOT_TOKEN=TOKEN, TELEGRAM_ADMIN_ID='', TELEGRAM_API_URL=f"{server.url}/bot",
+               DATABASE_URL=database_url, ALERT_SNAPSHOT_PATH=os.path.join(workdir, 'alerts.snapshot'),
+               INDODAX_API_URL=f"{simulator.url}/api", BITGET_API_URL=simulator.url,
+               BITGET_WS_URL=f"{simulator.url.replace('http://', 'ws://')}/spot/v1/stream",
+               REDIS_URL=stub.url, CLUSTER_ENABLED='true', METRICS_PORT_SPAN='1',
+               LEADER_LEASE_TTL=str(args.lease_ttl), LEADER_RENEW_INTERVAL=str(args.renew))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ports = free_ports(args.workers)
+    workers: Dict[str, subprocess.Popen] = {}
+    for i, port in enumerate(ports):
+        instance = f"worker-{i}"
+        with open(os.path.join(workdir, f"{instance}.log"), 'w') as output:
+            workers[instance] = subprocess.Popen(
+                [sys.executable, 'run.py'], cwd=root, stdout=output, stderr=subprocess.STDOUT,
+                env=dict(env, INSTANCE_ID=instance, METRICS_PORT=str(port))
+            )
+    print(f"{args.workers} workers started, output in {workdir}", file=sys.stderr)
+
+    problems = []
+    try:
+        deadline = time.monotonic() + 60
+        # Siap: ada pemimpin yang polling dan endpoint metrics semua worker menjawab
+        while client.get('bot:leader') is None or not server.calls.get('getUpdates') or \
+                any(math.isnan(handled(port)) for port in ports):
+            exited = [name for name, worker in workers.items() if worker.poll() is not None]
+            if exited:
+                sys.exit(f"{', '.join(exited)} exited early, see {workdir}")
+            if time.monotonic() > deadline:
+                sys.exit("Workers not ready within 60 seconds")
+            time.sleep(0.2)
+        leader = client.get('bot:leader').decode()
+        token = int(client.get('bot:fence'))
+        print(f"leader: {leader} (fencing token {token})")
+
+        before = [handled(port) for port in ports]
+        problems += check_burst("burst 1", replies, send_burst(server, range(
+            USER_ID_BASE, USER_ID_BASE + args.messages)), args.timeout)
+        spread = {name: handled(port) - start for name, port, start in zip(workers, ports, before)}
+        print("handled per worker: " + ", ".join(f"{name} {count:.0f}" for name, count in spread.items()))
+        if sum(1 for count in spread.values() if count > 0) < min(2, args.workers):
+            problems.append("burst 1 was not spread over several workers")
+
+        # Matikan pemimpin tanpa kesempatan melepas lease: failover lewat kedaluwarsa TTL
+        killed_at = time.monotonic()
+        workers[leader].send_signal(signal.SIGKILL)
+        workers[leader].wait()
+        sent_at = send_burst(server, range(USER_ID_BASE + args.messages, USER_ID_BASE + 2 * args.messages))
+        new_leader = None
+        while time.monotonic() - killed_at < args.lease_ttl * 3:
+            holder = client.get('bot:leader')
+            if holder is not None and holder.decode() != leader:
+                new_leader = holder.decode()
+                break
+            time.sleep(0.05)
+        if new_leader is None:
+            problems.append(f"no new leader within {args.lease_ttl * 3:.0f}s after killing {leader}")
+        else:
+            new_token = int(client.get('bot:fence'))
+            print(f"failover: {new_leader} leader after {time.monotonic() - killed_at:.2f}s "
+                  f"(fencing token {token} -> {new_token})")
+            if new_token <= token:
+                problems.append("fencing token did not increase on failover")
+        problems += check_burst("burst 2 (during failover)", replies, sent_at, args.timeout)
+    finally:
+        for worker in workers.values():
+            if worker.poll() is None:
+                worker.terminate()
+        for worker in workers.values():
+            try:
+                worker.wait(15)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+        simulator.stop()
+        server.stop()
+        stub.stop()
+
+    if problems:
+        print("FAILED:\n  " + "\n  ".join(problems), file=sys.stderr)
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,587 @@
+"""Local Indodax + Bitget simulator for replay and load testing.
+
+Serves, on one port, the REST endpoints the bot's clients call and the
+Bitget spot/v1/stream WebSocket:
+
+    Indodax  /api/ticker/<pair>  /api/ticker_all  /api/summaries  /api/pairs  /api/trades/<pair>
+    Bitget   /api/mix/v1/market/ticker  .../tickers  .../candles?symbol=BTCUSDT_UMCBL&granularity=1H
+    Bitget   ws://host:port/spot/v1/stream (ticker.<symbol> subscriptions)
+
+Prices are a seeded random walk per symbol, or a recording of real ticks
+(`record` below) replayed in timestamp order. --speed runs market time
+faster than wall time, so --speed 10 produces 10x the real tick rate;
+--rate is ticks per second per symbol at 1x. --latency delays every REST
+answer, --error-rate fails that fraction of REST requests (429/503) and
+closes WebSocket streams with that probability per second.
+
+    python -m tools.exchange_simulator --port 8090 --speed 10
+    python -m tools.exchange_simulator record --pairs BTCUSDT ETHUSDT --seconds 600 -o ticks.jsonl
+    python -m tools.exchange_simulator --replay ticks.jsonl --speed 5
+
+Point the bot at it with INDODAX_API_URL=http://127.0.0.1:8090/api,
+BITGET_API_URL=http://127.0.0.1:8090 and
+BITGET_WS_URL=ws://127.0.0.1:8090/spot/v1/stream. Order book and order
+calls go through ccxt and are not simulated.
+"""
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import math
+import random
+import struct
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlsplit
+from src.utils.symbols import normalize_symbol
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OPCODE_TEXT, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG = 0x1, 0x8, 0x9, 0xA
+
+# Harga awal (USDT) simbol utama; sisanya diacak dengan seed
+BASE_PRICES = {'BTC': 42000.0, 'ETH': 2300.0, 'SOL': 100.0, 'XRP': 0.6, 'DOGE': 0.09, 'ADA': 0.55,
+               'TRX': 0.11, 'LINK': 15.0, 'AVAX': 38.0, 'DOT': 8.0, 'LTC': 70.0, 'UNI': 6.5,
+               'ATOM': 10.0, 'XLM': 0.12, 'NEAR': 3.5, 'APT': 9.0, 'ARB': 1.8, 'OP': 3.6}
+USDT_IDR = 15800.0
+VOLATILITY = 0.0002  # Per akar detik waktu pasar, sekitar 6% per hari
+
+# Nilai granularity yang diterima /api/mix/v1/market/candles
+GRANULARITY_SECONDS = {'1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800, '1H': 3600, '2H': 7200,
+                       '4H': 14400, '6H': 21600, '12H': 43200, '1D': 86400, '1W': 604800}
+
+def base_symbol(symbol: str) -> str:
+    """BTCUSDT_UMCBL, BTC-USDT, btc_idr, btcidr or BTC/USDT -> BTC"""
+    return normalize_symbol(symbol.split('_')[0] if symbol.upper().endswith(('_UMCBL', '_SPBL')) else symbol)
+
+class SymbolState:
+    __slots__ = ('symbol', 'price', 'open', 'high', 'low', 'volume', 'premium', 'trades', 'updated')
+
+    def __init__(self, symbol: str, price: float, premium: float):
+        self.symbol = symbol
+        self.price = price
+        self.open = self.high = self.low = price
+        self.volume = 0.0
+        self.premium = premium  # Selisih harga Indodax terhadap Bitget
+        self.trades = deque(maxlen=1000)  # (market_ts, price_usdt, amount, side)
+        self.updated = 0.0
+
+    def apply(self, price: float, amount: float, market_ts: float, rng: random.Random):
+        self.price = price
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        self.volume += amount
+        self.updated = market_ts
+        self.trades.append((market_ts, price, amount, 'buy' if rng.random() < 0.5 else 'sell'))
+
+class MarketSimulator:
+    """Market state shared by the REST and WebSocket sides"""
+
+    def __init__(self, symbols: int = 200, speed: float = 1.0, rate: float = 1.0, seed: int = 1,
+                 replay: Optional[str] = None):
+        self.speed = speed
+        self.rate = rate
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.wall_start = time.monotonic()
+        self.market_start = time.time()
+
+        names = list(BASE_PRICES) + [f"SIM{i}" for i in range(max(0, symbols - len(BASE_PRICES)))]
+        self.states: Dict[str, SymbolState] = {}
+        for name in names[:symbols]:
+            price = BASE_PRICES.get(name) or 10 ** self.rng.uniform(-3, 3)
+            self.states[name] = SymbolState(name, price, self.rng.uniform(-0.004, 0.004))
+        self.usdt_idr = USDT_IDR
+
+        self.recording: List[Dict] = []
+        if replay:
+            with open(replay) as f:
+                self.recording = [json.loads(line) for line in f if line.strip()]
+            self.recording.sort(key=lambda tick: tick['ts'])
+            for tick in self.recording:
+                symbol = base_symbol(tick['symbol'])
+                if symbol not in self.states:
+                    self.states[symbol] = SymbolState(symbol, tick['price'], self.rng.uniform(-0.004, 0.004))
+        self.replayed = {base_symbol(tick['symbol']) for tick in self.recording}
+        self._seed_trades()
+        self._last_step = self.market_time()
+
+    def market_time(self) -> float:
+        """Simulated Unix time; runs `speed` times faster than the wall clock"""
+        return self.market_start + (time.monotonic() - self.wall_start) * self.speed
+
+    def _seed_trades(self):
+        """A day of trade history so trades/<pair> aggregates into candles from the start"""
+        now = self.market_time()
+        for state in self.states.values():
+            closes = self.history(state.symbol, 300, 288)
+            for i, close in enumerate(closes):
+                state.trades.append((now - (288 - i) * 300, close, self.rng.uniform(0.01, 2), 'buy'))
+
+    def history(self, symbol: str, period: int, count: int) -> List[float]:
+        """Closes of the last `count` candles, stable between calls and ending at the current price"""
+        rng = random.Random(f"{self.seed}:{symbol}:{period}")
+        sigma = VOLATILITY * math.sqrt(period)
+        log_price, closes = 0.0, []
+        for _ in range(count):
+            log_price += rng.gauss(0, sigma)
+            closes.append(log_price)
+        price = self.states[symbol].price
+        return [price * math.exp(value - closes[-1]) for value in closes]
+
+    # -- pergerakan harga -------------------------------------------------
+
+    def step(self, ticks: int) -> List[SymbolState]:
+        """Advance synthetic symbols to the current market time in `ticks` steps each; returns updated states"""
+        updated = []
+        now = self.market_time()
+        market_dt, self._last_step = now - self._last_step, now
+        sigma = VOLATILITY * math.sqrt(market_dt / max(ticks, 1))
+        with self.lock:
+            for state in self.states.values():
+                if state.symbol in self.replayed:
+                    continue
+                for _ in range(ticks):
+                    price = state.price * math.exp(self.rng.gauss(0, sigma))
+                    state.apply(price, self.rng.uniform(0.001, 1), now, self.rng)
+                    updated.append(state)
+            self.usdt_idr *= math.exp(self.rng.gauss(0, VOLATILITY * 0.05 * math.sqrt(market_dt)))
+        return updated
+
+    def replay_until(self, position: Tuple[int, int], market_ts: float) -> Tuple[Tuple[int, int], List[SymbolState]]:
+        """Apply recorded ticks up to market_ts; position is (loop, index), the recording repeats"""
+        updated = []
+        if not self.recording:
+            return position, updated
+        first = self.recording[0]['ts'] / 1000
+        span = max(self.recording[-1]['ts'] / 1000 - first, 1.0)
+        target = divmod(market_ts - self.market_start, span)
+        cycle, index = position
+        with self.lock:
+            while (cycle, self.recording[index]['ts'] / 1000 - first) <= target:
+                tick = self.recording[index]
+                state = self.states[base_symbol(tick['symbol'])]
+                state.apply(float(tick['price']), float(tick.get('amount', 0.1)), market_ts, self.rng)
+                updated.append(state)
+                index += 1
+                if index == len(self.recording):
+                    cycle, index = cycle + 1, 0
+        return (cycle, index), updated
+
+    # -- bentuk respons -----------------------------------------------------
+
+    def indodax_ticker(self, state: SymbolState) -> Dict:
+        factor = self.usdt_idr * (1 + state.premium)
+        return {
+            'high': f"{state.high * factor:.0f}", 'low': f"{state.low * factor:.0f}",
+            f"vol_{state.symbol.lower()}": f"{state.volume:.8f}", 'vol_idr': f"{state.volume * state.price * factor:.0f}",
+            'last': f"{state.price * factor:.0f}",
+            'buy': f"{state.price * factor * 0.999:.0f}", 'sell': f"{state.price * factor:.0f}",
+            'server_time': int(self.market_time()), 'name': state.symbol
+        }
+
+    def indodax_summaries(self) -> Dict:
+        """ticker_all plus the 24h-ago price per pair, the only place Indodax reports one"""
+        tickers = {f"{state.symbol.lower()}_idr": self.indodax_ticker(state) for state in self.states.values()}
+        tickers['usdt_idr'] = self.indodax_usdt()
+        prices_24h = {f"{state.symbol.lower()}idr": f"{state.open * self.usdt_idr * (1 + state.premium):.0f}"
+                      for state in self.states.values()}
+        prices_24h['usdtidr'] = f"{USDT_IDR:.0f}"
+        return {'tickers': tickers, 'prices_24h': prices_24h}
+
+    def indodax_usdt(self) -> Dict:
+        return {'high': f"{self.usdt_idr * 1.01:.0f}", 'low': f"{self.usdt_idr * 0.99:.0f}",
+                'vol_usdt': '1000000', 'vol_idr': f"{self.usdt_idr * 1e6:.0f}", 'last': f"{self.usdt_idr:.0f}",
+                'buy': f"{self.usdt_idr:.0f}", 'sell': f"{self.usdt_idr:.0f}",
+                'server_time': int(self.market_time()), 'name': 'Tether'}
+
+    def bitget_ticker(self, state: SymbolState, symbol: str) -> Dict:
+        return {
+            'symbol': symbol, 'last': f"{state.price:.8g}", 'high24h': f"{state.high:.8g}",
+            'low24h': f"{state.low:.8g}", 'open24h': f"{state.open:.8g}", 'volume24h': f"{state.volume:.4f}",
+            'baseVolume': f"{state.volume:.4f}", 'quoteVolume': f"{state.volume * state.price:.2f}",
+            'priceChangePercent': f"{(state.price / state.open - 1):.4f}",
+            'timestamp': str(int(self.market_time() * 1000))
+        }
+
+    def candles(self, symbol: str, period: int, limit: int) -> List[List[str]]:
+        closes = self.history(symbol, period, limit + 1)
+        start = (int(self.market_time()) // period - limit + 1) * period
+        rng = random.Random(f"{self.seed}:{symbol}:{period}:range")
+        result = []
+        for i in range(limit):
+            open_, close = closes[i], closes[i + 1]
+            spread = abs(rng.gauss(0, VOLATILITY * math.sqrt(period))) * close
+            result.append([str((start + i * period) * 1000), f"{open_:.8g}", f"{max(open_, close) + spread:.8g}",
+                           f"{min(open_, close) - spread:.8g}", f"{close:.8g}", f"{rng.uniform(10, 1000):.4f}"])
+        return result
+
+class WebSocketConnection:
+    """Server side of one RFC 6455 connection; send() may be called from any thread"""
+
+    def __init__(self, request: BaseHTTPRequestHandler):
+        self.request = request
+        self.lock = threading.Lock()
+        self.channels: Set[str] = set()  # "ticker.<symbol seperti dikirim klien>"
+        self.open = True
+        self.sent = 0
+
+    def handshake(self) -> bool:
+        key = self.request.headers.get('Sec-WebSocket-Key')
+        if not key:
+            self.request.send_error(400)
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.request.send_response(101, 'Switching Protocols')
+        self.request.send_header('Upgrade', 'websocket')
+        self.request.send_header('Connection', 'Upgrade')
+        self.request.send_header('Sec-WebSocket-Accept', accept)
+        self.request.end_headers()
+        self.request.wfile.flush()
+        return True
+
+    def send(self, payload: bytes, opcode: int = OPCODE_TEXT) -> bool:
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        with self.lock:
+            if not self.open:
+                return False
+            try:
+                self.request.wfile.write(header + payload)
+                self.request.wfile.flush()
+                self.sent += 1
+                return True
+            except OSError:
+                self.open = False
+                return False
+
+    def receive(self):
+        """(opcode, payload) of the next frame, or (None, None) when the client is gone"""
+        rfile = self.request.rfile
+        head = rfile.read(2)
+        if len(head) < 2:
+            return None, None
+        opcode, length = head[0] & 0x0F, head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', rfile.read(8))[0]
+        mask = rfile.read(4) if head[1] & 0x80 else None
+        payload = rfile.read(length)
+        if mask:
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        return opcode, payload
+
+    def close(self):
+        self.send(struct.pack('!H', 1000), OPCODE_CLOSE)
+        with self.lock:
+            self.open = False
+        try:
+            self.request.connection.shutdown(2)
+        except OSError:
+            pass
+
+class ExchangeSimulator:
+    def __init__(self, market: MarketSimulator, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, error_rate: float = 0.0):
+        self.market = market
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(market.seed + 1)
+        self.connections: Set[WebSocketConnection] = set()
+        self.connections_lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.errors = 0
+        self.messages = 0
+        self.dropped = 0
+        self._stop = threading.Event()
+        self.ids = itertools.count(1)
+
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if self.headers.get('Upgrade', '').lower() == 'websocket':
+                    simulator.serve_websocket(self)
+                else:
+                    simulator.serve_rest(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.threads: List[threading.Thread] = []
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'ExchangeSimulator':
+        for target, name in ((self.server.serve_forever, 'simulator-http'), (self._run_market, 'simulator-market')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self.connections_lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    # -- REST -------------------------------------------------------------
+
+    def serve_rest(self, request: BaseHTTPRequestHandler):
+        parts = urlsplit(request.path)
+        path, params = parts.path.rstrip('/'), dict(parse_qsl(parts.query))
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            status = self.rng.choice((429, 503))
+            payload = {'code': str(status), 'msg': 'simulated error'}
+        else:
+            endpoint, status, payload = self.route(path, params)
+            self.requests[endpoint] += 1
+
+        body = json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def route(self, path: str, params: Dict[str, str]):
+        market = self.market
+        with market.lock:
+            if path.startswith('/api/ticker_all'):
+                tickers = {f"{state.symbol.lower()}_idr": market.indodax_ticker(state) for state in market.states.values()}
+                tickers['usdt_idr'] = market.indodax_usdt()
+                return 'indodax.ticker_all', 200, {'tickers': tickers}
+            if path == '/api/summaries':
+                return 'indodax.summaries', 200, market.indodax_summaries()
+            if path.startswith('/api/ticker/'):
+                symbol = base_symbol(path.rsplit('/', 1)[-1])
+                if symbol == 'USDT':
+                    return 'indodax.ticker', 200, {'ticker': market.indodax_usdt()}
+                state = market.states.get(symbol)
+                if state is None:
+                    return 'indodax.ticker', 200, {'error': 'invalid_pair', 'error_description': 'Invalid pair'}
+                return 'indodax.ticker', 200, {'ticker': market.indodax_ticker(state)}
+            if path == '/api/pairs':
+                return 'indodax.pairs', 200, [{'id': f"{name.lower()}idr", 'symbol': f"{name}IDR",
+                                               'base_currency': 'idr', 'traded_currency': name.lower(),
+                                               'description': f"{name}/IDR"} for name in market.states]
+            if path.startswith('/api/trades/'):
+                state = market.states.get(base_symbol(path.rsplit('/', 1)[-1]))
+                if state is None:
+                    return 'indodax.trades', 200, {'error': 'invalid_pair'}
+                factor = market.usdt_idr * (1 + state.premium)
+                return 'indodax.trades', 200, [{'date': str(int(ts)), 'price': f"{price * factor:.0f}",
+                                                'amount': f"{amount:.8f}", 'tid': str(i), 'type': side}
+                                               for i, (ts, price, amount, side) in reversed(list(enumerate(state.trades)))]
+
+            if '/market/tickers' in path:
+                # Dengan productType: format mix (BTCUSDT_UMCBL); tanpa itu dipakai untuk daftar pair
+                suffix = '_UMCBL' if params.get('productType') else ''
+                separator = '' if suffix else '-'
+                return 'bitget.tickers', 200, {'code': '00000', 'msg': 'success', 'data': [
+                    market.bitget_ticker(state, f"{state.symbol}{separator}USDT{suffix}")
+                    for state in market.states.values()
+                ]}
+            if path.endswith('/market/ticker'):
+                state = market.states.get(base_symbol(params.get('symbol', '')))
+                if state is None:
+                    return 'bitget.ticker', 400, {'code': '40034', 'msg': 'Parameter does not exist'}
+                return 'bitget.ticker', 200, {'code': '00000', 'msg': 'success', 'data': market.bitget_ticker(state, params['symbol'])}
+            if path == '/api/mix/v1/market/candles':
+                symbol = params.get('symbol', '')
+                state = market.states.get(base_symbol(symbol)) if symbol.endswith('_UMCBL') else None
+                period = GRANULARITY_SECONDS.get(params.get('granularity', ''))
+                if state is None or period is None or 'startTime' not in params or 'endTime' not in params:
+                    return 'bitget.candles', 400, {'code': '40034', 'msg': 'Parameter does not exist'}
+                limit = min(int(params.get('limit', 100)), 1000)
+                # Seperti Bitget: array candle langsung, tanpa amplop code/data
+                return 'bitget.candles', 200, market.candles(state.symbol, period, limit)
+        return 'unknown', 404, {'code': '40404', 'msg': 'Request URL NOT FOUND'}
+
+    # -- WebSocket --------------------------------------------------------
+
+    def serve_websocket(self, request: BaseHTTPRequestHandler):
+        if not request.path.startswith('/spot/v1/stream'):
+            request.send_error(404)
+            return
+        connection = WebSocketConnection(request)
+        if not connection.handshake():
+            return
+        with self.connections_lock:
+            self.connections.add(connection)
+        try:
+            while connection.open:
+                opcode, payload = connection.receive()
+                if opcode is None or opcode == OPCODE_CLOSE:
+                    break
+                if opcode == OPCODE_PING:
+                    connection.send(payload, OPCODE_PONG)
+                elif opcode == OPCODE_TEXT:
+                    self.on_client_message(connection, payload.decode('utf-8', 'replace'))
+        except OSError:
+            pass
+        finally:
+            connection.open = False
+            with self.connections_lock:
+                self.connections.discard(connection)
+            request.close_connection = True
+
+    def on_client_message(self, connection: WebSocketConnection, text: str):
+        if text == 'ping':
+            connection.send(b'pong')
+            return
+        try:
+            message = json.loads(text)
+        except ValueError:
+            connection.send(json.dumps({'event': 'error', 'code': 30001, 'msg': 'invalid json'}).encode())
+            return
+        op, args = message.get('op'), message.get('args') or []
+        channels = {arg for arg in args if isinstance(arg, str)}
+        if op == 'subscribe':
+            connection.channels |= {channel for channel in channels
+                                    if channel.startswith('ticker.') and base_symbol(channel[7:]) in self.market.states}
+        elif op == 'unsubscribe':
+            connection.channels -= channels
+        connection.send(json.dumps({'event': op, 'args': args}).encode())
+
+    def _run_market(self):
+        market = self.market
+        # Frekuensi loop dibatasi; tick berlebih dalam satu putaran dikirim sekaligus
+        ticks_per_second = market.rate * market.speed
+        hz = max(1.0, min(ticks_per_second, 50.0))
+        carry = 0.0
+        position = (0, 0)
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            next_at += 1 / hz
+            carry += ticks_per_second / hz
+            ticks, carry = int(carry), carry - int(carry)
+            updated = market.step(ticks) if ticks else []
+            position, replayed = market.replay_until(position, market.market_time())
+            self.publish(updated + replayed)
+            if self.error_rate:
+                self._drop_connections(1 / hz)
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_at = time.monotonic()  # Tertinggal: jangan mengejar dengan burst
+
+    def publish(self, updated: List[SymbolState]):
+        with self.connections_lock:
+            connections = [connection for connection in self.connections if connection.channels]
+        if not connections or not updated:
+            return
+        subscribers = defaultdict(list)  # symbol -> [(connection, channel)]
+        for connection in connections:
+            for channel in list(connection.channels):
+                subscribers[base_symbol(channel[7:])].append((connection, channel))
+        for state in updated:
+            payloads = {}  # Satu encode per channel meski banyak koneksi berlangganan
+            for connection, channel in subscribers.get(state.symbol, ()):
+                payload = payloads.get(channel)
+                if payload is None:
+                    with self.market.lock:
+                        data = self.market.bitget_ticker(state, channel[7:])
+                    payload = payloads[channel] = json.dumps({'action': 'update', 'channel': channel, 'data': data}).encode()
+                if connection.send(payload):
+                    self.messages += 1
+
+    def _drop_connections(self, seconds: float):
+        with self.connections_lock:
+            connections = list(self.connections)
+        for connection in connections:
+            if self.rng.random() < self.error_rate * seconds:
+                self.dropped += 1
+                connection.close()
+
+    def stats(self) -> Dict:
+        return {'requests': dict(self.requests), 'errors': self.errors, 'ws_connections': len(self.connections),
+                'ws_messages': self.messages, 'ws_dropped': self.dropped}
+
+def record(symbols: List[str], seconds: float, output: str, url: str):
+    """Save live Bitget ticker pushes as JSON lines {ts, symbol, price} for --replay"""
+    import websocket
+    deadline = time.monotonic() + seconds
+    count = 0
+    ws = websocket.create_connection(url, timeout=10)
+    try:
+        ws.send(json.dumps({'op': 'subscribe', 'args': [f"ticker.{symbol}" for symbol in symbols]}))
+        with open(output, 'w') as f:
+            while time.monotonic() < deadline:
+                try:
+                    message = json.loads(ws.recv())
+                except websocket.WebSocketTimeoutException:
+                    continue
+                channel = message.get('channel', '')
+                data = message.get('data')
+                if not channel.startswith('ticker.') or not isinstance(data, dict):
+                    continue
+                f.write(json.dumps({'ts': int(data.get('timestamp') or time.time() * 1000),
+                                    'symbol': channel[7:], 'price': float(data['last'])}) + "\n")
+                count += 1
+    finally:
+        ws.close()
+    print(f"Recorded {count} ticks to {output}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('action', nargs='?', choices=('serve', 'record'), default='serve')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--symbols', type=int, default=200, help="Synthetic symbols to quote")
+    parser.add_argument('--speed', type=float, default=1.0, help="Market seconds per wall second")
+    parser.add_argument('--rate', type=float, default=1.0, help="Ticks per second per symbol at speed 1")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every REST answer")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--replay', help="JSON lines of recorded ticks")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--stats-interval', type=float, default=10.0)
+    # Perekaman
+    parser.add_argument('--pairs', nargs='+', default=['BTCUSDT', 'ETHUSDT'])
+    parser.add_argument('--seconds', type=float, default=600)
+    parser.add_argument('-o', '--output', default='ticks.jsonl')
+    parser.add_argument('--url', default='wss://ws.bitget.com/spot/v1/stream')
+    args = parser.parse_args()
+
+    if args.action == 'record':
+        record(args.pairs, args.seconds, args.output, args.url)
+        return
+
+    market = MarketSimulator(args.symbols, args.speed, args.rate, args.seed, args.replay)
+    simulator = ExchangeSimulator(market, args.host, args.port, args.latency, args.error_rate).start()
+    print(f"Exchange simulator listening on {simulator.url} "
+          f"({len(market.states)} symbols, speed {args.speed}x, {args.rate * args.speed:g} ticks/s per symbol)")
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            print(json.dumps(simulator.stats()))
+    except KeyboardInterrupt:
+        simulator.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""Local fake Telegram Bot API server for load and throughput testing.
+
+Point a bot at it with base_url=f"{server.url}/bot" (TELEGRAM_API_URL for
+the full bot). The server enforces Telegram-like flood limits (a global and
+a per-chat rate) and answers with 429 + retry_after when they are exceeded,
+so rate limiting code can be measured without touching the real API.
+
+Besides the send methods it serves getUpdates long polling from updates
+injected with push_update(), so a load generator can play users, and
+calls every listener with (method, chat_id, params, result) for each bot
+call.
+
+    python -m tools.fake_telegram_api --port 8081
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+class FloodWindow:
+    """Sliding one-second window counter"""
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.events = deque()
+
+    def hit(self, now: float) -> bool:
+        while self.events and now - self.events[0] >= 1.0:
+            self.events.popleft()
+        if self.limit and len(self.events) >= self.limit:
+            return False
+        self.events.append(now)
+        return True
+
+class FakeTelegramAPI:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, global_limit: float = 30,
+                 chat_limit: float = 1, retry_after: int = 1, latency: float = 0.0):
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.retry_after = retry_after
+        self.latency = latency
+
+        self.lock = threading.Lock()
+        self.message_ids = itertools.count(1)
+        self.global_window = FloodWindow(global_limit)
+        self.chat_windows = defaultdict(lambda: FloodWindow(chat_limit))
+        self.calls = defaultdict(int)
+        self.flood_errors = 0
+        self.sent = []  # (timestamp, method, chat_id, params)
+        self.keep_sent = True
+        self.listeners = []  # callable(method, chat_id, params, result), dipanggil dari thread server
+
+        self.updates = deque()
+        self.update_ids = itertools.count(1)
+        self.updates_ready = threading.Condition(self.lock)
+        self.callback_chats = {}  # callback_query id -> chat_id
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                api.handle(self)
+
+            do_GET = do_POST
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeTelegramAPI':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_stats(self):
+        with self.lock:
+            self.calls.clear()
+            self.flood_errors = 0
+            self.sent.clear()
+
+    def push_update(self, update: dict) -> int:
+        """Queue an update for getUpdates; update_id is assigned here"""
+        with self.lock:
+            update['update_id'] = next(self.update_ids)
+            if 'callback_query' in update:
+                query = update['callback_query']
+                self.callback_chats[query['id']] = query['message']['chat']['id']
+            self.updates.append(update)
+            self.updates_ready.notify_all()
+        return update['update_id']
+
+    # -- request handling -------------------------------------------------
+
+    def parse_params(self, request) -> dict:
+        length = int(request.headers.get('Content-Length') or 0)
+        body = request.rfile.read(length) if length else b''
+        content_type = request.headers.get('Content-Type', '')
+
+        if content_type.startswith('application/json'):
+            return json.loads(body or b'{}')
+        if content_type.startswith('multipart/form-data'):
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body
+            )
+            params = {}
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                if part.get_filename():
+                    params[name] = part.get_payload(decode=True)
+                else:
+                    params[name] = part.get_content()
+            return params
+        return dict(parse_qsl(body.decode()))
+
+    def handle(self, request):
+        # Path: /bot<token>/<method>
+        method = request.path.rstrip('/').rsplit('/', 1)[-1]
+        params = self.parse_params(request)
+        if self.latency and method != 'getUpdates':
+            time.sleep(self.latency)
+
+        handler = getattr(self, f"api_{method}", None)
+        if handler is None:
+            status, payload = 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+        else:
+            status, payload = handler(params)
+
+        body = json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def check_flood(self, method: str, chat_id) -> tuple:
+        """Return a 429 response if a send would exceed the flood limits"""
+        now = time.monotonic()
+        with self.lock:
+            self.calls[method] += 1
+            if not self.global_window.hit(now) or not self.chat_windows[str(chat_id)].hit(now):
+                self.flood_errors += 1
+                return 429, {
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f"Too Many Requests: retry after {self.retry_after}",
+                    'parameters': {'retry_after': self.retry_after}
+                }
+        return None
+
+    def message(self, chat_id, **fields) -> dict:
+        result = {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'}
+        }
+        result.update(fields)
+        return result
+
+    def record(self, method: str, chat_id, params: dict, result=True) -> tuple:
+        """Store a successful call, tell the listeners and build the 200 response"""
+        with self.lock:
+            if self.keep_sent:
+                self.sent.append((time.monotonic(), method, str(chat_id), params))
+        for listener in self.listeners:
+            listener(method, chat_id, params, result)
+        return 200, {'ok': True, 'result': result}
+
+    @staticmethod
+    def markup(params: dict):
+        markup = params.get('reply_markup')
+        return json.loads(markup) if isinstance(markup, (str, bytes)) else markup
+
+    def api_getMe(self, params):
+        return 200, {'ok': True, 'result': {
+            'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot'
+        }}
+
+    def api_sendMessage(self, params):
+        flood = self.check_flood('sendMessage', params['chat_id'])
+        if flood:
+            return flood
+        return self.record('sendMessage', params['chat_id'], params, self.message(
+            params['chat_id'], text=params.get('text', ''), reply_markup=self.markup(params)
+        ))
+
+    def api_sendPhoto(self, params):
+        flood = self.check_flood('sendPhoto', params['chat_id'])
+        if flood:
+            return flood
+        photo_id = next(self.message_ids)
+        return self.record('sendPhoto', params['chat_id'], params, self.message(
+            params['chat_id'], caption=params.get('caption', ''),
+            photo=[{'file_id': f"photo{photo_id}", 'file_unique_id': f"u{photo_id}", 'width': 1200, 'height': 800}]
+        ))
+
+    def api_sendDocument(self, params):
+        flood = self.check_flood('sendDocument', params['chat_id'])
+        if flood:
+            return flood
+        document_id = next(self.message_ids)
+        return self.record('sendDocument', params['chat_id'], params, self.message(
+            params['chat_id'], document={'file_id': f"doc{document_id}", 'file_unique_id': f"u{document_id}"}
+        ))
+
+    def api_editMessageText(self, params):
+        flood = self.check_flood('editMessageText', params.get('chat_id'))
+        if flood:
+            return flood
+        if 'inline_message_id' in params:
+            return self.record('editMessageText', None, params)
+        result = self.message(params['chat_id'], text=params.get('text', ''), reply_markup=self.markup(params))
+        result['message_id'] = int(params['message_id'])
+        result['edit_date'] = result['date']
+        return self.record('editMessageText', params['chat_id'], params, result)
+
+    def api_answerCallbackQuery(self, params):
+        with self.lock:
+            self.calls['answerCallbackQuery'] += 1
+            chat_id = self.callback_chats.pop(params.get('callback_query_id'), None)
+        return self.record('answerCallbackQuery', chat_id, params)
+
+    def api_getUpdates(self, params):
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        deadline = time.monotonic() + float(params.get('timeout') or 0)
+        with self.updates_ready:
+            self.calls['getUpdates'] += 1
+            while True:
+                # offset mengonfirmasi update sebelumnya, seperti di Bot API
+                while self.updates and self.updates[0]['update_id'] < offset:
+                    self.updates.popleft()
+                remaining = deadline - time.monotonic()
+                if self.updates or remaining <= 0:
+                    break
+                self.updates_ready.wait(remaining)
+            result = list(itertools.islice(self.updates, limit))
+        return 200, {'ok': True, 'result': result}
+
+    def api_deleteWebhook(self, params):
+        return 200, {'ok': True, 'result': True}
+
+    api_setMyCommands = api_sendChatAction = api_deleteWebhook
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--global-limit', type=float, default=30)
+    parser.add_argument('--chat-limit', type=float, default=1)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeTelegramAPI(args.host, args.port, args.global_limit, args.chat_limit, latency=args.latency)
+    print(f"Fake Telegram Bot API listening on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
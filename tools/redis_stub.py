@@ -0,0 +1,436 @@
+"""In-memory Redis stand-in for testing the cache and the worker leases.
+
+Speaks RESP2 and RESP3 (HELLO) over TCP, so redis-py, sync and asyncio,
+talks to it like a real server. Covered: strings with expiry (GET, SET with EX/PX/NX/XX,
+SETEX, MGET, DEL, EXISTS, INCR/INCRBY, EXPIRE, PEXPIRE, TTL, PTTL), lists
+(RPUSH, LPUSH, LPOP, BLPOP, LLEN), optimistic transactions (WATCH, MULTI,
+EXEC, DISCARD, UNWATCH), PUBLISH/SUBSCRIBE, plus HELLO, PING, SELECT,
+CLIENT, FLUSHALL and DBSIZE. There is no persistence and no Lua.
+
+stop() drops every connection, which lets tests check how clients behave
+when Redis goes away; start() again on the same port brings it back empty.
+
+    python -m tools.redis_stub --port 6390
+"""
+import argparse
+import socket
+import socketserver
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Set, Tuple
+
+class RedisError(Exception):
+    pass
+
+class Store:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}  # Nilai list disimpan sebagai deque
+        self.versions: Dict[bytes, int] = defaultdict(int)  # Untuk WATCH
+        self.pushed = threading.Condition(self.lock)  # Membangunkan BLPOP
+        self.subscribers: Dict[bytes, Set['Connection']] = defaultdict(set)
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        item = self.data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= time.monotonic():
+            del self.data[key]
+            self.versions[key] += 1
+            return None
+        return item[0]
+
+    def put(self, key: bytes, value: bytes, expires_at: Optional[float] = None):
+        self.data[key] = (value, expires_at)
+        self.versions[key] += 1
+
+    def delete(self, key: bytes) -> bool:
+        if self.get(key) is None:
+            return False
+        del self.data[key]
+        self.versions[key] += 1
+        return True
+
+class Connection(socketserver.StreamRequestHandler):
+    store: Store = None
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.write_lock = threading.Lock()
+        self.channels: Set[bytes] = set()
+        self.watched: Dict[bytes, int] = {}
+        self.queued: Optional[List[List[bytes]]] = None
+        self.resp3 = False
+        self.server.connections.add(self)
+
+    def finish(self):
+        with self.store.lock:
+            for channel in self.channels:
+                self.store.subscribers[channel].discard(self)
+        self.server.connections.discard(self)
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def handle(self):
+        while True:
+            try:
+                command = self.read_command()
+            except (OSError, ValueError):
+                return
+            if command is None:
+                return
+            try:
+                reply = self.dispatch(command)
+            except RedisError as e:
+                reply = e
+            self.send(reply)
+
+    def read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()  # Perintah inline (mis. dari telnet)
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def send(self, reply, push: bool = False):
+        data = encode(reply, self.resp3, push)
+        with self.write_lock:
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+            except OSError:
+                pass
+
+    def dispatch(self, command: List[bytes]):
+        name = command[0].upper().decode()
+        args = command[1:]
+        if self.queued is not None and name not in ('EXEC', 'DISCARD', 'MULTI', 'WATCH'):
+            self.queued.append(command)
+            return Status('QUEUED')
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            raise RedisError(f"ERR unknown command '{name}'")
+        with self.store.lock:
+            return handler(*args)
+
+    # --- koneksi ---
+    def cmd_hello(self, protocol: bytes = b'2', *options: bytes):
+        if protocol not in (b'2', b'3'):
+            raise RedisError("NOPROTO unsupported protocol version")
+        self.resp3 = protocol == b'3'
+        return Map({'server': 'redis', 'version': '7.2.0', 'proto': int(protocol), 'id': id(self) % 100000,
+                    'mode': 'standalone', 'role': 'master', 'modules': []})
+
+    def cmd_ping(self, message: bytes = None):
+        return message if message is not None else Status('PONG')
+
+    def cmd_echo(self, message: bytes):
+        return message
+
+    def cmd_select(self, db: bytes):
+        return Status('OK')
+
+    def cmd_client(self, *args):
+        return Status('OK')
+
+    def cmd_flushall(self, *args):
+        for key in list(self.store.data):
+            self.store.delete(key)
+        return Status('OK')
+
+    cmd_flushdb = cmd_flushall
+
+    def cmd_dbsize(self):
+        return sum(1 for key in list(self.store.data) if self.store.get(key) is not None)
+
+    # --- string ---
+    def cmd_get(self, key: bytes):
+        return self.string(key)
+
+    def cmd_mget(self, *keys: bytes):
+        return [value if isinstance(value, bytes) else None for value in map(self.store.get, keys)]
+
+    def string(self, key: bytes) -> Optional[bytes]:
+        value = self.store.get(key)
+        if value is not None and not isinstance(value, bytes):
+            raise RedisError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def list(self, key: bytes, create: bool = False) -> Optional[deque]:
+        value = self.store.get(key)
+        if value is None and create:
+            value = deque()
+            self.store.put(key, value)
+        elif value is not None and not isinstance(value, deque):
+            raise RedisError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def cmd_set(self, key: bytes, value: bytes, *options: bytes):
+        expires_at, only, options = None, None, [option.upper() for option in options]
+        i = 0
+        while i < len(options):
+            if options[i] in (b'EX', b'PX'):
+                amount = float(options[i + 1]) / (1000 if options[i] == b'PX' else 1)
+                expires_at = time.monotonic() + amount
+                i += 2
+            elif options[i] in (b'NX', b'XX'):
+                only = options[i]
+                i += 1
+            else:
+                raise RedisError("ERR syntax error")
+        exists = self.store.get(key) is not None
+        if (only == b'NX' and exists) or (only == b'XX' and not exists):
+            return None
+        self.store.put(key, value, expires_at)
+        return Status('OK')
+
+    def cmd_setex(self, key: bytes, seconds: bytes, value: bytes):
+        return self.cmd_set(key, value, b'EX', seconds)
+
+    def cmd_psetex(self, key: bytes, milliseconds: bytes, value: bytes):
+        return self.cmd_set(key, value, b'PX', milliseconds)
+
+    def cmd_del(self, *keys: bytes):
+        return sum(self.store.delete(key) for key in keys)
+
+    cmd_unlink = cmd_del
+
+    def cmd_exists(self, *keys: bytes):
+        return sum(self.store.get(key) is not None for key in keys)
+
+    def cmd_incrby(self, key: bytes, amount: bytes):
+        current = self.string(key)
+        try:
+            value = int(current or 0) + int(amount)
+        except ValueError:
+            raise RedisError("ERR value is not an integer or out of range")
+        self.store.put(key, str(value).encode(), self.store.data.get(key, (None, None))[1])
+        return value
+
+    def cmd_incr(self, key: bytes):
+        return self.cmd_incrby(key, b'1')
+
+    def cmd_pexpire(self, key: bytes, milliseconds: bytes):
+        value = self.store.get(key)
+        if value is None:
+            return 0
+        self.store.put(key, value, time.monotonic() + int(milliseconds) / 1000)
+        return 1
+
+    def cmd_expire(self, key: bytes, seconds: bytes):
+        return self.cmd_pexpire(key, str(int(seconds) * 1000).encode())
+
+    def cmd_pttl(self, key: bytes):
+        if self.store.get(key) is None:
+            return -2
+        expires_at = self.store.data[key][1]
+        return -1 if expires_at is None else max(0, int((expires_at - time.monotonic()) * 1000))
+
+    def cmd_ttl(self, key: bytes):
+        ttl = self.cmd_pttl(key)
+        return ttl if ttl < 0 else (ttl + 500) // 1000
+
+    # --- list ---
+    def cmd_rpush(self, key: bytes, *values: bytes):
+        items = self.list(key, create=True)
+        items.extend(values)
+        self.store.versions[key] += 1
+        self.store.pushed.notify_all()
+        return len(items)
+
+    def cmd_lpush(self, key: bytes, *values: bytes):
+        items = self.list(key, create=True)
+        items.extendleft(values)
+        self.store.versions[key] += 1
+        self.store.pushed.notify_all()
+        return len(items)
+
+    def cmd_lpop(self, key: bytes):
+        items = self.list(key)
+        if not items:
+            return None
+        value = items.popleft()
+        self.store.versions[key] += 1
+        if not items:
+            self.store.delete(key)
+        return value
+
+    def cmd_llen(self, key: bytes):
+        items = self.list(key)
+        return len(items) if items else 0
+
+    def cmd_blpop(self, *args: bytes):
+        keys, timeout = args[:-1], float(args[-1])
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            for key in keys:
+                if self.list(key):
+                    return [key, self.cmd_lpop(key)]
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            # Melepas lock store selama menunggu RPUSH/LPUSH dari koneksi lain
+            self.store.pushed.wait(remaining)
+
+    # --- transaksi ---
+    def cmd_watch(self, *keys: bytes):
+        for key in keys:
+            self.store.get(key)  # Kedaluwarsa dihitung sebagai perubahan
+            self.watched[key] = self.store.versions[key]
+        return Status('OK')
+
+    def cmd_unwatch(self):
+        self.watched.clear()
+        return Status('OK')
+
+    def cmd_multi(self):
+        if self.queued is not None:
+            raise RedisError("ERR MULTI calls can not be nested")
+        self.queued = []
+        return Status('OK')
+
+    def cmd_discard(self):
+        if self.queued is None:
+            raise RedisError("ERR DISCARD without MULTI")
+        self.queued = None
+        self.watched.clear()
+        return Status('OK')
+
+    def cmd_exec(self):
+        if self.queued is None:
+            raise RedisError("ERR EXEC without MULTI")
+        queued, self.queued = self.queued, None
+        watched, self.watched = self.watched, {}
+        for key, version in watched.items():
+            self.store.get(key)
+            if self.store.versions[key] != version:
+                return None  # Transaksi dibatalkan
+        results = []
+        for command in queued:
+            try:
+                results.append(self.dispatch(command))
+            except RedisError as e:
+                results.append(e)
+        return results
+
+    # --- pub/sub ---
+    def cmd_publish(self, channel: bytes, message: bytes):
+        subscribers = list(self.store.subscribers.get(channel, ()))
+        for connection in subscribers:
+            connection.send([b'message', channel, message], push=True)
+        return len(subscribers)
+
+    def cmd_subscribe(self, *channels: bytes):
+        for channel in channels:
+            self.channels.add(channel)
+            self.store.subscribers[channel].add(self)
+            self.send([b'subscribe', channel, len(self.channels)], push=True)
+        return NoReply
+
+    def cmd_unsubscribe(self, *channels: bytes):
+        for channel in channels or list(self.channels):
+            self.channels.discard(channel)
+            self.store.subscribers[channel].discard(self)
+            self.send([b'unsubscribe', channel, len(self.channels)], push=True)
+        return NoReply
+
+class Status(str):
+    pass
+
+class Map(dict):
+    pass
+
+NoReply = object()
+
+def encode(reply, resp3: bool = False, push: bool = False) -> bytes:
+    if reply is NoReply:
+        return b''
+    if reply is None:
+        return b'_\r\n' if resp3 else b'$-1\r\n'
+    if isinstance(reply, Status):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, RedisError):
+        return f"-{reply}\r\n".encode()
+    if isinstance(reply, bool):
+        reply = int(reply)
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if isinstance(reply, str):
+        reply = reply.encode()
+    if isinstance(reply, bytes):
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+    if isinstance(reply, Map):
+        items = [item for pair in reply.items() for item in pair]
+        if resp3:
+            return b'%%%d\r\n' % len(reply) + b''.join(encode(item, resp3) for item in items)
+        reply = items
+    if isinstance(reply, list):
+        # RESP3 mengirim pesan pub/sub sebagai tipe push
+        prefix = b'>' if resp3 and push else b'*'
+        return prefix + b'%d\r\n' % len(reply) + b''.join(encode(item, resp3) for item in reply)
+    raise TypeError(f"Cannot encode reply {reply!r}")
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class RedisStub:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.store = Store()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    def start(self) -> 'RedisStub':
+        handler = type('Handler', (Connection,), {'store': self.store})
+        self.server = _Server((self.host, self.port), handler)
+        self.server.connections = set()
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name='redis-stub', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop listening, drop all connections and forget the data"""
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        for connection in list(self.server.connections):
+            try:
+                connection.connection.shutdown(2)
+            except OSError:
+                pass
+        self.server = None
+        self.store = Store()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+
+    stub = RedisStub(args.host, args.port)
+    stub.start()
+    print(f"Redis stub listening on {stub.url}")
+    try:
+        stub.thread.join()
+    except KeyboardInterrupt:
+        stub.stop()
+
+if __name__ == "__main__":
+    main()
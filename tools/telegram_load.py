@@ -0,0 +1,366 @@
+"""Load test the whole bot with simulated Telegram users.
+
+Starts the fake Bot API (tools.fake_telegram_api) and the exchange
+simulator (tools.exchange_simulator), launches `run.py` against both with
+a throwaway SQLite database, and plays N users. Each user sends /start
+and then a weighted mix of commands; after a reply with inline buttons it
+presses one of them half of the time. A user waits for the bot's first
+reply and a think time before the next action.
+
+Latency is measured from pushing the update into getUpdates to the bot's
+first call for that chat (first_ms) and to its last call before the user
+acts again (last_ms, e.g. the photo after "membuat grafik..."; for live
+price messages it includes their periodic edits). Replies starting with ⏳
+are the scheduler shedding load and are counted as shed; a request without
+any reply within --timeout is a timeout.
+
+    python -m tools.telegram_load --users 10 50 100 200 --stage-seconds 60
+    python -m tools.telegram_load --users 100 --output load.json
+    python -m tools.telegram_load --users 100 --baseline load.json --threshold 0.3
+
+Several --users values run as consecutive stages on the same bot; the
+saturation point is where throughput stops growing while latency climbs.
+By default every user is ADMIN so quotas do not cap the measurement; use
+--premium/--free to measure the real role mix instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from tools.exchange_simulator import ExchangeSimulator, MarketSimulator
+from tools.fake_telegram_api import FakeTelegramAPI
+
+TOKEN = '123456:LOADTEST'
+USER_ID_BASE = 100000
+
+COINS = ('BTC', 'ETH', 'SOL', 'XRP', 'DOGE', 'ADA', 'LINK', 'AVAX')
+
+# (bobot, template perintah); {coin}, {tf}, {price} diisi acak
+COMMAND_MIX = (
+    (30, '/price {coin}'),
+    (8, '/chart {coin} {tf}'),
+    (8, '/analyze {coin}USDT'),
+    (6, '/alert {coin} {price} diatas'),
+    (5, '/alerts'),
+    (5, '/spread'),
+    (4, '/market'),
+    (4, '/portfolio'),
+    (4, '/help'),
+    (3, '/scan'),
+    (3, '/sentiment'),
+    (3, '/kondisi {coin} RSI(14) below 30'),
+    (3, '/status'),
+    (2, '/korelasi'),
+    (2, '/pairs')
+)
+TIMEFRAMES = ('15m', '1h', '4h', '1d')
+
+class Request:
+    __slots__ = ('command', 'stage', 'sent_at', 'first', 'last', 'shed', 'replied')
+
+    def __init__(self, command: str, stage: int, sent_at: float, replied: asyncio.Future):
+        self.command = command
+        self.stage = stage
+        self.sent_at = sent_at
+        self.first = None
+        self.last = None
+        self.shed = False
+        self.replied = replied
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+class LoadGenerator:
+    def __init__(self, server: FakeTelegramAPI, think: float, timeout: float, click: float, seed: int):
+        self.server = server
+        self.think = think
+        self.timeout = timeout
+        self.click = click
+        self.rng = random.Random(seed)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pending: Dict[int, Request] = {}  # chat_id -> permintaan terakhir
+        self.keyboards: Dict[int, tuple] = {}  # chat_id -> (message, [callback_data])
+        self.done: List[Request] = []
+        self.unsolicited = 0  # Pesan tanpa permintaan (notifikasi alert, busy reply)
+        self.stage = 0
+        self.stop_at = 0.0
+        self.message_ids = iter(range(1, 1 << 31))
+        self.callback_ids = iter(range(1, 1 << 31))
+        server.listeners.append(self.on_bot_call)
+
+    # Dipanggil dari thread server fake API
+    def on_bot_call(self, method: str, chat_id, params: dict, result):
+        if chat_id is None or self.loop is None:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._on_reply, method, int(chat_id), params, result, time.perf_counter())
+        except RuntimeError:
+            pass  # Loop generator sudah selesai; bot masih mengirim edit live
+
+    def _on_reply(self, method: str, chat_id: int, params: dict, result, at: float):
+        request = self.pending.get(chat_id)
+        if request is None:
+            self.unsolicited += 1
+            return
+        text = params.get('text') or ''
+        if isinstance(text, str) and text.startswith('⏳'):
+            request.shed = True
+        request.first = request.first or at
+        request.last = at
+        markup = FakeTelegramAPI.markup(params)
+        if isinstance(result, dict) and markup and markup.get('inline_keyboard'):
+            buttons = [button['callback_data'] for row in markup['inline_keyboard'] for button in row
+                       if button.get('callback_data')]
+            self.keyboards[chat_id] = (result, buttons)
+        if not request.replied.done():
+            request.replied.set_result(None)
+
+    def _finish(self, chat_id: int):
+        request = self.pending.pop(chat_id, None)
+        if request is not None:
+            self.done.append(request)
+
+    def _user(self, user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': f"Load{user_id}", 'username': f"load{user_id}"}
+
+    def send_command(self, user_id: int, text: str) -> Request:
+        command = text.split()[0][1:]
+        update = {'message': {
+            'message_id': next(self.message_ids), 'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'}, 'from': self._user(user_id), 'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command) + 1}]
+        }}
+        return self._push(user_id, command, update)
+
+    def press_button(self, user_id: int, message: dict, data: str) -> Request:
+        update = {'callback_query': {
+            'id': str(next(self.callback_ids)), 'from': self._user(user_id), 'chat_instance': str(user_id),
+            'data': data, 'message': dict(message, **{'from': {'id': 1, 'is_bot': True, 'first_name': 'FakeBot'}})
+        }}
+        return self._push(user_id, f"cb:{data.split('_')[0]}", update)
+
+    def _push(self, user_id: int, command: str, update: dict) -> Request:
+        self._finish(user_id)
+        request = Request(command, self.stage, time.perf_counter(), self.loop.create_future())
+        self.pending[user_id] = request
+        self.server.push_update(update)
+        return request
+
+    def next_command(self) -> str:
+        template = self.rng.choices([t for _, t in COMMAND_MIX], weights=[w for w, _ in COMMAND_MIX])[0]
+        return template.format(coin=self.rng.choice(COINS), tf=self.rng.choice(TIMEFRAMES),
+                               price=self.rng.randint(1, 100000))
+
+    async def run_user(self, user_id: int):
+        rng = random.Random(user_id)
+        await asyncio.sleep(rng.uniform(0, self.think))  # Jangan semua mulai bersamaan
+        first = True
+        while time.perf_counter() < self.stop_at:
+            keyboard = self.keyboards.pop(user_id, None)
+            if first:
+                request = self.send_command(user_id, '/start')
+                first = False
+            elif keyboard and keyboard[1] and rng.random() < self.click:
+                request = self.press_button(user_id, keyboard[0], rng.choice(keyboard[1]))
+            else:
+                request = self.send_command(user_id, self.next_command())
+            try:
+                await asyncio.wait_for(asyncio.shield(request.replied), self.timeout)
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.sleep(rng.expovariate(1 / self.think))
+        self._finish(user_id)
+
+    async def run(self, stages: List[int], seconds: float) -> List[Dict]:
+        self.loop = asyncio.get_running_loop()
+        self.stop_at = float('inf')
+        tasks, reports = [], []
+        for index, users in enumerate(stages):
+            self.stage = index
+            started = time.perf_counter()
+            # Pengguna tahap sebelumnya tetap berjalan; hanya kekurangannya yang ditambah
+            for user_id in range(USER_ID_BASE + len(tasks), USER_ID_BASE + users):
+                tasks.append(asyncio.create_task(self.run_user(user_id)))
+            await asyncio.sleep(seconds)
+            reports.append(self.report(index, users, time.perf_counter() - started))
+        self.stop_at = 0.0
+        await asyncio.wait(tasks, timeout=self.timeout + self.think * 3)
+        return reports
+
+    def report(self, stage: int, users: int, elapsed: float) -> Dict:
+        by_command = defaultdict(list)
+        in_flight = 0
+        for request in self.done + list(self.pending.values()):
+            if request.stage != stage:
+                continue
+            if request.first is None and request in self.pending.values():
+                in_flight += 1  # Belum dijawab, tapi belum melewati --timeout
+                continue
+            by_command[request.command].append(request)
+
+        def summarize(requests: List[Request]) -> Dict:
+            answered = [r for r in requests if r.first is not None and not r.shed]
+            first = [(r.first - r.sent_at) * 1000 for r in answered]
+            last = [(r.last - r.sent_at) * 1000 for r in answered]
+            result = {
+                'sent': len(requests),
+                'ok': len(answered),
+                'shed': sum(1 for r in requests if r.shed),
+                'timeouts': sum(1 for r in requests if r.first is None),
+                'per_second': round(len(answered) / elapsed, 2)
+            }
+            for name, values in (('first_ms', first), ('last_ms', last)):
+                for q in (0.5, 0.95, 0.99):
+                    value = percentile(values, q)
+                    result[f"{name}_p{int(q * 100)}"] = round(value, 1) if value is not None else None
+            return result
+
+        everything = [request for requests in by_command.values() for request in requests]
+        return {
+            'stage': stage,
+            'users': users,
+            'seconds': round(elapsed, 1),
+            'total': summarize(everything),
+            'commands': {command: summarize(requests) for command, requests in sorted(by_command.items())},
+            'in_flight': in_flight,
+            'unsolicited': self.unsolicited
+        }
+
+def seed_roles(database_url: str, users: int, premium: float, free: float, seed: int):
+    """Create the schema and give the simulated users their roles before the bot starts"""
+    os.environ['DATABASE_URL'] = database_url
+    from src.database.connection import DatabaseManager
+    from src.database.models import User, UserRole
+    db = DatabaseManager()
+    db.create_tables()
+    rng = random.Random(seed)
+    session = next(db.get_session())
+    try:
+        for i in range(users):
+            draw = rng.random()
+            role = UserRole.FREE if draw < free else UserRole.PREMIUM if draw < free + premium else UserRole.ADMIN
+            session.add(User(telegram_id=str(USER_ID_BASE + i), username=f"load{USER_ID_BASE + i}", role=role))
+        session.commit()
+    finally:
+        session.close()
+
+def compare(reports: List[Dict], baseline: List[Dict], threshold: float) -> List[str]:
+    """Regressions of the last stage: throughput down or p95 first-reply latency up beyond threshold"""
+    regressions = []
+    current, previous = reports[-1]['commands'], baseline[-1]['commands']
+    for command, stats in current.items():
+        before = previous.get(command)
+        if not before:
+            continue
+        if before['per_second'] and stats['per_second'] < before['per_second'] * (1 - threshold):
+            regressions.append(f"{command}: {before['per_second']}/s -> {stats['per_second']}/s")
+        if before['first_ms_p95'] and stats['first_ms_p95'] and \
+                stats['first_ms_p95'] > before['first_ms_p95'] * (1 + threshold):
+            regressions.append(f"{command}: p95 {before['first_ms_p95']}ms -> {stats['first_ms_p95']}ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--stage-seconds', type=float, default=60)
+    parser.add_argument('--warmup', type=float, default=20, help="Seconds for the bot to load markets first")
+    parser.add_argument('--think', type=float, default=2.0, help="Mean seconds between a reply and the next action")
+    parser.add_argument('--click', type=float, default=0.5, help="Chance to press a button after a keyboard")
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--premium', type=float, default=0.0, help="Share of PREMIUM users")
+    parser.add_argument('--free', type=float, default=0.0, help="Share of FREE users (the rest are ADMIN)")
+    parser.add_argument('--global-limit', type=float, default=0, help="Fake API flood limit, 0 = none")
+    parser.add_argument('--chat-limit', type=float, default=0)
+    parser.add_argument('--api-latency', type=float, default=0.0, help="Seconds added to every Bot API call")
+    parser.add_argument('--exchange-speed', type=float, default=1.0)
+    parser.add_argument('--exchange-latency', type=float, default=0.05)
+    parser.add_argument('--no-spawn', action='store_true', help="Do not start run.py; print the environment")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output')
+    parser.add_argument('--baseline')
+    parser.add_argument('--threshold', type=float, default=0.3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='telegram-load-')
+    server = FakeTelegramAPI(global_limit=args.global_limit, chat_limit=args.chat_limit,
+                             latency=args.api_latency).start()
+    server.keep_sent = False
+    simulator = ExchangeSimulator(MarketSimulator(speed=args.exchange_speed),
+                                  latency=args.exchange_latency).start()
+    database_url = f"sqlite:///{workdir}/load.db"
+    seed_roles(database_url, max(args.users), args.premium, args.free, args.seed)
+
+    env = dict(os.environ,
+               TELEGRAM_BOT_TOKEN=TOKEN, TELEGRAM_ADMIN_ID='', TELEGRAM_API_URL=f"{server.url}/bot",
+               DATABASE_URL=database_url, METRICS_PORT='0',
+               ALERT_SNAPSHOT_PATH=os.path.join(workdir, 'alerts.snapshot'),
+               INDODAX_API_URL=f"{simulator.url}/api", BITGET_API_URL=simulator.url,
+               BITGET_WS_URL=f"{simulator.url.replace('http://', 'ws://')}/spot/v1/stream")
+    bot = None
+    if args.no_spawn:
+        for key in ('TELEGRAM_BOT_TOKEN', 'TELEGRAM_API_URL', 'DATABASE_URL', 'INDODAX_API_URL',
+                    'BITGET_API_URL', 'BITGET_WS_URL'):
+            print(f"{key}={env[key]}")
+        input("Start the bot with these variables, then press Enter...")
+    else:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        bot = subprocess.Popen([sys.executable, 'run.py'], cwd=root, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while not server.calls.get('getUpdates'):
+            if bot is not None and bot.poll() is not None:
+                sys.exit(f"Bot exited with status {bot.returncode}, see logs/error.log")
+            if time.monotonic() > deadline:
+                sys.exit("Bot did not start polling within 60 seconds")
+            time.sleep(0.2)
+        print(f"Bot is polling, warming up for {args.warmup:.0f}s", file=sys.stderr)
+        time.sleep(args.warmup)
+
+        generator = LoadGenerator(server, args.think, args.timeout, args.click, args.seed)
+        reports = asyncio.run(generator.run(args.users, args.stage_seconds))
+    finally:
+        if bot is not None:
+            bot.terminate()
+            try:
+                bot.wait(15)
+            except subprocess.TimeoutExpired:
+                bot.kill()
+        simulator.stop()
+        server.stop()
+
+    for report in reports:
+        total = report['total']
+        print(f"{report['users']:>5} users: {total['per_second']:>7.2f} ok/s, shed {total['shed']}, "
+              f"timeouts {total['timeouts']}, first p50/p95 {total['first_ms_p50']}/{total['first_ms_p95']} ms",
+              file=sys.stderr)
+
+    result = {'stages': reports}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(reports, json.load(f)['stages'], args.threshold)
+        result['regressions'] = regressions
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if regressions:
+        print("Regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()